@@ -155,12 +155,17 @@ WEB_SEARCH_QUERIES_END
 
         formatted = []
         for i, ev in enumerate(evidence_list, 1):
-            formatted.append(
+            line = (
                 f"{i}. [{ev.timestamp.strftime('%Y-%m-%d %H:%M')}] "
                 f"(可靠性: {ev.reliability_score:.2f}) "
                 f"{ev.summary}\n"
                 f"   source_id: {ev.source_id}"
             )
+            # 已合并的转载新闻：列出多来源，体现交叉印证
+            sources = [str(s.get("source")) for s in (ev.metadata or {}).get("sources", []) if s.get("source")]
+            if len(sources) > 1:
+                line += f"\n   sources: {', '.join(sources[:4])}" + (f" (+{len(sources) - 4})" if len(sources) > 4 else "")
+            formatted.append(line)
         return "\n".join(formatted)
 
     async def execute(self, context: Dict[str, Any]) -> AnalystOutput:
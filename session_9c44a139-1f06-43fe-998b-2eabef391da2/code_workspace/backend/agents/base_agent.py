@@ -268,19 +268,17 @@ class BaseAgent(ABC):
         return queries[:3]
 
     async def _search_google_news(self, query: str, limit: int = 3) -> List[Dict[str, str]]:
-        import aiohttp
+        from data.data_source import get_data_source
         url = (
             "https://news.google.com/rss/search?"
             f"q={quote_plus(query)}&hl=en-US&gl=US&ceid=US:en"
         )
         out: List[Dict[str, str]] = []
-        timeout = aiohttp.ClientTimeout(total=10)
         headers = {"User-Agent": "Mozilla/5.0 (MyQuantAgent/1.0)"}
-        async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    return out
-                xml_text = await resp.text()
+        resp = await get_data_source().fetch(url, ttl_seconds=180, headers=headers, timeout=10)
+        if not resp.ok:
+            return out
+        xml_text = resp.text
         try:
             root = ET.fromstring(xml_text)
             for node in root.findall("./channel/item")[:limit]:
@@ -315,16 +313,27 @@ class BaseAgent(ABC):
             queries = self._extract_web_queries(prompt)
             if not queries:
                 return prompt
+            from data.news_dedup import get_news_index
+            news_index = get_news_index()
+            seen_clusters = set()
             snippets: List[str] = []
             for q in queries[:4]:
                 try:
                     items = await self._search_google_news(q, limit=2)
                 except Exception:
                     items = []
-                if not items:
+                # 跨查询的转载/近重复标题只保留一条，压缩提示词
+                fresh = []
+                for it in items:
+                    cid = news_index.assign(it["title"])
+                    if cid in seen_clusters:
+                        continue
+                    seen_clusters.add(cid)
+                    fresh.append(it)
+                if not fresh:
                     continue
                 snippets.append(f"[Query] {q}")
-                for it in items:
+                for it in fresh:
                     snippets.append(
                         f"- {it['title']} | source={it['source']} | time={it['timestamp']} | url={it['link']}"
                     )
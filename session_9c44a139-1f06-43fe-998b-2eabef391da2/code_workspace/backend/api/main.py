@@ -68,6 +68,22 @@ class MaterialUploadRequest(BaseModel):
     broadcast_to_all_d4: bool = True
 
 
+class CheckpointRequest(BaseModel):
+    note: str = ""
+
+
+class ParamSearchRequest(BaseModel):
+    symbols: Optional[List[str]] = None
+    days: Optional[int] = None
+    grid: Optional[Dict[str, List[float]]] = None
+    bounds: Optional[Dict[str, List[float]]] = None
+    samples: int = 32
+    seed: int = 0
+    objective: str = "sharpe"  # sharpe / calmar / drawdown
+    folds: int = 4
+    patience: int = 3
+
+
 class UserAccountRequest(BaseModel):
     user_id: str
     account_type: str  # "paper" 或 "real"
@@ -584,13 +600,14 @@ async def list_materials():
 
 @app.post("/api/d5/train")
 async def train_d5():
-    """触发 D5 在线训练/校准"""
+    """触发 D5 在线训练/校准（异步任务，进度见 /api/system/jobs）"""
     try:
-        report = await scheduler.train_d5()
+        job_id = scheduler.run_d5_training_manual()
         return {
             "success": True,
-            "message": "D5 training completed",
-            "report": report,
+            "message": "D5 training job started",
+            "job_id": job_id,
+            "report": scheduler.get_d5_training_report(),
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -612,6 +629,113 @@ async def get_d5_train_report():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/d5/features/{symbol}")
+async def get_d5_features(symbol: str, since: Optional[str] = None, limit: int = 1000):
+    """获取某只股票的 D5 特征时间序列（since 为 ISO 时间，返回其后的记录）"""
+    try:
+        since_dt = datetime.fromisoformat(since) if since else None
+        data = scheduler.get_d5_features(symbol, since=since_dt, limit=limit)
+        data["timestamp"] = datetime.now().isoformat()
+        return data
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting D5 features for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/d5/checkpoints")
+async def list_d5_checkpoints():
+    """列出 D5 模型检查点（含训练数据区间、指标与生效版本）"""
+    try:
+        data = scheduler.list_d5_checkpoints()
+        data["timestamp"] = datetime.now().isoformat()
+        return data
+    except Exception as e:
+        logger.error(f"Error listing D5 checkpoints: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/d5/checkpoints")
+async def save_d5_checkpoint(request: CheckpointRequest):
+    """保存当前 D5 模型为新检查点"""
+    try:
+        return {
+            "success": True,
+            "checkpoint": scheduler.save_d5_checkpoint(note=request.note),
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error saving D5 checkpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/d5/checkpoints/{version}/activate")
+async def activate_d5_checkpoint(version: int):
+    """加载并启用指定版本的 D5 检查点"""
+    try:
+        return {
+            "success": True,
+            "checkpoint": scheduler.activate_d5_checkpoint(version),
+            "params": scheduler.d5.get_params(),
+            "timestamp": datetime.now().isoformat()
+        }
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        logger.error(f"Error activating D5 checkpoint {version}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/d5/checkpoints/rollback")
+async def rollback_d5_checkpoint():
+    """回滚到上一个 D5 检查点"""
+    try:
+        return {
+            "success": True,
+            "checkpoint": scheduler.rollback_d5_checkpoint(),
+            "params": scheduler.d5.get_params(),
+            "timestamp": datetime.now().isoformat()
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error rolling back D5 checkpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/d5/params/search")
+async def run_d5_param_search(request: ParamSearchRequest):
+    """启动 D5 参数搜索（历史回测 + walk-forward，后台任务）"""
+    try:
+        payload = request.model_dump()
+        if payload.get("bounds"):
+            payload["bounds"] = {k: tuple(v[:2]) for k, v in payload["bounds"].items()}
+        return {
+            "success": True,
+            "message": "D5 parameter search job started",
+            "job_id": scheduler.run_d5_param_search_manual(payload),
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error starting D5 parameter search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/d5/params/search/report")
+async def get_d5_param_search_report():
+    """获取最近一次 D5 参数搜索报告"""
+    try:
+        return {
+            "report": scheduler.get_d5_param_search_report(),
+            "params": scheduler.d5.get_params(),
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error getting D5 parameter search report: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/config/update")
 async def update_config(request: UserConfigRequest):
     """更新用户配置"""
@@ -968,6 +1092,21 @@ async def run_once_manual():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/system/memory/consolidate")
+async def run_memory_consolidation():
+    """手动触发相似短期记忆合并为长期摘要"""
+    try:
+        return {
+            "success": True,
+            "message": "Memory consolidation job started",
+            "job_id": scheduler.run_memory_consolidation_manual(),
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        logger.error(f"Error running memory consolidation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/system/progress")
 async def get_progress():
     """获取部门与个股进度"""
@@ -986,6 +1125,24 @@ async def get_jobs():
     }
 
 
+@app.get("/api/system/data-source")
+async def get_data_source_stats():
+    """获取数据源模式（实时/录制/回放）与缓存统计"""
+    return {
+        "data_source": scheduler.get_data_source_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/api/system/source-health")
+async def get_source_health():
+    """获取行情数据源健康度（成功率/延迟/冷却/当前排序）"""
+    return {
+        "source_health": scheduler.get_source_health(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 @app.get("/api/d7/recommendations")
 async def get_d7_recommendations():
     """获取D7推荐池（短/中/长）"""
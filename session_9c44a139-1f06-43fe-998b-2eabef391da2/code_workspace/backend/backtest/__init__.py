@@ -0,0 +1,14 @@
+"""Backtest package"""
+from .engine import (
+    OHLCVPanel, D6Policy, RuleBasedD6Policy, CachedDecisionPolicy,
+    BacktestEngine, BacktestResult, performance_metrics
+)
+from .optimizer import (
+    ParameterSearch, grid_candidates, random_candidates, walk_forward_splits
+)
+
+__all__ = [
+    'OHLCVPanel', 'D6Policy', 'RuleBasedD6Policy', 'CachedDecisionPolicy',
+    'BacktestEngine', 'BacktestResult', 'performance_metrics',
+    'ParameterSearch', 'grid_candidates', 'random_candidates', 'walk_forward_splits'
+]
@@ -0,0 +1,499 @@
+"""
+回测引擎 - 历史 OHLCV 逐 bar 回放：D5 截面向量化计算 → 可插拔 D6 策略 → PaperTradingEngine 在模拟时钟下成交
+"""
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Iterable, Union
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+import csv
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+from models.base_models import TradingDecision
+from quantitative.d5_quant import D5QuantDepartment
+from trading.paper_trading import PaperTradingEngine
+
+# 方向编码：策略输出为整型数组，SKIP 表示本 bar 不对该股票下单
+DIRECTIONS = ("NO_TRADE", "FLAT", "LONG", "SHORT")
+SKIP, NO_TRADE, FLAT, LONG, SHORT = -1, 0, 1, 2, 3
+
+
+def _parse_ts(value: Union[str, datetime, float, int]) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(float(value))
+    return datetime.fromisoformat(str(value).strip())
+
+
+class OHLCVPanel:
+    """
+    对齐后的 T×N 行情面板（缺失 bar 为 NaN）：
+    - dept_scores / dept_confidence 为 T×N×4（D1-D4，缺失为 NaN），由录制的部门结论前向填充得到
+    - event_risk 为 T×N；whale_flows 为 T×N×4（大单净买、暗池净额、期权大单名义、ADV），缺省为 0
+    """
+
+    def __init__(self,
+                 timestamps: Sequence[datetime],
+                 symbols: Sequence[str],
+                 open: np.ndarray,
+                 high: np.ndarray,
+                 low: np.ndarray,
+                 close: np.ndarray,
+                 volume: np.ndarray,
+                 dept_scores: Optional[np.ndarray] = None,
+                 dept_confidence: Optional[np.ndarray] = None,
+                 event_risk: Optional[np.ndarray] = None,
+                 whale_flows: Optional[np.ndarray] = None):
+        self.timestamps = [_parse_ts(t) for t in timestamps]
+        self.symbols = [str(s).upper() for s in symbols]
+        shape = (len(self.timestamps), len(self.symbols))
+        self.open, self.high, self.low, self.close, self.volume = (
+            np.asarray(a, dtype=np.float64).reshape(shape) for a in (open, high, low, close, volume)
+        )
+        self.dept_scores = None if dept_scores is None else np.asarray(dept_scores, dtype=np.float64).reshape(shape + (4,))
+        self.dept_confidence = None if dept_confidence is None else np.asarray(dept_confidence, dtype=np.float64).reshape(shape + (4,))
+        self.event_risk = None if event_risk is None else np.asarray(event_risk, dtype=np.float64).reshape(shape)
+        self.whale_flows = None if whale_flows is None else np.asarray(whale_flows, dtype=np.float64).reshape(shape + (4,))
+        self._ts = np.array([t.timestamp() for t in self.timestamps], dtype=np.float64)
+
+    @property
+    def n_bars(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def n_symbols(self) -> int:
+        return len(self.symbols)
+
+    @classmethod
+    def from_records(cls, bars: Dict[str, List[Dict[str, Any]]]) -> "OHLCVPanel":
+        """{symbol: [{timestamp|date, open, high, low, close, volume}, ...]} 按时间并集对齐"""
+        parsed: Dict[str, List[Tuple[datetime, Dict[str, Any]]]] = {}
+        all_ts = set()
+        for symbol, rows in bars.items():
+            items = []
+            for row in rows:
+                ts = _parse_ts(row.get("timestamp", row.get("date")))
+                items.append((ts, row))
+                all_ts.add(ts)
+            parsed[str(symbol).upper()] = items
+        timestamps = sorted(all_ts)
+        index = {ts: i for i, ts in enumerate(timestamps)}
+        symbols = list(parsed)
+        arrays = {k: np.full((len(timestamps), len(symbols)), np.nan) for k in ("open", "high", "low", "close", "volume")}
+        for j, symbol in enumerate(symbols):
+            for ts, row in parsed[symbol]:
+                i = index[ts]
+                for k, arr in arrays.items():
+                    v = row.get(k)
+                    arr[i, j] = np.nan if v is None else float(v)
+        return cls(timestamps, symbols, **arrays)
+
+    @classmethod
+    def from_csv_dir(cls, path: str, symbols: Optional[Iterable[str]] = None) -> "OHLCVPanel":
+        """读取目录下 <SYMBOL>.csv（Stooq/Yahoo 日线格式：Date,Open,High,Low,Close,Volume）"""
+        wanted = {str(s).upper() for s in symbols} if symbols else None
+        bars: Dict[str, List[Dict[str, Any]]] = {}
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() != ".csv":
+                continue
+            symbol = stem.split(".")[0].upper()
+            if wanted is not None and symbol not in wanted:
+                continue
+            rows = []
+            with open(os.path.join(path, name), newline="", encoding="utf-8") as f:
+                for raw in csv.DictReader(f):
+                    row = {str(k).strip().lower(): v for k, v in raw.items() if k}
+                    try:
+                        rows.append({
+                            "timestamp": row["date"],
+                            "open": float(row["open"]),
+                            "high": float(row["high"]),
+                            "low": float(row["low"]),
+                            "close": float(row["close"]),
+                            "volume": float(row.get("volume") or 0.0),
+                        })
+                    except (KeyError, TypeError, ValueError):
+                        continue
+            if rows:
+                bars[symbol] = rows
+        return cls.from_records(bars)
+
+    def attach_department_scores(self, records: Iterable[Dict[str, Any]]):
+        """
+        录制的部门结论 {symbol, timestamp, department, score, confidence} 写入面板：
+        结论在其时间之后的第一根 bar 生效并前向填充，直到同部门下一条结论（不引入未来信息）
+        """
+        col = {s: j for j, s in enumerate(self.symbols)}
+        dept_idx = {d: k for k, d in enumerate(D5QuantDepartment.RESEARCH_DEPARTMENTS)}
+        T, N = self.n_bars, self.n_symbols
+        marks = np.full((T, N, 4), -1, dtype=np.int64)
+        values: List[Tuple[float, float]] = []
+        for rec in sorted(records, key=lambda r: _parse_ts(r["timestamp"])):
+            j = col.get(str(rec.get("symbol", "")).upper())
+            k = dept_idx.get(str(rec.get("department", "")).upper())
+            if j is None or k is None:
+                continue
+            i = int(np.searchsorted(self._ts, _parse_ts(rec["timestamp"]).timestamp(), side="left"))
+            if i >= T:
+                continue
+            marks[i, j, k] = len(values)
+            values.append((float(rec.get("score", 0.0)), float(rec.get("confidence", 0.0))))
+        if not values:
+            return
+        # 前向填充：沿时间轴取“至今最近一条结论”的编号
+        filled = np.maximum.accumulate(marks, axis=0)
+        table = np.array(values + [(np.nan, np.nan)], dtype=np.float64)
+        picked = table[np.where(filled >= 0, filled, len(values))]
+        self.dept_scores = picked[..., 0]
+        self.dept_confidence = picked[..., 1]
+
+    def slice(self, start: int, end: Optional[int] = None) -> "OHLCVPanel":
+        """按 bar 下标截取 [start, end)，用于滚动前推（walk-forward）切分"""
+        s = slice(start, end)
+        opt = lambda a: None if a is None else a[s]
+        return OHLCVPanel(
+            self.timestamps[s], self.symbols,
+            self.open[s], self.high[s], self.low[s], self.close[s], self.volume[s],
+            dept_scores=opt(self.dept_scores), dept_confidence=opt(self.dept_confidence),
+            event_risk=opt(self.event_risk), whale_flows=opt(self.whale_flows),
+        )
+
+
+class D6Policy(ABC):
+    """D6 决策策略：输入一根 bar 的 D5 截面数组，输出 (方向编码, 目标仓位)"""
+
+    def reset(self, panel: OHLCVPanel):
+        """回测开始前调用，可按面板预计算"""
+
+    @abstractmethod
+    def decide(self,
+               t: int,
+               columns: np.ndarray,
+               quant: Dict[str, np.ndarray],
+               confidence: np.ndarray,
+               event_risk: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+
+
+class RuleBasedD6Policy(D6Policy):
+    """
+    D6 确定性风控规则的向量化版本（口径同 D6ICDepartment._check_risk_controls /
+    _determine_direction / _calculate_target_position）：
+    - IC 评分以研究因子 LA_t 代替讨论结论；无部门分数时以 tanh(final_alpha / vol) 作为代理
+    - 无部门分数时不做平均置信度检查
+    - 量化仓位与线上一致：有风险模型预算仓位（risk_position）时优先使用；方向与交易方向相反时目标仓位为 0
+    """
+
+    def __init__(self,
+                 direction_threshold: float = 0.2,
+                 divergence_limit: float = 0.5,
+                 event_risk_limit: float = 0.7,
+                 min_confidence: float = 0.4,
+                 max_position: float = 1.0):
+        self.direction_threshold = direction_threshold
+        self.divergence_limit = divergence_limit
+        self.event_risk_limit = event_risk_limit
+        self.min_confidence = min_confidence
+        self.max_position = max_position
+
+    def decide(self, t, columns, quant, confidence, event_risk):
+        present = np.isfinite(confidence)
+        count = present.sum(axis=1)
+        has_research = count > 0
+        avg_conf = np.where(present, confidence, 0.0).sum(axis=1) / np.maximum(count, 1)
+
+        vol = np.where(quant["volatility"] <= 0, 0.01, quant["volatility"])
+        score = np.where(has_research, quant["la_t"], np.tanh(quant["final_alpha"] / vol))
+
+        no_trade = (event_risk > self.event_risk_limit) | (has_research & (avg_conf < self.min_confidence))
+        reduce = quant["divergence"] > self.divergence_limit
+
+        direction = np.where(score > self.direction_threshold, LONG,
+                             np.where(score < -self.direction_threshold, SHORT, FLAT))
+        direction = np.where(no_trade, NO_TRADE, direction)
+        quant_position = quant.get("risk_position", quant["position"]) * np.where(reduce, 0.5, 1.0)
+        target = np.clip(np.abs(score) * quant_position, -self.max_position, self.max_position)
+        opposed = ((direction == LONG) & (quant_position < 0)) | ((direction == SHORT) & (quant_position > 0))
+        target = np.where(no_trade | opposed, 0.0, target)
+        direction = np.where(np.isfinite(target), direction, SKIP)
+        return direction, np.nan_to_num(target)
+
+
+class CachedDecisionPolicy(D6Policy):
+    """
+    回放已记录的 D6 决策（TradingDecision 或其 to_dict）：决策在其时间之后的第一根 bar 执行，
+    其余 bar 不下单（维持原仓位）
+    """
+
+    def __init__(self, decisions: Iterable[Union[TradingDecision, Dict[str, Any]]]):
+        self.decisions = [d.to_dict() if isinstance(d, TradingDecision) else dict(d) for d in decisions]
+        self._direction: Optional[np.ndarray] = None
+        self._target: Optional[np.ndarray] = None
+
+    def reset(self, panel: OHLCVPanel):
+        col = {s: j for j, s in enumerate(panel.symbols)}
+        codes = {name: code for code, name in enumerate(DIRECTIONS)}
+        self._direction = np.full((panel.n_bars, panel.n_symbols), SKIP, dtype=np.int64)
+        self._target = np.zeros((panel.n_bars, panel.n_symbols))
+        for d in sorted(self.decisions, key=lambda x: _parse_ts(x["timestamp"])):
+            j = col.get(str(d.get("symbol", "")).upper())
+            code = codes.get(str(d.get("direction", "")).upper().strip())
+            if j is None or code is None:
+                continue
+            i = int(np.searchsorted(panel._ts, _parse_ts(d["timestamp"]).timestamp(), side="left"))
+            if i < panel.n_bars:
+                self._direction[i, j] = code
+                self._target[i, j] = float(d.get("target_position") or 0.0)
+
+    def decide(self, t, columns, quant, confidence, event_risk):
+        return self._direction[t, columns], self._target[t, columns]
+
+
+@dataclass
+class BacktestResult:
+    """回测结果：逐 bar 净值与汇总指标"""
+    timestamps: List[datetime]
+    equity: np.ndarray
+    metrics: Dict[str, Any]
+    trades: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self, include_curve: bool = True) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"metrics": self.metrics, "trades": len(self.trades)}
+        if include_curve:
+            out["equity_curve"] = [
+                {"timestamp": ts.isoformat(), "total_value": float(v)}
+                for ts, v in zip(self.timestamps, self.equity)
+            ]
+        return out
+
+
+class BacktestEngine:
+    """
+    逐 bar 回放（仅使用当前及之前的数据）：
+    1. 行情数组一次性对齐，D5 每根 bar 走与线上批量模式相同的截面向量化核心（_quant_arrays）
+    2. D6 策略向量化给出方向与目标仓位；多头目标总和超过 max_gross 时等比缩放
+    3. 目标与当前权重的偏离超过 rebalance_band（相对较大者的比例）且不小于 min_trade_weight 时才生成 TradingDecision，
+       经 PaperTradingEngine（模拟时钟、固定随机种子）整批成交（账户指标每根 bar 只重算一次），交易日/周次数限制按模拟日期生效
+    行情代理：VWAP 取典型价 (H+L+C)/3，订单簿不平衡取收盘在区间内的位置 (2C-H-L)/(H-L)
+    """
+
+    FILL_MODES = ("next_open", "close")
+
+    def __init__(self,
+                 panel: OHLCVPanel,
+                 policy: Optional[D6Policy] = None,
+                 d5: Optional[D5QuantDepartment] = None,
+                 params: Optional[Dict[str, float]] = None,
+                 initial_capital: float = 100000.0,
+                 fill: str = "next_open",
+                 rebalance_band: float = 0.2,
+                 min_trade_weight: float = 0.001,
+                 max_gross: float = 1.0,
+                 online_learning: bool = False,
+                 risk_model: Optional[bool] = None,
+                 risk_refresh_bars: int = 1,
+                 seed: int = 0,
+                 bars_per_year: int = 252):
+        if fill not in self.FILL_MODES:
+            raise ValueError(f"fill must be one of {self.FILL_MODES}")
+        self.panel = panel
+        self.policy = policy or RuleBasedD6Policy()
+        self.d5 = d5 or D5QuantDepartment(None)
+        if params:
+            self.d5.update_params(params)
+        # 风险预算仓位每根 bar 求解一次：risk_model 为 None 时沿用 D5 实例（全局配置）的开关；
+        # risk_refresh_bars > 1 时相关矩阵每 k 根 bar 重新估计一次，其间只用最新 alpha 重解
+        if risk_model is not None:
+            self.d5.risk_model_enabled = bool(risk_model)
+        self.d5.risk_model.refresh_every = max(1, int(risk_refresh_bars))
+        self.initial_capital = float(initial_capital)
+        self.fill = fill
+        self.rebalance_band = float(rebalance_band)
+        self.min_trade_weight = float(min_trade_weight)
+        self.max_gross = float(max_gross)
+        # 开启后每根 bar 写入训练样本（RLS 随回放在线更新 beta）；逐只更新，速度明显变慢
+        self.online_learning = bool(online_learning)
+        self.seed = seed
+        self.bars_per_year = bars_per_year
+        self._now = panel.timestamps[0] if panel.timestamps else datetime.now()
+        self.trading_engine = PaperTradingEngine(
+            account_id="backtest",
+            initial_capital=self.initial_capital,
+            clock=lambda: self._now,
+            rng=random.Random(seed),
+            snapshot_on_trade=False,
+        )
+
+    async def run(self) -> BacktestResult:
+        """执行回测"""
+        started = time.perf_counter()
+        panel, d5, engine = self.panel, self.d5, self.trading_engine
+        T, N = panel.n_bars, panel.n_symbols
+        symbols = panel.symbols
+
+        typical = (panel.high + panel.low + panel.close) / 3.0
+        bid = panel.close - panel.low
+        ask = panel.high - panel.close
+        if panel.whale_flows is not None:
+            flows = panel.whale_flows
+        else:
+            flows = np.zeros((T, N, 4))
+            flows[..., 3] = np.nan_to_num(panel.volume)
+        scores = panel.dept_scores if panel.dept_scores is not None else np.full((T, N, 4), np.nan)
+        confs = panel.dept_confidence if panel.dept_confidence is not None else np.full((T, N, 4), np.nan)
+        risk = panel.event_risk if panel.event_risk is not None else np.zeros((T, N))
+
+        self.policy.reset(panel)
+        qty = np.zeros(N)
+        prev_close = np.full(N, np.nan)
+        equity = np.full(T, np.nan)
+        pending: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        stats = {"orders": 0, "filled": 0, "rejected": 0, "traded_notional": 0.0}
+
+        for t in range(T):
+            self._now = panel.timestamps[t]
+            if pending is not None:
+                await self._execute(pending, panel.open[t], qty, stats)
+                pending = None
+
+            close_t = panel.close[t]
+            valid = np.isfinite(close_t) & (close_t > 0)
+            cols = np.flatnonzero(valid)
+            if len(cols):
+                syms = [symbols[j] for j in cols] if len(cols) < N else symbols
+                quant = d5._quant_arrays(
+                    close_t[cols], prev_close[cols], typical[t, cols], bid[t, cols], ask[t, cols],
+                    flows[t, cols], scores[t, cols], confs[t, cols], risk[t, cols], syms,
+                )
+                if self.online_learning:
+                    self._record_samples(syms, close_t[cols], quant, risk[t, cols])
+                direction, target = self.policy.decide(t, cols, quant, confs[t, cols], risk[t, cols])
+                full_dir = np.full(N, SKIP, dtype=np.int64)
+                full_target = np.zeros(N)
+                full_dir[cols] = direction
+                full_target[cols] = target
+                if self.fill == "close":
+                    await self._execute((full_dir, full_target), close_t, qty, stats)
+                elif t + 1 < T:
+                    pending = (full_dir, full_target)
+                prev_close[cols] = close_t[cols]
+
+            held = np.flatnonzero((qty > 0) & valid)
+            engine.mark_to_market_batch({symbols[j]: float(close_t[j]) for j in held})
+            engine.record_equity_snapshot("backtest")
+            equity[t] = engine.account.total_value
+
+        metrics = self._metrics(equity, stats)
+        metrics["elapsed_seconds"] = time.perf_counter() - started
+        return BacktestResult(list(panel.timestamps), equity, metrics, engine.trade_history)
+
+    def _record_samples(self, syms: List[str], price: np.ndarray, quant: Dict[str, np.ndarray], risk: np.ndarray):
+        for i, symbol in enumerate(syms):
+            self.d5._record_training_sample(
+                symbol=symbol,
+                price=float(price[i]),
+                r_t=float(quant["r_t"][i]),
+                z_vwap=float(quant["z_vwap"][i]),
+                imb_t=float(quant["imb_t"][i]),
+                wf_t=float(quant["wf_t"][i]),
+                la_adjusted=float(quant["la_adjusted"][i]),
+                divergence=float(quant["divergence"][i]),
+                event_risk=float(risk[i]),
+            )
+
+    async def _execute(self,
+                       decision: Tuple[np.ndarray, np.ndarray],
+                       price: np.ndarray,
+                       qty: np.ndarray,
+                       stats: Dict[str, Any]):
+        """把目标权重与当前持仓的差异转成订单，经纸面交易引擎成交；先卖后买以释放现金"""
+        direction, target = decision
+        engine = self.trading_engine
+        symbols = self.panel.symbols
+        tradable = np.isfinite(price) & (price > 0)
+        px = np.where(tradable, price, 0.0)
+
+        held = np.flatnonzero((qty > 0) & tradable)
+        if len(held):
+            engine.mark_to_market_batch({symbols[j]: float(px[j]) for j in held})
+
+        # 纸面账户只做多：SHORT/FLAT 目标为 0；NO_TRADE/SKIP 维持原仓位
+        desired = np.where(direction == LONG, np.abs(target), 0.0)
+        gross = desired.sum()
+        if gross > self.max_gross > 0:
+            desired *= self.max_gross / gross
+        total_value = max(float(engine.account.total_value), 1e-9)
+        current = qty * px / total_value
+        active = tradable & (direction != SKIP) & (direction != NO_TRADE)
+        delta = desired - current
+        band = np.maximum(self.min_trade_weight, self.rebalance_band * np.maximum(desired, current))
+        candidates = np.flatnonzero(active & (np.abs(delta) > band) & ((desired > 0) | (qty > 0)))
+        if not len(candidates):
+            return
+        order = candidates[np.argsort(delta[candidates], kind="stable")]
+
+        # 本 bar 的订单整批成交：账户指标在批末重算一次，而不是每笔 O(持仓数)
+        batch = [(TradingDecision(
+            symbol=symbols[j],
+            timestamp=self._now,
+            direction=DIRECTIONS[int(direction[j])],
+            target_position=float(desired[j]),
+            execution_plan={},
+            risk_controls={},
+            rationale="backtest",
+            evidence_ids=[],
+            department_outputs={},
+        ), float(px[j])) for j in order]
+        stats["orders"] += len(batch)
+        for j, filled in zip(order, await engine.execute_decisions_batch(batch)):
+            if filled.status != "FILLED" or filled.filled_quantity <= 0:
+                stats["rejected"] += 1
+                continue
+            stats["filled"] += 1
+            stats["traded_notional"] += filled.filled_quantity * filled.filled_price
+            qty[j] += filled.filled_quantity if filled.side == "BUY" else -filled.filled_quantity
+            qty[j] = max(0.0, qty[j])
+
+    def _metrics(self, equity: np.ndarray, stats: Dict[str, Any]) -> Dict[str, Any]:
+        eq = equity[np.isfinite(equity)]
+        out: Dict[str, Any] = {
+            "bars": int(self.panel.n_bars),
+            "symbols": int(self.panel.n_symbols),
+            "initial_capital": self.initial_capital,
+            "final_value": float(eq[-1]) if len(eq) else self.initial_capital,
+            "orders": stats["orders"],
+            "trades": stats["filled"],
+            "rejected": stats["rejected"],
+        }
+        out.update(performance_metrics(eq, self.bars_per_year, initial_value=self.initial_capital))
+        out["turnover"] = float(stats["traded_notional"] / eq.mean()) if len(eq) else 0.0
+        return out
+
+
+def performance_metrics(equity: np.ndarray,
+                        bars_per_year: int = 252,
+                        initial_value: Optional[float] = None) -> Dict[str, float]:
+    """净值序列的收益/风险指标；initial_value 缺省取序列首值（用于截取的区间）"""
+    eq = np.asarray(equity, dtype=np.float64)
+    eq = eq[np.isfinite(eq)]
+    if len(eq) < 2:
+        return {"total_return": 0.0, "annual_return": 0.0, "annual_volatility": 0.0,
+                "sharpe": 0.0, "max_drawdown": 0.0}
+    base = float(eq[0] if initial_value is None else initial_value)
+    rets = eq[1:] / eq[:-1] - 1.0
+    std = float(rets.std())
+    total_return = float(eq[-1] / base - 1.0)
+    years = len(rets) / bars_per_year
+    return {
+        "total_return": total_return,
+        "annual_return": float((1.0 + total_return) ** (1.0 / years) - 1.0) if total_return > -1.0 else -1.0,
+        "annual_volatility": std * math.sqrt(bars_per_year),
+        "sharpe": float(rets.mean() / std * math.sqrt(bars_per_year)) if std > 0 else 0.0,
+        "max_drawdown": float((1.0 - eq / np.maximum.accumulate(eq)).max()),
+    }
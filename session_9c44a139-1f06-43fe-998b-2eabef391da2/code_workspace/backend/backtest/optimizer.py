@@ -0,0 +1,277 @@
+"""
+D5 参数搜索 - 网格/随机采样参数集，进程池并行回测，滚动前推（walk-forward）选参并评估样本外稳定性
+"""
+from typing import Optional, Dict, Any, List, Sequence, Tuple, Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import asyncio
+import itertools
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from backtest.engine import OHLCVPanel, BacktestEngine, performance_metrics
+from quantitative.d5_quant import D5QuantDepartment
+
+# 目标函数：越大越好
+OBJECTIVES: Dict[str, Callable[[Dict[str, float]], float]] = {
+    "sharpe": lambda m: m["sharpe"],
+    "calmar": lambda m: m["annual_return"] / max(m["max_drawdown"], 1e-6),
+    "drawdown": lambda m: -m["max_drawdown"],
+}
+
+# 默认随机搜索范围：市场 alpha 系数、门控、仓位缩放与分歧惩罚
+DEFAULT_BOUNDS: Dict[str, Tuple[float, float]] = {
+    "beta_1": (0.0, 1.0),
+    "beta_2": (0.0, 1.0),
+    "beta_3": (0.0, 0.5),
+    "beta_4": (0.0, 1.0),
+    "gamma_1": (0.5, 3.0),
+    "gamma_2": (0.5, 3.0),
+    "K": (0.2, 1.2),
+    "lambda_div": (0.0, 1.0),
+    "pos_max": (0.3, 1.0),
+}
+
+
+def _check_keys(keys: Sequence[str]):
+    known = D5QuantDepartment(None).params
+    unknown = [k for k in keys if k not in known]
+    if unknown:
+        raise ValueError(f"Unknown D5 params: {unknown}")
+
+
+def grid_candidates(grid: Dict[str, Sequence[float]]) -> List[Dict[str, float]]:
+    """网格：各参数取值的笛卡尔积"""
+    _check_keys(list(grid))
+    keys = list(grid)
+    return [dict(zip(keys, map(float, combo))) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+def random_candidates(bounds: Dict[str, Tuple[float, float]], n: int, seed: int = 0) -> List[Dict[str, float]]:
+    """随机采样：各参数在 [low, high] 内均匀采样 n 组"""
+    _check_keys(list(bounds))
+    rng = random.Random(seed)
+    return [{k: rng.uniform(float(lo), float(hi)) for k, (lo, hi) in bounds.items()} for _ in range(max(0, int(n)))]
+
+
+def walk_forward_splits(n_bars: int,
+                        n_folds: int = 4,
+                        train_bars: Optional[int] = None,
+                        test_bars: Optional[int] = None,
+                        anchored: bool = False) -> List[Tuple[int, int, int]]:
+    """
+    滚动前推切分，返回 [(train_start, test_start, test_end)]：
+    测试窗口首尾相接铺满面板尾部；anchored=True 时训练窗口起点固定为 0（扩张窗口）
+    """
+    n_folds = max(1, int(n_folds))
+    if test_bars is None:
+        test_bars = n_bars // (n_folds + 1)
+    if train_bars is None:
+        train_bars = n_bars - n_folds * test_bars
+    if test_bars < 2 or train_bars < 2 or train_bars + n_folds * test_bars > n_bars:
+        raise ValueError(f"Not enough bars ({n_bars}) for {n_folds} folds")
+    first_test = n_bars - n_folds * test_bars
+    splits = []
+    for k in range(n_folds):
+        test_start = first_test + k * test_bars
+        train_start = 0 if anchored else test_start - train_bars
+        splits.append((train_start, test_start, test_start + test_bars))
+    return splits
+
+
+# 进程池工作进程内的面板与回测参数（initializer 注入一次，避免每个任务重复序列化行情数组）
+_WORKER_PANEL: Optional[OHLCVPanel] = None
+_WORKER_OPTIONS: Dict[str, Any] = {}
+
+
+def _init_worker(panel: OHLCVPanel, options: Dict[str, Any]):
+    global _WORKER_PANEL, _WORKER_OPTIONS
+    _WORKER_PANEL = panel
+    _WORKER_OPTIONS = options
+
+
+def _run_candidate(params: Dict[str, float],
+                   panel: Optional[OHLCVPanel] = None,
+                   options: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, int]:
+    """以一组参数回测整个面板，返回 (逐 bar 净值, 成交笔数)"""
+    panel = panel if panel is not None else _WORKER_PANEL
+    options = options if options is not None else _WORKER_OPTIONS
+    result = asyncio.run(BacktestEngine(panel, params=params, **options).run())
+    return result.equity, int(result.metrics["trades"])
+
+
+class ParameterSearch:
+    """
+    参数搜索：
+    - 每组参数在整个面板上回测一次（回放只用历史数据），按切分截取净值计算各折样本内/样本外目标值
+    - 各折以样本内目标值选参，记录其下一段样本外表现（walk-forward）；报告中只有 walk_forward 为样本外估计
+    - top/best 按全部折的样本内均值排序：滚动切分下后一折的训练窗口包含前一折的测试窗口，
+      这些候选没有未参与选参的数据，因此不报告其“样本外”得分
+    - 候选按批次提交到进程池（spawn 启动：调度器在多线程的服务进程内发起搜索，fork 可能死锁）；
+      连续 patience 个批次样本内最优未提升超过 min_delta 即提前停止
+    - 风险模型开关与相关矩阵刷新间隔（risk_model / risk_refresh_bars）显式传给每个候选的回测引擎，
+      不依赖工作进程各自加载的全局配置
+    """
+
+    def __init__(self,
+                 panel: OHLCVPanel,
+                 candidates: List[Dict[str, float]],
+                 base_params: Optional[Dict[str, float]] = None,
+                 objective: str = "sharpe",
+                 n_folds: int = 4,
+                 train_bars: Optional[int] = None,
+                 test_bars: Optional[int] = None,
+                 anchored: bool = False,
+                 max_workers: Optional[int] = None,
+                 batch_size: Optional[int] = None,
+                 patience: int = 3,
+                 min_delta: float = 1e-3,
+                 top_k: int = 5,
+                 risk_model: bool = True,
+                 risk_refresh_bars: int = 5,
+                 engine_options: Optional[Dict[str, Any]] = None):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {sorted(OBJECTIVES)}")
+        if not candidates:
+            raise ValueError("No parameter candidates")
+        self.panel = panel
+        self.base_params = dict(base_params or {})
+        self.candidates = [{**self.base_params, **c} for c in candidates]
+        self.searched_keys = sorted({k for c in candidates for k in c})
+        self.objective = objective
+        self.splits = walk_forward_splits(panel.n_bars, n_folds, train_bars, test_bars, anchored)
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max(0, int(max_workers))
+        self.batch_size = batch_size or max(1, 2 * self.max_workers)
+        self.patience = max(1, int(patience))
+        self.min_delta = float(min_delta)
+        self.top_k = top_k
+        self.engine_options = {
+            **(engine_options or {}),
+            "risk_model": bool(risk_model),
+            "risk_refresh_bars": max(1, int(risk_refresh_bars)),
+        }
+        self.bars_per_year = int(self.engine_options.get("bars_per_year", 252))
+
+    def _fold_scores(self, equity: np.ndarray) -> Tuple[List[float], List[float]]:
+        score = OBJECTIVES[self.objective]
+        in_sample, out_sample = [], []
+        for train_start, test_start, test_end in self.splits:
+            in_sample.append(score(performance_metrics(equity[train_start:test_start], self.bars_per_year)))
+            # 样本外区间从前一根 bar 的净值起算，首根 bar 的收益不丢失
+            out_sample.append(score(performance_metrics(equity[test_start - 1:test_end], self.bars_per_year)))
+        return in_sample, out_sample
+
+    async def run(self, progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """执行搜索；进程池任务通过 run_in_executor 等待，不阻塞事件循环"""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        rows: List[Dict[str, Any]] = []
+        best = -np.inf
+        stale = 0
+        stopped_early = False
+
+        pool = None
+        if self.max_workers > 0:
+            pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.panel, self.engine_options),
+            )
+        try:
+            for start in range(0, len(self.candidates), self.batch_size):
+                batch = self.candidates[start:start + self.batch_size]
+                if pool is not None:
+                    outputs = await asyncio.gather(*(loop.run_in_executor(pool, _run_candidate, c) for c in batch))
+                else:
+                    # 无进程池时在线程中逐个回测（回测内部自带事件循环）
+                    outputs = [await loop.run_in_executor(None, _run_candidate, c, self.panel, self.engine_options)
+                               for c in batch]
+                for params, (equity, trades) in zip(batch, outputs):
+                    is_scores, oos_scores = self._fold_scores(equity)
+                    rows.append({
+                        "params": params,
+                        "is_scores": is_scores,
+                        "oos_scores": oos_scores,
+                        "trades": trades,
+                        "full_period": performance_metrics(equity, self.bars_per_year),
+                    })
+                if progress:
+                    progress(len(rows), len(self.candidates))
+
+                batch_best = max(float(np.mean(r["is_scores"])) for r in rows[-len(batch):])
+                if batch_best > best + self.min_delta:
+                    best = batch_best
+                    stale = 0
+                else:
+                    stale += 1
+                    if stale >= self.patience and start + self.batch_size < len(self.candidates):
+                        stopped_early = True
+                        break
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        report = self._report(rows)
+        report.update(
+            evaluated=len(rows),
+            candidates=len(self.candidates),
+            stopped_early=stopped_early,
+            elapsed_seconds=time.perf_counter() - started,
+        )
+        return report
+
+    def _report(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        ts = self.panel.timestamps
+        is_matrix = np.array([r["is_scores"] for r in rows])
+        oos_matrix = np.array([r["oos_scores"] for r in rows])
+
+        folds = []
+        picks = np.argmax(is_matrix, axis=0)
+        for k, (train_start, test_start, test_end) in enumerate(self.splits):
+            i = int(picks[k])
+            folds.append({
+                "fold": k,
+                "train": [ts[train_start].isoformat(), ts[test_start - 1].isoformat()],
+                "test": [ts[test_start].isoformat(), ts[test_end - 1].isoformat()],
+                "params": self._searched(rows[i]["params"]),
+                "is_score": float(is_matrix[i, k]),
+                "oos_score": float(oos_matrix[i, k]),
+            })
+        wf_is = np.array([f["is_score"] for f in folds])
+        wf_oos = np.array([f["oos_score"] for f in folds])
+
+        ranked = []
+        for i in np.argsort(-is_matrix.mean(axis=1), kind="stable")[:self.top_k]:
+            r = rows[int(i)]
+            ranked.append({
+                "params": self._searched(r["params"]),
+                "is_mean": float(is_matrix[i].mean()),
+                "is_std": float(is_matrix[i].std()),
+                "selected_in_folds": int((picks == i).sum()),
+                "trades": r["trades"],
+                "full_period": r["full_period"],
+            })
+        return {
+            "objective": self.objective,
+            "searched_params": self.searched_keys,
+            "splits": len(self.splits),
+            "best": ranked[0] if ranked else None,
+            "top": ranked,
+            "walk_forward": {
+                "folds": folds,
+                "is_mean": float(wf_is.mean()),
+                "oos_mean": float(wf_oos.mean()),
+                "oos_std": float(wf_oos.std()),
+                "oos_positive_ratio": float((wf_oos > 0).mean()),
+                "degradation": float(wf_is.mean() - wf_oos.mean()),
+            },
+            "as_of": datetime.now().isoformat(),
+        }
+
+    def _searched(self, params: Dict[str, float]) -> Dict[str, float]:
+        return {k: float(params[k]) for k in self.searched_keys}
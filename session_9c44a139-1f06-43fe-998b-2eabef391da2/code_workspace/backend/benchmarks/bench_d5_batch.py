@@ -0,0 +1,75 @@
+"""
+D5 量化计算基准 - 逐只标量计算 vs 截面批量向量化计算（不含行情抓取）
+
+    python benchmarks/bench_d5_batch.py
+    python benchmarks/bench_d5_batch.py --sizes 10,100,1000,5000 --steps 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models.base_models import MarketData, WhaleFlow
+from quantitative.d5_quant import D5QuantDepartment
+
+
+def make_steps(n: int, steps: int, seed: int = 11):
+    rng = random.Random(seed)
+    now = datetime.now()
+    prices = [100.0 * (1 + rng.random()) for _ in range(n)]
+    out = []
+    for _ in range(steps):
+        mds, wfs = [], []
+        for i in range(n):
+            prices[i] *= 1 + rng.gauss(0, 0.015)
+            sym = f"S{i:05d}"
+            mds.append(MarketData(sym, now, prices[i], 1e6, prices[i] * (1 + rng.gauss(0, 0.005)),
+                                  0, 0, rng.random() * 500, rng.random() * 500))
+            wfs.append(WhaleFlow(sym, now, rng.gauss(0, 1e5), rng.gauss(0, 1e5), rng.random() * 1e5, 3e5))
+        out.append((mds, wfs))
+    finals = {
+        f"S{i:05d}": {d: SimpleNamespace(score=rng.uniform(-1, 1), confidence=rng.random()) for d in ("D1", "D3")}
+        for i in range(n)
+    }
+    return out, finals
+
+
+async def run_single(steps, finals) -> float:
+    d5 = D5QuantDepartment(None)
+    t0 = time.perf_counter()
+    for mds, wfs in steps:
+        for md, wf in zip(mds, wfs):
+            await d5.calculate_quant_output(md.symbol, md, wf, finals[md.symbol])
+    return time.perf_counter() - t0
+
+
+async def run_batch(steps, finals) -> float:
+    d5 = D5QuantDepartment(None)
+    t0 = time.perf_counter()
+    for mds, wfs in steps:
+        await d5.calculate_quant_outputs_batch(mds, wfs, finals)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--steps", type=int, default=30)
+    args = parser.parse_args()
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        steps, finals = make_steps(n, args.steps)
+        single = asyncio.run(run_single(steps, finals))
+        batch = asyncio.run(run_batch(steps, finals))
+        total = n * args.steps
+        print(f"symbols={n:>5} single={total / single:10.0f} sym/s batch={total / batch:10.0f} sym/s "
+              f"speedup={single / batch:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+记忆语义向量索引基准 - 写入/删除吞吐与候选内相似度延迟，挂载向量索引前后的检索耗时，以及逐股 vs 部门批量检索
+
+    python benchmarks/bench_embedding_index.py
+    python benchmarks/bench_embedding_index.py --sizes 1000,3000 --bucket 60 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from memory.embedding_index import EmbeddingIndex, HashingEmbedder
+from memory.memory_store import InMemoryStore, MemoryManager, MemoryType, MemoryScope
+
+VOCAB = (
+    "fed rate cut inflation yields guidance earnings beat miss capex datacenter ai chip margin "
+    "risk drawdown stop-loss regime policy tariff oil dollar liquidity momentum upgrade downgrade"
+).split()
+
+
+def random_text(rng: random.Random) -> str:
+    return " ".join(rng.choice(VOCAB) for _ in range(rng.randint(8, 40)))
+
+
+def bench_index(n: int, bucket: int, queries: int):
+    rng = random.Random(7)
+    index = EmbeddingIndex(HashingEmbedder())
+    texts = [random_text(rng) for _ in range(n)]
+    t0 = time.perf_counter()
+    for i, t in enumerate(texts):
+        index.add(f"m{i}", t)
+    add = (time.perf_counter() - t0) / n
+
+    # 检索只在部门/股票记忆桶内计算相似度
+    buckets = [[f"m{j}" for j in rng.sample(range(n), min(bucket, n))] for _ in range(queries)]
+    qs = [random_text(rng) for _ in range(queries)]
+    t0 = time.perf_counter()
+    for q, cand in zip(qs, buckets):
+        index.similarities(q, cand)
+    sim = (time.perf_counter() - t0) / queries
+
+    t0 = time.perf_counter()
+    for i in range(0, n, 2):
+        index.remove(f"m{i}")
+    remove = (time.perf_counter() - t0) / ((n + 1) // 2)
+    print(f"entries={n:>6} add={add * 1e6:7.1f}us remove={remove * 1e6:6.2f}us "
+          f"similarities(bucket={bucket})={sim * 1e6:7.1f}us/query")
+
+
+def bench_retrieval(symbols: int, per_symbol: int):
+    rng = random.Random(3)
+    texts = {f"S{i:03d}": [random_text(rng) for _ in range(per_symbol)] for i in range(symbols)}
+    queries = {sym: random_text(rng) for sym in texts}
+    for label, index in (("text-only", None), ("embedding", EmbeddingIndex())):
+        manager = MemoryManager(InMemoryStore(), embedding_index=index)
+        manager.max_total_entries = symbols * per_symbol
+        for sym, items in texts.items():
+            for t in items:
+                manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, t, "D6", sym,
+                                   importance=rng.random())
+        t0 = time.perf_counter()
+        for sym, q in queries.items():
+            manager.retrieve_relevant_memory("D6", sym, query_text=q)
+        single = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        manager.retrieve_relevant_memory_batch("D6", queries)
+        batch = time.perf_counter() - t0
+        print(f"symbols={symbols:>4} {label:>9} per-symbol={single * 1e3:8.1f}ms batch={batch * 1e3:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,3000")
+    parser.add_argument("--bucket", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        bench_index(n, args.bucket, args.queries)
+    bench_retrieval(symbols=50, per_symbol=60)
+
+
+if __name__ == "__main__":
+    main()
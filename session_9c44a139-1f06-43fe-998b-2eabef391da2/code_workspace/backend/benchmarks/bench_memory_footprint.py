@@ -0,0 +1,96 @@
+"""
+记忆条目内存占用基准（tracemalloc）- 单条 MemoryEntry 及含索引的 InMemoryStore 每条平均字节数
+
+    python benchmarks/bench_memory_footprint.py
+    python benchmarks/bench_memory_footprint.py --entries 50000 --feedback-rounds 20
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from memory.memory_store import InMemoryStore, MemoryManager, MemoryEntry, MemoryType, MemoryScope
+
+STOCK_DEPTS = ["D2", "D3", "D4", "D6"]
+VOCAB = (
+    "fed rate cut inflation yields guidance earnings beat miss capex datacenter ai chip margin "
+    "risk drawdown stop-loss regime policy tariff oil dollar liquidity momentum upgrade downgrade"
+).split()
+
+
+def make_entries(n: int, symbols: int, seed: int = 5):
+    rng = random.Random(seed)
+    now = datetime.now()
+    out = []
+    for i in range(n):
+        dept = rng.choice(STOCK_DEPTS)
+        # 从外部数据解析出的代码/部门是各自独立的字符串对象
+        sym = f"S{rng.randrange(symbols):03d}"
+        mt = rng.choice(list(MemoryType))
+        meta = {"source": "department_final", "confidence": round(rng.random(), 3)} if rng.random() < 0.1 else {}
+        out.append(MemoryEntry(
+            entry_id=f"m{i:08d}",
+            memory_type=mt,
+            scope=MemoryScope.STOCK_SPECIFIC,
+            department=dept[:1] + dept[1:],
+            stock_symbol=sym,
+            content=" ".join(rng.choice(VOCAB) for _ in range(rng.randint(8, 40))),
+            metadata=meta,
+            created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 20)),
+            expires_at=None if mt == MemoryType.LTM else now + timedelta(days=rng.randint(1, 30)),
+            importance=rng.random(),
+            access_count=rng.randint(0, 20),
+        ))
+    return out
+
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = fn()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return keep, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--feedback-rounds", type=int, default=10)
+    args = parser.parse_args()
+    n = args.entries
+
+    entries, entry_bytes = measure(lambda: make_entries(n, args.symbols))
+    print(f"entries={n} MemoryEntry objects: {entry_bytes / n:8.1f} B/entry")
+    del entries
+
+    def build_store():
+        manager = MemoryManager(InMemoryStore())
+        manager.max_total_entries = n
+        for e in make_entries(n, args.symbols):
+            manager.store.store(e)
+        return manager
+
+    manager, store_bytes = measure(build_store)
+    print(f"entries={n} InMemoryStore (indexes + text index): {store_bytes / n:8.1f} B/entry")
+
+    def feedback():
+        syms = [f"S{i:03d}" for i in range(args.symbols)]
+        for r in range(args.feedback_rounds):
+            manager.apply_trade_feedback_batch([(s, 0.05 if r % 2 else -0.04, "LONG") for s in syms])
+        return None
+
+    _, fb_bytes = measure(feedback)
+    print(f"entries={n} after {args.feedback_rounds} feedback rounds: +{fb_bytes / n:8.1f} B/entry")
+
+
+if __name__ == "__main__":
+    main()
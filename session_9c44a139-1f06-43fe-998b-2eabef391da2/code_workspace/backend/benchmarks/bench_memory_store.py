@@ -0,0 +1,151 @@
+"""
+记忆存储基准 - 在 3k/30k/300k 条目下比较：
+- InMemoryStore 索引查询 vs 全表扫描
+- 预计算文本索引的相关记忆检索 vs 逐条分词计算
+- 满容量时的插入吞吐：增量淘汰 vs 每次插入全量 prune
+
+    python benchmarks/bench_memory_store.py
+    python benchmarks/bench_memory_store.py --sizes 3000,30000 --queries 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from memory.memory_store import InMemoryStore, MemoryManager, MemoryEntry, MemoryType, MemoryScope
+
+GLOBAL_DEPTS = ["D1", "D5", "D7"]
+STOCK_DEPTS = ["D2", "D3", "D4", "D6"]
+VOCAB = (
+    "fed rate cut inflation yields guidance earnings beat miss capex datacenter ai chip margin "
+    "risk drawdown stop-loss regime policy tariff oil dollar liquidity momentum upgrade downgrade"
+).split()
+
+
+def build_store(n: int, symbols: int, seed: int = 11) -> InMemoryStore:
+    rng = random.Random(seed)
+    syms = [f"S{i:03d}" for i in range(symbols)]
+    now = datetime.now()
+    store = InMemoryStore()
+    for i in range(n):
+        if rng.random() < 0.2:
+            scope, dept, sym = MemoryScope.GLOBAL, rng.choice(GLOBAL_DEPTS), None
+        else:
+            scope, dept, sym = MemoryScope.STOCK_SPECIFIC, rng.choice(STOCK_DEPTS), rng.choice(syms)
+        mt = rng.choice(list(MemoryType))
+        store.store(MemoryEntry(
+            entry_id=f"m{i}",
+            memory_type=mt,
+            scope=scope,
+            department=dept,
+            stock_symbol=sym,
+            content=f"{dept} {sym or 'GLOBAL'} " + " ".join(rng.choice(VOCAB) for _ in range(rng.randint(8, 40))),
+            metadata={},
+            created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 20)),
+            expires_at=None if mt == MemoryType.LTM else now + timedelta(days=rng.randint(1, 30)),
+            importance=rng.random(),
+            access_count=rng.randint(0, 20),
+        ))
+    return store
+
+
+def scan_query(store: InMemoryStore, scope, department, stock_symbol, limit: int = 100):
+    """原实现：全表扫描 + is_expired() + 全量排序"""
+    results = []
+    for entry in store._entries.values():
+        if entry.is_expired():
+            continue
+        if scope and entry.scope != scope:
+            continue
+        if department and entry.department != department:
+            continue
+        if stock_symbol and entry.stock_symbol != stock_symbol:
+            continue
+        results.append(entry)
+    results.sort(key=lambda x: (x.importance, x.access_count), reverse=True)
+    return results[:limit]
+
+
+def bench(n: int, queries: int, symbols: int):
+    store = build_store(n, symbols)
+    rng = random.Random(1)
+    plan = []
+    for _ in range(queries):
+        if rng.random() < 0.3:
+            plan.append((MemoryScope.GLOBAL, rng.choice(GLOBAL_DEPTS), None))
+        else:
+            plan.append((MemoryScope.STOCK_SPECIFIC, rng.choice(STOCK_DEPTS), f"S{rng.randrange(symbols):03d}"))
+
+    t0 = time.perf_counter()
+    for scope, dept, sym in plan:
+        store.query(scope=scope, department=dept, stock_symbol=sym)
+    indexed = (time.perf_counter() - t0) / queries
+
+    scan_n = max(1, min(queries, 200 if n >= 100_000 else queries))
+    t0 = time.perf_counter()
+    for scope, dept, sym in plan[:scan_n]:
+        scan_query(store, scope, dept, sym)
+    scanned = (time.perf_counter() - t0) / scan_n
+
+    print(f"entries={n:>7} indexed={indexed * 1e6:9.1f}us/query scan={scanned * 1e6:10.1f}us/query "
+          f"speedup={scanned / max(indexed, 1e-12):6.1f}x")
+
+    # 相关记忆检索（D6 单股桶 + 查询文本）
+    manager = MemoryManager(store)
+    query_text = "datacenter capex guidance risk after fed rate cut"
+    stock_plans = [p for p in plan if p[2]][:200]
+    t0 = time.perf_counter()
+    for _, dept, sym in stock_plans:
+        manager.retrieve_relevant_memory(dept, sym, query_text=query_text, max_entries=10)
+    retrieve_indexed = (time.perf_counter() - t0) / max(1, len(stock_plans))
+
+    # 去掉文本索引即走原逐条分词路径
+    text_index, store.text_index = store.text_index, None
+    t0 = time.perf_counter()
+    for _, dept, sym in stock_plans:
+        manager.retrieve_relevant_memory(dept, sym, query_text=query_text, max_entries=10)
+    retrieve_legacy = (time.perf_counter() - t0) / max(1, len(stock_plans))
+    store.text_index = text_index
+    print(f"{'':15}retrieve indexed={retrieve_indexed * 1e6:9.1f}us/query "
+          f"per-entry tokenize={retrieve_legacy * 1e6:9.1f}us/query")
+
+    # 满容量插入：每次插入都触发淘汰
+    manager.max_total_entries = n
+    manager.max_bucket_entries = n
+    inserts = 500
+    t0 = time.perf_counter()
+    for i in range(inserts):
+        manager.add_memory(MemoryType.STM, MemoryScope.STOCK_SPECIFIC, f"insert {i} " + rng.choice(VOCAB),
+                           department="D3", stock_symbol="S000", importance=rng.random())
+    insert_incremental = (time.perf_counter() - t0) / inserts
+
+    full_n = 5 if n >= 100_000 else 50
+    t0 = time.perf_counter()
+    for i in range(full_n):
+        manager.store.store(MemoryEntry(
+            entry_id=f"full{i}", memory_type=MemoryType.STM, scope=MemoryScope.STOCK_SPECIFIC,
+            department="D3", stock_symbol="S000", content="full prune", metadata={},
+            created_at=datetime.now(), importance=rng.random(),
+        ))
+        manager.prune_memories()
+    insert_full = (time.perf_counter() - t0) / full_n
+    print(f"{'':15}insert incremental={insert_incremental * 1e6:9.1f}us "
+          f"full-prune={insert_full * 1e6:11.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="3000,30000,300000")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--symbols", type=int, default=50)
+    args = parser.parse_args()
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        bench(n, args.queries, args.symbols)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+回放基准 - 用录制归档离线驱动调度器的 D5 周期，测量模拟时间相对墙钟的倍速
+
+先以 record 模式运行平台生成归档（config.data_source_mode = "record"），然后：
+    python benchmarks/bench_replay.py --archive data_archive --symbols AAPL,MSFT --cycles 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.settings import config
+from data.data_source import ReplayDataSource, ReplayFinished, set_data_source
+from core.scheduler import TradingPlatformScheduler
+
+
+async def run(archive: str, symbols, cycles: int, speed: float):
+    source = ReplayDataSource(archive, speed=speed)
+    set_data_source(source)
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = TradingPlatformScheduler(state_file=os.path.join(tmp, "state.json"))
+        for sym in symbols:
+            scheduler.add_stock(sym)
+
+        sim_start = source.now()
+        wall_start = time.perf_counter()
+        done = 0
+        for _ in range(cycles):
+            await scheduler._run_d5_for_all_stocks()
+            done += 1
+            try:
+                await scheduler._sleep(config.d5_interval * 60)
+            except ReplayFinished:
+                break
+        wall = time.perf_counter() - wall_start
+        sim = (source.now() - sim_start).total_seconds()
+
+    stats = source.get_stats()
+    print(f"cycles={done} symbols={len(symbols)} wall={wall:.3f}s simulated={sim / 3600:.2f}h "
+          f"speedup={sim / max(wall, 1e-9):.0f}x served={stats['served']} missing={stats['missing']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", default=config.data_archive_dir)
+    parser.add_argument("--symbols", default="AAPL,MSFT,NVDA")
+    parser.add_argument("--cycles", type=int, default=100)
+    parser.add_argument("--speed", type=float, default=0.0)
+    args = parser.parse_args()
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    asyncio.run(run(args.archive, symbols, args.cycles, args.speed))
+
+
+if __name__ == "__main__":
+    main()
@@ -51,6 +51,36 @@ class SystemConfig:
     d4_interval: int = 360  # 专家材料部：6小时
     d6_interval: int = 30  # 投委会：30分钟
     d7_interval: int = 1440  # 选股部：每天一次
+
+    # D5 在线学习：beta 随每条带标签样本递推最小二乘更新（批量岭回归训练改为一致性校验）
+    d5_rls_enabled: bool = True
+    d5_rls_forgetting: float = 0.995  # 遗忘因子，有效样本量约 1/(1-λ)
+    d5_rls_delta: float = 1e4  # 协方差初始尺度（先验强度的倒数）；特征量级小（收益率约 1e-2），需足够大才能脱离初始 beta
+
+    # D5 自动重训：距上次训练新增样本达到阈值时在后台任务中重训（0 表示只手动触发）
+    d5_auto_train_min_samples: int = 200
+    d5_auto_train_interval: int = 30  # 两次自动重训检查的最小间隔（分钟）
+
+    # D5 特征存储：每只股票内存保留的特征条数；目录非空时同时追加写入磁盘（每只股票一个二进制文件）
+    d5_feature_store_capacity: int = 2048
+    d5_feature_store_dir: str = ""
+
+    # D5 跨资产风险模型：收益率协方差 EWMA 增量更新并向常相关目标收缩，截面仓位按相关性做风险预算
+    d5_risk_model_enabled: bool = True
+    d5_risk_halflife: float = 60.0  # 协方差 EWMA 半衰期（D5 周期数）
+    d5_risk_shrinkage: float = 0.5  # 最小收缩强度，样本少时自动加大
+    d5_risk_min_observations: int = 20  # 观测次数不足的股票按不相关处理
+
+    # D5 模型检查点：参数与训练缓冲按版本存为 .npz；目录为空时放在运行状态文件旁的 .d5_checkpoints
+    d5_checkpoint_dir: str = ""
+    d5_checkpoint_keep: int = 20  # 保留的版本数（生效版本不会被清理）
+    d5_checkpoint_on_train: bool = True  # 每次训练完成后自动保存检查点
+
+    # D5 参数搜索（历史日线回测 + walk-forward）
+    d5_param_search_days: int = 756  # 回测使用的日线根数（约 3 年）
+    d5_param_search_workers: int = 0  # 进程池大小，0 表示 CPU 核数
+    d5_param_search_risk_model: bool = True  # 候选回测是否启用协方差风险预算仓位
+    d5_param_search_risk_refresh: int = 5  # 候选回测中相关矩阵每 k 根 bar 重新估计一次
     
     # 事件触发冷却时间（分钟）
     event_cooldown: int = 15
@@ -91,7 +121,40 @@ class SystemConfig:
     # 数据库配置
     database_url: str = "sqlite:///trading_platform.db"
     redis_url: str = "redis://localhost:6379/0"
-    
+
+    # HTTP 响应缓存（RSS/行情，落盘以便重启复用）
+    http_cache_dir: str = ".http_cache"  # 相对 backend 目录
+    http_cache_max_mb: int = 64
+    symbol_validation_ttl: int = 6 * 3600  # 代码有效性校验结果复用时长（秒）
+
+    # 证据采集并发
+    data_fetch_concurrency: int = 8  # 单次采集同时在途的数据源请求上限
+    data_source_timeout: float = 15.0  # 单个数据源超时（秒），超时按空结果处理
+
+    # 数据源模式：live 实时 / record 实时并录制归档 / replay 离线回放归档
+    data_source_mode: str = "live"
+    data_archive_dir: str = "data_archive"  # 相对 backend 目录
+    replay_speed: float = 0.0  # 回放时钟倍速；0 表示纯虚拟时钟（仅随调度休眠推进）
+
+    # 行情源健康度（Stooq / Yahoo chart / Yahoo quote 自适应排序）
+    source_health_window: int = 20  # 滚动统计窗口（次）
+    source_failure_threshold: int = 3  # 连续失败次数达到后进入冷却
+    source_cooldown_seconds: int = 300  # 冷却时长（秒）
+    source_timeout_min: float = 2.0  # 自适应超时下限（秒）
+    source_timeout_max: float = 10.0  # 自适应超时上限（秒），无样本时使用
+
+    # 记忆系统
+    memory_backend: str = "sqlite"  # sqlite：写入 database_url 指向的库（WAL + FTS5 内容检索）；memory：纯内存，随运行状态文件保存
+    memory_embedding_enabled: bool = False  # 检索排序是否混入本地语义向量相似度
+    memory_embedding_weight: float = 0.5  # 语义分中向量相似度的占比
+    memory_summary_cache_ttl: int = 600  # 记忆摘要缓存最长复用时间（秒）；桶内有写入时立即失效
+    memory_sweep_interval: int = 30  # 记忆全量清理间隔（分钟），插入时仅做增量淘汰
+    memory_consolidation_interval: int = 360  # 短期记忆合并为长期摘要的间隔（分钟），0 表示只手动触发
+    memory_consolidation_min_age_hours: int = 6  # 只合并创建超过该时长的短期记忆
+    memory_consolidation_min_cluster: int = 3  # 相似条目达到该数量才合并
+    memory_consolidation_similarity: float = 0.35  # 聚类的语义相似度阈值（余弦）
+    memory_consolidation_use_llm: bool = False  # 摘要是否调用所属部门的决策模型（失败回退抽取式）
+
     # 日志配置
     log_level: str = "INFO"
     log_file: str = "logs/trading_platform.log"
@@ -1,21 +1,26 @@
 ﻿"""
 核心调度系统 - 协调所有部门的运行
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import asyncio
 from dataclasses import dataclass
 import logging
 import uuid
 import copy
+import functools
 import os
 import json
 import re
+import time
 from types import SimpleNamespace
 
 from config.settings import config, DepartmentType
-from models.base_models import StockCase, TradingDecision, QuantOutput, UserAccount
-from memory.memory_store import InMemoryStore, MemoryManager, MemoryEntry, MemoryType, MemoryScope
+from models.base_models import StockCase, TradingDecision, QuantOutput, UserAccount, MarketData, WhaleFlow
+from memory.sqlite_store import create_memory_store
+from memory.embedding_index import EmbeddingIndex
+from memory.consolidation import MemoryConsolidator
+from memory.memory_store import MemoryManager, MemoryEntry, MemoryType, MemoryScope, FeedbackStats
 
 from departments.d1_macro import D1MacroDepartment
 from departments.d2_industry import D2IndustryDepartment
@@ -24,7 +29,13 @@ from departments.d4_expert import D4ExpertDepartment
 from departments.d6_ic import D6ICDepartment
 from departments.d7_stock_selection import D7StockSelectionDepartment
 from quantitative.d5_quant import D5QuantDepartment
+from quantitative.checkpoints import D5CheckpointStore
 from trading.paper_trading import PaperTradingEngine, Position
+from data.data_source import DataSource, ReplayFinished, get_data_source
+from data.data_collector import DataCollector
+from backtest.engine import OHLCVPanel
+from backtest.optimizer import ParameterSearch, DEFAULT_BOUNDS, grid_candidates, random_candidates
+from data.source_health import SourceHealthTracker
 
 
 @dataclass
@@ -77,10 +88,28 @@ class _LiteDepartmentFinal:
 class TradingPlatformScheduler:
     """交易平台调度器"""
     
-    def __init__(self, user_config: Optional[Dict[str, Any]] = None):
-        # 初始化记忆系统
-        self.memory_store = InMemoryStore()
-        self.memory_manager = MemoryManager(self.memory_store)
+    def __init__(self,
+                 user_config: Optional[Dict[str, Any]] = None,
+                 state_file: Optional[str] = None,
+                 memory_db_path: Optional[str] = None):
+        # 初始化记忆系统（临时 state_file 默认搭配同目录的临时记忆库）
+        if memory_db_path is None and state_file:
+            memory_db_path = os.path.splitext(state_file)[0] + ".memory.db"
+        self.memory_store = create_memory_store(memory_db_path)
+        self.memory_manager = MemoryManager(
+            self.memory_store,
+            embedding_index=EmbeddingIndex() if config.memory_embedding_enabled else None,
+            embedding_weight=config.memory_embedding_weight,
+            summary_cache_ttl=config.memory_summary_cache_ttl,
+        )
+        # 相似短期记忆定期合并为长期摘要（带来源追溯）
+        self.memory_consolidator = MemoryConsolidator(
+            self.memory_manager,
+            similarity_threshold=config.memory_consolidation_similarity,
+            min_cluster_size=config.memory_consolidation_min_cluster,
+            min_age_hours=config.memory_consolidation_min_age_hours,
+            summarizer=self._summarize_memory_cluster,
+        )
         
         # 初始化部门
         self.d1 = D1MacroDepartment(self.memory_manager)
@@ -92,7 +121,7 @@ class TradingPlatformScheduler:
         self.d7 = D7StockSelectionDepartment(self.memory_manager)
         
         # 初始化交易引擎（默认的，用于向后兼容）
-        self.trading_engine = PaperTradingEngine()
+        self.trading_engine = PaperTradingEngine(clock=self._now)
         
         # 用户账户管理
         self.user_accounts: Dict[str, UserAccount] = {}
@@ -114,20 +143,56 @@ class TradingPlatformScheduler:
         # 事件触发冷却时间
         self.event_cooldowns: Dict[str, datetime] = {}
         self.market_cache: Dict[str, Dict[str, Any]] = {}
+        # 行情源健康度：自适应排序/超时，故障源冷却跳过（时钟跟随数据源，回放时为模拟时间）
+        self.source_health = SourceHealthTracker(
+            ["stooq", "yahoo_chart", "yahoo_quote"],
+            window=config.source_health_window,
+            failure_threshold=config.source_failure_threshold,
+            cooldown_seconds=config.source_cooldown_seconds,
+            min_timeout=config.source_timeout_min,
+            max_timeout=config.source_timeout_max,
+            clock=lambda: self._now().timestamp(),
+        )
         # D7 仅支持手动触发
         self.d7_manual_only: bool = True
-        self._state_file = os.path.normpath(
+        self._last_memory_sweep: Optional[datetime] = None
+        self._last_memory_consolidation: Optional[datetime] = None
+        # 最近一次 D5 参数搜索报告
+        self.last_param_search: Dict[str, Any] = {}
+        # D5 自动重训：上次训练时的累计样本数与上次检查时间
+        self._d5_samples_at_train = 0
+        self._last_d5_auto_train: Optional[datetime] = None
+        # state_file 可指向临时文件（离线回放/基准），避免覆盖正式运行状态
+        self._state_file = state_file or os.path.normpath(
             os.path.join(os.path.dirname(__file__), "..", ".runtime_state.json")
         )
         self._load_runtime_state()
+        # D5 模型检查点：启动时加载生效版本
+        self.d5_checkpoints = D5CheckpointStore(
+            config.d5_checkpoint_dir or os.path.join(os.path.dirname(os.path.abspath(self._state_file)), ".d5_checkpoints"),
+            keep=config.d5_checkpoint_keep,
+        )
+        self._load_active_d5_checkpoint()
+
+    @property
+    def data_source(self) -> DataSource:
+        """行情/校验请求的数据源（实时经磁盘缓存，或录制/回放归档）"""
+        return get_data_source()
+
+    def _now(self) -> datetime:
+        """调度时钟：回放模式下为模拟时间"""
+        return self.data_source.now()
+
+    async def _sleep(self, seconds: float):
+        await self.data_source.sleep(seconds)
 
     def reload_departments(self):
         """重载部门实例，使运行时配置（如模型选择）立即生效"""
         old_d4_materials = list(getattr(self.d4, "uploaded_materials", [])) if hasattr(self, "d4") else []
-        old_d5_params = dict(getattr(self.d5, "params", {})) if hasattr(self, "d5") else {}
-        old_d5_samples = list(getattr(self.d5, "training_samples", [])) if hasattr(self, "d5") else []
-        old_d5_pending = dict(getattr(self.d5, "_pending_sample", {})) if hasattr(self, "d5") else {}
+        # D5 模型状态（参数、训练样本、待标注样本、RLS、风险模型）经导出/导入移交新实例
+        old_d5_state = self.d5.export_state() if hasattr(self, "d5") else None
         old_d5_report = dict(getattr(self.d5, "last_training_report", {})) if hasattr(self, "d5") else {}
+        old_d5_features = getattr(self.d5, "feature_store", None) if hasattr(self, "d5") else None
         self.d1 = D1MacroDepartment(self.memory_manager)
         self.d2 = D2IndustryDepartment(self.memory_manager)
         self.d3 = D3StockDepartment(self.memory_manager)
@@ -136,14 +201,12 @@ class TradingPlatformScheduler:
         self.d6 = D6ICDepartment(self.memory_manager)
         self.d7 = D7StockSelectionDepartment(self.memory_manager)
         self.d4.uploaded_materials = old_d4_materials
-        if old_d5_params:
-            self.d5.params.update(old_d5_params)
-        if old_d5_samples:
-            self.d5.training_samples = old_d5_samples
-        if old_d5_pending:
-            self.d5._pending_sample = old_d5_pending
+        if old_d5_state is not None:
+            self.d5.import_state(old_d5_state, restore_data=True, restore_runtime=True)
         if old_d5_report:
             self.d5.last_training_report = old_d5_report
+        if old_d5_features is not None:
+            self.d5.feature_store = old_d5_features
         self.logger.info("Departments reloaded with latest runtime config")
 
     def _iso(self, dt: Optional[datetime]) -> Optional[str]:
@@ -179,7 +242,7 @@ class TradingPlatformScheduler:
             try:
                 case.quant_output = QuantOutput(
                     symbol=symbol,
-                    timestamp=self._parse_dt(q.get("timestamp")) or datetime.now(),
+                    timestamp=self._parse_dt(q.get("timestamp")) or self._now(),
                     market_alpha=float(q.get("market_alpha", 0.0) or 0.0),
                     research_gate=float(q.get("research_gate", 0.0) or 0.0),
                     final_alpha=float(q.get("final_alpha", 0.0) or 0.0),
@@ -189,6 +252,8 @@ class TradingPlatformScheduler:
                     research_score=float(q.get("research_score", 0.0) or 0.0),
                     divergence=float(q.get("divergence", 0.0) or 0.0),
                     event_risk=float(q.get("event_risk", 0.0) or 0.0),
+                    volatility_horizons={k: float(v) for k, v in (q.get("volatility_horizons") or {}).items()},
+                    risk_position=float(q["risk_position"]) if q.get("risk_position") is not None else None,
                 )
             except Exception:
                 case.quant_output = None
@@ -198,7 +263,7 @@ class TradingPlatformScheduler:
             try:
                 case.trading_decision = TradingDecision(
                     symbol=symbol,
-                    timestamp=self._parse_dt(d.get("timestamp")) or datetime.now(),
+                    timestamp=self._parse_dt(d.get("timestamp")) or self._now(),
                     direction=str(d.get("direction") or "NO_TRADE"),
                     target_position=float(d.get("target_position", 0.0) or 0.0),
                     execution_plan=dict(d.get("execution_plan") or {}),
@@ -275,11 +340,18 @@ class TradingPlatformScheduler:
         return [e.to_dict() for e in entries]
 
     def _deserialize_memory_entries(self, rows: List[Dict[str, Any]]):
-        if not hasattr(self.memory_store, "_entries"):
+        persistent = bool(getattr(self.memory_store, "persistent", False))
+        if not rows or (persistent and len(self.memory_store) > 0):
+            # 持久化存储只在库为空时从旧版状态文件迁移一次
+            return
+        if not persistent and not hasattr(self.memory_store, "_entries"):
             return
-        target = {}
+        target = []
         for r in rows or []:
             try:
+                metadata = dict(r.get("metadata") or {})
+                # 旧版状态文件把反馈统计放在 metadata["feedback"]
+                legacy_fb = metadata.pop("feedback", None)
                 entry = MemoryEntry(
                     entry_id=str(r.get("entry_id")),
                     memory_type=MemoryType(str(r.get("memory_type"))),
@@ -287,21 +359,29 @@ class TradingPlatformScheduler:
                     department=r.get("department"),
                     stock_symbol=r.get("stock_symbol"),
                     content=str(r.get("content") or ""),
-                    metadata=dict(r.get("metadata") or {}),
-                    created_at=self._parse_dt(r.get("created_at")) or datetime.now(),
+                    metadata=metadata,
+                    created_at=self._parse_dt(r.get("created_at")) or self._now(),
                     expires_at=self._parse_dt(r.get("expires_at")),
                     importance=float(r.get("importance", 0.5) or 0.5),
                     access_count=int(r.get("access_count", 0) or 0),
+                    feedback=FeedbackStats.from_dict(r.get("feedback") or legacy_fb),
                 )
-                target[entry.entry_id] = entry
+                target.append(entry)
             except Exception:
                 continue
-        self.memory_store._entries = target
+        if persistent:
+            self.memory_store.store_many(target)
+            self.logger.info("Migrated %d memory entries from runtime state into %s", len(target), self.memory_store.db_path)
+            return
+        # 经由 store() 写入以维护二级索引
+        self.memory_store.clear()
+        for entry in target:
+            self.memory_store.store(entry)
 
     def _persist_runtime_state(self):
         payload = {
             "version": 2,
-            "saved_at": datetime.now().isoformat(),
+            "saved_at": self._now().isoformat(),
             "state": {
                 "active_stocks": list(self.state.active_stocks),
                 "last_run_times": {k: self._iso(v) for k, v in self.state.last_run_times.items()},
@@ -312,9 +392,11 @@ class TradingPlatformScheduler:
             },
             "stock_cases": [self._serialize_stock_case(c) for c in self.stock_cases.values()],
             "trading": self._serialize_trading_engine(),
-            "memory_entries": self._serialize_memory_entries(),
             "market_cache": self.market_cache,
         }
+        if not getattr(self.memory_store, "persistent", False):
+            # 纯内存后端才随状态文件保存记忆；SQLite 后端写入即落盘
+            payload["memory_entries"] = self._serialize_memory_entries()
         try:
             with open(self._state_file, "w", encoding="utf-8") as f:
                 json.dump(payload, f, ensure_ascii=False, indent=2)
@@ -373,7 +455,7 @@ class TradingPlatformScheduler:
         self.state.progress["global"][department] = {
             "status": status,
             "message": message,
-            "updated_at": datetime.now().isoformat()
+            "updated_at": self._now().isoformat()
         }
 
     def _set_stock_progress(self, symbol: str, department: str, status: str, message: str = ""):
@@ -382,7 +464,7 @@ class TradingPlatformScheduler:
         self.state.progress["stocks"][symbol][department] = {
             "status": status,
             "message": message,
-            "updated_at": datetime.now().isoformat()
+            "updated_at": self._now().isoformat()
         }
 
     def _reset_stock_cycle_progress(self, symbol: str, last_decision: str = ""):
@@ -425,7 +507,7 @@ class TradingPlatformScheduler:
         }
 
     def _build_next_run_schedule(self) -> Dict[str, Any]:
-        now = datetime.now()
+        now = self._now()
         out: Dict[str, Any] = {
             "global": {},
             "stocks": {},
@@ -451,7 +533,7 @@ class TradingPlatformScheduler:
             "status": "running",
             "progress": 0,
             "stage": "starting",
-            "started_at": datetime.now().isoformat(),
+            "started_at": self._now().isoformat(),
             "finished_at": None,
             "message": ""
         }
@@ -477,7 +559,7 @@ class TradingPlatformScheduler:
         if job_id in self.state.jobs:
             self.state.jobs[job_id]["status"] = status
             self.state.jobs[job_id]["message"] = message
-            self.state.jobs[job_id]["finished_at"] = datetime.now().isoformat()
+            self.state.jobs[job_id]["finished_at"] = self._now().isoformat()
             self._persist_runtime_state()
     
     async def start(self):
@@ -500,17 +582,27 @@ class TradingPlatformScheduler:
             try:
                 # 检查并运行各部门
                 await self._check_and_run_departments()
+
+                # 记忆全量清理（插入路径只做增量淘汰）
+                self._maybe_sweep_memory()
+                await self._maybe_consolidate_memory()
+                self._maybe_retrain_d5()
                 
                 # 短暂休眠
-                await asyncio.sleep(10)  # 每10秒检查一次
-                
+                await self._sleep(10)  # 每10秒检查一次
+
+            except ReplayFinished as e:
+                # 回放到达归档末尾：停止调度，避免在无新数据的模拟时间里空转
+                self.logger.info(f"Replay finished: {e}")
+                await self.stop()
+                break
             except Exception as e:
                 self.logger.error(f"Scheduler error: {e}")
-                await asyncio.sleep(5)
+                await self._sleep(5)
     
     async def _check_and_run_departments(self):
         """检查并运行各部门"""
-        now = datetime.now()
+        now = self._now()
 
         # 股票池为空时，不运行 D1-D6/D5；D7 仅手动触发
         if not self.state.active_stocks:
@@ -530,6 +622,13 @@ class TradingPlatformScheduler:
             except Exception as e:
                 self.logger.error(f"D1 scheduled run failed: {e}")
         
+        # D2/D3/D4：本轮到期的股票先批量收集证据、一次检索记忆摘要
+        await self._prepare_department_batches({
+            dept: [s for s in self.state.active_stocks
+                   if self._should_run_department(f"{dept}_{s}", now, timedelta(minutes=interval))]
+            for dept, interval in (("D2", config.d2_interval), ("D3", config.d3_interval), ("D4", config.d4_interval))
+        })
+
         # D2/D3/D4/D6 - 对每只股票运行
         for symbol in self.state.active_stocks:
             # D2 行业
@@ -560,6 +659,76 @@ class TradingPlatformScheduler:
                 except Exception as e:
                     self.logger.error(f"D6 scheduled run failed for {symbol}: {e}")
     
+    def _maybe_sweep_memory(self):
+        """按 memory_sweep_interval 定期执行记忆全量清理（时效/低价值/容量）"""
+        now = self._now()
+        last = self._last_memory_sweep
+        if last is not None and now - last < timedelta(minutes=config.memory_sweep_interval):
+            return
+        self._last_memory_sweep = now
+        try:
+            self.memory_manager.prune_memories()
+        except Exception as e:
+            self.logger.warning(f"Memory sweep failed: {e}")
+
+    async def _maybe_consolidate_memory(self):
+        """按 memory_consolidation_interval 定期合并相似短期记忆（0 表示只手动触发）"""
+        interval = int(config.memory_consolidation_interval or 0)
+        if interval <= 0:
+            return
+        now = self._now()
+        last = self._last_memory_consolidation
+        if last is None:
+            # 启动后先等一个完整间隔，避免与首轮分析抢占
+            self._last_memory_consolidation = now
+            return
+        if now - last < timedelta(minutes=interval) or self._find_running_job("consolidate_memory"):
+            return
+        self._last_memory_consolidation = now
+        try:
+            stats = await self.memory_consolidator.consolidate(as_of=now)
+            if stats["digests"]:
+                self.logger.info(f"Memory consolidation: {stats}")
+        except Exception as e:
+            self.logger.warning(f"Memory consolidation failed: {e}")
+
+    async def _summarize_memory_cluster(self, entries: List[MemoryEntry]) -> Optional[str]:
+        """LLM 摘要（需开启 memory_consolidation_use_llm）：使用条目所属部门的决策模型，返回 None 则用抽取式"""
+        if not config.memory_consolidation_use_llm or not entries:
+            return None
+        dept = getattr(self, str(entries[0].department or "").lower(), None)
+        agent = getattr(dept, "decider", None) or getattr(self.d1, "decider", None)
+        if agent is None:
+            return None
+        notes = "\n".join(f"- [{e.created_at:%Y-%m-%d %H:%M}] {e.content}" for e in entries)
+        prompt = (
+            "以下是同一部门对同一标的的多条历史分析记录。请合并为不超过5条要点的长期记忆摘要，"
+            "保留结论、关键数据、风险与触发条件，删除重复内容，只输出要点列表。\n" + notes
+        )
+        return await agent.call_model(prompt)
+
+    def run_memory_consolidation_manual(self) -> str:
+        """手动触发记忆合并（异步任务）"""
+        running = self._find_running_job("consolidate_memory")
+        if running:
+            return running
+        job_id = self._create_job("consolidate_memory")
+        asyncio.create_task(self._run_memory_consolidation_job(job_id))
+        return job_id
+
+    async def _run_memory_consolidation_job(self, job_id: str):
+        try:
+            self._update_job(job_id, progress=10, stage="clustering", message="Clustering short-term memories")
+            now = self._now()
+            stats = await self.memory_consolidator.consolidate(as_of=now)
+            self._last_memory_consolidation = now
+            self._finish_job(
+                job_id, "completed",
+                f"Consolidated {stats['consolidated']} entries into {stats['digests']} digests"
+            )
+        except Exception as e:
+            self._finish_job(job_id, "failed", str(e))
+
     def _should_run_department(self, dept_key: str, now: datetime, interval: timedelta) -> bool:
         """判断是否应该运行部门"""
         # 若上次状态为失败，则优先重试，不受冷却间隔限制
@@ -638,7 +807,7 @@ class TradingPlatformScheduler:
         self.state.d7_history.append(picked_symbols)
         self.state.d7_history = self.state.d7_history[-20:]
         
-        self.state.last_run_times["D7"] = datetime.now()
+        self.state.last_run_times["D7"] = self._now()
         self.logger.info(f"D7 selected {len(selected_candidates)} stocks ({pool_source}): {picked_symbols}")
         self._persist_runtime_state()
         return picked_symbols
@@ -659,27 +828,27 @@ class TradingPlatformScheduler:
                 "message": "Step 1/4: 收集候选股票池",
                 "stage": "collecting",
                 "progress": 10,
-                "updated_at": datetime.now().isoformat()
+                "updated_at": self._now().isoformat()
             }
             self._update_job(job_id, progress=10, stage="collecting", message="Collecting candidate universe")
-            await asyncio.sleep(1.2)
+            await self._sleep(1.2)
 
             self.state.progress["d7"] = {
                 "status": "running",
                 "message": "Step 2/4: 多维度评分中",
                 "stage": "scoring",
                 "progress": 45,
-                "updated_at": datetime.now().isoformat()
+                "updated_at": self._now().isoformat()
             }
             self._update_job(job_id, progress=45, stage="scoring", message="Scoring candidates")
-            await asyncio.sleep(0.6)
+            await self._sleep(0.6)
 
             self.state.progress["d7"] = {
                 "status": "running",
                 "message": "Step 3/4: 按短/中/长分组",
                 "stage": "grouping",
                 "progress": 75,
-                "updated_at": datetime.now().isoformat()
+                "updated_at": self._now().isoformat()
             }
             self._update_job(job_id, progress=75, stage="grouping", message="Grouping by horizons")
 
@@ -693,19 +862,19 @@ class TradingPlatformScheduler:
                     "message": f"Step 2/4: 评分中 {done}/{total} · {symbol}",
                     "stage": "scoring",
                     "progress": p,
-                    "updated_at": datetime.now().isoformat()
+                    "updated_at": self._now().isoformat()
                 }
                 self._update_job(job_id, progress=p, stage="scoring", message=f"Scored {done}/{total}: {symbol}")
 
             symbols = await self._run_d7(progress_cb=_on_candidate_scored)
             pool_source = getattr(self.d7, "last_pool_source", "unknown")
-            await asyncio.sleep(0.8)
+            await self._sleep(0.8)
             self.state.progress["d7"] = {
                 "status": "completed",
                 "message": f"Step 4/4: 完成，生成 {len(symbols)} 条推荐（source={pool_source}）",
                 "stage": "completed",
                 "progress": 100,
-                "updated_at": datetime.now().isoformat()
+                "updated_at": self._now().isoformat()
             }
             self._update_job(job_id, progress=100, stage="completed", message=f"D7 completed ({pool_source}): {', '.join(symbols)}")
             self._finish_job(job_id, "completed", f"D7 completed ({pool_source}): {', '.join(symbols)}")
@@ -715,7 +884,7 @@ class TradingPlatformScheduler:
                 "message": str(e),
                 "stage": "failed",
                 "progress": 100,
-                "updated_at": datetime.now().isoformat()
+                "updated_at": self._now().isoformat()
             }
             self._finish_job(job_id, "failed", str(e))
 
@@ -749,6 +918,14 @@ class TradingPlatformScheduler:
                 errors.append(f"D5:{e}")
 
             symbols = list(self.state.active_stocks)
+            self._update_job(job_id, progress=20, stage="prepare", message="Collecting D2-D4 evidence and memory")
+            try:
+                await asyncio.wait_for(
+                    self._prepare_department_batches({dept: symbols for dept in ("D2", "D3", "D4")}),
+                    timeout=dept_timeout,
+                )
+            except Exception as e:
+                self.logger.warning(f"Department batch prepare failed, falling back to per-stock runs: {e}")
             total_steps = max(1, len(symbols) * 4)
             done_steps = 0
             for symbol in symbols:
@@ -786,7 +963,7 @@ class TradingPlatformScheduler:
                     self.stock_cases[symbol].department_finals["D1"] = dept_final
                     self._set_stock_progress(symbol, "D1", "completed", "Macro context updated")
             
-            self.state.last_run_times["D1"] = datetime.now()
+            self.state.last_run_times["D1"] = self._now()
             self._set_global_progress("D1", "completed", "Macro analysis completed")
             self._persist_runtime_state()
         except Exception as e:
@@ -795,6 +972,17 @@ class TradingPlatformScheduler:
                 self._set_stock_progress(symbol, "D1", "failed", str(e))
             raise
     
+    async def _prepare_department_batches(self, due: Dict[str, List[str]]):
+        """D2/D3/D4 批量准备：各部门到期股票的证据并发收集，记忆摘要按部门一次批量检索"""
+        departments = {"D2": self.d2, "D3": self.d3, "D4": self.d4}
+        for dept, symbols in due.items():
+            if not symbols:
+                continue
+            try:
+                await departments[dept].prepare_batch(symbols)
+            except Exception as e:
+                self.logger.warning(f"{dept} batch prepare failed: {e}")
+
     async def _run_d2(self, symbol: str):
         """运行D2行业"""
         self._set_stock_progress(symbol, "D2", "running", "Industry analysis in progress")
@@ -805,7 +993,7 @@ class TradingPlatformScheduler:
             if symbol in self.stock_cases:
                 self.stock_cases[symbol].department_finals["D2"] = dept_final
             
-            self.state.last_run_times[f"D2_{symbol}"] = datetime.now()
+            self.state.last_run_times[f"D2_{symbol}"] = self._now()
             self._set_stock_progress(symbol, "D2", "completed", "Industry analysis completed")
             self._persist_runtime_state()
         except Exception as e:
@@ -822,7 +1010,7 @@ class TradingPlatformScheduler:
             if symbol in self.stock_cases:
                 self.stock_cases[symbol].department_finals["D3"] = dept_final
             
-            self.state.last_run_times[f"D3_{symbol}"] = datetime.now()
+            self.state.last_run_times[f"D3_{symbol}"] = self._now()
             self._set_stock_progress(symbol, "D3", "completed", "Stock-specific analysis completed")
             self._persist_runtime_state()
         except Exception as e:
@@ -839,7 +1027,7 @@ class TradingPlatformScheduler:
             if symbol in self.stock_cases:
                 self.stock_cases[symbol].department_finals["D4"] = dept_final
             
-            self.state.last_run_times[f"D4_{symbol}"] = datetime.now()
+            self.state.last_run_times[f"D4_{symbol}"] = self._now()
             self._set_stock_progress(symbol, "D4", "completed", "Expert analysis completed")
             self._persist_runtime_state()
         except Exception as e:
@@ -847,25 +1035,50 @@ class TradingPlatformScheduler:
             raise
     
     async def _run_d5_for_all_stocks(self):
-        """为所有股票运行D5量化"""
+        """为所有股票运行D5量化：行情并发抓取，量化对全部股票一次截面批量计算"""
         symbols = list(self.state.active_stocks)
         if not symbols:
             return
 
-        # D5 对每只股票是独立计算，可并发执行，避免“排队感”
-        tasks = [self._run_d5(symbol) for symbol in symbols]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        for symbol, result in zip(symbols, results):
+        for symbol in symbols:
+            self._set_stock_progress(symbol, "D5", "running", "Quant signal generation in progress")
+        self.logger.info(f"Running D5 quant analysis for {len(symbols)} stocks")
+        fetched = await asyncio.gather(*[self._get_market_data(s) for s in symbols], return_exceptions=True)
+        ready: List[str] = []
+        market_data: List[MarketData] = []
+        whale_flows: List[WhaleFlow] = []
+        for symbol, result in zip(symbols, fetched):
             if isinstance(result, Exception):
                 self.logger.error(f"D5 run failed for {symbol}: {result}")
+                self._set_stock_progress(symbol, "D5", "failed", str(result))
+                continue
+            ready.append(symbol)
+            market_data.append(result[0])
+            whale_flows.append(result[1])
+
+        if ready:
+            dept_finals = {s: self.stock_cases[s].department_finals for s in ready if s in self.stock_cases}
+            outputs = await self.d5.calculate_quant_outputs_batch(
+                market_data, whale_flows, dept_finals, as_of=self._now()
+            )
+            # 持仓反馈先收集，本周期统一批量写入记忆
+            feedback: List[Tuple[str, float, str]] = []
+            for symbol, md in zip(ready, market_data):
+                try:
+                    self._apply_d5_output(symbol, md, outputs[symbol], feedback_sink=feedback)
+                except Exception as e:
+                    self.logger.error(f"D5 run failed for {symbol}: {e}")
+                    self._set_stock_progress(symbol, "D5", "failed", str(e))
+            if feedback:
+                self.memory_manager.apply_trade_feedback_batch(feedback, as_of=self._now())
+            self._persist_runtime_state()
         self.trading_engine.record_equity_snapshot("d5_cycle")
     
-    async def _run_d5(self, symbol: str):
-        """运行D5量化"""
+    async def _run_d5(self, symbol: str, feedback_sink: Optional[List[Tuple[str, float, str]]] = None):
+        """运行单只股票的D5量化（传入 feedback_sink 时持仓反馈由调用方批量应用）"""
         self._set_stock_progress(symbol, "D5", "running", "Quant signal generation in progress")
         self.logger.info(f"Running D5 quant analysis for {symbol}")
         try:
-            # 获取市场数据和资金流（模拟数据）
             market_data, whale_flow = await self._get_market_data(symbol)
             
             # 获取部门结论
@@ -878,36 +1091,47 @@ class TradingPlatformScheduler:
                 symbol=symbol,
                 market_data=market_data,
                 whale_flow=whale_flow,
-                department_finals=dept_finals
+                department_finals=dept_finals,
+                as_of=self._now()
             )
-            
-            if symbol in self.stock_cases:
-                self.stock_cases[symbol].quant_output = quant_output
-                self.stock_cases[symbol].latest_price = market_data.price
-                self.stock_cases[symbol].latest_market_timestamp = market_data.timestamp
-            decision_direction = ""
-            if symbol in self.stock_cases and self.stock_cases[symbol].trading_decision:
-                decision_direction = str(self.stock_cases[symbol].trading_decision.direction or "")
-            if symbol in self.trading_engine.account.positions:
-                pos = self.trading_engine.account.positions[symbol]
-                self.trading_engine.mark_to_market(symbol, market_data.price)
-                pnl_ratio = 0.0
-                base_mv = max(1e-9, abs(pos.market_value))
-                if base_mv > 1e-9:
-                    pnl_ratio = float(pos.unrealized_pnl) / base_mv
+            self._apply_d5_output(symbol, market_data, quant_output, feedback_sink=feedback_sink)
+            self._persist_runtime_state()
+        except Exception as e:
+            self._set_stock_progress(symbol, "D5", "failed", str(e))
+            raise
+
+    def _apply_d5_output(self,
+                         symbol: str,
+                         market_data: MarketData,
+                         quant_output: QuantOutput,
+                         feedback_sink: Optional[List[Tuple[str, float, str]]] = None):
+        """写回量化输出与最新行情，按持仓盈亏生成交易反馈"""
+        if symbol in self.stock_cases:
+            self.stock_cases[symbol].quant_output = quant_output
+            self.stock_cases[symbol].latest_price = market_data.price
+            self.stock_cases[symbol].latest_market_timestamp = market_data.timestamp
+        decision_direction = ""
+        if symbol in self.stock_cases and self.stock_cases[symbol].trading_decision:
+            decision_direction = str(self.stock_cases[symbol].trading_decision.direction or "")
+        if symbol in self.trading_engine.account.positions:
+            pos = self.trading_engine.account.positions[symbol]
+            self.trading_engine.mark_to_market(symbol, market_data.price)
+            pnl_ratio = 0.0
+            base_mv = max(1e-9, abs(pos.market_value))
+            if base_mv > 1e-9:
+                pnl_ratio = float(pos.unrealized_pnl) / base_mv
+            if feedback_sink is not None:
+                feedback_sink.append((symbol, pnl_ratio, decision_direction))
+            else:
                 self.memory_manager.apply_trade_feedback(
                     symbol=symbol,
                     pnl_ratio=pnl_ratio,
                     decision_direction=decision_direction,
-                    as_of=datetime.now()
+                    as_of=self._now()
                 )
-            
-            self.state.last_run_times[f"D5_{symbol}"] = datetime.now()
-            self._set_stock_progress(symbol, "D5", "completed", "Quant output completed")
-            self._persist_runtime_state()
-        except Exception as e:
-            self._set_stock_progress(symbol, "D5", "failed", str(e))
-            raise
+        
+        self.state.last_run_times[f"D5_{symbol}"] = self._now()
+        self._set_stock_progress(symbol, "D5", "completed", "Quant output completed")
     
     async def _run_d6(self, symbol: str):
         """运行D6投委会"""
@@ -953,7 +1177,7 @@ class TradingPlatformScheduler:
             # 执行交易
             await self._execute_trade(decision, symbol)
 
-            self.state.last_run_times[f"D6_{symbol}"] = datetime.now()
+            self.state.last_run_times[f"D6_{symbol}"] = self._now()
             # 完成一轮后清空状态，进入下一轮倒计时
             self._reset_stock_cycle_progress(symbol, last_decision=decision.direction)
             pool_action = str((decision.execution_plan or {}).get("pool_action", "keep")).strip().lower()
@@ -967,7 +1191,7 @@ class TradingPlatformScheduler:
     
     def _check_event_cooldown(self, symbol: str) -> bool:
         """检查事件触发冷却时间"""
-        now = datetime.now()
+        now = self._now()
         
         if symbol in self.event_cooldowns:
             last_trigger = self.event_cooldowns[symbol]
@@ -983,17 +1207,13 @@ class TradingPlatformScheduler:
         - baseline: 50万美元
         - adaptive: max(50万, 当日1m成交额P95, 当日总成交额0.2%)
         """
-        import aiohttp
-
         y_symbol = symbol.replace(".", "-").upper()
         url = f"https://query1.finance.yahoo.com/v8/finance/chart/{y_symbol}?interval=1m&range=1d&includePrePost=false"
-        timeout = aiohttp.ClientTimeout(total=timeout_sec)
         headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-        async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-            async with session.get(url) as resp:
-                if resp.status != 200:
-                    raise RuntimeError(f"yahoo chart status={resp.status}")
-                data = await resp.json()
+        resp = await self.data_source.fetch(url, ttl_seconds=60, headers=headers, timeout=timeout_sec)
+        if not resp.ok:
+            raise RuntimeError(f"yahoo chart status={resp.status}")
+        data = resp.json()
         result = (((data or {}).get("chart") or {}).get("result") or [None])[0]
         if not result:
             raise RuntimeError("empty chart")
@@ -1063,284 +1283,329 @@ class TradingPlatformScheduler:
             "adv_dollar": float(max(total_notional, 1.0)),
         }
     
-    async def _get_market_data(self, symbol: str):
-        """获取市场数据（Stooq优先，Yahoo兜底，失败时仅用缓存真实数据）。"""
-        from models.base_models import MarketData, WhaleFlow
-        import aiohttp
+    async def _fetch_stooq_quote_row(self, symbol: str, timeout: float) -> Tuple[Optional[List[str]], bool]:
+        """Stooq 日内快照（CSV 一行），无数据时为 None；第二项为是否由缓存直接应答"""
         import csv
         from io import StringIO
-        y_symbol = symbol.replace(".", "-").upper()
         stooq_symbol = f"{symbol.replace('.', '-').lower()}.us"
+        stooq_url = f"https://stooq.com/q/l/?s={stooq_symbol}&f=sd2t2ohlcv&h&e=csv"
+        resp = await self.data_source.fetch(stooq_url, ttl_seconds=60, headers={"User-Agent": "Mozilla/5.0"}, timeout=timeout)
+        if not resp.ok:
+            raise RuntimeError(f"stooq status={resp.status}")
+        rows = list(csv.reader(StringIO(resp.text)))
+        if len(rows) >= 2 and len(rows[1]) >= 8:
+            r = [x.strip() for x in rows[1]]
+            if r[6] not in ("N/D", "-", ""):
+                return r, resp.from_cache
+        return None, resp.from_cache
+
+    async def _fetch_yahoo_chart_series(self, symbol: str, timeout: float) -> Tuple[Optional[List[tuple]], bool]:
+        """Yahoo 1m 全日序列 [(close, volume)]，无数据时为 None；第二项为是否由缓存直接应答"""
+        y_symbol = symbol.replace(".", "-").upper()
+        chart_url = f"https://query1.finance.yahoo.com/v8/finance/chart/{y_symbol}?interval=1m&range=1d&includePrePost=false"
+        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+        resp = await self.data_source.fetch(chart_url, ttl_seconds=60, headers=headers, timeout=timeout)
+        if not resp.ok:
+            raise RuntimeError(f"yahoo chart status={resp.status}")
+        chart_data = resp.json()
+        result = (((chart_data or {}).get("chart") or {}).get("result") or [None])[0]
+        if not result:
+            return None, resp.from_cache
+        quote = ((result.get("indicators") or {}).get("quote") or [{}])[0]
+        closes = list(quote.get("close") or [])
+        vols = list(quote.get("volume") or [])
+        valid = []
+        n = min(len(closes), len(vols))
+        for i in range(n):
+            c = closes[i]
+            v = vols[i]
+            if c is None or v is None:
+                continue
+            c = float(c)
+            v = float(v)
+            if c <= 0:
+                continue
+            valid.append((c, max(v, 0.0)))
+        return valid or None, resp.from_cache
+
+    async def _fetch_yahoo_quote_row(self, symbol: str, timeout: float) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Yahoo quote v7 单行报价，无有效价格时为 None；第二项为是否由缓存直接应答"""
+        y_symbol = symbol.replace(".", "-").upper()
+        url = f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={y_symbol}"
+        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+        resp = await self.data_source.fetch(url, ttl_seconds=60, headers=headers, timeout=timeout)
+        if not resp.ok:
+            raise RuntimeError(f"quote status={resp.status}")
+        data = resp.json()
+        row = (((data or {}).get("quoteResponse") or {}).get("result") or [None])[0]
+        if not row or float(row.get("regularMarketPrice") or 0.0) <= 0:
+            return None, resp.from_cache
+        return row, resp.from_cache
+
+    async def _build_from_stooq(self, symbol: str, r: List[str]):
+        from models.base_models import MarketData, WhaleFlow
+        y_symbol = symbol.replace(".", "-").upper()
+        open_v = float(r[3])
+        high_v = float(r[4])
+        low_v = float(r[5])
+        close_v = float(r[6])
+        vol_v = float(r[7]) if r[7] not in ("N/D", "-", "") else 0.0
+        market_data = MarketData(
+            symbol=symbol,
+            timestamp=self._now(),
+            price=close_v,
+            volume=max(vol_v, 1.0),
+            vwap=(open_v + high_v + low_v + close_v) / 4.0,
+            bid_price=close_v * 0.999,
+            ask_price=close_v * 1.001,
+            bid_size=max(8000.0, vol_v * 0.002),
+            ask_size=max(8000.0, vol_v * 0.002)
+        )
+        adv = max(vol_v, 1_000_000.0)
+        adv_dollar = max(close_v * adv, 1_000_000.0)
+        chg_pct = ((close_v - open_v) / open_v * 100.0) if open_v > 0 else 0.0
+        # 优先用 Yahoo 全日1m成交记录估算大单流；失败再用价格变化近似
+        large_stats = {}
         try:
-            # 1) Stooq（稳定且无需key）
-            stooq_url = f"https://stooq.com/q/l/?s={stooq_symbol}&f=sd2t2ohlcv&h&e=csv"
-            timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(stooq_url, headers={"User-Agent": "Mozilla/5.0"}) as resp:
-                    if resp.status == 200:
-                        txt = await resp.text()
-                        rows = list(csv.reader(StringIO(txt)))
-                        if len(rows) >= 2 and len(rows[1]) >= 8:
-                            r = [x.strip() for x in rows[1]]
-                            close_s = r[6]
-                            if close_s not in ("N/D", "-", ""):
-                                open_v = float(r[3])
-                                high_v = float(r[4])
-                                low_v = float(r[5])
-                                close_v = float(close_s)
-                                vol_v = float(r[7]) if r[7] not in ("N/D", "-", "") else 0.0
-                                market_data = MarketData(
-                                    symbol=symbol,
-                                    timestamp=datetime.now(),
-                                    price=close_v,
-                                    volume=max(vol_v, 1.0),
-                                    vwap=(open_v + high_v + low_v + close_v) / 4.0,
-                                    bid_price=close_v * 0.999,
-                                    ask_price=close_v * 1.001,
-                                    bid_size=max(8000.0, vol_v * 0.002),
-                                    ask_size=max(8000.0, vol_v * 0.002)
-                                )
-                                adv = max(vol_v, 1_000_000.0)
-                                adv_dollar = max(close_v * adv, 1_000_000.0)
-                                chg_pct = ((close_v - open_v) / open_v * 100.0) if open_v > 0 else 0.0
-                                # 优先用 Yahoo 全日1m成交记录估算大单流；失败再用价格变化近似
-                                large_stats = {}
-                                try:
-                                    large_stats = await self._estimate_large_prints_from_yahoo(symbol)
-                                except Exception:
-                                    large_stats = {}
-                                adv_dollar_used = float(large_stats.get("adv_dollar", adv_dollar))
-                                block_net = float(large_stats.get("large_trade_net", (close_v - open_v) * adv * 0.08))
-                                large_notional = float(
-                                    large_stats.get("large_trade_notional", abs(chg_pct) / 100.0 * adv_dollar_used * 0.5)
-                                )
-                                whale_flow = WhaleFlow(
-                                    symbol=symbol,
-                                    timestamp=datetime.now(),
-                                    block_net_buy_value=block_net,
-                                    dark_pool_net=block_net * 0.15,
-                                    options_whale_notional=large_notional * 0.12,
-                                    adv=max(adv_dollar_used, 1.0)
-                                )
-                                cached_meta = self.market_cache.get(symbol) or {}
-                                market_cap = cached_meta.get("market_cap")
-                                short_name = str(cached_meta.get("short_name") or symbol)
-                                try:
-                                    quote_url = f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={y_symbol}"
-                                    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-                                    async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                                        async with session.get(quote_url) as q_resp:
-                                            if q_resp.status == 200:
-                                                q_data = await q_resp.json()
-                                                row = (((q_data or {}).get("quoteResponse") or {}).get("result") or [None])[0]
-                                                if row:
-                                                    market_cap = float(row.get("marketCap") or 0.0) or None
-                                                    short_name = str(row.get("shortName") or row.get("longName") or symbol)
-                                except Exception:
-                                    pass
-                                self.market_cache[symbol] = {
-                                    "price": close_v,
-                                    "ts": datetime.now().isoformat(),
-                                    "source": "stooq",
-                                    "change_percent": chg_pct,
-                                    "market_cap": market_cap,
-                                    "avg_volume_3m": adv,
-                                    "avg_volume_3m_dollar": adv_dollar_used,
-                                    "short_name": short_name,
-                                    "large_trade_threshold_usd": float(large_stats.get("threshold_usd", max(500000.0, adv_dollar_used * 0.002))),
-                                    "large_trade_count": int(large_stats.get("large_trade_count", max(0, int(abs((close_v - open_v) * adv) / 500000.0)))),
-                                    "large_trade_notional": float(large_stats.get("large_trade_notional", abs((close_v - open_v) * adv))),
-                                    "large_trade_net": float(large_stats.get("large_trade_net", (close_v - open_v) * adv * 0.35)),
-                                    "tape_source": "yahoo_chart_1m"
-                                }
-                                return market_data, whale_flow
-
-            # 2) Yahoo Chart 兜底（无需 quote v7）
-            chart_url = f"https://query1.finance.yahoo.com/v8/finance/chart/{y_symbol}?interval=1m&range=1d&includePrePost=false"
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(chart_url) as resp:
-                    if resp.status == 200:
-                        chart_data = await resp.json()
-                        result = (((chart_data or {}).get("chart") or {}).get("result") or [None])[0]
-                        if result:
-                            quote = ((result.get("indicators") or {}).get("quote") or [{}])[0]
-                            closes = list(quote.get("close") or [])
-                            vols = list(quote.get("volume") or [])
-                            valid = []
-                            n = min(len(closes), len(vols))
-                            for i in range(n):
-                                c = closes[i]
-                                v = vols[i]
-                                if c is None or v is None:
-                                    continue
-                                c = float(c)
-                                v = float(v)
-                                if c <= 0:
-                                    continue
-                                valid.append((c, max(v, 0.0)))
-                            if valid:
-                                open_v = float(valid[0][0])
-                                close_v = float(valid[-1][0])
-                                vol_v = float(sum(v for _, v in valid))
-                                adv = max(vol_v, 1_000_000.0)
-                                adv_dollar = max(close_v * adv, 1_000_000.0)
-                                chg_pct = ((close_v - open_v) / open_v * 100.0) if open_v > 0 else 0.0
-
-                                market_data = MarketData(
-                                    symbol=symbol,
-                                    timestamp=datetime.now(),
-                                    price=close_v,
-                                    volume=max(vol_v, 1.0),
-                                    vwap=(open_v + close_v) / 2.0,
-                                    bid_price=close_v * 0.9995,
-                                    ask_price=close_v * 1.0005,
-                                    bid_size=max(12000.0, vol_v * 0.0015),
-                                    ask_size=max(12000.0, vol_v * 0.0015),
-                                )
-                                large_stats = {}
-                                try:
-                                    large_stats = await self._estimate_large_prints_from_yahoo(symbol)
-                                except Exception:
-                                    large_stats = {}
-                                adv_dollar_used = float(large_stats.get("adv_dollar", adv_dollar))
-                                block_net = float(large_stats.get("large_trade_net", (close_v - open_v) * adv * 0.08))
-                                large_notional = float(
-                                    large_stats.get("large_trade_notional", abs(chg_pct) / 100.0 * adv_dollar_used * 0.5)
-                                )
-                                whale_flow = WhaleFlow(
-                                    symbol=symbol,
-                                    timestamp=datetime.now(),
-                                    block_net_buy_value=block_net,
-                                    dark_pool_net=block_net * 0.15,
-                                    options_whale_notional=large_notional * 0.12,
-                                    adv=max(adv_dollar_used, 1.0)
-                                )
-                                cached_meta = self.market_cache.get(symbol) or {}
-                                self.market_cache[symbol] = {
-                                    "price": close_v,
-                                    "ts": datetime.now().isoformat(),
-                                    "source": "yahoo_chart",
-                                    "change_percent": chg_pct,
-                                    "market_cap": cached_meta.get("market_cap"),
-                                    "avg_volume_3m": adv,
-                                    "avg_volume_3m_dollar": adv_dollar_used,
-                                    "short_name": str(cached_meta.get("short_name") or symbol),
-                                    "large_trade_threshold_usd": float(large_stats.get("threshold_usd", max(500000.0, adv_dollar_used * 0.002))),
-                                    "large_trade_count": int(large_stats.get("large_trade_count", 0)),
-                                    "large_trade_notional": float(large_stats.get("large_trade_notional", 0.0)),
-                                    "large_trade_net": float(large_stats.get("large_trade_net", 0.0)),
-                                    "tape_source": "yahoo_chart_1m"
-                                }
-                                return market_data, whale_flow
-
-            # 3) Yahoo quote v7 兜底
-            url = f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={y_symbol}"
+            large_stats = await self._estimate_large_prints_from_yahoo(symbol)
+        except Exception:
+            large_stats = {}
+        adv_dollar_used = float(large_stats.get("adv_dollar", adv_dollar))
+        block_net = float(large_stats.get("large_trade_net", (close_v - open_v) * adv * 0.08))
+        large_notional = float(
+            large_stats.get("large_trade_notional", abs(chg_pct) / 100.0 * adv_dollar_used * 0.5)
+        )
+        whale_flow = WhaleFlow(
+            symbol=symbol,
+            timestamp=self._now(),
+            block_net_buy_value=block_net,
+            dark_pool_net=block_net * 0.15,
+            options_whale_notional=large_notional * 0.12,
+            adv=max(adv_dollar_used, 1.0)
+        )
+        cached_meta = self.market_cache.get(symbol) or {}
+        market_cap = cached_meta.get("market_cap")
+        short_name = str(cached_meta.get("short_name") or symbol)
+        try:
+            quote_url = f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={y_symbol}"
             headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        raise RuntimeError(f"quote status={resp.status}")
-                    data = await resp.json()
-            row = (((data or {}).get("quoteResponse") or {}).get("result") or [None])[0]
-            if not row:
-                raise RuntimeError("empty quote")
-            price = float(row.get("regularMarketPrice") or 0.0)
-            if price <= 0:
-                raise RuntimeError("invalid price")
-            volume = float(row.get("regularMarketVolume") or 0.0)
-            bid = float(row.get("bid") or 0.0)
-            ask = float(row.get("ask") or 0.0)
-            if bid <= 0 or ask <= 0:
-                bid = price * 0.9995
-                ask = price * 1.0005
-            bid_sz = float(row.get("bidSize") or 20000.0)
-            ask_sz = float(row.get("askSize") or 20000.0)
-            vwap = float(row.get("regularMarketPrice") or price)
-            adv = float(row.get("averageDailyVolume3Month") or volume or 1_000_000.0)
-            adv_dollar = max(price * adv, 1_000_000.0)
-            chg_pct = float(row.get("regularMarketChangePercent") or 0.0)
-            cap = float(row.get("marketCap") or 0.0)
-            short_name = str(row.get("shortName") or row.get("longName") or symbol)
-            prev = self.market_cache.get(symbol, {}).get("price", price)
-            delta = price - prev
-
-            market_data = MarketData(
-                symbol=symbol,
-                timestamp=datetime.now(),
-                price=price,
-                volume=volume if volume > 0 else adv,
-                vwap=vwap,
-                bid_price=bid,
-                ask_price=ask,
-                bid_size=bid_sz if bid_sz > 0 else 20000.0,
-                ask_size=ask_sz if ask_sz > 0 else 20000.0
-            )
+            # 市值/简称变化很慢，缓存更久
+            q_resp = await self.data_source.fetch(quote_url, ttl_seconds=3600, headers=headers, timeout=10)
+            if q_resp.ok:
+                q_data = q_resp.json()
+                row = (((q_data or {}).get("quoteResponse") or {}).get("result") or [None])[0]
+                if row:
+                    market_cap = float(row.get("marketCap") or 0.0) or None
+                    short_name = str(row.get("shortName") or row.get("longName") or symbol)
+        except Exception:
+            pass
+        self.market_cache[symbol] = {
+            "price": close_v,
+            "ts": self._now().isoformat(),
+            "source": "stooq",
+            "change_percent": chg_pct,
+            "market_cap": market_cap,
+            "avg_volume_3m": adv,
+            "avg_volume_3m_dollar": adv_dollar_used,
+            "short_name": short_name,
+            "large_trade_threshold_usd": float(large_stats.get("threshold_usd", max(500000.0, adv_dollar_used * 0.002))),
+            "large_trade_count": int(large_stats.get("large_trade_count", max(0, int(abs((close_v - open_v) * adv) / 500000.0)))),
+            "large_trade_notional": float(large_stats.get("large_trade_notional", abs((close_v - open_v) * adv))),
+            "large_trade_net": float(large_stats.get("large_trade_net", (close_v - open_v) * adv * 0.35)),
+            "tape_source": "yahoo_chart_1m"
+        }
+        return market_data, whale_flow
+
+    async def _build_from_yahoo_chart(self, symbol: str, valid: List[tuple]):
+        from models.base_models import MarketData, WhaleFlow
+        open_v = float(valid[0][0])
+        close_v = float(valid[-1][0])
+        vol_v = float(sum(v for _, v in valid))
+        adv = max(vol_v, 1_000_000.0)
+        adv_dollar = max(close_v * adv, 1_000_000.0)
+        chg_pct = ((close_v - open_v) / open_v * 100.0) if open_v > 0 else 0.0
+
+        market_data = MarketData(
+            symbol=symbol,
+            timestamp=self._now(),
+            price=close_v,
+            volume=max(vol_v, 1.0),
+            vwap=(open_v + close_v) / 2.0,
+            bid_price=close_v * 0.9995,
+            ask_price=close_v * 1.0005,
+            bid_size=max(12000.0, vol_v * 0.0015),
+            ask_size=max(12000.0, vol_v * 0.0015),
+        )
+        large_stats = {}
+        try:
+            large_stats = await self._estimate_large_prints_from_yahoo(symbol)
+        except Exception:
+            large_stats = {}
+        adv_dollar_used = float(large_stats.get("adv_dollar", adv_dollar))
+        block_net = float(large_stats.get("large_trade_net", (close_v - open_v) * adv * 0.08))
+        large_notional = float(
+            large_stats.get("large_trade_notional", abs(chg_pct) / 100.0 * adv_dollar_used * 0.5)
+        )
+        whale_flow = WhaleFlow(
+            symbol=symbol,
+            timestamp=self._now(),
+            block_net_buy_value=block_net,
+            dark_pool_net=block_net * 0.15,
+            options_whale_notional=large_notional * 0.12,
+            adv=max(adv_dollar_used, 1.0)
+        )
+        cached_meta = self.market_cache.get(symbol) or {}
+        self.market_cache[symbol] = {
+            "price": close_v,
+            "ts": self._now().isoformat(),
+            "source": "yahoo_chart",
+            "change_percent": chg_pct,
+            "market_cap": cached_meta.get("market_cap"),
+            "avg_volume_3m": adv,
+            "avg_volume_3m_dollar": adv_dollar_used,
+            "short_name": str(cached_meta.get("short_name") or symbol),
+            "large_trade_threshold_usd": float(large_stats.get("threshold_usd", max(500000.0, adv_dollar_used * 0.002))),
+            "large_trade_count": int(large_stats.get("large_trade_count", 0)),
+            "large_trade_notional": float(large_stats.get("large_trade_notional", 0.0)),
+            "large_trade_net": float(large_stats.get("large_trade_net", 0.0)),
+            "tape_source": "yahoo_chart_1m"
+        }
+        return market_data, whale_flow
+
+    async def _build_from_yahoo_quote(self, symbol: str, row: Dict[str, Any]):
+        from models.base_models import MarketData, WhaleFlow
+        price = float(row.get("regularMarketPrice") or 0.0)
+        volume = float(row.get("regularMarketVolume") or 0.0)
+        bid = float(row.get("bid") or 0.0)
+        ask = float(row.get("ask") or 0.0)
+        if bid <= 0 or ask <= 0:
+            bid = price * 0.9995
+            ask = price * 1.0005
+        bid_sz = float(row.get("bidSize") or 20000.0)
+        ask_sz = float(row.get("askSize") or 20000.0)
+        vwap = float(row.get("regularMarketPrice") or price)
+        adv = float(row.get("averageDailyVolume3Month") or volume or 1_000_000.0)
+        adv_dollar = max(price * adv, 1_000_000.0)
+        chg_pct = float(row.get("regularMarketChangePercent") or 0.0)
+        cap = float(row.get("marketCap") or 0.0)
+        short_name = str(row.get("shortName") or row.get("longName") or symbol)
+        prev = self.market_cache.get(symbol, {}).get("price", price)
+        delta = price - prev
+
+        market_data = MarketData(
+            symbol=symbol,
+            timestamp=self._now(),
+            price=price,
+            volume=volume if volume > 0 else adv,
+            vwap=vwap,
+            bid_price=bid,
+            ask_price=ask,
+            bid_size=bid_sz if bid_sz > 0 else 20000.0,
+            ask_size=ask_sz if ask_sz > 0 else 20000.0
+        )
+        large_stats = {}
+        try:
+            large_stats = await self._estimate_large_prints_from_yahoo(symbol)
+        except Exception:
             large_stats = {}
+        adv_dollar_used = float(large_stats.get("adv_dollar", adv_dollar))
+        block_net = float(large_stats.get("large_trade_net", delta * adv * 0.08))
+        large_notional = float(
+            large_stats.get("large_trade_notional", abs(chg_pct) / 100.0 * adv_dollar_used * 0.5)
+        )
+        whale_flow = WhaleFlow(
+            symbol=symbol,
+            timestamp=self._now(),
+            block_net_buy_value=block_net,
+            dark_pool_net=block_net * 0.15,
+            options_whale_notional=large_notional * 0.12,
+            adv=max(adv_dollar_used, 1.0)
+        )
+        self.market_cache[symbol] = {
+            "price": price,
+            "ts": self._now().isoformat(),
+            "source": "yahoo",
+            "change_percent": chg_pct,
+            "market_cap": cap if cap > 0 else None,
+            "avg_volume_3m": adv if adv > 0 else None,
+            "avg_volume_3m_dollar": adv_dollar_used,
+            "short_name": short_name,
+            "large_trade_threshold_usd": float(large_stats.get("threshold_usd", max(500000.0, adv_dollar_used * 0.002))),
+            "large_trade_count": int(large_stats.get("large_trade_count", max(0, int(abs(delta * adv) / 500000.0)))),
+            "large_trade_notional": float(large_stats.get("large_trade_notional", abs(delta * adv))),
+            "large_trade_net": float(large_stats.get("large_trade_net", delta * adv * 0.35)),
+            "tape_source": "yahoo_chart_1m"
+        }
+        return market_data, whale_flow
+
+    async def _get_market_data(self, symbol: str):
+        """获取市场数据（按数据源健康度自适应排序，冷却中的源跳过；全部失败时仅用缓存真实数据）。"""
+        from models.base_models import MarketData, WhaleFlow
+        sources = {
+            "stooq": (self._fetch_stooq_quote_row, self._build_from_stooq),
+            "yahoo_chart": (self._fetch_yahoo_chart_series, self._build_from_yahoo_chart),
+            "yahoo_quote": (self._fetch_yahoo_quote_row, self._build_from_yahoo_quote),
+        }
+        errors: List[str] = []
+        for name in self.source_health.ordered():
+            fetch, build = sources[name]
+            timeout = self.source_health.timeout_for(name)
+            started = time.monotonic()
             try:
-                large_stats = await self._estimate_large_prints_from_yahoo(symbol)
-            except Exception:
-                large_stats = {}
-            adv_dollar_used = float(large_stats.get("adv_dollar", adv_dollar))
-            block_net = float(large_stats.get("large_trade_net", delta * adv * 0.08))
-            large_notional = float(
-                large_stats.get("large_trade_notional", abs(chg_pct) / 100.0 * adv_dollar_used * 0.5)
-            )
-            whale_flow = WhaleFlow(
-                symbol=symbol,
-                timestamp=datetime.now(),
-                block_net_buy_value=block_net,
-                dark_pool_net=block_net * 0.15,
-                options_whale_notional=large_notional * 0.12,
-                adv=max(adv_dollar_used, 1.0)
-            )
-            self.market_cache[symbol] = {
-                "price": price,
-                "ts": datetime.now().isoformat(),
-                "source": "yahoo",
-                "change_percent": chg_pct,
-                "market_cap": cap if cap > 0 else None,
-                "avg_volume_3m": adv if adv > 0 else None,
-                "avg_volume_3m_dollar": adv_dollar_used,
-                "short_name": short_name,
-                "large_trade_threshold_usd": float(large_stats.get("threshold_usd", max(500000.0, adv_dollar_used * 0.002))),
-                "large_trade_count": int(large_stats.get("large_trade_count", max(0, int(abs(delta * adv) / 500000.0)))),
-                "large_trade_notional": float(large_stats.get("large_trade_notional", abs(delta * adv))),
-                "large_trade_net": float(large_stats.get("large_trade_net", delta * adv * 0.35)),
-                "tape_source": "yahoo_chart_1m"
-            }
-            return market_data, whale_flow
-        except Exception as e:
-            # 严格降级：仅使用已缓存真实行情；不再生成随机“假数据”
-            cached = self.market_cache.get(symbol, {})
-            cached_price = cached.get("price")
-            if cached_price is None:
-                raise RuntimeError(f"Market data unavailable for {symbol}") from e
-            price = float(cached_price)
-            volume = float(cached.get("avg_volume_3m") or 1_000_000.0)
-            chg_pct = float(cached.get("change_percent") or 0.0)
-            market_data = MarketData(
-                symbol=symbol,
-                timestamp=datetime.now(),
-                price=price,
-                volume=volume,
-                vwap=price,
-                bid_price=price * 0.9995,
-                ask_price=price * 1.0005,
-                bid_size=12000.0,
-                ask_size=12000.0
-            )
-            whale_flow = WhaleFlow(
-                symbol=symbol,
-                timestamp=datetime.now(),
-                block_net_buy_value=0.0,
-                dark_pool_net=0.0,
-                options_whale_notional=0.0,
-                adv=max(volume, 1.0)
-            )
-            self.market_cache[symbol]["source"] = str(cached.get("source") or "cached_fallback")
-            self.market_cache[symbol]["change_percent"] = chg_pct
-            return market_data, whale_flow
+                # 只对主报价请求计时/限时；大单流、市值等补充请求不计入该源健康度
+                payload, from_cache = await asyncio.wait_for(fetch(symbol, timeout), timeout=timeout)
+                latency = time.monotonic() - started
+                if payload is None:
+                    # 该股票在此源无数据：换下一个源，但不算源故障（避免少数无数据股票让健康的源进入冷却）
+                    self.source_health.record_empty(name, None if from_cache else latency)
+                    errors.append(f"{name}: empty")
+                    continue
+                result = await build(symbol, payload)
+            except Exception as e:
+                self.source_health.record_failure(name, f"{type(e).__name__}: {e}")
+                errors.append(f"{name}: {type(e).__name__}")
+                continue
+            # 缓存命中不计入延迟统计，否则分位数趋近 0、自适应超时被压到下限
+            if from_cache:
+                self.source_health.record_cache_hit(name)
+            else:
+                self.source_health.record_success(name, latency)
+            return result
+
+        # 严格降级：仅使用已缓存真实行情；不再生成随机“假数据”
+        cached = self.market_cache.get(symbol, {})
+        cached_price = cached.get("price")
+        if cached_price is None:
+            raise RuntimeError(f"Market data unavailable for {symbol} ({'; '.join(errors)})")
+        price = float(cached_price)
+        volume = float(cached.get("avg_volume_3m") or 1_000_000.0)
+        chg_pct = float(cached.get("change_percent") or 0.0)
+        market_data = MarketData(
+            symbol=symbol,
+            timestamp=self._now(),
+            price=price,
+            volume=volume,
+            vwap=price,
+            bid_price=price * 0.9995,
+            ask_price=price * 1.0005,
+            bid_size=12000.0,
+            ask_size=12000.0
+        )
+        whale_flow = WhaleFlow(
+            symbol=symbol,
+            timestamp=self._now(),
+            block_net_buy_value=0.0,
+            dark_pool_net=0.0,
+            options_whale_notional=0.0,
+            adv=max(volume, 1.0)
+        )
+        self.market_cache[symbol]["source"] = str(cached.get("source") or "cached_fallback")
+        self.market_cache[symbol]["change_percent"] = chg_pct
+        return market_data, whale_flow
+
+    def get_source_health(self) -> Dict[str, Any]:
+        """行情数据源健康度（成功率/延迟/冷却），用于定位抓取耗时"""
+        return self.source_health.get_stats()
     
     async def _execute_trade(self, decision: TradingDecision, symbol: str):
         """执行交易"""
@@ -1362,7 +1627,7 @@ class TradingPlatformScheduler:
                 symbol=symbol,
                 pnl_ratio=pnl_ratio,
                 decision_direction=decision.direction,
-                as_of=datetime.now()
+                as_of=self._now()
             )
         
         self.logger.info(
@@ -1380,27 +1645,25 @@ class TradingPlatformScheduler:
 
     async def validate_symbol_exists(self, symbol: str) -> bool:
         """严格验证股票代码是否可被真实行情源识别（不使用随机/缓存降级）"""
-        import aiohttp
         import csv
         from io import StringIO
 
         s = self._normalize_symbol(symbol)
         y_symbol = s.replace(".", "-").upper()
         stooq_symbol = f"{s.replace('.', '-').lower()}.us"
-        timeout = aiohttp.ClientTimeout(total=8)
+        # 代码是否存在变化极慢：TTL 内复用缓存响应，热重启时不再逐个联网校验
+        ttl = config.symbol_validation_ttl
 
         # 1) Stooq
         try:
             stooq_url = f"https://stooq.com/q/l/?s={stooq_symbol}&f=sd2t2ohlcv&h&e=csv"
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(stooq_url, headers={"User-Agent": "Mozilla/5.0"}) as resp:
-                    if resp.status == 200:
-                        txt = await resp.text()
-                        rows = list(csv.reader(StringIO(txt)))
-                        if len(rows) >= 2 and len(rows[1]) >= 8:
-                            close_s = str(rows[1][6]).strip()
-                            if close_s not in ("N/D", "-", ""):
-                                return True
+            resp = await self.data_source.fetch(stooq_url, ttl_seconds=ttl, headers={"User-Agent": "Mozilla/5.0"}, timeout=8)
+            if resp.ok:
+                rows = list(csv.reader(StringIO(resp.text)))
+                if len(rows) >= 2 and len(rows[1]) >= 8:
+                    close_s = str(rows[1][6]).strip()
+                    if close_s not in ("N/D", "-", ""):
+                        return True
         except Exception:
             pass
 
@@ -1408,12 +1671,8 @@ class TradingPlatformScheduler:
         try:
             url = f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={y_symbol}"
             headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        data = None
-                    else:
-                        data = await resp.json()
+            resp = await self.data_source.fetch(url, ttl_seconds=ttl, headers=headers, timeout=8)
+            data = resp.json() if resp.ok else None
             if not data:
                 raise RuntimeError("quote_v7_unavailable")
             row = (((data or {}).get("quoteResponse") or {}).get("result") or [None])[0]
@@ -1428,11 +1687,10 @@ class TradingPlatformScheduler:
         try:
             chart_url = f"https://query1.finance.yahoo.com/v8/finance/chart/{y_symbol}?interval=1d&range=5d&includePrePost=false"
             headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(chart_url) as resp:
-                    if resp.status != 200:
-                        return False
-                    data = await resp.json()
+            resp = await self.data_source.fetch(chart_url, ttl_seconds=ttl, headers=headers, timeout=8)
+            if not resp.ok:
+                return False
+            data = resp.json()
             result = (((data or {}).get("chart") or {}).get("result") or [None])[0]
             if not result:
                 return False
@@ -1494,8 +1752,10 @@ class TradingPlatformScheduler:
         try:
             self.d5._pending_sample.pop(symbol, None)
             self.d5._last_price.pop(symbol, None)
-            self.d5._ret_windows.pop(symbol, None)
-            self.d5.training_samples = [x for x in self.d5.training_samples if str(x.get("symbol", "")).upper() != symbol]
+            self.d5._ret_stats.pop(symbol, None)
+            self.d5.training_samples.remove_symbol(symbol)
+            self.d5.feature_store.remove_symbol(symbol)
+            self.d5.risk_model.remove_symbol(symbol)
         except Exception:
             pass
 
@@ -1508,10 +1768,9 @@ class TradingPlatformScheduler:
         self.state.d7_history = [[s for s in run if str(s).upper() != symbol] for run in self.state.d7_history]
 
         # 清理 memory 中该股票的条目
-        if hasattr(self.memory_store, "_entries"):
-            to_del = [eid for eid, e in self.memory_store._entries.items() if str(getattr(e, "stock_symbol", "")).upper() == symbol]
-            for eid in to_del:
-                self.memory_store._entries.pop(eid, None)
+        if hasattr(self.memory_store, "entries_for_symbol"):
+            for e in self.memory_store.entries_for_symbol(symbol):
+                self.memory_store.delete(e.entry_id)
 
     def _cleanup_orphan_stock_state(self):
         """清理不在 active_stocks 内的遗留股票状态"""
@@ -1547,6 +1806,10 @@ class TradingPlatformScheduler:
         """获取后台任务状态"""
         return self.state.jobs
 
+    def get_data_source_stats(self) -> Dict[str, Any]:
+        """获取数据源模式与统计"""
+        return self.data_source.get_stats()
+
     def get_d7_recommendations(self) -> Dict[str, Any]:
         """获取D7推荐池（短/中/长）"""
         self._prune_d7_recommendations()
@@ -1590,33 +1853,207 @@ class TradingPlatformScheduler:
         """获取按股票收益指标（周/月/半年/年）。"""
         return self.trading_engine.get_stock_performance(symbols)
 
-    async def train_d5(self) -> Dict[str, Any]:
-        """触发 D5 在线训练/校准"""
+    async def train_d5(self, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """D5 在线训练/校准：持仓行情并发拉取，回归与参数更新在线程池执行，不阻塞事件循环"""
         history = self.trading_engine.get_trade_history()
         positions = self.trading_engine.get_positions()
         account = self.trading_engine.get_account_summary()
-        latest_quotes: Dict[str, float] = {}
-        for p in positions:
-            sym = str(p.get("symbol") or "").upper()
-            if not sym:
-                continue
-            try:
-                md, _ = await self._get_market_data(sym)
-                latest_quotes[sym] = md.price
-            except Exception:
-                continue
-        report = self.d5.train_from_runtime(
-            trade_history=history,
-            positions=positions,
-            latest_quotes=latest_quotes,
-            account_summary=account,
-            stock_cases=self.stock_cases
+        symbols = sorted({str(p.get("symbol") or "").upper() for p in positions} - {""})
+        if job_id:
+            self._update_job(job_id, progress=10, stage="fetching", message=f"Fetching quotes for {len(symbols)} positions")
+        fetched = await asyncio.gather(*[self._get_market_data(s) for s in symbols], return_exceptions=True)
+        latest_quotes = {s: r[0].price for s, r in zip(symbols, fetched) if not isinstance(r, Exception)}
+
+        # 在事件循环内拷贝训练输入，线程池只做计算；期间 D5 周期照常写入样本、读取旧参数
+        d5 = self.d5
+        snapshot = d5.snapshot_training_input()
+        samples_at = d5.training_samples.appended
+        if job_id:
+            self._update_job(job_id, progress=50, stage="training", message=f"Training on {len(snapshot['samples'][1])} samples")
+        loop = asyncio.get_running_loop()
+        update = await loop.run_in_executor(
+            None,
+            functools.partial(
+                d5.compute_training_update,
+                snapshot,
+                trade_history=history,
+                positions=positions,
+                latest_quotes=latest_quotes,
+                account_summary=account,
+            ),
         )
-        self._persist_runtime_state()
+        # 回到事件循环后一次性替换参数（及 RLS 重置），两次 await 之间不会有 D5 周期读到半新半旧的参数
+        report = d5.apply_training_update(update)
+        self._d5_samples_at_train = samples_at
         return report
 
+    def run_d5_training_manual(self) -> str:
+        """手动触发 D5 训练（异步任务）"""
+        running = self._find_running_job("train_d5")
+        if running:
+            return running
+        job_id = self._create_job("train_d5")
+        asyncio.create_task(self._run_d5_training_job(job_id))
+        return job_id
+
+    async def _run_d5_training_job(self, job_id: str):
+        try:
+            report = await self.train_d5(job_id)
+            message = report.get("summary", "D5 training completed")
+            if config.d5_checkpoint_on_train and report.get("training", {}).get("mode") != "skip":
+                try:
+                    meta = self.save_d5_checkpoint(reason="train", metrics=report.get("training"))
+                    message += f" (checkpoint v{meta['version']})"
+                except Exception as e:
+                    self.logger.warning(f"Failed to save D5 checkpoint: {e}")
+            self._finish_job(job_id, "completed", message)
+        except Exception as e:
+            self._finish_job(job_id, "failed", str(e))
+
+    def _maybe_retrain_d5(self):
+        """距上次训练新增样本达到 d5_auto_train_min_samples 时启动后台训练任务（0 表示只手动触发）"""
+        threshold = int(config.d5_auto_train_min_samples or 0)
+        if threshold <= 0:
+            return
+        now = self._now()
+        last = self._last_d5_auto_train
+        if last is not None and now - last < timedelta(minutes=config.d5_auto_train_interval):
+            return
+        self._last_d5_auto_train = now
+        appended = self.d5.training_samples.appended
+        if appended < self._d5_samples_at_train:
+            # 样本缓冲被清空后重新计数
+            self._d5_samples_at_train = appended
+        if appended - self._d5_samples_at_train >= threshold:
+            self.logger.info(f"D5 auto retrain: {appended - self._d5_samples_at_train} new samples")
+            self.run_d5_training_manual()
+
     def get_d5_training_report(self) -> Dict[str, Any]:
         return getattr(self.d5, "last_training_report", {}) or {}
+
+    def save_d5_checkpoint(self,
+                           reason: str = "manual",
+                           note: str = "",
+                           metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """保存 D5 模型检查点并设为生效版本"""
+        return self.d5_checkpoints.save(
+            self.d5.export_state(), created_at=self._now(), reason=reason, note=note, metrics=metrics
+        )
+
+    def list_d5_checkpoints(self) -> Dict[str, Any]:
+        return {"active": self.d5_checkpoints.active, "checkpoints": self.d5_checkpoints.list_versions()}
+
+    def activate_d5_checkpoint(self, version: int, restore_data: bool = False) -> Dict[str, Any]:
+        """
+        加载指定版本到运行中的 D5 并设为生效版本（无需重启）：只替换参数与 RLS，
+        保留当前的训练样本、风险协方差、上一价格与待标注样本；restore_data=True（启动加载）时一并恢复样本与协方差
+        """
+        state = self.d5_checkpoints.load(version)
+        self.d5.import_state(state, restore_data=restore_data)
+        self.d5_checkpoints.set_active(version)
+        self._d5_samples_at_train = self.d5.training_samples.appended
+        self.logger.info(f"Activated D5 checkpoint v{version}")
+        return self.d5_checkpoints.get(version)
+
+    def rollback_d5_checkpoint(self) -> Dict[str, Any]:
+        """回滚到生效版本之前的一个版本"""
+        previous = self.d5_checkpoints.previous()
+        if previous is None:
+            raise ValueError("No earlier D5 checkpoint to roll back to")
+        return self.activate_d5_checkpoint(previous)
+
+    def _load_active_d5_checkpoint(self):
+        version = self.d5_checkpoints.active
+        if version is None:
+            return
+        try:
+            started = time.perf_counter()
+            self.activate_d5_checkpoint(version, restore_data=True)
+            self.logger.info("Loaded D5 checkpoint v%s in %.1f ms", version, 1000 * (time.perf_counter() - started))
+        except Exception as e:
+            self.logger.warning(f"Failed to load D5 checkpoint v{version}: {e}")
+
+    def get_d5_features(self, symbol: str, since: Optional[datetime] = None, limit: int = 1000) -> Dict[str, Any]:
+        """D5 特征时间序列（列式数组切片，时间戳为 ISO 字符串）"""
+        symbol = self._normalize_symbol(symbol)
+        data = self.d5.feature_store.query(symbol, since=since, limit=limit)
+        ts = data.pop("ts")
+        has_more = data.pop("has_more")
+        return {
+            "symbol": symbol,
+            "count": int(len(ts)),
+            "has_more": has_more,
+            "timestamps": [datetime.fromtimestamp(float(t)).isoformat() for t in ts],
+            "features": {k: v.tolist() for k, v in data.items()},
+        }
+
+    def run_d5_param_search_manual(self, request: Optional[Dict[str, Any]] = None) -> str:
+        """手动触发 D5 参数搜索（异步任务，回测在进程池中执行）"""
+        running = self._find_running_job("d5_param_search")
+        if running:
+            return running
+        job_id = self._create_job("d5_param_search")
+        asyncio.create_task(self._run_d5_param_search_job(job_id, dict(request or {})))
+        return job_id
+
+    async def _run_d5_param_search_job(self, job_id: str, request: Dict[str, Any]):
+        try:
+            symbols = [self._normalize_symbol(s) for s in (request.get("symbols") or list(self.state.active_stocks))]
+            if not symbols:
+                raise ValueError("No symbols to backtest")
+            days = int(request.get("days") or config.d5_param_search_days)
+            self._update_job(job_id, progress=5, stage="fetching", message=f"Fetching daily bars for {len(symbols)} symbols")
+            collector = DataCollector()
+            rows = await collector.gather_bounded(
+                [collector.get_historical_ohlcv(s, days) for s in symbols], default=[]
+            )
+            bars = {s: r for s, r in zip(symbols, rows) if r}
+            if not bars:
+                raise RuntimeError("No historical bars available")
+            panel = OHLCVPanel.from_records(bars)
+
+            if request.get("grid"):
+                candidates = grid_candidates(request["grid"])
+            else:
+                candidates = random_candidates(
+                    request.get("bounds") or DEFAULT_BOUNDS,
+                    n=int(request.get("samples") or 32),
+                    seed=int(request.get("seed") or 0),
+                )
+            objective = str(request.get("objective") or "sharpe")
+            search = ParameterSearch(
+                panel,
+                candidates,
+                base_params=self.d5.get_params(),
+                objective=objective,
+                n_folds=int(request.get("folds") or 4),
+                max_workers=config.d5_param_search_workers or None,
+                patience=int(request.get("patience") or 3),
+                risk_model=config.d5_param_search_risk_model,
+                risk_refresh_bars=config.d5_param_search_risk_refresh,
+            )
+
+            def on_progress(done: int, total: int):
+                self._update_job(job_id, progress=10 + int(85 * done / max(total, 1)), stage="searching",
+                                 message=f"Evaluated {done}/{total} parameter sets")
+
+            self._update_job(job_id, progress=10, stage="searching",
+                             message=f"Backtesting {len(candidates)} parameter sets on {panel.n_bars} bars")
+            report = await search.run(on_progress)
+            report["symbols"] = list(bars)
+            report["bars"] = panel.n_bars
+            self.last_param_search = report
+            best = report.get("best") or {}
+            self._finish_job(
+                job_id, "completed",
+                f"Evaluated {report['evaluated']} sets; best in-sample {objective} {best.get('is_mean', 0.0):.3f}, "
+                f"walk-forward OOS {report['walk_forward']['oos_mean']:.3f}"
+            )
+        except Exception as e:
+            self._finish_job(job_id, "failed", str(e))
+
+    def get_d5_param_search_report(self) -> Dict[str, Any]:
+        return self.last_param_search
     
     # ============== 用户账户管理 ==============
     
@@ -1647,9 +2084,9 @@ class TradingPlatformScheduler:
         # 生成账户ID
         if not account_id:
             if account_type == "paper":
-                account_id = f"paper_{user_id}_{datetime.now().timestamp()}"
+                account_id = f"paper_{user_id}_{self._now().timestamp()}"
             else:
-                account_id = f"real_{user_id}_{datetime.now().timestamp()}"
+                account_id = f"real_{user_id}_{self._now().timestamp()}"
         
         # 创建账户记录
         user_account = UserAccount(
@@ -1668,7 +2105,8 @@ class TradingPlatformScheduler:
             # 创建模拟账户
             engine = PaperTradingEngine(
                 account_id=user_account.account_id,
-                initial_capital=100000.0
+                initial_capital=100000.0,
+                clock=self._now
             )
             self.user_trading_engines[user_id] = engine
             self.logger.info(f"Created paper trading account for user {user_id}")
@@ -1,10 +1,13 @@
 """
 数据收集模块 - 收集市场数据、新闻等
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Awaitable
 from datetime import datetime, timedelta
 from models.base_models import Evidence, MarketData, WhaleFlow
-import aiohttp
+from data.data_source import DataSource, get_data_source
+from data.news_dedup import cluster_evidence, content_hash
+from config.settings import config
+import asyncio
 import random
 import xml.etree.ElementTree as ET
 from email.utils import parsedate_to_datetime
@@ -47,6 +50,11 @@ class DataCollector:
         self.cache: Dict[str, Any] = {}
         self.cache_expiry: Dict[str, datetime] = {}
 
+    @property
+    def data_source(self) -> DataSource:
+        """共享数据源（实时/录制/回放），每次取用以便运行期切换"""
+        return get_data_source()
+
     async def collect_macro_news(self) -> List[Evidence]:
         """收集宏观新闻（真实 RSS）"""
         query_groups = [
@@ -56,8 +64,11 @@ class DataCollector:
         ]
         evidence: List[Evidence] = []
 
-        for q in query_groups:
-            rss_items = await self._fetch_google_news_rss(q, limit=4)
+        results = await self.gather_bounded(
+            [self._fetch_google_news_rss(q, limit=4) for q in query_groups],
+            default=[],
+        )
+        for q, rss_items in zip(query_groups, results):
             for item in rss_items:
                 evidence.append(Evidence(
                     content=item["title"],
@@ -72,11 +83,8 @@ class DataCollector:
                     }
                 ))
 
-        # 去重并限制条数
-        uniq = {}
-        for e in evidence:
-            uniq[e.source_id] = e
-        merged = sorted(uniq.values(), key=lambda x: x.timestamp, reverse=True)
+        # 跨查询合并转载/近重复标题，并限制条数
+        merged = sorted(cluster_evidence(evidence), key=lambda x: x.timestamp, reverse=True)
         return merged[:12]
 
     async def collect_industry_news(self, sector: str) -> List[Evidence]:
@@ -96,7 +104,7 @@ class DataCollector:
             )
             for item in rss_items
         ]
-        return evidence[:8]
+        return cluster_evidence(evidence)[:8]
 
     async def collect_stock_news(self, symbol: str) -> List[Evidence]:
         """收集股票新闻（真实 RSS）"""
@@ -117,7 +125,7 @@ class DataCollector:
             )
             for item in rss_items
         ]
-        return evidence[:8]
+        return cluster_evidence(evidence)[:8]
 
     async def collect_sector_snapshot(self, sector: str) -> Optional[Evidence]:
         """行业快照（基于代表ETF/指数的当日行情）"""
@@ -246,6 +254,35 @@ class DataCollector:
             return [random.uniform(100, 200)]
         return closes[-days:]
 
+    async def get_historical_ohlcv(self, symbol: str, days: int = 756) -> List[Dict[str, Any]]:
+        """获取历史日线 OHLCV（Stooq），按日期升序；取不到时返回空列表（回测不使用随机数据）"""
+        sym = f"{symbol.upper().replace('.', '-')}.US"
+        url = f"https://stooq.com/q/d/l/?s={sym.lower()}&i=d"
+        text = await self._fetch_text(url, ttl_seconds=3600)
+        if not text:
+            return []
+
+        rows: List[Dict[str, Any]] = []
+        for ln in text.splitlines()[1:]:
+            parts = [p.strip() for p in ln.split(",")]
+            if len(parts) < 5:
+                continue
+            try:
+                row = {
+                    "date": parts[0],
+                    "open": float(parts[1]),
+                    "high": float(parts[2]),
+                    "low": float(parts[3]),
+                    "close": float(parts[4]),
+                    "volume": float(parts[5]) if len(parts) > 5 and parts[5] else 0.0,
+                }
+                datetime.fromisoformat(row["date"])
+            except Exception:
+                continue
+            if row["close"] > 0:
+                rows.append(row)
+        return rows[-days:] if days > 0 else rows
+
     async def get_stooq_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
         """从 Stooq 获取单标的最新OHLCV"""
         sym = (symbol or "").strip().lower()
@@ -300,13 +337,37 @@ class DataCollector:
             "volume": volume_v,
         }
 
+    async def gather_bounded(self,
+                             coros: List[Awaitable[Any]],
+                             default: Any = None,
+                             concurrency: Optional[int] = None,
+                             timeout: Optional[float] = None) -> List[Any]:
+        """并发执行多个数据源请求：限制同时在途数量，单源超时或异常时返回 default，结果保持输入顺序"""
+        limit = max(1, int(concurrency or config.data_fetch_concurrency))
+        per_source = float(timeout if timeout is not None else config.data_source_timeout)
+        sem = asyncio.Semaphore(limit)
+
+        async def one(coro: Awaitable[Any]) -> Any:
+            async with sem:
+                try:
+                    return await asyncio.wait_for(coro, timeout=per_source)
+                except Exception:
+                    return default
+
+        return await asyncio.gather(*[one(c) for c in coros])
+
     async def _fetch_google_news_rss(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
         q = query.strip().replace(" ", "+")
         url = f"{self.GOOGLE_NEWS_RSS}?q={q}&hl=en-US&gl=US&ceid=US:en"
         xml_text = await self._fetch_text(url, ttl_seconds=180)
         if not xml_text:
             return []
+        # 大体积 RSS 的 XML 解析放到线程池，避免阻塞同时服务 API 的事件循环
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._parse_google_news_rss, xml_text, limit)
 
+    def _parse_google_news_rss(self, xml_text: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """解析 Google News RSS（纯 CPU，可在线程池中执行）"""
         items: List[Dict[str, Any]] = []
         try:
             root = ET.fromstring(xml_text)
@@ -327,7 +388,7 @@ class DataCollector:
                 except Exception:
                     pass
 
-                sid = f"google_news_{abs(hash((title, link, pub)))}"
+                sid = f"google_news_{content_hash(title, link, pub)}"
                 reliability = 0.78
                 if source.lower() in {"reuters", "bloomberg.com", "the new york times", "wsj", "cnbc"}:
                     reliability = 0.90
@@ -360,16 +421,13 @@ class DataCollector:
             "Accept": "text/xml,application/xml,text/plain,*/*"
         }
         try:
-            timeout = aiohttp.ClientTimeout(total=12)
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        return None
-                    text = await resp.text()
-                    self._save_to_cache(url, text, ttl_seconds=ttl_seconds)
-                    return text
+            resp = await self.data_source.fetch(url, ttl_seconds=ttl_seconds, headers=headers, timeout=12)
         except Exception:
             return None
+        if not resp.ok:
+            return None
+        self._save_to_cache(url, resp.text, ttl_seconds=ttl_seconds)
+        return resp.text
 
     def _clean_title(self, text: str) -> str:
         t = html.unescape(text or "")
@@ -389,11 +447,11 @@ class DataCollector:
     def _get_from_cache(self, key: str) -> Optional[Any]:
         """从缓存获取数据"""
         if key in self.cache:
-            if datetime.now() < self.cache_expiry.get(key, datetime.min):
+            if self.data_source.now() < self.cache_expiry.get(key, datetime.min):
                 return self.cache[key]
         return None
 
     def _save_to_cache(self, key: str, value: Any, ttl_seconds: int = 300):
         """保存到缓存"""
         self.cache[key] = value
-        self.cache_expiry[key] = datetime.now() + timedelta(seconds=ttl_seconds)
+        self.cache_expiry[key] = self.data_source.now() + timedelta(seconds=ttl_seconds)
@@ -0,0 +1,297 @@
+"""
+数据源抽象 - 实盘抓取 / 录制归档 / 离线回放，统一对外提供 fetch + 时钟
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from abc import ABC, abstractmethod
+from datetime import datetime
+from bisect import bisect_right
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from data.http_cache import CachedResponse, HttpCache, get_http_cache
+
+
+class ReplayFinished(Exception):
+    """回放的模拟时钟已越过归档中最后一条录制"""
+
+
+class ReplayedFetchError(RuntimeError):
+    """回放录制时失败的请求（与实盘相同的错误路径）"""
+
+
+class DataSource(ABC):
+    """数据源接口：所有外部 HTTP 数据（行情/RSS）与调度时钟都经由此处"""
+
+    mode: str = "live"
+
+    @abstractmethod
+    async def fetch(self,
+                    url: str,
+                    ttl_seconds: float = 60,
+                    headers: Optional[Dict[str, str]] = None,
+                    timeout: float = 12.0) -> CachedResponse:
+        """GET 请求，网络异常向上抛出"""
+        pass
+
+    def now(self) -> datetime:
+        """当前（可能是模拟的）时间"""
+        return datetime.now()
+
+    async def sleep(self, seconds: float):
+        """按数据源时钟休眠"""
+        await asyncio.sleep(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode}
+
+
+class LiveDataSource(DataSource):
+    """实时数据源：经磁盘 HTTP 缓存访问外部接口"""
+
+    mode = "live"
+
+    def __init__(self, http_cache: Optional[HttpCache] = None):
+        self.http_cache = http_cache or get_http_cache()
+
+    async def fetch(self,
+                    url: str,
+                    ttl_seconds: float = 60,
+                    headers: Optional[Dict[str, str]] = None,
+                    timeout: float = 12.0) -> CachedResponse:
+        return await self.http_cache.fetch(url, ttl_seconds=ttl_seconds, headers=headers, timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "http_cache": self.http_cache.get_stats()}
+
+
+class DataArchive:
+    """
+    录制归档目录：
+    - index.jsonl：每行 {url, ts, status, body, error}，按录制时间追加；error 非空表示该次请求抛出异常
+    - bodies/<sha1>.txt：响应正文（按内容去重）
+    """
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, "index.jsonl")
+        self.bodies_dir = os.path.join(archive_dir, "bodies")
+
+    def load(self) -> Dict[str, List[Tuple[float, int, Optional[str], Optional[str]]]]:
+        """读取索引：url -> [(ts, status, body_key, error)]，按时间升序"""
+        records: Dict[str, List[Tuple[float, int, Optional[str], Optional[str]]]] = {}
+        if not os.path.exists(self.index_path):
+            return records
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                    records.setdefault(str(row["url"]), []).append(
+                        (float(row["ts"]), int(row.get("status") or 0), row.get("body"), row.get("error"))
+                    )
+                except Exception:
+                    continue
+        for rows in records.values():
+            rows.sort(key=lambda r: r[0])
+        return records
+
+    def write_body(self, text: Optional[str]) -> Optional[str]:
+        if text is None:
+            return None
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        path = os.path.join(self.bodies_dir, f"{key}.txt")
+        if not os.path.exists(path):
+            os.makedirs(self.bodies_dir, exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        return key
+
+    def read_body(self, key: Optional[str]) -> Optional[str]:
+        if not key:
+            return None
+        try:
+            with open(os.path.join(self.bodies_dir, f"{key}.txt"), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def append(self, url: str, ts: float, status: int, body_key: Optional[str], error: Optional[str] = None):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        row = {"url": url, "ts": ts, "status": status, "body": body_key}
+        if error:
+            row["error"] = error
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+class RecordingDataSource(DataSource):
+    """
+    录制数据源：透传到内层数据源，同时把响应写入归档（结果不变时不重复记录）；
+    请求抛出的异常同样记录（status=0 + error），回放时按原样重现失败路径
+    """
+
+    mode = "record"
+
+    def __init__(self, archive_dir: str, inner: Optional[DataSource] = None):
+        self.inner = inner or LiveDataSource()
+        self.archive = DataArchive(archive_dir)
+        self._last: Dict[str, Tuple[int, Optional[str], Optional[str]]] = {
+            url: rows[-1][1:] for url, rows in self.archive.load().items()
+        }
+        self.recorded = 0
+
+    def _record(self, url: str, status: int, text: Optional[str], error: Optional[str] = None):
+        try:
+            body_key = self.archive.write_body(text)
+            if self._last.get(url) != (status, body_key, error):
+                self.archive.append(url, self.inner.now().timestamp(), status, body_key, error)
+                self._last[url] = (status, body_key, error)
+                self.recorded += 1
+        except OSError:
+            pass
+
+    async def fetch(self,
+                    url: str,
+                    ttl_seconds: float = 60,
+                    headers: Optional[Dict[str, str]] = None,
+                    timeout: float = 12.0) -> CachedResponse:
+        try:
+            resp = await self.inner.fetch(url, ttl_seconds=ttl_seconds, headers=headers, timeout=timeout)
+        except Exception as e:
+            self._record(url, 0, None, f"{type(e).__name__}: {e}"[:500])
+            raise
+        self._record(url, resp.status, resp.text)
+        return resp
+
+    def now(self) -> datetime:
+        return self.inner.now()
+
+    async def sleep(self, seconds: float):
+        await self.inner.sleep(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "archive_dir": self.archive.archive_dir,
+            "recorded": self.recorded,
+            "urls": len(self._last),
+        }
+
+
+class ReplayDataSource(DataSource):
+    """
+    回放数据源：按模拟时钟返回该时刻及之前最近一次录制的响应（录制的失败请求抛出 ReplayedFetchError；
+    该时刻之前没有录制时按缺失返回 404）
+    - speed <= 0：纯虚拟时钟，仅在 sleep() 时推进，不做真实等待（确定性、最快）
+    - speed > 0：墙钟加速 speed 倍，sleep(s) 实际等待 s/speed 秒
+    - 模拟时钟越过最后一条录制后 sleep() 抛出 ReplayFinished，调度循环据此停止
+    """
+
+    mode = "replay"
+
+    def __init__(self, archive_dir: str, speed: float = 0.0, start: Optional[datetime] = None):
+        self.archive = DataArchive(archive_dir)
+        self.speed = float(speed or 0.0)
+        self._records = self.archive.load()
+        self._times: Dict[str, List[float]] = {url: [r[0] for r in rows] for url, rows in self._records.items()}
+        self._bodies: Dict[str, Optional[str]] = {}
+        first_ts = min((rows[0][0] for rows in self._records.values()), default=time.time())
+        self._t0 = start.timestamp() if start else first_ts
+        self.end_ts = max((rows[-1][0] for rows in self._records.values()), default=self._t0)
+        self._virtual = 0.0
+        self._wall0 = time.monotonic()
+        self.stats = {"served": 0, "missing": 0, "errors": 0}
+
+    def clock(self) -> float:
+        """模拟时钟（epoch 秒）"""
+        t = self._t0 + self._virtual
+        if self.speed > 0:
+            t += (time.monotonic() - self._wall0) * self.speed
+        return t
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.clock())
+
+    @property
+    def finished(self) -> bool:
+        return self.clock() > self.end_ts
+
+    async def sleep(self, seconds: float):
+        seconds = max(0.0, float(seconds))
+        if self.speed > 0:
+            await asyncio.sleep(seconds / self.speed)
+        else:
+            self._virtual += seconds
+            await asyncio.sleep(0)
+        if self.finished:
+            raise ReplayFinished(f"Replay reached the end of the archive ({datetime.fromtimestamp(self.end_ts).isoformat()})")
+
+    async def fetch(self,
+                    url: str,
+                    ttl_seconds: float = 60,
+                    headers: Optional[Dict[str, str]] = None,
+                    timeout: float = 12.0) -> CachedResponse:
+        rows = self._records.get(url)
+        # 未录制的 URL，或模拟时钟早于该 URL 首条录制（不返回未来的响应）
+        idx = bisect_right(self._times[url], self.clock()) - 1 if rows else -1
+        if idx < 0:
+            self.stats["missing"] += 1
+            return CachedResponse(status=404, text=None, from_cache=True)
+        _, status, body_key, error = rows[idx]
+        if error:
+            self.stats["errors"] += 1
+            raise ReplayedFetchError(error)
+        if body_key not in self._bodies:
+            self._bodies[body_key] = self.archive.read_body(body_key)
+        self.stats["served"] += 1
+        return CachedResponse(status=status, text=self._bodies[body_key], from_cache=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "mode": self.mode,
+            "archive_dir": self.archive.archive_dir,
+            "urls": len(self._records),
+            "speed": self.speed,
+            "clock": self.now().isoformat(),
+            "end": datetime.fromtimestamp(self.end_ts).isoformat(),
+            "finished": self.finished,
+        }
+
+
+_shared_source: Optional[DataSource] = None
+
+
+def _resolve_dir(path: str) -> str:
+    if os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(os.path.dirname(__file__), "..", path))
+
+
+def get_data_source() -> DataSource:
+    """进程内共享数据源（按 config.data_source_mode 构建）"""
+    global _shared_source
+    if _shared_source is None:
+        from config.settings import config
+        mode = str(config.data_source_mode or "live").lower()
+        archive_dir = _resolve_dir(config.data_archive_dir)
+        if mode == "record":
+            _shared_source = RecordingDataSource(archive_dir)
+        elif mode == "replay":
+            _shared_source = ReplayDataSource(archive_dir, speed=config.replay_speed)
+        else:
+            _shared_source = LiveDataSource()
+    return _shared_source
+
+
+def set_data_source(source: Optional[DataSource]):
+    """替换共享数据源（回放测试/基准用）；传 None 则下次按配置重建"""
+    global _shared_source
+    _shared_source = source
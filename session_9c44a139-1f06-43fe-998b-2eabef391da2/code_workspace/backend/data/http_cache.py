@@ -0,0 +1,212 @@
+"""
+HTTP 持久化缓存 - RSS/行情响应落盘，重启后复用，并通过 ETag/Last-Modified 做条件请求
+"""
+from typing import Dict, Any, Optional
+from dataclasses import dataclass
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import time
+
+
+@dataclass
+class CachedResponse:
+    """缓存层返回的响应"""
+    status: int
+    text: Optional[str]
+    from_cache: bool = False  # 未发出网络请求（TTL 内命中）
+    revalidated: bool = False  # 条件请求得到 304，沿用缓存正文
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.text is not None
+
+    def json(self) -> Any:
+        return json.loads(self.text or "null")
+
+
+class HttpCache:
+    """磁盘 HTTP 缓存：每个 URL 一个 JSON 文件（正文 + ETag/Last-Modified + 抓取时间），目录总大小受限"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 64 * 1024 * 1024, memory_entries: int = 256):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, int(max_bytes))
+        self.memory_entries = max(0, int(memory_entries))
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # key -> (文件大小, mtime)，mtime 作为 LRU 依据
+        self._index: Dict[str, tuple] = {}
+        self._total_bytes = 0
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "network_errors": 0, "evictions": 0}
+        self._scan()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _scan(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            self._index[name[:-5]] = (st.st_size, st.st_mtime)
+            self._total_bytes += st.st_size
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        key = self._key(url)
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        if key not in self._index:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except Exception:
+            self._drop(key)
+            return None
+        if entry.get("url") != url:
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _write(self, url: str, entry: Dict[str, Any]):
+        key = self._key(url)
+        self._remember(key, entry)
+        path = self._path(key)
+        tmp = f"{path}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            st = os.stat(path)
+        except OSError:
+            return
+        old = self._index.get(key)
+        if old:
+            self._total_bytes -= old[0]
+        self._index[key] = (st.st_size, st.st_mtime)
+        self._total_bytes += st.st_size
+        self._enforce_size_limit()
+
+    def _drop(self, key: str):
+        old = self._index.pop(key, None)
+        if old:
+            self._total_bytes -= old[0]
+        self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _enforce_size_limit(self):
+        """超过目录上限时按最久未写入淘汰，降到上限的 90%"""
+        if self.max_bytes <= 0 or self._total_bytes <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, _ in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total_bytes <= target:
+                break
+            self._drop(key)
+            self.stats["evictions"] += 1
+
+    async def fetch(self,
+                    url: str,
+                    ttl_seconds: float = 60,
+                    headers: Optional[Dict[str, str]] = None,
+                    timeout: float = 12.0) -> CachedResponse:
+        """
+        带缓存的 GET：
+        - TTL 内直接返回缓存正文
+        - 过期则带 If-None-Match / If-Modified-Since 重新验证，304 续期
+        - 网络异常向上抛出，由调用方决定降级策略
+        """
+        entry = self._load(url)
+        now = time.time()
+        if entry and now - float(entry.get("fetched_at") or 0.0) < ttl_seconds:
+            self.stats["hits"] += 1
+            return CachedResponse(status=200, text=entry.get("body"), from_cache=True)
+
+        req_headers = dict(headers or {})
+        if entry:
+            if entry.get("etag"):
+                req_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                req_headers["If-Modified-Since"] = entry["last_modified"]
+
+        import aiohttp
+        try:
+            client_timeout = aiohttp.ClientTimeout(total=timeout)
+            async with aiohttp.ClientSession(timeout=client_timeout, headers=req_headers) as session:
+                async with session.get(url) as resp:
+                    if resp.status == 304 and entry:
+                        entry = dict(entry)
+                        entry["fetched_at"] = now
+                        self._write(url, entry)
+                        self.stats["revalidated"] += 1
+                        return CachedResponse(status=200, text=entry.get("body"), from_cache=True, revalidated=True)
+                    text = await resp.text()
+                    self.stats["misses"] += 1
+                    if resp.status != 200:
+                        return CachedResponse(status=resp.status, text=text)
+                    self._write(url, {
+                        "url": url,
+                        "body": text,
+                        "etag": resp.headers.get("ETag"),
+                        "last_modified": resp.headers.get("Last-Modified"),
+                        "fetched_at": now,
+                    })
+                    return CachedResponse(status=200, text=text)
+        except Exception:
+            self.stats["network_errors"] += 1
+            raise
+
+    def clear(self):
+        """清空磁盘与内存缓存"""
+        for key in list(self._index.keys()):
+            self._drop(key)
+        self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "entries": len(self._index),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "cache_dir": self.cache_dir,
+        }
+
+
+_shared_cache: Optional[HttpCache] = None
+
+
+def get_http_cache() -> HttpCache:
+    """进程内共享的 HTTP 缓存实例（按 config 构建）"""
+    global _shared_cache
+    if _shared_cache is None:
+        from config.settings import config
+        cache_dir = config.http_cache_dir
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", cache_dir))
+        _shared_cache = HttpCache(cache_dir, max_bytes=int(config.http_cache_max_mb) * 1024 * 1024)
+    return _shared_cache
@@ -0,0 +1,175 @@
+"""
+新闻去重 - 稳定内容哈希 + 标题 MinHash/LSH 近重复聚类（跨查询、跨部门共享）
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import random
+import re
+
+from models.base_models import Evidence
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def content_hash(*parts: Any, length: int = 16) -> str:
+    """跨进程稳定的内容哈希（替代随进程随机化的 hash()）"""
+    raw = "\x1f".join(str(p or "") for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:length]
+
+
+def normalize_title(title: str) -> str:
+    t = (title or "").lower()
+    t = re.sub(r"[^\w\s]", " ", t)
+    return re.sub(r"\s+", " ", t).strip()
+
+
+def title_shingles(title: str, k: int = 4) -> List[str]:
+    """字符 k-gram（对改写标点/个别词的转载标题更稳健，也适用于中文）"""
+    t = normalize_title(title)
+    if len(t) <= k:
+        return [t] if t else []
+    return list({t[i:i + k] for i in range(len(t) - k + 1)})
+
+
+def _stable_hash32(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+class MinHasher:
+    """MinHash 签名：固定种子的线性置换，结果跨进程可复现"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 7):
+        rng = random.Random(seed)
+        self.num_perm = int(num_perm)
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(self.num_perm)
+        ]
+
+    def signature(self, shingles: List[str]) -> Tuple[int, ...]:
+        if not shingles:
+            return tuple([_MAX_HASH] * self.num_perm)
+        hashes = [_stable_hash32(s) for s in shingles]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    @staticmethod
+    def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        if not sig_a or len(sig_a) != len(sig_b):
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """
+    标题近重复索引（LSH 分桶）：
+    - assign(title) 返回所属簇 ID；与已有簇估计 Jaccard >= threshold 时复用其 ID
+    - 簇 ID 为首个成员规范化标题的内容哈希，同一新闻在各部门/重启后保持一致
+    - 容量有限，按最久未命中淘汰
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.6, max_items: int = 5000):
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.bands = max(1, int(bands))
+        self.rows = max(1, num_perm // self.bands)
+        self.threshold = float(threshold)
+        self.max_items = max(1, int(max_items))
+        self._clusters: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+
+    def _band_keys(self, sig: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(b, sig[b * self.rows:(b + 1) * self.rows]) for b in range(self.bands)]
+
+    def assign(self, title: str) -> str:
+        sig = self.hasher.signature(title_shingles(title))
+        best_id, best_sim = None, 0.0
+        for key in self._band_keys(sig):
+            for cid in self._buckets.get(key, ()):
+                sim = MinHasher.similarity(sig, self._clusters[cid])
+                if sim > best_sim:
+                    best_id, best_sim = cid, sim
+        if best_id is not None and best_sim >= self.threshold:
+            self._clusters.move_to_end(best_id)
+            return best_id
+
+        cid = content_hash(normalize_title(title))
+        if cid in self._clusters:
+            self._clusters.move_to_end(cid)
+            return cid
+        self._clusters[cid] = sig
+        for key in self._band_keys(sig):
+            self._buckets.setdefault(key, set()).add(cid)
+        while len(self._clusters) > self.max_items:
+            self._evict(next(iter(self._clusters)))
+        return cid
+
+    def _evict(self, cid: str):
+        sig = self._clusters.pop(cid, None)
+        if sig is None:
+            return
+        for key in self._band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(cid)
+                if not bucket:
+                    self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._clusters)
+
+
+_shared_index: Optional[NearDuplicateIndex] = None
+
+
+def get_news_index() -> NearDuplicateIndex:
+    """进程内共享的近重复索引（D1/D2/D3/D7 与 Agent 联网检索共用）"""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = NearDuplicateIndex()
+    return _shared_index
+
+
+def cluster_evidence(evidence_list: List[Evidence],
+                     prefix: str = "news",
+                     index: Optional[NearDuplicateIndex] = None) -> List[Evidence]:
+    """
+    合并转载/同题新闻：每簇保留可靠性最高的一条作为代表，
+    source_id 改为稳定簇 ID，metadata["sources"] 列出全部来源
+    """
+    index = index or get_news_index()
+    groups: "OrderedDict[str, List[Evidence]]" = OrderedDict()
+    for ev in evidence_list:
+        groups.setdefault(index.assign(ev.content), []).append(ev)
+
+    merged: List[Evidence] = []
+    for cid, members in groups.items():
+        rep = max(members, key=lambda e: (e.reliability_score, e.timestamp))
+        sources: List[Dict[str, Any]] = []
+        seen = set()
+        for ev in sorted(members, key=lambda e: e.timestamp):
+            meta = ev.metadata or {}
+            key = (meta.get("source"), meta.get("link"))
+            if key in seen:
+                continue
+            seen.add(key)
+            sources.append({
+                "source": meta.get("source"),
+                "link": meta.get("link"),
+                "timestamp": ev.timestamp.isoformat(),
+            })
+        metadata = dict(rep.metadata or {})
+        metadata["sources"] = sources
+        metadata["duplicate_count"] = len(members)
+        merged.append(Evidence(
+            content=rep.content,
+            timestamp=max(e.timestamp for e in members),
+            source_id=f"{prefix}_{cid}",
+            reliability_score=rep.reliability_score,
+            summary=rep.summary,
+            metadata=metadata,
+        ))
+    return merged
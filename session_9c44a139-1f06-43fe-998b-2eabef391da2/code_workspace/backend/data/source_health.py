@@ -0,0 +1,149 @@
+"""
+数据源健康度跟踪 - 滚动成功率/延迟、自适应排序与超时、故障冷却
+"""
+from typing import Dict, Any, List, Optional, Callable
+from collections import deque
+import time
+
+
+class SourceStats:
+    """单个数据源的滚动统计"""
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.outcomes: deque = deque(maxlen=window)  # True/False
+        self.latencies: deque = deque(maxlen=window)  # 秒（仅成功请求）
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.cache_hits = 0
+        self.empty = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.last_error = ""
+
+    def success_rate(self) -> float:
+        if not self.outcomes:
+            return 1.0
+        return sum(1 for ok in self.outcomes if ok) / len(self.outcomes)
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        vals = sorted(self.latencies)
+        idx = min(len(vals) - 1, max(0, int(round(q * (len(vals) - 1)))))
+        return vals[idx]
+
+
+class SourceHealthTracker:
+    """
+    跟踪多个等价数据源的健康度：
+    - 排序：按预期耗时 = 中位延迟 + 失败率 × 当前超时，从小到大
+    - 冷却：连续失败达到阈值，或窗口成功率过低时跳过该源一段时间
+    - 超时：按成功请求的 P95 延迟 × 2 自适应，限定在 [min, max] 之间
+    - 缓存命中（未发出网络请求）与“该股票无数据”只计数，不影响成功率、连续失败与冷却
+    """
+
+    def __init__(self,
+                 names: List[str],
+                 window: int = 20,
+                 failure_threshold: int = 3,
+                 min_success_rate: float = 0.3,
+                 cooldown_seconds: float = 300.0,
+                 min_timeout: float = 2.0,
+                 max_timeout: float = 10.0,
+                 clock: Optional[Callable[[], float]] = None):
+        self.names = list(names)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.min_success_rate = float(min_success_rate)
+        self.cooldown_seconds = float(cooldown_seconds)
+        self.min_timeout = float(min_timeout)
+        self.max_timeout = max(float(max_timeout), self.min_timeout)
+        self.clock = clock or time.monotonic
+        self.sources: Dict[str, SourceStats] = {n: SourceStats(n, window) for n in self.names}
+
+    def is_cooling_down(self, name: str) -> bool:
+        return self.sources[name].cooldown_until > self.clock()
+
+    def timeout_for(self, name: str) -> float:
+        p95 = self.sources[name].latency_quantile(0.95)
+        if p95 is None:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, p95 * 2.0))
+
+    def expected_cost(self, name: str) -> float:
+        s = self.sources[name]
+        p50 = s.latency_quantile(0.5) or 0.0
+        return p50 + (1.0 - s.success_rate()) * self.timeout_for(name)
+
+    def ordered(self) -> List[str]:
+        """本次请求应尝试的数据源顺序；全部冷却时保留最早解除冷却的一个做探测"""
+        available = [n for n in self.names if not self.is_cooling_down(n)]
+        if not available:
+            available = [min(self.names, key=lambda n: self.sources[n].cooldown_until)]
+        for n in self.names:
+            if n not in available:
+                self.sources[n].skipped += 1
+        # sorted 稳定：无样本时保持声明的默认优先级
+        return sorted(available, key=self.expected_cost)
+
+    def record_success(self, name: str, latency: float):
+        s = self.sources[name]
+        s.attempts += 1
+        s.successes += 1
+        s.consecutive_failures = 0
+        s.cooldown_until = 0.0
+        s.outcomes.append(True)
+        s.latencies.append(max(0.0, float(latency)))
+
+    def record_cache_hit(self, name: str):
+        """由 HTTP 缓存直接应答：耗时不代表源的网络延迟，不计入延迟分位数"""
+        self.sources[name].cache_hits += 1
+
+    def record_empty(self, name: str, latency: Optional[float] = None):
+        """源正常应答但该股票无数据（如 Stooq 的 N/D）：按股票的结果，不计为源故障；latency 为网络往返耗时"""
+        s = self.sources[name]
+        s.empty += 1
+        if latency is not None:
+            s.latencies.append(max(0.0, float(latency)))
+
+    def record_failure(self, name: str, error: str = ""):
+        s = self.sources[name]
+        s.attempts += 1
+        s.failures += 1
+        s.consecutive_failures += 1
+        s.outcomes.append(False)
+        s.last_error = str(error)[:200]
+        enough = len(s.outcomes) >= self.failure_threshold
+        if s.consecutive_failures >= self.failure_threshold or (enough and s.success_rate() < self.min_success_rate):
+            s.cooldown_until = self.clock() + self.cooldown_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = self.clock()
+        out: Dict[str, Any] = {}
+        for n in self.names:
+            s = self.sources[n]
+            p50 = s.latency_quantile(0.5)
+            p95 = s.latency_quantile(0.95)
+            out[n] = {
+                "attempts": s.attempts,
+                "successes": s.successes,
+                "failures": s.failures,
+                "skipped": s.skipped,
+                "cache_hits": s.cache_hits,
+                "empty": s.empty,
+                "success_rate": round(s.success_rate(), 4),
+                "latency_p50_ms": round(p50 * 1000.0, 1) if p50 is not None else None,
+                "latency_p95_ms": round(p95 * 1000.0, 1) if p95 is not None else None,
+                "timeout_s": round(self.timeout_for(n), 2),
+                "consecutive_failures": s.consecutive_failures,
+                "cooldown_remaining_s": round(max(0.0, s.cooldown_until - now), 1),
+                "last_error": s.last_error,
+            }
+        return {"order": self.ordered_preview(), "sources": out}
+
+    def ordered_preview(self) -> List[str]:
+        """当前排序（不计入 skipped 统计）"""
+        available = [n for n in self.names if not self.is_cooling_down(n)]
+        return sorted(available, key=self.expected_cost)
@@ -2,7 +2,7 @@
 部门基类
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import asyncio
 import logging
@@ -24,6 +24,8 @@ class BaseDepartment(ABC):
         self.department_type = department_type
         self.memory_manager = memory_manager
         self.logger = logging.getLogger(__name__)
+        # prepare_batch() 预取的 {stock_symbol: (证据包, 记忆摘要)}，对应股票运行时取出使用
+        self._prepared: Dict[Optional[str], Tuple[List[Evidence], str]] = {}
         
         # 初始化agents
         self.analysts: List[AnalystAgent] = []
@@ -87,16 +89,21 @@ class BaseDepartment(ABC):
                                         additional_context: Optional[Dict[str, Any]] = None) -> DepartmentFinal:
         """执行三轮讨论机制"""
         
-        # 1. 收集证据
-        evidence_pack = await self.gather_evidence(stock_symbol)
-        
-        # 2. 获取记忆摘要
-        memory_query = self._build_memory_query(stock_symbol, evidence_pack, additional_context)
-        memory_summary = self.memory_manager.get_summary(
-            department=self.department_type,
-            stock_symbol=stock_symbol,
-            query_text=memory_query
-        )
+        prepared = self._prepared.pop(stock_symbol, None)
+        if prepared is not None and not additional_context:
+            # 1-2. 使用 prepare_batch() 预取的证据与记忆摘要（预取查询不含附加上下文）
+            evidence_pack, memory_summary = prepared
+        else:
+            # 1. 收集证据
+            evidence_pack = await self.gather_evidence(stock_symbol)
+            
+            # 2. 获取记忆摘要
+            memory_query = self._build_memory_query(stock_symbol, evidence_pack, additional_context)
+            memory_summary = self.memory_manager.get_summary(
+                department=self.department_type,
+                stock_symbol=stock_symbol,
+                query_text=memory_query
+            )
         
         # 3. Round 1: 独立分析
         analyst_outputs = await self._run_round1(
@@ -128,6 +135,25 @@ class BaseDepartment(ABC):
         
         return dept_final
     
+    async def prepare_batch(self, stock_symbols: List[str]) -> int:
+        """
+        同一部门多只股票运行前的批量准备：并发收集各股证据，记忆摘要一次批量检索
+        （语义向量对全部股票的查询一次矩阵乘积）。结果在各股 run_three_round_discussion 时取出；
+        证据收集失败的股票不预取，运行时按单股路径重试。返回预取成功的股票数
+        """
+        symbols = list(dict.fromkeys(stock_symbols))
+        self._prepared = {}
+        if not symbols:
+            return 0
+        packs = await asyncio.gather(*[self.gather_evidence(s) for s in symbols], return_exceptions=True)
+        evidence = {s: p for s, p in zip(symbols, packs) if not isinstance(p, Exception)}
+        if not evidence:
+            return 0
+        queries = {s: self._build_memory_query(s, pack, None) for s, pack in evidence.items()}
+        summaries = self.memory_manager.get_summary_batch(self.department_type, queries)
+        self._prepared = {s: (evidence[s], summaries[s]) for s in evidence}
+        return len(self._prepared)
+
     async def _run_round1(self, 
                          evidence_pack: List[Evidence],
                          memory_summary: str,
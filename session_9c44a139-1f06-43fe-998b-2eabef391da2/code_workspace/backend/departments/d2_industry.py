@@ -21,9 +21,12 @@ class D2IndustryDepartment(BaseDepartment):
     async def gather_evidence(self, stock_symbol: Optional[str] = None) -> List[Evidence]:
         """收集行业证据（行业新闻 + 行业行情快照）"""
         sector = self.collector.infer_sector(stock_symbol or "")
-        evidence_list = await self.collector.collect_industry_news(sector)
-
-        snap = await self.collector.collect_sector_snapshot(sector)
+        # 行业新闻与行业快照互不依赖，并发拉取
+        news, snap = await self.collector.gather_bounded([
+            self.collector.collect_industry_news(sector),
+            self.collector.collect_sector_snapshot(sector),
+        ])
+        evidence_list = list(news or [])
         if snap:
             evidence_list.insert(0, snap)
 
@@ -24,11 +24,15 @@ class D3StockDepartment(BaseDepartment):
         if not symbol:
             return []
 
-        evidence_list = await self.collector.collect_stock_news(symbol)
+        # 新闻与行情快照并发拉取；任一源失败/超时不影响另一源
+        news, md = await self.collector.gather_bounded([
+            self.collector.collect_stock_news(symbol),
+            self.collector.get_market_data(symbol),
+        ])
+        evidence_list = list(news or [])
 
         # 补充一条行情快照，增强可证据化
-        try:
-            md = await self.collector.get_market_data(symbol)
+        if md is not None:
             evidence_list.insert(0, Evidence(
                 content=f"{symbol} 最新价 {md.price:.2f}，成交量 {md.volume:.0f}，时间 {md.timestamp.isoformat()}",
                 timestamp=md.timestamp,
@@ -37,8 +41,6 @@ class D3StockDepartment(BaseDepartment):
                 summary=f"{symbol} 行情快照",
                 metadata={"symbol": symbol, "price": md.price, "volume": md.volume}
             ))
-        except Exception:
-            pass
 
         if evidence_list:
             return evidence_list[:10]
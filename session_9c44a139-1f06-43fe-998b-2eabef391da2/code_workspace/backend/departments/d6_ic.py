@@ -87,7 +87,9 @@ class D6ICDepartment:
         
         # 4. 构建交易决策
         direction = self._determine_direction(dept_final.score, risk_controls)
-        target_position = self._calculate_target_position(dept_final.score, quant_output.position, risk_controls)
+        # 优先使用风险模型按相关性预算后的仓位，缺失时沿用逐只独立仓位
+        quant_position = quant_output.position if quant_output.risk_position is None else quant_output.risk_position
+        target_position = self._calculate_target_position(dept_final.score, quant_position, risk_controls, direction)
         pool_action = self._resolve_pool_action(
             direction=direction,
             round3_action=str(getattr(dept_final.round3_output, "action_recommendation", "") or ""),
@@ -256,10 +258,14 @@ class D6ICDepartment:
     def _calculate_target_position(self,
                                    score: float,
                                    quant_position: float,
-                                   risk_controls: Dict[str, Any]) -> float:
-        """计算目标仓位"""
+                                   risk_controls: Dict[str, Any],
+                                   direction: Optional[str] = None) -> float:
+        """计算目标仓位；量化仓位方向与交易方向相反时不建仓"""
         if risk_controls['no_trade']:
             return 0.0
+
+        if (direction == "LONG" and quant_position < 0) or (direction == "SHORT" and quant_position > 0):
+            return 0.0
         
         if risk_controls['reduce_position']:
             quant_position *= 0.5  # 减半仓位
@@ -140,10 +140,15 @@ class D7StockSelectionDepartment:
         source = "memory"
         if not text or "No relevant memory" in text:
             source = "self_scan"
-            macro_news = await self.collector.collect_macro_news()
-            sector_heads = []
-            for sec in ["technology", "financial", "energy", "healthcare", "industrial"]:
-                sector_heads.extend(await self.collector.collect_industry_news(sec))
+            sectors = ["technology", "financial", "energy", "healthcare", "industrial"]
+            macro_news, sector_lists = await asyncio.gather(
+                self.collector.collect_macro_news(),
+                self.collector.gather_bounded(
+                    [self.collector.collect_industry_news(sec) for sec in sectors],
+                    default=[],
+                ),
+            )
+            sector_heads = [e for items in sector_lists for e in items]
             text = "\n".join([x.summary for x in (macro_news + sector_heads)[:24]])
 
         # 关键词 -> 行业偏置
@@ -3,8 +3,10 @@ from .memory_store import (
     MemoryStore, InMemoryStore, MemoryManager,
     MemoryEntry, MemoryScope, MemoryType
 )
+from .sqlite_store import SQLiteMemoryStore, create_memory_store
 
 __all__ = [
     'MemoryStore', 'InMemoryStore', 'MemoryManager',
-    'MemoryEntry', 'MemoryScope', 'MemoryType'
+    'MemoryEntry', 'MemoryScope', 'MemoryType',
+    'SQLiteMemoryStore', 'create_memory_store'
 ]
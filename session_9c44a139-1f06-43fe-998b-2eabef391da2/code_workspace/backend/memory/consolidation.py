@@ -0,0 +1,216 @@
+"""
+记忆合并 - 后台将同一 (部门, 股票) 桶内相似的短期记忆聚类，合并为一条带来源追溯的长期摘要记忆
+"""
+from typing import Dict, List, Optional, Tuple, Callable, Awaitable, Any
+from collections import Counter
+from datetime import datetime
+import asyncio
+import copy
+import inspect
+import math
+import re
+import uuid
+
+import numpy as np
+
+from memory.embedding_index import HashingEmbedder
+from memory.memory_store import MemoryEntry, MemoryManager, MemoryType
+from memory.text_index import tokenize_text
+
+DIGEST_KIND = "consolidated_digest"
+
+# 句子切分：中英文句末标点、分号与换行
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;])|\n+|(?<=\.)\s+")
+
+Summarizer = Callable[[List[MemoryEntry]], Awaitable[Optional[str]]]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(str(text or "")) if s and s.strip()]
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / float(len(a | b))
+
+
+class MemoryConsolidator:
+    """
+    短期记忆合并：
+    - 只处理创建超过 min_age_hours 的 STM 条目，按桶 (scope, 部门, 股票) 分组
+    - 桶内按时间顺序贪心聚类：与已有簇中心的余弦相似度 >= similarity_threshold 即并入（结果确定）
+    - 成员数 >= min_cluster_size 的簇生成一条 LTM 摘要（抽取式；可选注入 LLM 摘要函数，失败回退抽取式），
+      metadata 记录来源条目 ID 与时间区间，随后删除来源条目
+    - consolidate() 分三步：事件循环上取条目快照（snapshot_buckets）→ 线程池中聚类并生成抽取式摘要
+      （compute_clusters，不读写存储）→ 回到事件循环写入摘要、删除来源条目
+    """
+
+    def __init__(self,
+                 manager: MemoryManager,
+                 similarity_threshold: float = 0.35,
+                 min_cluster_size: int = 3,
+                 min_age_hours: float = 6.0,
+                 max_sentences: int = 4,
+                 max_chars: int = 600,
+                 embedder: Optional[HashingEmbedder] = None,
+                 summarizer: Optional[Summarizer] = None):
+        self.manager = manager
+        self.similarity_threshold = float(similarity_threshold)
+        self.min_cluster_size = max(2, int(min_cluster_size))
+        self.min_age_hours = float(min_age_hours)
+        self.max_sentences = max(1, int(max_sentences))
+        self.max_chars = max(80, int(max_chars))
+        index = getattr(manager.store, "embedding_index", None)
+        self.embedder = embedder or getattr(index, "embedder", None) or HashingEmbedder()
+        self.summarizer = summarizer
+
+    def snapshot_buckets(self, as_of_ts: float) -> Dict[Tuple, List[MemoryEntry]]:
+        """按桶分组的可合并 STM 条目快照（条目浅拷贝，组内按创建时间升序）；在事件循环上调用"""
+        cutoff = as_of_ts - self.min_age_hours * 3600
+        buckets: Dict[Tuple, List[MemoryEntry]] = {}
+        for e in self.manager.store.query(memory_type=MemoryType.STM, limit=1 << 30):
+            if e.created_ts > cutoff or not str(e.content or "").strip():
+                continue
+            buckets.setdefault((e.scope, e.department, e.stock_symbol), []).append(copy.copy(e))
+        out = {}
+        for key, arr in buckets.items():
+            if len(arr) >= self.min_cluster_size:
+                arr.sort(key=lambda x: (x.created_ts, x.entry_id))
+                out[key] = arr
+        return out
+
+    def cluster(self, entries: List[MemoryEntry]) -> List[List[MemoryEntry]]:
+        """按输入顺序贪心聚类，返回各簇成员（保持输入顺序）"""
+        if not entries:
+            return []
+        vecs = self.embedder.embed_many([e.content for e in entries])
+        sums: List[np.ndarray] = []
+        groups: List[List[MemoryEntry]] = []
+        for entry, vec in zip(entries, vecs):
+            best, best_sim = -1, self.similarity_threshold
+            for i, s in enumerate(sums):
+                norm = float(np.linalg.norm(s))
+                sim = float(s @ vec) / norm if norm > 1e-12 else 0.0
+                if sim >= best_sim:
+                    best, best_sim = i, sim
+            if best < 0:
+                sums.append(vec.astype(np.float32).copy())
+                groups.append([entry])
+            else:
+                sums[best] += vec
+                groups[best].append(entry)
+        return groups
+
+    @staticmethod
+    def _header(entries: List[MemoryEntry]) -> str:
+        first, last = entries[0], entries[-1]
+        label = f"{first.department or 'NA'}·{first.stock_symbol or '全局'}"
+        return (f"[{label}] 合并 {len(entries)} 条短期记忆"
+                f"（{first.created_at:%Y-%m-%d} ~ {last.created_at:%Y-%m-%d}）")
+
+    def extractive_summary(self, entries: List[MemoryEntry]) -> str:
+        """
+        抽取式摘要：句子得分 = 所含词在簇内的文档频率之和 / sqrt(词数)，
+        近似重复句（Jaccard >= 0.6）只保留一条，入选句按原时间顺序排列
+        """
+        sentences: List[Tuple[int, int, str, set]] = []
+        df: Counter = Counter()
+        for ei, e in enumerate(entries):
+            df.update(set(tokenize_text(e.content)))
+            for si, s in enumerate(split_sentences(e.content)):
+                terms = set(tokenize_text(s))
+                if terms:
+                    sentences.append((ei, si, s, terms))
+
+        def score(item) -> float:
+            terms = item[3]
+            return sum(df[t] for t in terms) / math.sqrt(len(terms))
+
+        ranked = sorted(sentences, key=lambda x: (-score(x), x[0], x[1]))
+        picked: List[Tuple[int, int, str, set]] = []
+        for item in ranked:
+            if len(picked) >= self.max_sentences:
+                break
+            if any(_jaccard(item[3], p[3]) >= 0.6 for p in picked):
+                continue
+            picked.append(item)
+        picked.sort(key=lambda x: (x[0], x[1]))
+
+        text = self._header(entries)
+        for _, _, s, _ in picked:
+            line = f"\n- {s}"
+            if len(text) + len(line) > self.max_chars:
+                break
+            text += line
+        return text
+
+    def compute_clusters(self, buckets: Dict[Tuple, List[MemoryEntry]]) -> Dict[str, Any]:
+        """
+        纯计算（可在线程池执行）：逐桶聚类，返回 {"buckets", "clusters", "groups": [(簇成员, 抽取式摘要)]}，
+        groups 只含成员数 >= min_cluster_size 的簇
+        """
+        plan: Dict[str, Any] = {"buckets": 0, "clusters": 0, "groups": []}
+        for members in buckets.values():
+            plan["buckets"] += 1
+            for group in self.cluster(members):
+                plan["clusters"] += 1
+                if len(group) >= self.min_cluster_size:
+                    plan["groups"].append((group, self.extractive_summary(group)))
+        return plan
+
+    async def _summarize(self, entries: List[MemoryEntry], extractive: str) -> Tuple[str, str]:
+        if self.summarizer is not None:
+            try:
+                result = self.summarizer(entries)
+                if inspect.isawaitable(result):
+                    result = await result
+                text = str(result or "").strip()
+                if text:
+                    return f"{self._header(entries)}\n{text[:self.max_chars]}", "llm"
+            except Exception:
+                pass
+        return extractive, "extractive"
+
+    def _digest_entry(self, members: List[MemoryEntry], content: str, summarizer: str, as_of: datetime) -> MemoryEntry:
+        first, last = members[0], members[-1]
+        return MemoryEntry(
+            entry_id=str(uuid.uuid4()),
+            memory_type=MemoryType.LTM,
+            scope=first.scope,
+            department=first.department,
+            stock_symbol=first.stock_symbol,
+            content=content,
+            metadata={
+                "memory_kind": DIGEST_KIND,
+                "source_entry_ids": [m.entry_id for m in members],
+                "source_count": len(members),
+                "period_start": first.created_at.isoformat(),
+                "period_end": last.created_at.isoformat(),
+                "summarizer": summarizer,
+                "consolidated_at": as_of.isoformat(),
+            },
+            created_at=last.created_ts,
+            expires_at=None,
+            importance=max(m.importance for m in members),
+            access_count=sum(m.access_count for m in members),
+        )
+
+    async def consolidate(self, as_of: Optional[datetime] = None) -> Dict[str, Any]:
+        """执行一轮合并，返回统计；聚类与抽取式摘要在线程池中计算，不阻塞事件循环"""
+        as_of = as_of or datetime.now()
+        store = self.manager.store
+        buckets = self.snapshot_buckets(as_of.timestamp())
+        plan = await asyncio.get_running_loop().run_in_executor(None, self.compute_clusters, buckets)
+        stats = {"buckets": plan["buckets"], "clusters": plan["clusters"], "digests": 0, "consolidated": 0, "skipped": 0}
+        for group, extractive in plan["groups"]:
+            content, how = await self._summarize(group, extractive)
+            digest = self._digest_entry(group, content, how, as_of)
+            # 快照后/摘要期间成员可能已被删除/淘汰：跳过该簇；否则写入摘要与删除成员一并完成（SQLite 为单事务）
+            if not store.store_replacing(digest, [m.entry_id for m in group]):
+                stats["skipped"] += 1
+                continue
+            self.manager._enforce_capacity(digest)
+            stats["digests"] += 1
+            stats["consolidated"] += len(group)
+        return stats
@@ -0,0 +1,145 @@
+"""
+记忆语义向量索引 - 本地哈希向量化 + 随机投影（NumPy），连续 float32 矩阵，在检索候选内计算相似度
+"""
+from typing import Dict, List, Optional, Iterable, Sequence
+from collections import Counter
+import hashlib
+import math
+
+import numpy as np
+
+from memory.text_index import tokenize_text
+
+
+def _feature(term: str, n_features: int):
+    """稳定的特征哈希：返回 (列号, 符号)"""
+    h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+    return h % n_features, (1.0 if (h >> 63) & 1 else -1.0)
+
+
+class HashingEmbedder:
+    """
+    无需模型文件的本地向量化：
+    - 词（含 CJK 二元组）及相邻词对哈希到 n_features 维带符号稀疏向量，词频取 1 + log(tf)
+    - 乘以固定种子的高斯随机投影矩阵降到 dim 维，再做 L2 归一化
+    相邻词对让“rate cut”与“cut rate”可区分，随机投影使相关词组在低维空间保持内积
+    """
+
+    def __init__(self, dim: int = 128, n_features: int = 1 << 14, seed: int = 17):
+        self.dim = int(dim)
+        self.n_features = int(n_features)
+        rng = np.random.default_rng(seed)
+        self._projection = (rng.standard_normal((self.n_features, self.dim)) / math.sqrt(self.dim)).astype(np.float32)
+        self._feature_cache: Dict[str, tuple] = {}
+
+    def _features(self, text: str) -> Counter:
+        tokens = tokenize_text(text)
+        feats = Counter(tokens)
+        feats.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        return feats
+
+    def embed(self, text: str) -> np.ndarray:
+        feats = self._features(text)
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if not feats:
+            return vec
+        cols = np.empty(len(feats), dtype=np.int64)
+        weights = np.empty(len(feats), dtype=np.float32)
+        for i, (term, tf) in enumerate(feats.items()):
+            hit = self._feature_cache.get(term)
+            if hit is None:
+                hit = _feature(term, self.n_features)
+                if len(self._feature_cache) < 200_000:
+                    self._feature_cache[term] = hit
+            cols[i] = hit[0]
+            weights[i] = hit[1] * (1.0 + math.log(tf))
+        vec = weights @ self._projection[cols]
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 1e-12 else vec
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i] = self.embed(t)
+        return out
+
+
+class EmbeddingIndex:
+    """
+    条目向量索引：
+    - 向量按行存放在连续 float32 矩阵中（容量倍增），删除时用末行填补空位
+    - similarities() 只在给定候选（部门/股票记忆桶）内一次矩阵-向量乘积，供检索排序使用；
+      记忆总量有上限（max_total_entries），候选内暴力计算即可，不维护近邻分区
+    - similarities_batch() 同一部门多只股票的查询对候选并集一次矩阵乘积
+    """
+
+    def __init__(self, embedder: Optional[HashingEmbedder] = None):
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = self.embedder.dim
+        self._matrix = np.zeros((64, self.dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._row
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """当前全部向量（视图，行序与 ids 一致）"""
+        return self._matrix[:len(self._ids)]
+
+    @property
+    def ids(self) -> List[str]:
+        return self._ids
+
+    def add(self, entry_id: str, text: str):
+        self.add_vector(entry_id, self.embedder.embed(text))
+
+    def add_vector(self, entry_id: str, vec: np.ndarray):
+        row = self._row.get(entry_id)
+        if row is None:
+            row = len(self._ids)
+            if row >= self._matrix.shape[0]:
+                grown = np.zeros((self._matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self._ids.append(entry_id)
+            self._row[entry_id] = row
+        self._matrix[row] = vec
+
+    def remove(self, entry_id: str):
+        row = self._row.pop(entry_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        if row != last:
+            moved = self._ids[last]
+            self._ids[row] = moved
+            self._row[moved] = row
+            self._matrix[row] = self._matrix[last]
+        self._ids.pop()
+
+    def clear(self):
+        self._ids.clear()
+        self._row.clear()
+
+    def similarities(self, query_text: str, candidates: Iterable[str]) -> Dict[str, float]:
+        """候选条目与查询的余弦相似度（向量已归一化，即内积）"""
+        rows = [(eid, self._row[eid]) for eid in candidates if eid in self._row]
+        if not rows:
+            return {}
+        q = self.embedder.embed(query_text)
+        sims = self._matrix[[r for _, r in rows]] @ q
+        return {eid: float(s) for (eid, _), s in zip(rows, sims)}
+
+    def similarities_batch(self, query_texts: Sequence[str], candidates: Iterable[str]) -> Dict[str, np.ndarray]:
+        """多条查询对同一候选集：一次矩阵乘积，返回 {entry_id: 各查询相似度}"""
+        rows = [(eid, self._row[eid]) for eid in candidates if eid in self._row]
+        if not rows or not query_texts:
+            return {}
+        q = self.embedder.embed_many(query_texts)
+        sims = self._matrix[[r for _, r in rows]] @ q.T
+        return {eid: sims[i] for i, (eid, _) in enumerate(rows)}
@@ -2,15 +2,21 @@
 记忆系统 - 三层记忆架构
 """
 from dataclasses import dataclass, field
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Set
 from datetime import datetime, timedelta
 from enum import Enum
 import json
 import re
+import sys
 import math
-from collections import Counter
+import heapq
+import hashlib
+import time
+from collections import Counter, OrderedDict
 from abc import ABC, abstractmethod
 
+from memory.text_index import MemoryTextIndex, tokenize_text
+
 
 class MemoryScope(Enum):
     """记忆范围"""
@@ -26,25 +32,158 @@ class MemoryType(Enum):
     EPHEMERAL = "ephemeral"  # 会话记忆（minutes/hours）
 
 
-@dataclass
+class FeedbackStats:
+    """交易反馈累计（定长字段、原地更新，替代 metadata 中不断复制的嵌套 dict）"""
+
+    __slots__ = ("updates", "importance_delta", "last_update_ts", "last_pnl_ratio", "last_symbol", "last_direction")
+
+    def __init__(self,
+                 updates: int = 0,
+                 importance_delta: float = 0.0,
+                 last_update_ts: float = 0.0,
+                 last_pnl_ratio: float = 0.0,
+                 last_symbol: str = "",
+                 last_direction: str = ""):
+        self.updates = int(updates)
+        self.importance_delta = float(importance_delta)
+        self.last_update_ts = float(last_update_ts)
+        self.last_pnl_ratio = float(last_pnl_ratio)
+        self.last_symbol = last_symbol
+        self.last_direction = last_direction
+
+    def record(self, ts: float, symbol: str, direction: str, pnl_ratio: float, delta: float):
+        self.updates += 1
+        self.importance_delta += delta
+        self.last_update_ts = ts
+        self.last_pnl_ratio = pnl_ratio
+        self.last_symbol = sys.intern(symbol)
+        self.last_direction = sys.intern(direction)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "updates": self.updates,
+            "importance_delta": self.importance_delta,
+            "last_update_at": datetime.fromtimestamp(self.last_update_ts).isoformat() if self.last_update_ts else None,
+            "last_symbol": self.last_symbol,
+            "last_direction": self.last_direction,
+            "last_pnl_ratio": self.last_pnl_ratio,
+        }
+
+    @classmethod
+    def from_dict(cls, raw: Optional[Dict[str, Any]]) -> Optional["FeedbackStats"]:
+        """兼容旧版 metadata["feedback"] 格式"""
+        if not isinstance(raw, dict):
+            return None
+        ts = 0.0
+        try:
+            if raw.get("last_update_at"):
+                ts = datetime.fromisoformat(str(raw["last_update_at"])).timestamp()
+        except ValueError:
+            ts = 0.0
+        return cls(
+            updates=int(raw.get("updates", 0) or 0),
+            importance_delta=float(raw.get("importance_delta", 0.0) or 0.0),
+            last_update_ts=ts,
+            last_pnl_ratio=float(raw.get("last_pnl_ratio", 0.0) or 0.0),
+            last_symbol=str(raw.get("last_symbol") or ""),
+            last_direction=str(raw.get("last_direction") or ""),
+        )
+
+
+def _to_ts(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(init=False, slots=True)
 class MemoryEntry:
-    """记忆条目"""
+    """
+    记忆条目（__slots__ 紧凑表示）：
+    - 部门/股票代码驻留（intern），同一代码的所有条目共享一个字符串对象
+    - 时间以 epoch 秒 float 保存，created_at/expires_at 属性按需转换为 datetime
+    - 元数据为冷数据：为空时不分配 dict，首次访问 metadata 时才创建
+    """
     entry_id: str
     memory_type: MemoryType
     scope: MemoryScope
     department: Optional[str]  # 部门标识
     stock_symbol: Optional[str]  # 股票代码
     content: str  # 记忆内容
-    metadata: Dict[str, Any]  # 元数据
-    created_at: datetime
-    expires_at: Optional[datetime] = None
-    importance: float = 0.5  # 重要性 [0, 1]
-    access_count: int = 0  # 访问次数
+    created_ts: float
+    expires_ts: Optional[float]
+    importance: float  # 重要性 [0, 1]
+    access_count: int  # 访问次数
+    feedback: Optional[FeedbackStats]  # 交易反馈累计
+    _metadata: Optional[Dict[str, Any]]
+
+    def __init__(self,
+                 entry_id: str,
+                 memory_type: MemoryType,
+                 scope: MemoryScope,
+                 department: Optional[str],
+                 stock_symbol: Optional[str],
+                 content: str,
+                 metadata: Optional[Dict[str, Any]],
+                 created_at: Any,
+                 expires_at: Any = None,
+                 importance: float = 0.5,
+                 access_count: int = 0,
+                 feedback: Optional[FeedbackStats] = None):
+        self.entry_id = entry_id
+        self.memory_type = memory_type
+        self.scope = scope
+        self.department = _intern(department)
+        self.stock_symbol = _intern(stock_symbol)
+        self.content = content
+        self._metadata = metadata or None
+        self.created_ts = _to_ts(created_at)
+        self.expires_ts = _to_ts(expires_at)
+        self.importance = importance
+        self.access_count = access_count
+        self.feedback = feedback
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: Optional[Dict[str, Any]]):
+        self._metadata = value or None
+
+    @property
+    def has_metadata(self) -> bool:
+        """是否有非空元数据（不触发 dict 分配）"""
+        return bool(self._metadata)
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_ts)
+
+    @created_at.setter
+    def created_at(self, value: Any):
+        self.created_ts = _to_ts(value)
+
+    @property
+    def expires_at(self) -> Optional[datetime]:
+        return datetime.fromtimestamp(self.expires_ts) if self.expires_ts is not None else None
+
+    @expires_at.setter
+    def expires_at(self, value: Any):
+        self.expires_ts = _to_ts(value)
     
     def is_expired(self) -> bool:
-        if self.expires_at is None:
+        if self.expires_ts is None:
             return False
-        return datetime.now() > self.expires_at
+        return time.time() > self.expires_ts
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -54,11 +193,12 @@ class MemoryEntry:
             "department": self.department,
             "stock_symbol": self.stock_symbol,
             "content": self.content,
-            "metadata": self.metadata,
+            "metadata": self.metadata if self.has_metadata else {},
             "created_at": self.created_at.isoformat(),
             "expires_at": self.expires_at.isoformat() if self.expires_at else None,
             "importance": self.importance,
-            "access_count": self.access_count
+            "access_count": self.access_count,
+            "feedback": self.feedback.to_dict() if self.feedback else None
         }
 
 
@@ -96,15 +236,168 @@ class MemoryStore(ABC):
         pass
 
 
+class BucketGenerations:
+    """
+    桶级写入代数：条目写入/删除/修改时把所在桶与 (scope, department) 的代数推进到全局递增时钟，
+    摘要缓存据此判断是否失效；clear() 后未写入的桶统一返回新的基准代数
+    """
+
+    def __init__(self):
+        self._clock = 0
+        self._base = 0
+        self._bucket: Dict[Tuple, int] = {}
+        self._scope_dept: Dict[Tuple, int] = {}
+
+    def bump(self, key: Tuple):
+        self._clock += 1
+        self._bucket[key] = self._clock
+        self._scope_dept[(key[0], key[1])] = self._clock
+
+    def reset(self):
+        self._clock += 1
+        self._base = self._clock
+        self._bucket.clear()
+        self._scope_dept.clear()
+
+    def get(self, scope: MemoryScope, department: Optional[str], stock_symbol: Optional[str] = None) -> int:
+        """指定股票时返回单个桶的代数，否则返回该范围/部门下全部桶的代数"""
+        if stock_symbol:
+            return self._bucket.get((scope, department, stock_symbol), self._base)
+        return self._scope_dept.get((scope, department), self._base)
+
+
 class InMemoryStore(MemoryStore):
-    """内存记忆存储（用于开发和测试）"""
+    """
+    内存记忆存储（用于开发和测试）
+    - 二级索引：(scope, department, stock_symbol) 桶、(scope, department)、memory_type
+    - 过期堆：按 expires_at 惰性弹出，清理成本只与过期条目数相关
+    - 淘汰堆：每个桶一个、全局一个，按 (importance, access_count, created_at) 取最低优先级
+    - 写入/删除必须经由 store()/delete()/clear()，重要性/访问次数变化后调用 update()，以保持索引一致
+    """
     
     def __init__(self):
         self._entries: Dict[str, MemoryEntry] = {}
+        self._by_bucket: Dict[Tuple[MemoryScope, Optional[str], Optional[str]], Dict[str, MemoryEntry]] = {}
+        self._buckets_by_scope_dept: Dict[Tuple[MemoryScope, Optional[str]], Set[Tuple]] = {}
+        self._by_type: Dict[MemoryType, Dict[str, MemoryEntry]] = {}
+        # 按股票代码（大写）索引，交易反馈只访问相关条目
+        self._by_symbol: Dict[str, Dict[str, MemoryEntry]] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # 淘汰堆惰性失效：键变化时重新入堆，弹出时校验当前键
+        self._bucket_heaps: Dict[Tuple, List[Tuple[float, int, float, str]]] = {}
+        self._global_heap: List[Tuple[float, int, float, str]] = []
+        # 写入时分词/向量化，检索时只做稀疏点积
+        self.text_index = MemoryTextIndex()
+        # 可选语义向量索引（attach_embedding_index 挂载后随写入/删除同步）
+        self.embedding_index = None
+        self.generations = BucketGenerations()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def bucket_key(entry: MemoryEntry) -> Tuple[MemoryScope, Optional[str], Optional[str]]:
+        return (entry.scope, entry.department, entry.stock_symbol)
+
+    def bucket_size(self, key: Tuple) -> int:
+        return len(self._by_bucket.get(key, ()))
+
+    def generation(self, scope: MemoryScope, department: Optional[str], stock_symbol: Optional[str] = None) -> int:
+        return self.generations.get(scope, department, stock_symbol)
+
+    def attach_embedding_index(self, index):
+        """挂载语义向量索引并为现有条目建向量"""
+        index.clear()
+        for entry in self._entries.values():
+            index.add(entry.entry_id, entry.content)
+        self.embedding_index = index
+
+    @staticmethod
+    def symbol_key(symbol: Optional[str]) -> str:
+        return str(symbol or "").upper().strip()
+
+    def entries_for_symbol(self, symbol: str) -> List[MemoryEntry]:
+        """该股票的全部条目（不区分范围/部门，含未清理的过期条目）"""
+        return list(self._by_symbol.get(self.symbol_key(symbol), {}).values())
+
+    def entries_for_scope_department(self, scope: MemoryScope, department: Optional[str]) -> List[MemoryEntry]:
+        keys = self._buckets_by_scope_dept.get((scope, department), ())
+        return [e for k in keys for e in self._by_bucket[k].values()]
+
+    @staticmethod
+    def _priority(entry: MemoryEntry) -> Tuple[float, int, float]:
+        return (float(entry.importance), int(entry.access_count), entry.created_ts)
+
+    def _push_priority(self, entry: MemoryEntry):
+        item = (*self._priority(entry), entry.entry_id)
+        key = self.bucket_key(entry)
+        heap = self._bucket_heaps.setdefault(key, [])
+        heapq.heappush(heap, item)
+        if len(heap) > 2 * self.bucket_size(key) + 64:
+            self._bucket_heaps[key] = self._rebuild_heap(self._by_bucket.get(key, {}).values())
+        heapq.heappush(self._global_heap, item)
+        if len(self._global_heap) > 2 * len(self._entries) + 64:
+            self._global_heap = self._rebuild_heap(self._entries.values())
+
+    def _rebuild_heap(self, entries) -> List[Tuple[float, int, float, str]]:
+        heap = [(*self._priority(e), e.entry_id) for e in entries]
+        heapq.heapify(heap)
+        return heap
+
+    def _index(self, entry: MemoryEntry):
+        key = self.bucket_key(entry)
+        self.generations.bump(key)
+        bucket = self._by_bucket.get(key)
+        if bucket is None:
+            bucket = self._by_bucket[key] = {}
+            self._buckets_by_scope_dept.setdefault((entry.scope, entry.department), set()).add(key)
+        bucket[entry.entry_id] = entry
+        self._by_type.setdefault(entry.memory_type, {})[entry.entry_id] = entry
+        sym = self.symbol_key(entry.stock_symbol)
+        if sym:
+            self._by_symbol.setdefault(sym, {})[entry.entry_id] = entry
+        if entry.expires_ts is not None:
+            heapq.heappush(self._expiry_heap, (entry.expires_ts, entry.entry_id))
+        self.text_index.add(entry.entry_id, entry.content)
+        if self.embedding_index is not None:
+            self.embedding_index.add(entry.entry_id, entry.content)
+        self._push_priority(entry)
+
+    def _unindex(self, entry: MemoryEntry):
+        key = self.bucket_key(entry)
+        self.generations.bump(key)
+        bucket = self._by_bucket.get(key)
+        if bucket is not None:
+            bucket.pop(entry.entry_id, None)
+            if not bucket:
+                del self._by_bucket[key]
+                self._bucket_heaps.pop(key, None)
+                keys = self._buckets_by_scope_dept.get((entry.scope, entry.department))
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._buckets_by_scope_dept[(entry.scope, entry.department)]
+        typed = self._by_type.get(entry.memory_type)
+        if typed is not None:
+            typed.pop(entry.entry_id, None)
+        sym = self.symbol_key(entry.stock_symbol)
+        by_sym = self._by_symbol.get(sym) if sym else None
+        if by_sym is not None:
+            by_sym.pop(entry.entry_id, None)
+            if not by_sym:
+                del self._by_symbol[sym]
+        self.text_index.remove(entry.entry_id)
+        if self.embedding_index is not None:
+            self.embedding_index.remove(entry.entry_id)
+        # 过期堆/淘汰堆中的旧项惰性失效，弹出时校验
     
     def store(self, entry: MemoryEntry) -> bool:
         try:
+            old = self._entries.get(entry.entry_id)
+            if old is not None:
+                self._unindex(old)
             self._entries[entry.entry_id] = entry
+            self._index(entry)
             return True
         except Exception as e:
             print(f"Error storing memory: {e}")
@@ -114,7 +407,54 @@ class InMemoryStore(MemoryStore):
         entry = self._entries.get(entry_id)
         if entry:
             entry.access_count += 1
+            self._push_priority(entry)
+            self.generations.bump(self.bucket_key(entry))
         return entry
+
+    def update(self, entry: MemoryEntry) -> bool:
+        """条目的重要性/访问次数/元数据已原地修改：刷新淘汰堆（O(log n)）"""
+        if self._entries.get(entry.entry_id) is not entry:
+            return self.store(entry)
+        self._push_priority(entry)
+        self.generations.bump(self.bucket_key(entry))
+        return True
+
+    def evict_lowest(self, bucket_key: Optional[Tuple] = None) -> Optional[str]:
+        """删除桶内（或全局）优先级最低的条目，返回其 ID"""
+        if bucket_key is None:
+            heap = self._global_heap
+        else:
+            heap = self._bucket_heaps.get(bucket_key)
+        while heap:
+            imp, acc, ts, eid = heap[0]
+            entry = self._entries.get(eid)
+            stale = (
+                entry is None
+                or self._priority(entry) != (imp, acc, ts)
+                or (bucket_key is not None and self.bucket_key(entry) != bucket_key)
+            )
+            heapq.heappop(heap)
+            if stale:
+                continue
+            self.delete(eid)
+            return eid
+        return None
+
+    def _candidates(self,
+                    memory_type: Optional[MemoryType],
+                    scope: Optional[MemoryScope],
+                    department: Optional[str],
+                    stock_symbol: Optional[str]):
+        """选最窄的索引作为候选集，其余条件再逐条过滤"""
+        if scope and department and stock_symbol:
+            return self._by_bucket.get((scope, department, stock_symbol), {}).values()
+        if scope and department:
+            return self.entries_for_scope_department(scope, department)
+        if stock_symbol:
+            return self._by_symbol.get(self.symbol_key(stock_symbol), {}).values()
+        if memory_type:
+            return self._by_type.get(memory_type, {}).values()
+        return self._entries.values()
     
     def query(self, 
               memory_type: Optional[MemoryType] = None,
@@ -122,9 +462,10 @@ class InMemoryStore(MemoryStore):
               department: Optional[str] = None,
               stock_symbol: Optional[str] = None,
               limit: int = 100) -> List[MemoryEntry]:
+        now_ts = time.time()
         results = []
-        for entry in self._entries.values():
-            if entry.is_expired():
+        for entry in self._candidates(memory_type, scope, department, stock_symbol):
+            if entry.expires_ts is not None and now_ts > entry.expires_ts:
                 continue
             
             # 应用过滤条件
@@ -139,32 +480,88 @@ class InMemoryStore(MemoryStore):
             
             results.append(entry)
         
-        # 按重要性和访问次数排序
-        results.sort(key=lambda x: (x.importance, x.access_count), reverse=True)
-        return results[:limit]
+        # 按重要性和访问次数排序（只取 top-k）
+        sort_key = lambda x: (x.importance, x.access_count)
+        if limit < len(results):
+            return heapq.nlargest(limit, results, key=sort_key)
+        results.sort(key=sort_key, reverse=True)
+        return results
     
+    def store_replacing(self, entry: MemoryEntry, replaced_ids: List[str]) -> bool:
+        """写入 entry 并删除被其替代的条目；任一被替代条目已不存在时不做任何修改并返回 False"""
+        if any(eid not in self._entries for eid in replaced_ids):
+            return False
+        if not self.store(entry):
+            return False
+        for eid in replaced_ids:
+            self.delete(eid)
+        return True
+
     def delete(self, entry_id: str) -> bool:
-        if entry_id in self._entries:
-            del self._entries[entry_id]
-            return True
-        return False
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return False
+        self._unindex(entry)
+        return True
+
+    def clear(self):
+        """清空全部记忆与索引"""
+        self._entries.clear()
+        self._by_bucket.clear()
+        self._buckets_by_scope_dept.clear()
+        self._by_type.clear()
+        self._by_symbol.clear()
+        self._expiry_heap.clear()
+        self._bucket_heaps.clear()
+        self._global_heap.clear()
+        self.text_index.clear()
+        if self.embedding_index is not None:
+            self.embedding_index.clear()
+        self.generations.reset()
     
     def cleanup_expired(self) -> int:
-        expired_ids = [eid for eid, entry in self._entries.items() if entry.is_expired()]
-        for eid in expired_ids:
-            del self._entries[eid]
-        return len(expired_ids)
+        now_ts = datetime.now().timestamp()
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now_ts:
+            ts, eid = heapq.heappop(heap)
+            entry = self._entries.get(eid)
+            # 条目已删除或过期时间已变更（重新 store 时会再次入堆）
+            if entry is None or entry.expires_ts is None or entry.expires_ts != ts:
+                continue
+            self.delete(eid)
+            removed += 1
+        # 堆中失效项过多时重建，避免无限增长
+        if len(heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [
+                (e.expires_ts, eid) for eid, e in self._entries.items() if e.expires_ts is not None
+            ]
+            heapq.heapify(self._expiry_heap)
+        return removed
 
 
 class MemoryManager:
     """记忆管理器 - 管理三层记忆"""
     
-    def __init__(self, store: MemoryStore):
+    def __init__(self,
+                 store: MemoryStore,
+                 embedding_index=None,
+                 embedding_weight: float = 0.5,
+                 summary_cache_ttl: float = 600.0):
         self.store = store
+        # 语义向量相似度在语义分中的占比（0 表示只用词频余弦）
+        self.embedding_weight = max(0.0, min(1.0, float(embedding_weight)))
+        if embedding_index is not None and hasattr(store, "attach_embedding_index"):
+            store.attach_embedding_index(embedding_index)
         self._setup_expiry_rules()
         # 软上限，防止记忆无限增长
         self.max_total_entries = 3000
         self.max_bucket_entries = 120
+        # 摘要缓存：(部门, 股票, 条数, 查询指纹) -> (桶代数, 写入时刻, 摘要)
+        # 桶代数不变即直接复用；TTL 兜底 recency 随时间的漂移与未清理的过期条目
+        self.summary_cache_ttl = float(summary_cache_ttl)
+        self.summary_cache_size = 512
+        self._summary_cache: "OrderedDict[Tuple, Tuple[int, float, str]]" = OrderedDict()
     
     def _setup_expiry_rules(self):
         """设置过期规则"""
@@ -175,11 +572,7 @@ class MemoryManager:
         }
 
     def _tokenize(self, text: str) -> List[str]:
-        s = str(text or "").lower()
-        # 英文词 + 数字 + 常见代码符号拆词
-        tokens = re.findall(r"[a-z0-9\.\-_]+", s)
-        # 过滤太短token
-        return [t for t in tokens if len(t) >= 2]
+        return tokenize_text(text)
 
     def _cosine_text(self, a: str, b: str) -> float:
         ta = self._tokenize(a)
@@ -238,9 +631,29 @@ class MemoryManager:
         )
         
         self.store.store(entry)
-        self.prune_memories()
+        self._enforce_capacity(entry)
         return entry
 
+    def _enforce_capacity(self, entry: MemoryEntry):
+        """插入后按桶/全局上限淘汰最低优先级条目；时效类清理由定期 prune_memories() 完成"""
+        store = self.store
+        if not hasattr(store, "evict_lowest"):
+            self.prune_memories()
+            return
+        store.cleanup_expired()
+        key = store.bucket_key(entry)
+        while store.bucket_size(key) > self.max_bucket_entries:
+            if store.evict_lowest(key) is None:
+                break
+        while len(store) > self.max_total_entries:
+            if store.evict_lowest() is None:
+                break
+
+    def _touch(self, entry: MemoryEntry):
+        """重要性等可变字段变更后通知存储"""
+        if hasattr(self.store, "update"):
+            self.store.update(entry)
+
     def _decide_retention(self,
                           department: str,
                           stock_symbol: Optional[str],
@@ -323,20 +736,21 @@ class MemoryManager:
             "reason": "heuristic_keep"
         }
     
+    @staticmethod
+    def _department_scope(department: str, stock_symbol: Optional[str]) -> Tuple[MemoryScope, Optional[str]]:
+        """根据部门类型确定查询范围"""
+        if department in ['D1', 'D5', 'D7']:
+            # 全局部门只能访问全局记忆
+            return MemoryScope.GLOBAL, None
+        # 股票特定部门访问股票特定记忆
+        return MemoryScope.STOCK_SPECIFIC, stock_symbol
+
     def get_department_memory(self, 
                              department: str,
                              stock_symbol: Optional[str] = None,
                              memory_type: Optional[MemoryType] = None) -> List[MemoryEntry]:
         """获取部门记忆（权限隔离）"""
-        # 根据部门类型确定查询范围
-        if department in ['D1', 'D5', 'D7']:
-            # 全局部门只能访问全局记忆
-            scope = MemoryScope.GLOBAL
-            stock_symbol = None
-        else:
-            # 股票特定部门访问股票特定记忆
-            scope = MemoryScope.STOCK_SPECIFIC
-        
+        scope, stock_symbol = self._department_scope(department, stock_symbol)
         return self.store.query(
             memory_type=memory_type,
             scope=scope,
@@ -352,46 +766,166 @@ class MemoryManager:
         """
         语义检索 + 规则分混合：
         - 基础分：importance/access_count/recency
-        - 语义分：余弦相似度 + 关键词重叠
+        - 语义分：余弦相似度（挂载向量索引时与语义向量相似度加权）+ 关键词重叠
         """
         entries = self.get_department_memory(department, stock_symbol)
         if not entries:
             return []
 
         q = str(query_text or "").strip()
-        now = datetime.now()
+        # 预计算索引：只对与查询有公共词的条目做稀疏点积；无索引的存储退回逐条计算
+        text_index = getattr(self.store, "text_index", None)
+        sims: Dict[str, tuple] = {}
+        if q and text_index is not None:
+            sims = text_index.score(q, {e.entry_id for e in entries})
+        emb: Optional[Dict[str, float]] = None
+        embedding_index = getattr(self.store, "embedding_index", None)
+        if q and embedding_index is not None and self.embedding_weight > 0:
+            emb = embedding_index.similarities(q, [e.entry_id for e in entries])
+        return self._rank_entries(entries, q, sims, emb, max_entries)
+
+    def retrieve_relevant_memory_batch(self,
+                                       department: str,
+                                       queries: Dict[Optional[str], Optional[str]],
+                                       max_entries: int = 10) -> Dict[Optional[str], List[MemoryEntry]]:
+        """
+        同一部门多只股票一次检索：queries 为 {stock_symbol: query_text}
+        语义向量相似度对所有查询 × 全部候选做一次矩阵乘积
+        """
+        candidates = {sym: self.get_department_memory(department, sym) for sym in queries}
+        texts = {sym: str(q or "").strip() for sym, q in queries.items()}
+        embedding_index = getattr(self.store, "embedding_index", None)
+        batch_emb: Dict[str, Any] = {}
+        batch_cols: Dict[Optional[str], int] = {}
+        if embedding_index is not None and self.embedding_weight > 0:
+            active = [sym for sym in queries if texts[sym] and candidates[sym]]
+            batch_cols = {sym: i for i, sym in enumerate(active)}
+            union = {e.entry_id for sym in active for e in candidates[sym]}
+            batch_emb = embedding_index.similarities_batch([texts[sym] for sym in active], union)
+
+        text_index = getattr(self.store, "text_index", None)
+        out: Dict[Optional[str], List[MemoryEntry]] = {}
+        for sym, entries in candidates.items():
+            q = texts[sym]
+            if not entries:
+                out[sym] = []
+                continue
+            sims: Dict[str, tuple] = {}
+            if q and text_index is not None:
+                sims = text_index.score(q, {e.entry_id for e in entries})
+            emb: Optional[Dict[str, float]] = None
+            if sym in batch_cols:
+                col = batch_cols[sym]
+                emb = {e.entry_id: float(batch_emb[e.entry_id][col]) for e in entries if e.entry_id in batch_emb}
+            out[sym] = self._rank_entries(entries, q, sims, emb, max_entries)
+        return out
+
+    def _rank_entries(self,
+                      entries: List[MemoryEntry],
+                      q: str,
+                      sims: Dict[str, tuple],
+                      emb: Optional[Dict[str, float]],
+                      max_entries: int) -> List[MemoryEntry]:
+        text_index = getattr(self.store, "text_index", None)
+        w = self.embedding_weight if emb is not None else 0.0
+        now_ts = time.time()
         scored: List[tuple] = []
         for e in entries:
-            age_days = max(0.0, (now - e.created_at).total_seconds() / 86400.0)
+            age_days = max(0.0, (now_ts - e.created_ts) / 86400.0)
             recency = 1.0 / (1.0 + age_days / 7.0)  # 约7天半衰
             access = min(1.0, float(e.access_count) / 20.0)
             base = 0.50 * float(e.importance) + 0.25 * recency + 0.25 * access
 
             if q:
-                sem = self._cosine_text(e.content, q)
-                key = self._keyword_overlap(e.content, q)
+                if text_index is not None:
+                    sem, key = sims.get(e.entry_id, (0.0, 0.0))
+                else:
+                    sem = self._cosine_text(e.content, q)
+                    key = self._keyword_overlap(e.content, q)
+                if w > 0:
+                    sem = (1.0 - w) * sem + w * max(0.0, emb.get(e.entry_id, 0.0))
                 rank = 0.60 * base + 0.25 * sem + 0.15 * key
             else:
                 rank = base
 
             scored.append((rank, e))
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [e for _, e in scored[:max_entries]]
+        top = heapq.nlargest(max_entries, scored, key=lambda x: x[0])
+        return [e for _, e in top]
     
+    def _summary_key(self, department: str, stock_symbol: Optional[str], max_entries: int,
+                     query_text: Optional[str]) -> Optional[Tuple[Tuple, int]]:
+        """摘要缓存键与当前桶代数；存储不提供代数时不缓存"""
+        if self.summary_cache_ttl <= 0 or not hasattr(self.store, "generation"):
+            return None
+        scope, sym = self._department_scope(department, stock_symbol)
+        q = str(query_text or "").strip()
+        fingerprint = hashlib.sha1(q.encode("utf-8")).hexdigest()[:16] if q else ""
+        return (department, sym, int(max_entries), fingerprint), self.store.generation(scope, department, sym)
+
+    def _cached_summary(self, key: Optional[Tuple[Tuple, int]]) -> Optional[str]:
+        if key is None:
+            return None
+        hit = self._summary_cache.get(key[0])
+        if hit is None:
+            return None
+        generation, at, summary = hit
+        if generation != key[1] or time.monotonic() - at > self.summary_cache_ttl:
+            self._summary_cache.pop(key[0], None)
+            return None
+        self._summary_cache.move_to_end(key[0])
+        return summary
+
+    def _remember_summary(self, key: Optional[Tuple[Tuple, int]], summary: str):
+        if key is None:
+            return
+        self._summary_cache[key[0]] = (key[1], time.monotonic(), summary)
+        self._summary_cache.move_to_end(key[0])
+        while len(self._summary_cache) > self.summary_cache_size:
+            self._summary_cache.popitem(last=False)
+
     def get_summary(self,
                    department: str,
                    stock_symbol: Optional[str] = None,
                    max_entries: int = 10,
                    query_text: Optional[str] = None) -> str:
-        """获取记忆摘要（用于上下文构建）"""
+        """获取记忆摘要（用于上下文构建；桶内无变化时直接返回缓存）"""
+        key = self._summary_key(department, stock_symbol, max_entries, query_text)
+        cached = self._cached_summary(key)
+        if cached is not None:
+            return cached
         entries = self.retrieve_relevant_memory(
             department=department,
             stock_symbol=stock_symbol,
             query_text=query_text,
             max_entries=max_entries
         )
-        
+        summary = self._format_summary(entries)
+        self._remember_summary(key, summary)
+        return summary
+
+    def get_summary_batch(self,
+                          department: str,
+                          queries: Dict[Optional[str], Optional[str]],
+                          max_entries: int = 10) -> Dict[Optional[str], str]:
+        """同一部门多只股票的记忆摘要（命中缓存的直接返回，其余一次批量检索）"""
+        out: Dict[Optional[str], str] = {}
+        keys = {}
+        for sym, q in queries.items():
+            keys[sym] = self._summary_key(department, sym, max_entries, q)
+            cached = self._cached_summary(keys[sym])
+            if cached is not None:
+                out[sym] = cached
+        missing = {sym: q for sym, q in queries.items() if sym not in out}
+        if missing:
+            found = self.retrieve_relevant_memory_batch(department, missing, max_entries=max_entries)
+            for sym, entries in found.items():
+                out[sym] = self._format_summary(entries)
+                self._remember_summary(keys[sym], out[sym])
+        return out
+
+    @staticmethod
+    def _format_summary(entries: List[MemoryEntry]) -> str:
         if not entries:
             return "No relevant memory found."
         
@@ -406,6 +940,7 @@ class MemoryManager:
         entry = self.store.retrieve(entry_id)
         if entry:
             entry.importance = min(1.0, max(0.0, entry.importance + delta))
+            self._touch(entry)
     
     def consolidate_to_ltm(self, entry_id: str):
         """将短期记忆固化为长期记忆"""
@@ -428,22 +963,30 @@ class MemoryManager:
             self.store.store(ltm_entry)
     
     def prune_memories(self):
-        """按容量、时效、重要性清理记忆。"""
+        """全量清理（容量、时效、重要性）。插入路径只做增量淘汰，本方法由调度器定期执行。"""
         self.store.cleanup_expired()
         if not hasattr(self.store, "_entries"):
+            # 持久化存储：时效规则下推为一条删除语句，容量上限已由插入时增量淘汰保证
+            if hasattr(self.store, "delete_stale"):
+                now = datetime.now()
+                self.store.delete_stale(
+                    ephemeral_before=now - timedelta(hours=24),
+                    low_importance=0.45,
+                    low_importance_before=now - timedelta(days=14),
+                )
             return
 
         entries: Dict[str, MemoryEntry] = getattr(self.store, "_entries", {})
-        now = datetime.now()
+        now_ts = time.time()
         to_delete = set()
 
         # 1) 清理低重要性旧数据
         for eid, e in entries.items():
-            age = now - e.created_at
-            if e.memory_type == MemoryType.EPHEMERAL and age > timedelta(hours=24):
+            age_s = now_ts - e.created_ts
+            if e.memory_type == MemoryType.EPHEMERAL and age_s > 24 * 3600:
                 to_delete.add(eid)
                 continue
-            if e.importance < 0.45 and age > timedelta(days=14):
+            if e.importance < 0.45 and age_s > 14 * 86400:
                 to_delete.add(eid)
 
         # 2) 每个 bucket 限制条数
@@ -454,73 +997,106 @@ class MemoryManager:
             key = f"{e.department or 'NA'}::{e.stock_symbol or 'GLOBAL'}::{e.scope.value}"
             buckets.setdefault(key, []).append(e)
         for _, arr in buckets.items():
-            arr.sort(key=lambda x: (x.importance, x.access_count, x.created_at.timestamp()), reverse=True)
+            arr.sort(key=lambda x: (x.importance, x.access_count, x.created_ts), reverse=True)
             for extra in arr[self.max_bucket_entries:]:
                 to_delete.add(extra.entry_id)
 
         # 3) 全局上限
         alive = [e for eid, e in entries.items() if eid not in to_delete]
-        alive.sort(key=lambda x: (x.importance, x.access_count, x.created_at.timestamp()), reverse=True)
+        alive.sort(key=lambda x: (x.importance, x.access_count, x.created_ts), reverse=True)
         for extra in alive[self.max_total_entries:]:
             to_delete.add(extra.entry_id)
 
         for eid in to_delete:
-            entries.pop(eid, None)
+            self.store.delete(eid)
 
-    def apply_trade_feedback(self,
-                             symbol: str,
-                             pnl_ratio: float,
-                             decision_direction: str = "",
-                             as_of: Optional[datetime] = None):
+    FEEDBACK_DEPARTMENTS = ("D1", "D5", "D7")
+
+    def _feedback_candidates(self, sym: str, global_entries: List[MemoryEntry]) -> List[MemoryEntry]:
+        """与该股票有关或全局策略部门的条目（去重）"""
+        if hasattr(self.store, "entries_for_symbol"):
+            stock_entries = self.store.entries_for_symbol(sym)
+        else:
+            entries: Dict[str, MemoryEntry] = getattr(self.store, "_entries", {})
+            stock_entries = [e for e in entries.values() if str(e.stock_symbol or "").upper() == sym]
+        if not global_entries:
+            return stock_entries
+        # 全局条目在多只股票间复用同一对象，累计调整不会被重新读取的副本覆盖
+        global_ids = {e.entry_id for e in global_entries}
+        return [e for e in stock_entries if e.entry_id not in global_ids] + global_entries
+
+    def _feedback_global_entries(self) -> List[MemoryEntry]:
+        if hasattr(self.store, "entries_for_scope_department"):
+            return [
+                e for dept in self.FEEDBACK_DEPARTMENTS
+                for e in self.store.entries_for_scope_department(MemoryScope.GLOBAL, dept)
+            ]
+        entries: Dict[str, MemoryEntry] = getattr(self.store, "_entries", {})
+        return [
+            e for e in entries.values()
+            if e.scope == MemoryScope.GLOBAL and e.department in self.FEEDBACK_DEPARTMENTS
+        ]
+
+    def apply_trade_feedback_batch(self,
+                                   feedback: List[Tuple[str, float, str]],
+                                   as_of: Optional[datetime] = None) -> int:
         """
-        交易反馈学习：
-        - 根据 pnl_ratio 对相关记忆做 importance 微调
-        - 正收益强化，负收益衰减
+        批量交易反馈学习（每个周期对全部持仓执行一次）：
+        - feedback: [(symbol, pnl_ratio, decision_direction)]
+        - 根据 pnl_ratio 对相关记忆做 importance 微调，正收益强化，负收益衰减
+        - 按股票/全局部门索引定位相关条目，每个条目只刷新一次淘汰堆
+        返回被调整的条目数
         """
-        if not hasattr(self.store, "_entries"):
-            return
+        if not hasattr(self.store, "_entries") and not hasattr(self.store, "entries_for_symbol"):
+            return 0
         now = as_of or datetime.now()
-        sym = str(symbol or "").upper().strip()
-        if not sym:
-            return
-
-        p = max(-1.0, min(1.0, float(pnl_ratio or 0.0)))
-        direction = str(decision_direction or "").upper().strip()
-        # SHORT方向收益符号反转
-        signed = -p if direction == "SHORT" else p
-        # 控制单次调整幅度
-        delta_base = max(-0.10, min(0.10, signed * 0.25))
-        if abs(delta_base) < 0.002:
-            return
+        now_ts = now.timestamp()
+        max_age_s = 24 * 45 * 3600.0
 
-        entries: Dict[str, MemoryEntry] = getattr(self.store, "_entries", {})
-        for entry in entries.values():
-            # 只更新与该股票有关或全局策略部门的近期记忆
-            related_stock = str(entry.stock_symbol or "").upper() == sym
-            related_global = (
-                entry.scope == MemoryScope.GLOBAL
-                and (entry.department in ("D1", "D5", "D7"))
-            )
-            if not (related_stock or related_global):
+        global_entries: Optional[List[MemoryEntry]] = None
+        touched: Dict[str, MemoryEntry] = {}
+        for symbol, pnl_ratio, decision_direction in feedback:
+            sym = str(symbol or "").upper().strip()
+            if not sym:
                 continue
-
-            age_h = max(0.0, (now - entry.created_at).total_seconds() / 3600.0)
-            if age_h > 24 * 45:
+            p = max(-1.0, min(1.0, float(pnl_ratio or 0.0)))
+            direction = str(decision_direction or "").upper().strip()
+            # SHORT方向收益符号反转
+            signed = -p if direction == "SHORT" else p
+            # 控制单次调整幅度
+            delta_base = max(-0.10, min(0.10, signed * 0.25))
+            if abs(delta_base) < 0.002:
                 continue
-            recency_w = 1.0 / (1.0 + age_h / 48.0)
-            delta = delta_base * recency_w
-            entry.importance = max(0.0, min(1.0, entry.importance + delta))
-
-            fb = dict(entry.metadata.get("feedback") or {})
-            fb["last_update_at"] = now.isoformat()
-            fb["last_symbol"] = sym
-            fb["last_direction"] = direction
-            fb["last_pnl_ratio"] = p
-            fb["updates"] = int(fb.get("updates", 0) or 0) + 1
-            fb["importance_delta"] = float(fb.get("importance_delta", 0.0) or 0.0) + float(delta)
-            entry.metadata["feedback"] = fb
-
-        self.prune_memories()
+
+            if global_entries is None:
+                global_entries = self._feedback_global_entries()
+            # 多个持仓按顺序叠加，结果与逐个调用一致
+            for entry in self._feedback_candidates(sym, global_entries):
+                age_s = now_ts - entry.created_ts
+                if age_s > max_age_s:
+                    continue
+                age_h = max(0.0, age_s / 3600.0)
+                recency_w = 1.0 / (1.0 + age_h / 48.0)
+                delta = delta_base * recency_w
+                entry.importance = max(0.0, min(1.0, entry.importance + delta))
+                if entry.feedback is None:
+                    entry.feedback = FeedbackStats()
+                entry.feedback.record(now_ts, sym, direction, p, delta)
+                touched[entry.entry_id] = entry
+
+        for entry in touched.values():
+            self._touch(entry)
+        if touched and not hasattr(self.store, "evict_lowest"):
+            self.prune_memories()
+        return len(touched)
+
+    def apply_trade_feedback(self,
+                             symbol: str,
+                             pnl_ratio: float,
+                             decision_direction: str = "",
+                             as_of: Optional[datetime] = None):
+        """单只股票的交易反馈（如成交后立即反馈）"""
+        self.apply_trade_feedback_batch([(symbol, pnl_ratio, decision_direction)], as_of=as_of)
 
     def write_session_summary(self,
                               department: str,
@@ -0,0 +1,480 @@
+"""
+SQLite 记忆存储 - WAL 模式、按范围/部门/股票/类型/过期时间建索引、FTS5 内容检索
+"""
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+from collections import Counter
+from datetime import datetime
+import json
+import math
+import os
+import sqlite3
+import threading
+
+from memory.memory_store import MemoryStore, MemoryEntry, MemoryScope, MemoryType, FeedbackStats, BucketGenerations
+from memory.text_index import idf_weight, tokenize_text
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY,
+    entry_id TEXT NOT NULL UNIQUE,
+    memory_type TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    department TEXT,
+    stock_symbol TEXT,
+    symbol_key TEXT,
+    content TEXT NOT NULL,
+    tokens TEXT NOT NULL,
+    metadata TEXT,
+    feedback TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    importance REAL NOT NULL,
+    access_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_memories_bucket
+    ON memories(scope, department, stock_symbol, importance, access_count, created_at);
+CREATE INDEX IF NOT EXISTS idx_memories_symbol ON memories(symbol_key);
+CREATE INDEX IF NOT EXISTS idx_memories_type ON memories(memory_type);
+CREATE INDEX IF NOT EXISTS idx_memories_expires ON memories(expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_memories_priority ON memories(importance, access_count, created_at);
+"""
+
+# 外部内容 FTS5 表：索引写入时预分词的 tokens 列（与 MemoryTextIndex 同一分词口径，含 CJK 二元组）
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+    tokens, content='memories', content_rowid='id', tokenize="unicode61 tokenchars '.-_'"
+);
+CREATE TRIGGER IF NOT EXISTS memories_fts_ai AFTER INSERT ON memories BEGIN
+    INSERT INTO memories_fts(rowid, tokens) VALUES (new.id, new.tokens);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_fts_ad AFTER DELETE ON memories BEGIN
+    INSERT INTO memories_fts(memories_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_fts_au AFTER UPDATE OF tokens ON memories BEGIN
+    INSERT INTO memories_fts(memories_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+    INSERT INTO memories_fts(rowid, tokens) VALUES (new.id, new.tokens);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO memories (entry_id, memory_type, scope, department, stock_symbol, symbol_key,
+                      content, tokens, metadata, feedback, created_at, expires_at,
+                      importance, access_count)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(entry_id) DO UPDATE SET
+    memory_type=excluded.memory_type, scope=excluded.scope,
+    department=excluded.department, stock_symbol=excluded.stock_symbol,
+    symbol_key=excluded.symbol_key, content=excluded.content, tokens=excluded.tokens,
+    metadata=excluded.metadata, feedback=excluded.feedback,
+    created_at=excluded.created_at, expires_at=excluded.expires_at,
+    importance=excluded.importance, access_count=excluded.access_count
+"""
+
+_COLUMNS = (
+    "entry_id, memory_type, scope, department, stock_symbol, content, metadata, feedback, "
+    "created_at, expires_at, importance, access_count"
+)
+
+
+def _symbol_key(symbol: Optional[str]) -> Optional[str]:
+    return str(symbol or "").upper().strip() or None
+
+
+def _fts5_available(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE IF EXISTS temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """
+    SQLite 持久化记忆存储：
+    - 与 InMemoryStore 提供相同的能力接口（桶淘汰、按股票/部门索引、文本检索 score），MemoryManager 无需修改
+    - 每次读取返回新的 MemoryEntry；原地修改后须调用 update() 写回
+    - 文本检索经 FTS5 MATCH 预筛出含任一查询词的候选条目，只对命中行的 tokens 列计算余弦/关键词重叠；
+      启动时不加载条目，FTS5 表由触发器随写入/删除同步
+    - 无 FTS5 的 SQLite 构建退回读取全部候选的 tokens 列逐条计算
+    """
+
+    persistent = True
+
+    def __init__(self, db_path: str, enable_fts: bool = True):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.fts_enabled = bool(enable_fts) and _fts5_available(self._conn)
+        if self.fts_enabled:
+            self._conn.executescript(_FTS_SCHEMA)
+        self._conn.commit()
+        # 可选语义向量索引：常驻内存，启动挂载时由 content 列重建
+        self.embedding_index = None
+        # 桶代数只在进程内维护（本进程是唯一写入方）
+        self.generations = BucketGenerations()
+
+    @property
+    def text_index(self) -> "SQLiteMemoryStore":
+        """MemoryManager 的文本检索入口：存储自身提供 score()"""
+        return self
+
+    def attach_embedding_index(self, index):
+        """挂载语义向量索引并为现有条目建向量"""
+        index.clear()
+        with self._lock:
+            rows = self._conn.execute("SELECT entry_id, content FROM memories").fetchall()
+        for entry_id, content in rows:
+            index.add(entry_id, content)
+        self.embedding_index = index
+
+    def _on_removed(self, rows: Iterable[Tuple]):
+        """删除语句 RETURNING (entry_id, scope, department, stock_symbol) 的后续同步"""
+        for entry_id, scope, department, stock_symbol in rows:
+            self.generations.bump((MemoryScope(scope), department, stock_symbol))
+            if self.embedding_index is not None:
+                self.embedding_index.remove(entry_id)
+
+    def generation(self, scope: MemoryScope, department: Optional[str], stock_symbol: Optional[str] = None) -> int:
+        return self.generations.get(scope, department, stock_symbol)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---- 行 <-> 条目 ----
+
+    @staticmethod
+    def _row_values(entry: MemoryEntry) -> Tuple:
+        return (
+            entry.entry_id,
+            entry.memory_type.value,
+            entry.scope.value,
+            entry.department,
+            entry.stock_symbol,
+            _symbol_key(entry.stock_symbol),
+            entry.content,
+            " ".join(tokenize_text(entry.content)),
+            json.dumps(entry.metadata, ensure_ascii=False, default=str) if entry.has_metadata else None,
+            json.dumps(entry.feedback.to_dict(), ensure_ascii=False) if entry.feedback else None,
+            entry.created_ts,
+            entry.expires_ts,
+            float(entry.importance),
+            int(entry.access_count),
+        )
+
+    @staticmethod
+    def _to_entry(row: Tuple) -> MemoryEntry:
+        (entry_id, memory_type, scope, department, stock_symbol, content, metadata, feedback,
+         created_at, expires_at, importance, access_count) = row
+        return MemoryEntry(
+            entry_id=entry_id,
+            memory_type=MemoryType(memory_type),
+            scope=MemoryScope(scope),
+            department=department,
+            stock_symbol=stock_symbol,
+            content=content,
+            metadata=json.loads(metadata) if metadata else None,
+            created_at=created_at,
+            expires_at=expires_at,
+            importance=float(importance),
+            access_count=int(access_count),
+            feedback=FeedbackStats.from_dict(json.loads(feedback)) if feedback else None,
+        )
+
+    def _select(self, where: str = "", params: Iterable[Any] = (), tail: str = "") -> List[MemoryEntry]:
+        sql = f"SELECT {_COLUMNS} FROM memories"
+        if where:
+            sql += f" WHERE {where}"
+        if tail:
+            sql += f" {tail}"
+        with self._lock:
+            rows = self._conn.execute(sql, tuple(params)).fetchall()
+        return [self._to_entry(r) for r in rows]
+
+    # ---- MemoryStore 接口 ----
+
+    def store(self, entry: MemoryEntry) -> bool:
+        return self.store_many([entry]) == 1
+
+    def store_many(self, entries: Iterable[MemoryEntry]) -> int:
+        """单事务批量写入（同 ID 覆盖）"""
+        entries = list(entries)
+        rows = [self._row_values(e) for e in entries]
+        try:
+            with self._lock, self._conn:
+                # 覆盖写入可能改变条目所在桶：旧桶同样推进代数
+                ids = [e.entry_id for e in entries]
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    for scope, department, stock_symbol in self._conn.execute(
+                        f"SELECT scope, department, stock_symbol FROM memories "
+                        f"WHERE entry_id IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall():
+                        self.generations.bump((MemoryScope(scope), department, stock_symbol))
+                self._conn.executemany(_UPSERT, rows)
+        except sqlite3.Error as e:
+            print(f"Error storing memory: {e}")
+            return 0
+        for e in entries:
+            self.generations.bump(self.bucket_key(e))
+            if self.embedding_index is not None:
+                self.embedding_index.add(e.entry_id, e.content)
+        return len(rows)
+
+    def store_replacing(self, entry: MemoryEntry, replaced_ids: List[str]) -> bool:
+        """单事务写入 entry 并删除被其替代的条目；任一被替代条目已不存在时不做任何修改并返回 False"""
+        ids = list(dict.fromkeys(replaced_ids))
+        row = self._row_values(entry)
+        placeholders = ",".join("?" * len(ids))
+        try:
+            with self._lock, self._conn:
+                if ids:
+                    present = self._conn.execute(
+                        f"SELECT COUNT(*) FROM memories WHERE entry_id IN ({placeholders})", ids
+                    ).fetchone()[0]
+                    if present != len(ids):
+                        return False
+                self._conn.execute(_UPSERT, row)
+                removed = self._conn.execute(
+                    f"DELETE FROM memories WHERE entry_id IN ({placeholders}) "
+                    "RETURNING entry_id, scope, department, stock_symbol",
+                    ids,
+                ).fetchall() if ids else []
+        except sqlite3.Error as e:
+            print(f"Error storing memory: {e}")
+            return False
+        self._on_removed(removed)
+        self.generations.bump(self.bucket_key(entry))
+        if self.embedding_index is not None:
+            self.embedding_index.add(entry.entry_id, entry.content)
+        return True
+
+    def retrieve(self, entry_id: str) -> Optional[MemoryEntry]:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE memories SET access_count = access_count + 1 WHERE entry_id = ?", (entry_id,))
+            rows = self._select("entry_id = ?", (entry_id,))
+        if not rows:
+            return None
+        self.generations.bump(self.bucket_key(rows[0]))
+        return rows[0]
+
+    def update(self, entry: MemoryEntry) -> bool:
+        """写回原地修改的可变字段（重要性/访问次数/元数据/反馈）"""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE memories SET importance = ?, access_count = ?, metadata = ?, feedback = ? WHERE entry_id = ?",
+                (
+                    float(entry.importance),
+                    int(entry.access_count),
+                    json.dumps(entry.metadata, ensure_ascii=False, default=str) if entry.has_metadata else None,
+                    json.dumps(entry.feedback.to_dict(), ensure_ascii=False) if entry.feedback else None,
+                    entry.entry_id,
+                ),
+            )
+        if cur.rowcount == 0:
+            return self.store(entry)
+        self.generations.bump(self.bucket_key(entry))
+        return True
+
+    def query(self,
+              memory_type: Optional[MemoryType] = None,
+              scope: Optional[MemoryScope] = None,
+              department: Optional[str] = None,
+              stock_symbol: Optional[str] = None,
+              limit: int = 100) -> List[MemoryEntry]:
+        clauses = ["(expires_at IS NULL OR expires_at >= ?)"]
+        params: List[Any] = [datetime.now().timestamp()]
+        if memory_type:
+            clauses.append("memory_type = ?")
+            params.append(memory_type.value)
+        if scope:
+            clauses.append("scope = ?")
+            params.append(scope.value)
+        if department:
+            clauses.append("department = ?")
+            params.append(department)
+        if stock_symbol:
+            clauses.append("stock_symbol = ?")
+            params.append(stock_symbol)
+        params.append(int(limit))
+        return self._select(" AND ".join(clauses), params, "ORDER BY importance DESC, access_count DESC LIMIT ?")
+
+    def delete(self, entry_id: str) -> bool:
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM memories WHERE entry_id = ? RETURNING entry_id, scope, department, stock_symbol",
+                (entry_id,),
+            ).fetchall()
+        self._on_removed(removed)
+        return bool(removed)
+
+    def clear(self):
+        """清空全部记忆"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM memories")
+        if self.embedding_index is not None:
+            self.embedding_index.clear()
+        self.generations.reset()
+
+    def cleanup_expired(self) -> int:
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM memories WHERE expires_at IS NOT NULL AND expires_at < ? "
+                "RETURNING entry_id, scope, department, stock_symbol",
+                (datetime.now().timestamp(),),
+            ).fetchall()
+        self._on_removed(removed)
+        return len(removed)
+
+    # ---- 容量与索引访问（与 InMemoryStore 同名能力） ----
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0])
+
+    @staticmethod
+    def bucket_key(entry: MemoryEntry) -> Tuple[MemoryScope, Optional[str], Optional[str]]:
+        return (entry.scope, entry.department, entry.stock_symbol)
+
+    def bucket_size(self, key: Tuple) -> int:
+        scope, department, stock_symbol = key
+        with self._lock:
+            return int(self._conn.execute(
+                "SELECT COUNT(*) FROM memories WHERE scope = ? AND department IS ? AND stock_symbol IS ?",
+                (scope.value, department, stock_symbol),
+            ).fetchone()[0])
+
+    def evict_lowest(self, bucket_key: Optional[Tuple] = None) -> Optional[str]:
+        """删除桶内（或全局）优先级最低的条目，返回其 ID"""
+        sql = "SELECT entry_id FROM memories"
+        params: Tuple = ()
+        if bucket_key is not None:
+            scope, department, stock_symbol = bucket_key
+            sql += " WHERE scope = ? AND department IS ? AND stock_symbol IS ?"
+            params = (scope.value, department, stock_symbol)
+        sql += " ORDER BY importance ASC, access_count ASC, created_at ASC LIMIT 1"
+        with self._lock, self._conn:
+            row = self._conn.execute(sql, params).fetchone()
+            if row is None:
+                return None
+            removed = self._conn.execute(
+                "DELETE FROM memories WHERE entry_id = ? RETURNING entry_id, scope, department, stock_symbol",
+                (row[0],),
+            ).fetchall()
+        self._on_removed(removed)
+        return row[0]
+
+    def entries_for_symbol(self, symbol: str) -> List[MemoryEntry]:
+        """该股票的全部条目（不区分范围/部门，含未清理的过期条目）"""
+        key = _symbol_key(symbol)
+        if not key:
+            return []
+        return self._select("symbol_key = ?", (key,))
+
+    def entries_for_scope_department(self, scope: MemoryScope, department: Optional[str]) -> List[MemoryEntry]:
+        return self._select("scope = ? AND department IS ?", (scope.value, department))
+
+    def delete_stale(self, ephemeral_before: datetime, low_importance: float, low_importance_before: datetime) -> int:
+        """全量清理的时效规则：过旧的会话记忆、过旧的低重要性记忆"""
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                """
+                DELETE FROM memories
+                WHERE (memory_type = ? AND created_at < ?) OR (importance < ? AND created_at < ?)
+                RETURNING entry_id, scope, department, stock_symbol
+                """,
+                (MemoryType.EPHEMERAL.value, ephemeral_before.timestamp(),
+                 float(low_importance), low_importance_before.timestamp()),
+            ).fetchall()
+        self._on_removed(removed)
+        return len(removed)
+
+    # ---- 文本检索 ----
+
+    def score(self, query_text: str, candidates: Optional[Iterable[str]] = None) -> Dict[str, Tuple[float, float]]:
+        """
+        返回 {entry_id: (余弦相似度, 关键词重叠)}，口径与 MemoryTextIndex.score 一致（IDF 加权查询），仅包含与查询有公共词的条目
+        - FTS5：MATCH 预筛含任一查询词的条目（给定候选时再限定在候选内），只读取命中行的 tokens 列；
+          各查询词的文档频率由 FTS5 索引计数
+        - 无 FTS5：读取全部候选（不限候选时全表）的 tokens 列逐条计算，文档频率逐词扫描 tokens 列
+        """
+        q_tf = Counter(tokenize_text(query_text))
+        if not q_tf:
+            return {}
+        ids = None if candidates is None else list(candidates)
+        if ids is not None and not ids:
+            return {}
+        quoted = {t: '"' + t.replace('"', '""') + '"' for t in q_tf}
+        if self.fts_enabled:
+            sql = ("SELECT m.entry_id, m.tokens FROM memories_fts f JOIN memories m ON m.id = f.rowid "
+                   "WHERE memories_fts MATCH ?")
+            match = " OR ".join(quoted.values())
+            df_sql, df_args = "SELECT COUNT(*) FROM memories_fts WHERE memories_fts MATCH ?", quoted
+        else:
+            sql = "SELECT entry_id, tokens FROM memories m WHERE 1"
+            match = None
+            df_sql = "SELECT COUNT(*) FROM memories WHERE instr(' ' || tokens || ' ', ?) > 0"
+            df_args = {t: f" {t} " for t in q_tf}
+        head = (match,) if match is not None else ()
+        rows: List[Tuple[str, str]] = []
+        with self._lock:
+            n_docs = int(self._conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0])
+            idf = {t: idf_weight(n_docs, int(self._conn.execute(df_sql, (df_args[t],)).fetchone()[0])) for t in q_tf}
+            if ids is None:
+                rows = self._conn.execute(sql, head).fetchall()
+            else:
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    rows.extend(self._conn.execute(
+                        f"{sql} AND m.entry_id IN ({','.join('?' * len(chunk))})", head + tuple(chunk)
+                    ).fetchall())
+
+        q_norm = math.sqrt(sum((float(q_cnt) * idf[term]) ** 2 for term, q_cnt in q_tf.items()))
+        idf_total = sum(idf.values())
+        out: Dict[str, Tuple[float, float]] = {}
+        for entry_id, tokens in rows:
+            tf = Counter(tokens.split())
+            dot, hit = 0.0, 0.0
+            for term, q_cnt in q_tf.items():
+                cnt = tf.get(term)
+                if cnt:
+                    dot += float(q_cnt) * idf[term] * float(cnt)
+                    hit += idf[term]
+            if not hit:
+                continue
+            e_norm = math.sqrt(sum(float(v) * float(v) for v in tf.values()))
+            cos = 0.0 if e_norm <= 1e-12 or q_norm <= 1e-12 else max(0.0, min(1.0, dot / (e_norm * q_norm)))
+            out[entry_id] = (cos, max(0.0, min(1.0, hit / idf_total)))
+        return out
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite",
+            "db_path": self.db_path,
+            "fts5": self.fts_enabled,
+            "entries": len(self),
+        }
+
+def resolve_memory_db_path(database_url: str) -> str:
+    """由 sqlite:///path 形式的 database_url 得到数据库文件路径（相对路径以 backend 目录为基准）"""
+    url = str(database_url or "").strip()
+    path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else "trading_platform.db"
+    if path == ":memory:" or os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(os.path.dirname(__file__), "..", path))
+
+
+def create_memory_store(db_path: Optional[str] = None) -> MemoryStore:
+    """按 config.memory_backend 构建记忆存储：sqlite（默认，持久化）或 memory（纯内存）"""
+    from config.settings import config
+    from memory.memory_store import InMemoryStore
+    if str(config.memory_backend or "sqlite").lower() != "sqlite":
+        return InMemoryStore()
+    return SQLiteMemoryStore(db_path or resolve_memory_db_path(config.database_url))
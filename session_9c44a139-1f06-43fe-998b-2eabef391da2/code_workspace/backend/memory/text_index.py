@@ -0,0 +1,139 @@
+"""
+记忆文本索引 - 写入时分词/向量化，倒排表 + 文档频率（IDF 加权查询），查询只遍历含查询词的条目
+"""
+from typing import Dict, List, Tuple, Iterable, Optional
+from collections import Counter
+import math
+import re
+import sys
+
+_ASCII_TOKEN = re.compile(r"[a-z0-9\.\-_]+")
+# 中日韩统一表意文字（含扩展 A）、日文假名、韩文音节
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]+")
+
+
+def tokenize_text(text: str) -> List[str]:
+    """
+    混合语言分词：
+    - 英文词 + 数字 + 常见代码符号，过滤过短 token
+    - 连续 CJK 字符切成重叠二元组（“风控回撤” -> 风控/控回/回撤），单字片段保留单字
+    """
+    s = str(text or "").lower()
+    tokens = [t for t in _ASCII_TOKEN.findall(s) if len(t) >= 2]
+    for run in _CJK_RUN.findall(s):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def idf_weight(n_docs: int, df: int) -> float:
+    """平滑 IDF：log((1 + N) / (1 + df)) + 1"""
+    return math.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+
+class MemoryTextIndex:
+    """
+    记忆内容的稀疏向量索引：
+    - _terms：entry_id -> 该条目的词元组（驻留字符串，删除时定位倒排表），_norm：词频向量 L2 范数
+    - _postings：term -> {entry_id: 词频}（倒排表，len 即文档频率；词频只存这一份）
+    score() 按 IDF 给查询词加权：常见词对余弦与关键词重叠的贡献小于罕见词；SQLiteMemoryStore.score 口径相同
+    """
+
+    def __init__(self):
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._norm: Dict[str, float] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._terms
+
+    def add(self, entry_id: str, text: str):
+        self.add_tokens(entry_id, tokenize_text(text))
+
+    def add_tokens(self, entry_id: str, tokens: Iterable[str]):
+        """以已分词的词序列建索引（持久化存储重启时由保存的 tokens 列恢复，无需重新分词）"""
+        if entry_id in self._terms:
+            self.remove(entry_id)
+        tf = Counter(tokens)
+        terms = tuple(sys.intern(t) for t in tf)
+        self._terms[entry_id] = terms
+        self._norm[entry_id] = math.sqrt(sum(float(v) * float(v) for v in tf.values()))
+        for term in terms:
+            self._postings.setdefault(term, {})[entry_id] = tf[term]
+
+    def remove(self, entry_id: str):
+        terms = self._terms.pop(entry_id, None)
+        self._norm.pop(entry_id, None)
+        if not terms:
+            return
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(entry_id, None)
+            if not posting:
+                del self._postings[term]
+
+    def clear(self):
+        self._terms.clear()
+        self._norm.clear()
+        self._postings.clear()
+
+    def document_frequency(self, term: str) -> int:
+        return len(self._postings.get(term, ()))
+
+    def idf(self, term: str) -> float:
+        return idf_weight(len(self._terms), self.document_frequency(term))
+
+    def score(self, query_text: str, candidates: Optional[Iterable[str]] = None) -> Dict[str, Tuple[float, float]]:
+        """
+        返回 {entry_id: (余弦相似度, 关键词重叠)}，仅包含与查询有公共词的条目；查询词权重 w = 查询词频 × idf
+        - 余弦：Σ w·条目词频 / (|e| * |w|)（条目侧为词频向量，范数写入时预计算）
+        - 重叠：条目命中的查询词 idf 之和 / 全部查询词 idf 之和
+        """
+        q_tf = Counter(tokenize_text(query_text))
+        if not q_tf:
+            return {}
+        allowed = candidates if candidates is None or isinstance(candidates, (set, frozenset, dict)) else set(candidates)
+
+        n_docs = len(self._terms)
+        postings = [(term, q_cnt, self._postings.get(term)) for term, q_cnt in q_tf.items()]
+        idf = {term: idf_weight(n_docs, len(p or ())) for term, _, p in postings}
+        q_norm = math.sqrt(sum((float(q_cnt) * idf[term]) ** 2 for term, q_cnt in q_tf.items()))
+        idf_total = sum(idf.values())
+        postings = [(float(q_cnt) * idf[term], idf[term], p) for term, q_cnt, p in postings if p]
+
+        dots: Dict[str, float] = {}
+        hits: Dict[str, float] = {}
+        posting_cost = sum(len(p) for _, _, p in postings)
+        if allowed is not None and len(allowed) * len(q_tf) < posting_cost:
+            # 候选集远小于倒排表（常见词）：逐个候选在查询词的倒排表中查词频
+            for eid in allowed:
+                dot, hit = 0.0, 0.0
+                for q_w, t_idf, posting in postings:
+                    cnt = posting.get(eid)
+                    if cnt:
+                        dot += q_w * float(cnt)
+                        hit += t_idf
+                if hit:
+                    dots[eid] = dot
+                    hits[eid] = hit
+        else:
+            for q_w, t_idf, posting in postings:
+                for eid, cnt in posting.items():
+                    if allowed is not None and eid not in allowed:
+                        continue
+                    dots[eid] = dots.get(eid, 0.0) + q_w * float(cnt)
+                    hits[eid] = hits.get(eid, 0.0) + t_idf
+
+        out: Dict[str, Tuple[float, float]] = {}
+        for eid, dot in dots.items():
+            e_norm = self._norm.get(eid, 0.0)
+            cos = 0.0 if e_norm <= 1e-12 or q_norm <= 1e-12 else max(0.0, min(1.0, dot / (e_norm * q_norm)))
+            out[eid] = (cos, max(0.0, min(1.0, hits[eid] / idf_total)))
+        return out
@@ -209,6 +209,8 @@ class QuantOutput:
     research_score: float  # 研究得分
     divergence: float  # 分歧度
     event_risk: float  # 事件风险
+    volatility_horizons: Dict[str, float] = field(default_factory=dict)  # 多周期波动率（vol_20/vol_60/vol_120/vol_ewma）
+    risk_position: Optional[float] = None  # 风险模型按相关性预算后的建议仓位（None 表示未计算）
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -222,7 +224,9 @@ class QuantOutput:
             "whale_flow_score": self.whale_flow_score,
             "research_score": self.research_score,
             "divergence": self.divergence,
-            "event_risk": self.event_risk
+            "event_risk": self.event_risk,
+            "volatility_horizons": dict(self.volatility_horizons),
+            "risk_position": self.risk_position
         }
 
 
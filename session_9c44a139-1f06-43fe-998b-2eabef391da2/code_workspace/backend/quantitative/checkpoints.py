@@ -0,0 +1,130 @@
+"""
+D5 模型检查点 - 参数与 NumPy 缓冲按版本存为压缩 .npz，索引文件记录训练数据区间、指标与当前生效版本
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import json
+import os
+
+import numpy as np
+
+
+class D5CheckpointStore:
+    """
+    版本化检查点目录：
+    - d5-000001.npz …：D5QuantDepartment.export_state() 的数组（np.savez_compressed，不含 pickle 对象）
+    - index.json：各版本元数据（创建时间、来源、训练样本时间区间、训练指标、参数）与 active 版本
+    - 写入先落临时文件再原子替换；超过 keep 个版本时删除最旧的非生效版本
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str, keep: int = 20):
+        self.directory = directory
+        self.keep = max(1, int(keep))
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._read_index()
+
+    def _read_index(self) -> Dict[str, Any]:
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {"active": data.get("active"), "checkpoints": list(data.get("checkpoints") or [])}
+        return {"active": None, "checkpoints": []}
+
+    def _write_index(self):
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @property
+    def active(self) -> Optional[int]:
+        return self._index["active"]
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        return [dict(meta, active=meta["version"] == self.active) for meta in self._index["checkpoints"]]
+
+    def get(self, version: int) -> Dict[str, Any]:
+        for meta in self._index["checkpoints"]:
+            if meta["version"] == int(version):
+                return meta
+        raise KeyError(f"D5 checkpoint {version} not found")
+
+    def save(self,
+             state: Dict[str, np.ndarray],
+             created_at: Optional[datetime] = None,
+             reason: str = "manual",
+             note: str = "",
+             metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """保存一个新版本并设为生效版本，返回其元数据"""
+        versions = [m["version"] for m in self._index["checkpoints"]]
+        version = max(versions, default=0) + 1
+        name = f"d5-{version:06d}.npz"
+        path = os.path.join(self.directory, name)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **state)
+        os.replace(tmp, path)
+
+        ts = state.get("sample_ts")
+        has_samples = ts is not None and len(ts) > 0
+        params = state.get("param_keys")
+        meta = {
+            "version": version,
+            "file": name,
+            "created_at": (created_at or datetime.now()).isoformat(),
+            "reason": reason,
+            "note": note,
+            "parent": self.active,
+            "size_bytes": os.path.getsize(path),
+            "data_range": {
+                "sample_count": int(len(ts)) if ts is not None else 0,
+                "start": datetime.fromtimestamp(float(ts.min())).isoformat() if has_samples else None,
+                "end": datetime.fromtimestamp(float(ts.max())).isoformat() if has_samples else None,
+                "symbols": sorted({str(s) for s in state["sample_symbols"]}) if "sample_symbols" in state else [],
+            },
+            "metrics": dict(metrics or {}),
+            "params": (
+                {str(k): float(v) for k, v in zip(params, state["param_values"])} if params is not None else {}
+            ),
+        }
+        self._index["checkpoints"].append(meta)
+        self._index["active"] = version
+        self._prune()
+        self._write_index()
+        return meta
+
+    def _prune(self):
+        metas = self._index["checkpoints"]
+        while len(metas) > self.keep:
+            oldest = next((m for m in metas if m["version"] != self.active), None)
+            if oldest is None:
+                break
+            metas.remove(oldest)
+            try:
+                os.remove(os.path.join(self.directory, oldest["file"]))
+            except OSError:
+                pass
+
+    def load(self, version: int) -> Dict[str, np.ndarray]:
+        """读取某版本的全部数组（一次性解压到内存）"""
+        meta = self.get(version)
+        with np.load(os.path.join(self.directory, meta["file"]), allow_pickle=False) as data:
+            return {k: data[k] for k in data.files}
+
+    def set_active(self, version: Optional[int]):
+        if version is not None:
+            self.get(version)
+        self._index["active"] = version
+        self._write_index()
+
+    def previous(self, version: Optional[int] = None) -> Optional[int]:
+        """早于给定版本（缺省为生效版本）的最近一个版本"""
+        current = self.active if version is None else version
+        if current is None:
+            return None
+        older = [m["version"] for m in self._index["checkpoints"] if m["version"] < current]
+        return max(older) if older else None
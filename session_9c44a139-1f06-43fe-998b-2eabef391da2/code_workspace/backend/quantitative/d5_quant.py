@@ -1,28 +1,45 @@
 """
 D5 量化部 - 持续运行的量化分析部门
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence
 from datetime import datetime
 import math
-from collections import deque
 import numpy as np
+from config.settings import config
 from models.base_models import QuantOutput, MarketData, WhaleFlow, DepartmentFinal
 from memory.memory_store import MemoryManager
+from quantitative.rolling_stats import RollingStats
+from quantitative.ring_buffer import SampleRingBuffer
+from quantitative.online_rls import RecursiveLeastSquares
+from quantitative.feature_store import FeatureStore
+from quantitative.risk_model import CovarianceRiskModel
 
 
 class D5QuantDepartment:
     """D5 量化部 - 负责市场微结构 + 大额资金流 + 融合研究因子"""
 
+    RESEARCH_DEPARTMENTS = ("D1", "D2", "D3", "D4")
+    # 收益率统计窗口：仓位用最长窗口波动率，其余周期随输出一并给出
+    VOL_WINDOWS = (20, 60, 120)
+    MIN_VOL_SAMPLES = 10
+    SAMPLE_AUX_COLUMNS = ("la_adjusted", "divergence", "event_risk")
+    BETA_KEYS = ("beta_0", "beta_1", "beta_2", "beta_3", "beta_4")
+    PENDING_FIELDS = ("price", "r_t", "z_vwap", "imb_t", "wf_t", "la_adjusted", "divergence", "event_risk")
+
     def __init__(self, memory_manager: MemoryManager):
         self.memory_manager = memory_manager
         self._last_price: Dict[str, float] = {}
-        self._ret_windows: Dict[str, deque] = {}
+        self._ret_stats: Dict[str, RollingStats] = {}
 
         # 用于在线监督训练：上一时刻特征等待下一时刻收益标签
         self._pending_sample: Dict[str, Dict[str, float]] = {}
-        self.training_samples: list = []
         self.max_training_samples = 4000
         self.min_training_samples = 40
+        self.training_window = 1500  # 每次训练使用最近的样本条数
+        # 特征 x = [1, r_t, z_vwap, imb_t, wf_t]，标签 y 为下一时刻收益
+        self.training_samples = SampleRingBuffer(
+            self.max_training_samples, n_features=5, aux_columns=self.SAMPLE_AUX_COLUMNS
+        )
 
         # 量化模型参数
         self.params = {
@@ -58,13 +75,38 @@ class D5QuantDepartment:
         }
         self.last_training_report: Dict[str, Any] = {}
 
+        # beta 在线递推更新：每条带标签样本到达即更新；批量岭回归作为定期一致性校验
+        self.rls_enabled = bool(config.d5_rls_enabled)
+        self.rls_reset_ratio = 1.5  # RLS 样本内 MSE 超过岭回归的倍数时以岭回归解重置
+        self.rls = RecursiveLeastSquares(
+            len(self.BETA_KEYS),
+            forgetting=config.d5_rls_forgetting,
+            delta=config.d5_rls_delta,
+            initial=[self.params[k] for k in self.BETA_KEYS],
+        )
+        # 跨资产风险模型：截面仓位按收益率相关性做风险预算（关闭时沿用逐只独立仓位）
+        self.risk_model_enabled = bool(config.d5_risk_model_enabled)
+        self.risk_model = CovarianceRiskModel(
+            halflife=config.d5_risk_halflife,
+            shrinkage=config.d5_risk_shrinkage,
+            min_observations=config.d5_risk_min_observations,
+        )
+
+        # 每次计算的特征向量按股票写入列式特征存储，供时间序列查询与离线研究
+        self.feature_store = FeatureStore(
+            capacity=config.d5_feature_store_capacity,
+            path=config.d5_feature_store_dir or None,
+        )
+
     async def calculate_quant_output(self,
                                     symbol: str,
                                     market_data: MarketData,
                                     whale_flow: WhaleFlow,
                                     department_finals: Dict[str, DepartmentFinal],
-                                    event_risk: float = 0.0) -> QuantOutput:
-        """计算量化输出"""
+                                    event_risk: float = 0.0,
+                                    as_of: Optional[datetime] = None) -> QuantOutput:
+        """计算量化输出（as_of 为调度时钟时间，回放模式下为模拟时间；缺省取系统时间）"""
+        now = as_of or datetime.now()
 
         # 1. 计算市场特征
         r_t = self._calculate_return(market_data)
@@ -103,12 +145,19 @@ class D5QuantDepartment:
             wf_t=WF_t,
             la_adjusted=LA_adjusted,
             divergence=divergence,
-            event_risk=event_risk
+            event_risk=event_risk,
+            ts=now.timestamp()
         )
+        self.feature_store.append(symbol, now, {
+            "price": market_data.price, "r_t": r_t, "z_vwap": z_vwap, "imb_t": imb_t, "wf_t": WF_t,
+            "la_t": LA_t, "la_adjusted": LA_adjusted, "divergence": divergence, "event_risk": event_risk,
+            "gate": gate_t, "market_alpha": market_alpha, "final_alpha": final_alpha,
+            "volatility": vol_t, "position": position,
+        })
 
         return QuantOutput(
             symbol=symbol,
-            timestamp=datetime.now(),
+            timestamp=now,
             market_alpha=market_alpha,
             research_gate=gate_t,
             final_alpha=final_alpha,
@@ -117,9 +166,164 @@ class D5QuantDepartment:
             whale_flow_score=WF_t,
             research_score=LA_t,
             divergence=divergence,
-            event_risk=event_risk
+            event_risk=event_risk,
+            volatility_horizons=self.get_volatility_horizons(symbol)
         )
 
+    async def calculate_quant_outputs_batch(self,
+                                            market_data: List[MarketData],
+                                            whale_flows: List[WhaleFlow],
+                                            department_finals: Optional[Dict[str, Dict[str, DepartmentFinal]]] = None,
+                                            event_risk: Optional[Sequence[float]] = None,
+                                            as_of: Optional[datetime] = None) -> Dict[str, QuantOutput]:
+        """截面批量计算：全部股票的行情/资金流组成数组，一次向量化计算，返回 {symbol: QuantOutput}（as_of 同单只接口）"""
+        n = len(market_data)
+        if n == 0:
+            return {}
+        if len(whale_flows) != n:
+            raise ValueError("market_data and whale_flows must have the same length")
+        finals = department_finals or {}
+        symbols = [md.symbol for md in market_data]
+
+        price = np.fromiter((md.price for md in market_data), dtype=float, count=n)
+        prev = np.fromiter((self._last_price.get(s, np.nan) for s in symbols), dtype=float, count=n)
+        vwap = np.fromiter((md.vwap for md in market_data), dtype=float, count=n)
+        bid = np.fromiter((md.bid_size for md in market_data), dtype=float, count=n)
+        ask = np.fromiter((md.ask_size for md in market_data), dtype=float, count=n)
+        flows = np.array(
+            [(wf.block_net_buy_value, wf.dark_pool_net, wf.options_whale_notional, wf.adv) for wf in whale_flows],
+            dtype=float,
+        ).reshape(n, 4)
+        risk = np.zeros(n) if event_risk is None else np.asarray(event_risk, dtype=float).reshape(n)
+        scores, confs = self._research_matrix(symbols, finals)
+
+        out = self._quant_arrays(price, prev, vwap, bid, ask, flows, scores, confs, risk, symbols)
+
+        now = as_of or datetime.now()
+        results: Dict[str, QuantOutput] = {}
+        for i, symbol in enumerate(symbols):
+            self._record_training_sample(
+                symbol=symbol,
+                price=float(price[i]),
+                r_t=float(out["r_t"][i]),
+                z_vwap=float(out["z_vwap"][i]),
+                imb_t=float(out["imb_t"][i]),
+                wf_t=float(out["wf_t"][i]),
+                la_adjusted=float(out["la_adjusted"][i]),
+                divergence=float(out["divergence"][i]),
+                event_risk=float(risk[i]),
+                ts=now.timestamp()
+            )
+            results[symbol] = QuantOutput(
+                symbol=symbol,
+                timestamp=now,
+                market_alpha=float(out["market_alpha"][i]),
+                research_gate=float(out["gate"][i]),
+                final_alpha=float(out["final_alpha"][i]),
+                position=float(out["position"][i]),
+                volatility=float(out["volatility"][i]),
+                whale_flow_score=float(out["wf_t"][i]),
+                research_score=float(out["la_t"][i]),
+                divergence=float(out["divergence"][i]),
+                event_risk=float(risk[i]),
+                volatility_horizons=self.get_volatility_horizons(symbol),
+                risk_position=float(out["risk_position"][i]) if "risk_position" in out else None
+            )
+        self.feature_store.append_batch(symbols, now, {**out, "price": price, "event_risk": risk})
+        return results
+
+    def _research_matrix(self, symbols: List[str], finals: Dict[str, Dict[str, DepartmentFinal]]):
+        """各股票 D1-D4 的分数/置信度矩阵（n×4），缺失部门为 NaN"""
+        scores = np.full((len(symbols), 4), np.nan)
+        confs = np.full((len(symbols), 4), np.nan)
+        for i, symbol in enumerate(symbols):
+            dept_finals = finals.get(symbol)
+            if not dept_finals:
+                continue
+            for j, dept in enumerate(self.RESEARCH_DEPARTMENTS):
+                f = dept_finals.get(dept)
+                if f is not None:
+                    scores[i, j] = f.score
+                    confs[i, j] = f.confidence
+        return scores, confs
+
+    def _quant_arrays(self,
+                      price: np.ndarray,
+                      prev: np.ndarray,
+                      vwap: np.ndarray,
+                      bid: np.ndarray,
+                      ask: np.ndarray,
+                      flows: np.ndarray,
+                      scores: np.ndarray,
+                      confs: np.ndarray,
+                      event_risk: np.ndarray,
+                      symbols: List[str]) -> Dict[str, np.ndarray]:
+        """向量化核心：与逐只计算口径一致（收益率、VWAP偏离、不平衡、资金流、市场alpha、门控、仓位）"""
+        p = self.params
+
+        # 1. 收益率（无上一价格时为 0），并推进收益率窗口
+        has_prev = np.isfinite(prev) & (prev > 0)
+        r_t = np.zeros_like(price)
+        np.divide(price - prev, prev, out=r_t, where=has_prev)
+        for i, symbol in enumerate(symbols):
+            self._last_price[symbol] = float(price[i])
+            if has_prev[i]:
+                self._return_stats(symbol).push(float(r_t[i]))
+        volatility = np.fromiter((self._calculate_volatility(s) for s in symbols), dtype=float, count=len(symbols))
+
+        # 2. VWAP 偏离与订单簿不平衡
+        z_vwap = np.zeros_like(price)
+        np.divide(price - vwap, vwap, out=z_vwap, where=vwap != 0)
+        total = bid + ask
+        imb_t = np.zeros_like(price)
+        np.divide(bid - ask, total, out=imb_t, where=total != 0)
+
+        # 3. 大额资金流得分
+        adv = flows[:, 3:4]
+        ratios = np.zeros((len(price), 3))
+        np.divide(flows[:, :3], adv, out=ratios, where=adv > 0)
+        ratios = np.clip(ratios, -3.0, 3.0)
+        wf_t = np.clip(ratios @ np.array([p['w_1'], p['w_2'], p['w_3']]), -4.0, 4.0)
+
+        # 4. 市场 alpha
+        market_alpha = np.clip(
+            p['beta_0'] + p['beta_1'] * r_t + p['beta_2'] * z_vwap + p['beta_3'] * imb_t + p['beta_4'] * wf_t,
+            -6.0, 6.0,
+        )
+
+        # 5. 研究因子与分歧（缺失部门不参与）
+        weights = np.array([p['alpha_M'], p['alpha_I'], p['alpha_S'], p['alpha_E']])
+        present = np.isfinite(scores)
+        wc = np.where(present, weights * np.nan_to_num(confs), 0.0)
+        numerator = (wc * np.nan_to_num(scores)).sum(axis=1)
+        denominator = p['epsilon'] + wc.sum(axis=1)
+        la_t = np.zeros_like(price)
+        np.divide(numerator, denominator, out=la_t, where=denominator > p['epsilon'])
+        count = present.sum(axis=1)
+        mean = np.nan_to_num(scores).sum(axis=1) / np.maximum(count, 1)
+        var = np.where(present, (np.nan_to_num(scores) - mean[:, None]) ** 2, 0.0).sum(axis=1) / np.maximum(count, 1)
+        divergence = np.where(count > 1, np.sqrt(var), 0.0)
+        la_adjusted = la_t * (1 - p['lambda_div'] * divergence)
+
+        # 6. 门控、最终 alpha 与仓位
+        x = np.clip(p['gamma_0'] + p['gamma_1'] * la_adjusted - p['gamma_2'] * divergence - p['gamma_3'] * event_risk,
+                    -20.0, 20.0)
+        gate = 1.0 / (1.0 + np.exp(-x))
+        final_alpha = gate * market_alpha
+        vol = np.where(volatility <= 0, 0.01, volatility)
+        position = np.clip(p['K'] * final_alpha / vol, -p['pos_max'], p['pos_max'])
+        out = {
+            "r_t": r_t, "z_vwap": z_vwap, "imb_t": imb_t, "wf_t": wf_t, "volatility": volatility,
+            "market_alpha": market_alpha, "la_t": la_t, "divergence": divergence, "la_adjusted": la_adjusted,
+            "gate": gate, "final_alpha": final_alpha, "position": position,
+        }
+
+        # 7. 风险预算仓位：更新收益率协方差后按相关性一次求解
+        if self.risk_model_enabled:
+            self.risk_model.update(symbols, r_t, observed=has_prev)
+            out["risk_position"] = self.risk_model.risk_positions(symbols, final_alpha, vol, p['K'], p['pos_max'])
+        return out
+
     def _record_training_sample(self,
                                 symbol: str,
                                 price: float,
@@ -129,24 +333,28 @@ class D5QuantDepartment:
                                 wf_t: float,
                                 la_adjusted: float,
                                 divergence: float,
-                                event_risk: float):
+                                event_risk: float,
+                                ts: Optional[float] = None):
+        """ts 为样本标注时刻（epoch 秒），缺省取系统时间"""
         if price <= 0:
             return
 
         prev = self._pending_sample.get(symbol)
         if prev and prev.get("price", 0.0) > 0:
             y = (price - prev["price"]) / prev["price"]
-            self.training_samples.append({
-                "symbol": symbol,
-                "ts": datetime.now().isoformat(),
-                "x": [1.0, prev["r_t"], prev["z_vwap"], prev["imb_t"], prev["wf_t"]],
-                "la_adjusted": prev["la_adjusted"],
-                "divergence": prev["divergence"],
-                "event_risk": prev["event_risk"],
-                "y": float(y)
-            })
-            if len(self.training_samples) > self.max_training_samples:
-                self.training_samples = self.training_samples[-self.max_training_samples:]
+            x = (1.0, prev["r_t"], prev["z_vwap"], prev["imb_t"], prev["wf_t"])
+            self.training_samples.append(
+                symbol,
+                x,
+                float(y),
+                (prev["la_adjusted"], prev["divergence"], prev["event_risk"]),
+                ts=ts,
+            )
+            if self.rls_enabled:
+                self.rls.update(x, y)
+                # 预热：样本数达到最小训练样本数前只学习、不改动生效参数
+                if self.rls.n_updates >= self.min_training_samples:
+                    self._apply_betas(self.rls.theta)
 
         self._pending_sample[symbol] = {
             "price": float(price),
@@ -167,8 +375,7 @@ class D5QuantDepartment:
             return 0.0
         ret = (market_data.price - prev) / prev
 
-        w = self._ret_windows.setdefault(market_data.symbol, deque(maxlen=120))
-        w.append(ret)
+        self._return_stats(market_data.symbol).push(ret)
         return ret
 
     def _calculate_vwap_zscore(self, market_data: MarketData) -> float:
@@ -177,14 +384,32 @@ class D5QuantDepartment:
             return 0.0
         return (market_data.price - market_data.vwap) / market_data.vwap
 
+    def _return_stats(self, symbol: str) -> RollingStats:
+        stats = self._ret_stats.get(symbol)
+        if stats is None:
+            stats = self._ret_stats[symbol] = RollingStats(self.VOL_WINDOWS)
+        return stats
+
     def _calculate_volatility(self, symbol: str) -> float:
-        """计算滚动波动率（使用近120个收益率）"""
-        w = self._ret_windows.get(symbol)
-        if not w or len(w) < 10:
+        """滚动波动率（最长窗口，增量统计 O(1) 读取）"""
+        stats = self._ret_stats.get(symbol)
+        if stats is None or stats.count() < self.MIN_VOL_SAMPLES:
             return 0.02
-        arr = np.array(w, dtype=float)
-        vol = float(np.std(arr))
-        return max(0.005, min(0.12, vol))
+        return max(0.005, min(0.12, stats.std()))
+
+    def get_volatility_horizons(self, symbol: str) -> Dict[str, float]:
+        """各周期波动率（样本不足的窗口不输出）与 EWMA 波动率"""
+        stats = self._ret_stats.get(symbol)
+        if stats is None:
+            return {}
+        out = {
+            f"vol_{w}": stats.std(w)
+            for w in stats.windows if stats.count(w) >= self.MIN_VOL_SAMPLES
+        }
+        ewma = stats.ewma_volatility()
+        if ewma is not None and stats.count() >= self.MIN_VOL_SAMPLES:
+            out["vol_ewma"] = ewma
+        return out
 
     def _calculate_whale_flow_score(self, whale_flow: WhaleFlow) -> float:
         """计算大额资金流得分"""
@@ -268,26 +493,138 @@ class D5QuantDepartment:
         raw_position = self.params['K'] * final_alpha / volatility
         return max(-self.params['pos_max'], min(self.params['pos_max'], raw_position))
 
+    def _apply_betas(self, betas, params: Optional[Dict[str, float]] = None):
+        """写入 beta（beta_1..beta_4 限制在 [-2, 2]，防止参数爆炸）；params 缺省为生效参数"""
+        target = self.params if params is None else params
+        for i, k in enumerate(self.BETA_KEYS):
+            v = float(betas[i])
+            target[k] = v if i == 0 else float(np.clip(v, -2.0, 2.0))
+
     def update_params(self, new_params: Dict[str, float]):
-        """更新模型参数"""
+        """更新模型参数（手动设置 beta 时以其作为 RLS 的新初始值）"""
         self.params.update(new_params)
+        if any(k in new_params for k in self.BETA_KEYS):
+            self.rls.reset([self.params[k] for k in self.BETA_KEYS])
 
     def get_params(self) -> Dict[str, float]:
         """获取当前参数"""
         return self.params.copy()
 
+    def export_state(self) -> Dict[str, np.ndarray]:
+        """导出模型状态为扁平的 NumPy 数组字典（参数、训练样本、待标注样本、RLS、风险模型），可直接写入 .npz"""
+        X, y, aux, sym = self.training_samples.latest()
+        pending = list(self._pending_sample)
+        state = {
+            "param_keys": np.array(list(self.params), dtype=str),
+            "param_values": np.array(list(self.params.values()), dtype=np.float64),
+            "sample_symbols": np.array(self.training_samples.symbols, dtype=str),
+            "sample_x": X.copy(),
+            "sample_y": y.copy(),
+            "sample_aux": aux.copy(),
+            "sample_sym": sym.copy(),
+            "sample_ts": self.training_samples.timestamps().copy(),
+            "pending_symbols": np.array(pending, dtype=str),
+            "pending_values": np.array(
+                [[self._pending_sample[s][f] for f in self.PENDING_FIELDS] for s in pending], dtype=np.float64
+            ).reshape(len(pending), len(self.PENDING_FIELDS)),
+            "last_price_symbols": np.array(list(self._last_price), dtype=str),
+            "last_price_values": np.array(list(self._last_price.values()), dtype=np.float64),
+            "rls_theta": self.rls.theta.copy(),
+            "rls_P": self.rls.P.copy(),
+            "rls_n_updates": np.array(self.rls.n_updates, dtype=np.int64),
+        }
+        for k, v in self.risk_model.to_arrays().items():
+            state[f"risk_{k}"] = v
+        return state
+
+    def import_state(self,
+                     state: Dict[str, np.ndarray],
+                     restore_data: bool = False,
+                     restore_runtime: bool = False):
+        """
+        从 export_state() 的结果恢复模型状态（缺失的数组保持当前值）。
+        - 模型（参数、RLS）总是恢复
+        - 训练样本与风险模型协方差是累积的观测数据：默认保留当前值（运行中激活/回滚版本不丢弃检查点之后的数据），
+          只有启动加载或移交实例时（restore_data=True）才恢复
+        - 上一价格与待标注样本是运行时观测：只有同一时刻移交实例（restore_runtime=True，如重载部门）时才恢复，
+          避免用检查点时刻的旧价格计算收益率与标注样本
+        """
+        if "param_keys" in state:
+            self.params.update({str(k): float(v) for k, v in zip(state["param_keys"], state["param_values"])})
+        if restore_data and "sample_y" in state:
+            self.training_samples.restore(
+                state["sample_symbols"], state["sample_x"], state["sample_y"],
+                state["sample_aux"], state["sample_sym"], state["sample_ts"],
+            )
+        if restore_runtime and "pending_symbols" in state:
+            self._pending_sample = {
+                str(s): dict(zip(self.PENDING_FIELDS, map(float, row)))
+                for s, row in zip(state["pending_symbols"], state["pending_values"])
+            }
+        if restore_runtime and "last_price_symbols" in state:
+            self._last_price = {
+                str(s): float(v) for s, v in zip(state["last_price_symbols"], state["last_price_values"])
+            }
+        if "rls_theta" in state:
+            self.rls.theta = np.array(state["rls_theta"], dtype=np.float64)
+            self.rls.P = np.array(state["rls_P"], dtype=np.float64)
+            self.rls.n_updates = int(state["rls_n_updates"])
+        if restore_data and "risk_symbols" in state:
+            self.risk_model.restore({k[5:]: v for k, v in state.items() if k.startswith("risk_")})
+
+    def snapshot_training_input(self) -> Dict[str, Any]:
+        """
+        在事件循环上拷贝训练输入：最近 training_window 条样本 (X, y, aux, sym)、生效参数与 RLS 系数。
+        快照交给线程池计算，计算期间 D5 周期可继续写入样本
+        """
+        return {
+            "samples": tuple(a.copy() for a in self.training_samples.latest(self.training_window)),
+            "params": self.get_params(),
+            "rls_theta": self.rls.theta.copy(),
+            "rls_updates": int(self.rls.n_updates),
+        }
+
     def train_from_runtime(self,
                            trade_history: list,
                            positions: list,
                            latest_quotes: Dict[str, float],
                            account_summary: Dict[str, Any],
                            stock_cases: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """基于运行时数据在线训练：回归校准 beta + 风险门控参数"""
-        old = self.get_params()
+        """基于运行时数据在线训练：回归校准 beta + 风险门控参数（同步计算并立即生效）"""
+        update = self.compute_training_update(
+            self.snapshot_training_input(), trade_history, positions, latest_quotes, account_summary
+        )
+        return self.apply_training_update(update)
+
+    def apply_training_update(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        在事件循环上生效训练结果：整体替换参数字典并按需重置 RLS，
+        D5 周期读到的要么全是旧参数、要么全是新参数；训练期间 RLS 写入的 beta 只在本次训练改写时被覆盖
+        """
+        if update["params"]:
+            self.params = {**self.params, **update["params"]}
+        if update["rls_reset"] is not None:
+            self.rls.reset(update["rls_reset"])
+        self.last_training_report = update["report"]
+        return update["report"]
+
+    def compute_training_update(self,
+                                snapshot: Dict[str, Any],
+                                trade_history: list,
+                                positions: list,
+                                latest_quotes: Dict[str, float],
+                                account_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        由训练输入快照计算新参数，不修改实例状态（可在线程池中执行）。
+        返回 {"report": 训练报告, "params": 本次改写的参数, "rls_reset": 重置 RLS 的 beta 或 None}
+        """
+        old = dict(snapshot["params"])
+        params = dict(old)
+        rls_reset = None
 
         # ===== 1) 监督训练样本 =====
-        samples = self.training_samples[-1500:]
-        sample_n = len(samples)
+        X, y, aux, _ = snapshot["samples"]
+        sample_n = len(y)
 
         # 运行统计
         trade_cnt = len(trade_history or [])
@@ -328,18 +665,35 @@ class D5QuantDepartment:
                 "params_after": old,
                 "summary": "D5 training skipped: insufficient samples"
             }
-            self.last_training_report = report
-            return report
+            return {"report": report, "params": {}, "rls_reset": None}
 
         # ===== 3) 线性回归拟合 beta =====
-        X = np.array([s["x"] for s in samples], dtype=float)
-        y = np.array([s["y"] for s in samples], dtype=float)
-
         ridge = 1e-3
         I = np.eye(X.shape[1], dtype=float)
         beta_hat = np.linalg.solve(X.T @ X + ridge * I, X.T @ y)
 
-        pred = X @ beta_hat
+        ridge_mse = float(np.mean((X @ beta_hat - y) ** 2))
+        rls_check: Optional[Dict[str, Any]] = None
+        changed = ["gamma_1", "gamma_2", "K", "lambda_div", "pos_max"]
+        if self.rls_enabled:
+            # beta 已由 RLS 逐样本更新；岭回归仅校验一致性，RLS 明显劣化（或数值异常）时以岭回归解重置
+            theta = np.asarray(snapshot["rls_theta"], dtype=float)
+            rls_mse = float(np.mean((X @ theta - y) ** 2))
+            reset = not np.all(np.isfinite(theta)) or rls_mse > self.rls_reset_ratio * ridge_mse + 1e-12
+            if reset:
+                rls_reset = beta_hat
+                self._apply_betas(beta_hat, params)
+                changed += self.BETA_KEYS
+            rls_check = {
+                "rls_mse": round(rls_mse, 8),
+                "ridge_mse": round(ridge_mse, 8),
+                "max_beta_gap": round(float(np.max(np.abs(theta - beta_hat))), 6),
+                "rls_updates": int(snapshot["rls_updates"]),
+                "reset_to_ridge": bool(reset),
+            }
+            pred = X @ np.array([params[k] for k in self.BETA_KEYS])
+        else:
+            pred = X @ beta_hat
         mse = float(np.mean((pred - y) ** 2)) if len(y) else 0.0
 
         # 方向命中率（忽略极小波动）
@@ -349,20 +703,18 @@ class D5QuantDepartment:
         else:
             hit = 0.5
 
-        # EMA 平滑更新 beta，避免过拟合抖动
-        smooth = 0.25
-        for i, k in enumerate(["beta_0", "beta_1", "beta_2", "beta_3", "beta_4"]):
-            self.params[k] = (1 - smooth) * self.params[k] + smooth * float(beta_hat[i])
-
-        # 防止参数爆炸
-        self.params["beta_1"] = float(np.clip(self.params["beta_1"], -2.0, 2.0))
-        self.params["beta_2"] = float(np.clip(self.params["beta_2"], -2.0, 2.0))
-        self.params["beta_3"] = float(np.clip(self.params["beta_3"], -2.0, 2.0))
-        self.params["beta_4"] = float(np.clip(self.params["beta_4"], -2.0, 2.0))
+        if not self.rls_enabled:
+            # EMA 平滑更新 beta，避免过拟合抖动
+            smooth = 0.25
+            self._apply_betas([
+                (1 - smooth) * params[k] + smooth * float(beta_hat[i])
+                for i, k in enumerate(self.BETA_KEYS)
+            ], params)
+            changed += self.BETA_KEYS
 
         # ===== 4) 研究门控参数微调（基于样本相关性） =====
-        la_vals = np.array([float(s.get("la_adjusted", 0.0)) for s in samples], dtype=float)
-        div_vals = np.array([float(s.get("divergence", 0.0)) for s in samples], dtype=float)
+        la_vals = aux[:, 0]
+        div_vals = aux[:, 1]
         err_vals = np.abs(pred - y)
 
         la_corr = 0.0
@@ -376,32 +728,33 @@ class D5QuantDepartment:
             if np.isnan(div_err_corr):
                 div_err_corr = 0.0
 
-        self.params["gamma_1"] = float(np.clip(self.params["gamma_1"] * (1 + 0.08 * la_corr), 0.6, 3.5))
-        self.params["gamma_2"] = float(np.clip(self.params["gamma_2"] * (1 + 0.08 * max(0.0, div_err_corr)), 0.8, 4.0))
+        params["gamma_1"] = float(np.clip(params["gamma_1"] * (1 + 0.08 * la_corr), 0.6, 3.5))
+        params["gamma_2"] = float(np.clip(params["gamma_2"] * (1 + 0.08 * max(0.0, div_err_corr)), 0.8, 4.0))
 
         # ===== 5) 风险参数调整 =====
         # hit 高且回撤低 -> 略放大；否则收缩
         if hit >= 0.56 and open_win_rate >= 0.54 and max_dd <= 0.08:
-            self.params["K"] = float(np.clip(self.params["K"] * 1.04, 0.4, 2.5))
-            self.params["lambda_div"] = float(np.clip(self.params["lambda_div"] * 0.97, 0.2, 1.5))
-            self.params["pos_max"] = float(np.clip(self.params["pos_max"] * 1.02, 0.3, 1.25))
+            params["K"] = float(np.clip(params["K"] * 1.04, 0.4, 2.5))
+            params["lambda_div"] = float(np.clip(params["lambda_div"] * 0.97, 0.2, 1.5))
+            params["pos_max"] = float(np.clip(params["pos_max"] * 1.02, 0.3, 1.25))
         else:
-            self.params["K"] = float(np.clip(self.params["K"] * 0.94, 0.35, 2.5))
-            self.params["lambda_div"] = float(np.clip(self.params["lambda_div"] * 1.05, 0.2, 1.6))
-            self.params["pos_max"] = float(np.clip(self.params["pos_max"] * 0.96, 0.3, 1.25))
+            params["K"] = float(np.clip(params["K"] * 0.94, 0.35, 2.5))
+            params["lambda_div"] = float(np.clip(params["lambda_div"] * 1.05, 0.2, 1.6))
+            params["pos_max"] = float(np.clip(params["pos_max"] * 0.96, 0.3, 1.25))
 
         if total_pnl < 0 or max_dd > 0.1:
-            self.params["gamma_2"] = float(np.clip(self.params["gamma_2"] * 1.04, 0.8, 4.0))
+            params["gamma_2"] = float(np.clip(params["gamma_2"] * 1.04, 0.8, 4.0))
 
         report = {
             "timestamp": datetime.now().isoformat(),
             "training": {
                 "sample_count": sample_n,
-                "mode": "ridge_regression_online",
+                "mode": "rls_online_ridge_check" if self.rls_enabled else "ridge_regression_online",
                 "mse": round(mse, 8),
                 "directional_hit_rate": round(hit, 4),
                 "la_return_corr": round(la_corr, 4),
                 "divergence_error_corr": round(div_err_corr, 4),
+                "rls_check": rls_check,
             },
             "runtime": {
                 "trade_count": trade_cnt,
@@ -411,8 +764,7 @@ class D5QuantDepartment:
                 "max_drawdown": max_dd,
             },
             "params_before": old,
-            "params_after": self.get_params(),
+            "params_after": params,
             "summary": "D5 online training completed"
         }
-        self.last_training_report = report
-        return report
+        return {"report": report, "params": {k: params[k] for k in changed}, "rls_reset": rls_reset}
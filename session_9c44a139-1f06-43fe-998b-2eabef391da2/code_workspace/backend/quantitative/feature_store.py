@@ -0,0 +1,204 @@
+"""
+D5 特征存储 - 按股票的列式环形缓冲保存每次 D5 计算的特征向量（带时间戳），可选追加写入磁盘
+"""
+from typing import Dict, List, Optional, Sequence, Any
+from datetime import datetime
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+# 每条记录的特征列（时间戳单独存放在第 0 列）
+FEATURE_COLUMNS = (
+    "price", "r_t", "z_vwap", "imb_t", "wf_t", "la_t", "la_adjusted", "divergence",
+    "event_risk", "gate", "market_alpha", "final_alpha", "volatility", "position",
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _SeriesBuffer:
+    """
+    单只股票的列式环形缓冲：
+    - 存储为 (1 + 特征数, 2×capacity) 的 float64 数组，第 0 行为 epoch 秒时间戳，每列特征连续存放
+    - 每条记录同时写入 slot 与 slot+capacity（镜像），最近 n 条始终是一段连续切片
+    """
+
+    def __init__(self, capacity: int, n_columns: int):
+        self.capacity = capacity
+        self._data = np.zeros((1 + n_columns, 2 * capacity), dtype=np.float64)
+        self._count = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, row: np.ndarray):
+        slot = self._count % self.capacity
+        self._data[:, slot] = row
+        self._data[:, slot + self.capacity] = row
+        self._count += 1
+        if self._size < self.capacity:
+            self._size += 1
+
+    def extend(self, rows: np.ndarray):
+        for row in rows[-self.capacity:]:
+            self.append(row)
+
+    def view(self) -> np.ndarray:
+        """按时间升序的全部记录 (1 + 特征数, size)，零拷贝只读视图"""
+        if self._size < self.capacity:
+            out = self._data[:, :self._size]
+        else:
+            end = (self._count - 1) % self.capacity + self.capacity + 1
+            out = self._data[:, end - self._size:end]
+        out.flags.writeable = False
+        return out
+
+
+class FeatureStore:
+    """
+    D5 特征存储：
+    - 内存中每只股票保留最近 capacity 条特征向量（列式环形缓冲，O(1) 追加）
+    - path 非空时每条记录同时以定长二进制行追加到 <path>/<SYMBOL>.f64，
+      进程重启后按需加载尾部 capacity 条；查询早于内存窗口的区间时直接内存映射磁盘文件
+    """
+
+    def __init__(self,
+                 capacity: int = 2048,
+                 path: Optional[str] = None,
+                 columns: Sequence[str] = FEATURE_COLUMNS):
+        self.capacity = max(1, int(capacity))
+        self.columns = tuple(columns)
+        self._row_width = 1 + len(self.columns)
+        self._series: Dict[str, _SeriesBuffer] = {}
+        self.path = self._open_dir(path) if path else None
+
+    def _open_dir(self, path: str) -> Optional[str]:
+        """准备磁盘目录；已有数据的列定义与当前不一致时不写磁盘，避免按错误行宽解析"""
+        try:
+            os.makedirs(path, exist_ok=True)
+            meta_file = os.path.join(path, "columns.json")
+            if os.path.exists(meta_file):
+                with open(meta_file, "r", encoding="utf-8") as f:
+                    stored = tuple(json.load(f).get("columns") or ())
+                if stored != self.columns:
+                    logger.warning("Feature store at %s has columns %s, expected %s; disk persistence disabled",
+                                   path, stored, self.columns)
+                    return None
+            else:
+                with open(meta_file, "w", encoding="utf-8") as f:
+                    json.dump({"columns": list(self.columns)}, f)
+            return path
+        except OSError as e:
+            logger.warning("Feature store directory %s unavailable: %s", path, e)
+            return None
+
+    def _file(self, symbol: str) -> str:
+        return os.path.join(self.path, re.sub(r"[^A-Za-z0-9._-]", "_", symbol) + ".f64")
+
+    def _disk_rows(self, symbol: str) -> Optional[np.ndarray]:
+        """磁盘上该股票的全部记录 (行数, 1 + 特征数)，内存映射只读"""
+        if not self.path:
+            return None
+        file = self._file(symbol)
+        if not os.path.exists(file):
+            return None
+        n = os.path.getsize(file) // (8 * self._row_width)
+        if n == 0:
+            return None
+        return np.memmap(file, dtype=np.float64, mode="r", shape=(n, self._row_width))
+
+    def _truncate_partial_row(self, symbol: str):
+        """异常退出可能留下不完整的尾行，截断后续追加才能保持行对齐"""
+        if not self.path:
+            return
+        file = self._file(symbol)
+        try:
+            size = os.path.getsize(file)
+            extra = size % (8 * self._row_width)
+            if extra:
+                os.truncate(file, size - extra)
+        except OSError:
+            pass
+
+    def _buffer(self, symbol: str) -> _SeriesBuffer:
+        buf = self._series.get(symbol)
+        if buf is None:
+            buf = self._series[symbol] = _SeriesBuffer(self.capacity, len(self.columns))
+            self._truncate_partial_row(symbol)
+            rows = self._disk_rows(symbol)
+            if rows is not None:
+                buf.extend(np.asarray(rows[-self.capacity:]))
+        return buf
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._series)
+
+    def __len__(self) -> int:
+        return sum(len(b) for b in self._series.values())
+
+    def append_batch(self,
+                     symbols: Sequence[str],
+                     timestamp: datetime,
+                     features: Dict[str, np.ndarray]):
+        """追加一次截面计算的结果：features 为 {列名: 长度与 symbols 相同的数组}，缺失列记为 NaN"""
+        n = len(symbols)
+        rows = np.full((n, self._row_width), np.nan)
+        rows[:, 0] = timestamp.timestamp()
+        for j, col in enumerate(self.columns, start=1):
+            values = features.get(col)
+            if values is not None:
+                rows[:, j] = values
+        for symbol, row in zip(symbols, rows):
+            self._buffer(symbol).append(row)
+            if self.path:
+                try:
+                    with open(self._file(symbol), "ab") as f:
+                        f.write(row.tobytes())
+                except OSError as e:
+                    logger.warning("Feature store write failed for %s: %s", symbol, e)
+
+    def append(self, symbol: str, timestamp: datetime, features: Dict[str, float]):
+        self.append_batch([symbol], timestamp, {k: np.array([v], dtype=float) for k, v in features.items()})
+
+    def query(self,
+              symbol: str,
+              since: Optional[datetime] = None,
+              limit: int = 1000) -> Dict[str, Any]:
+        """
+        查询特征序列：since 为空时返回最近 limit 条；否则返回时间戳晚于 since 的最早 limit 条（has_more 表示还有后续）。
+        返回 {"ts": epoch 秒数组, 各特征列: 数组, "has_more": bool}
+        """
+        limit = max(1, int(limit))
+        if symbol in self._series or self._disk_rows(symbol) is not None:
+            data = self._buffer(symbol).view()
+        else:
+            data = np.zeros((self._row_width, 0))
+        ts = data[0]
+        if since is not None:
+            cutoff = since.timestamp()
+            if self.path and (len(ts) == 0 or cutoff < ts[0]):
+                # 早于内存窗口：从磁盘文件读取
+                rows = self._disk_rows(symbol)
+                if rows is not None:
+                    data = rows.T
+                    ts = data[0]
+            start = int(np.searchsorted(ts, cutoff, side="right"))
+            end = min(len(ts), start + limit)
+        else:
+            end = len(ts)
+            start = max(0, end - limit)
+        block = np.array(data[:, start:end])
+        out: Dict[str, Any] = {"ts": block[0]}
+        for j, col in enumerate(self.columns, start=1):
+            out[col] = block[j]
+        out["has_more"] = bool(since is not None and end < len(ts))
+        return out
+
+    def remove_symbol(self, symbol: str) -> bool:
+        """移除内存中的序列（磁盘历史保留，供离线研究）"""
+        return self._series.pop(symbol, None) is not None
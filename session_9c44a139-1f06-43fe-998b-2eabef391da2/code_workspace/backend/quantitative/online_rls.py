@@ -0,0 +1,74 @@
+"""
+带遗忘因子的递推最小二乘（RLS）- 每条带标签样本 O(k²) 更新线性系数，无需批量重解
+"""
+from typing import Optional, Sequence, Dict, Any
+
+import numpy as np
+
+
+class RecursiveLeastSquares:
+    """
+    指数加权递推最小二乘：
+        k = P x / (λ + xᵀ P x)
+        e = y - θᵀ x                （先验误差）
+        θ ← θ + k e
+        P ← (P - k xᵀ P) / λ
+    - forgetting（λ）< 1 时旧样本按 λ^age 衰减，有效样本量约 1 / (1 - λ)
+    - delta 为 P 的初始尺度（先验强度的倒数）：越大越快脱离初始系数
+    - 信号长期缺乏激励时 P 会随 1/λ 膨胀（wind-up），迹超过 max_trace（默认初始迹的 100 倍）时整体缩放回上限
+    """
+
+    def __init__(self,
+                 n_features: int,
+                 forgetting: float = 0.995,
+                 delta: float = 10.0,
+                 initial: Optional[Sequence[float]] = None,
+                 max_trace: Optional[float] = None):
+        self.n_features = int(n_features)
+        self.forgetting = float(forgetting)
+        if not 0.0 < self.forgetting <= 1.0:
+            raise ValueError("forgetting must be in (0, 1]")
+        self.delta = float(delta)
+        self.max_trace = float(max_trace) if max_trace is not None else 100.0 * self.delta * self.n_features
+        self.theta = np.zeros(self.n_features, dtype=np.float64)
+        self.P = np.eye(self.n_features, dtype=np.float64) * self.delta
+        self.n_updates = 0
+        if initial is not None:
+            self.reset(initial)
+
+    def reset(self, theta: Optional[Sequence[float]] = None):
+        """重置协方差；给定 theta 时以其为新的初始系数"""
+        if theta is not None:
+            self.theta = np.asarray(theta, dtype=np.float64).reshape(self.n_features).copy()
+        self.P = np.eye(self.n_features, dtype=np.float64) * self.delta
+        self.n_updates = 0
+
+    def predict(self, x: Sequence[float]) -> float:
+        return float(self.theta @ np.asarray(x, dtype=np.float64))
+
+    def update(self, x: Sequence[float], y: float) -> float:
+        """吸收一条样本，返回先验预测误差"""
+        x = np.asarray(x, dtype=np.float64)
+        Px = self.P @ x
+        denom = self.forgetting + float(x @ Px)
+        if not np.isfinite(denom) or denom <= 1e-12:
+            return 0.0
+        k = Px / denom
+        err = float(y) - float(self.theta @ x)
+        self.theta += k * err
+        self.P = (self.P - np.outer(k, Px)) / self.forgetting
+        # 保持对称，防止数值误差累积
+        self.P = 0.5 * (self.P + self.P.T)
+        trace = float(np.trace(self.P))
+        if trace > self.max_trace:
+            self.P *= self.max_trace / trace
+        self.n_updates += 1
+        return err
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "theta": self.theta.tolist(),
+            "forgetting": self.forgetting,
+            "n_updates": self.n_updates,
+            "p_trace": float(np.trace(self.P)),
+        }
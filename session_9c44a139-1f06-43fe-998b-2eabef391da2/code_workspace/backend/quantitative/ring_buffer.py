@@ -0,0 +1,163 @@
+"""
+训练样本环形缓冲 - 预分配 float64 特征/标签数组，O(1) 追加，最近 n 条以零拷贝视图读取
+"""
+from typing import Dict, List, Optional, Sequence, Tuple, Any
+from datetime import datetime
+
+import numpy as np
+
+
+class SampleRingBuffer:
+    """
+    固定容量的监督样本缓冲：
+    - 特征 X (n_features)、标签 y、辅助列 aux、股票编号 sym、时间戳 ts 各为预分配数组
+    - 存储区为 2×capacity，每条样本同时写入 slot 与 slot+capacity（镜像），
+      因此任意“最近 n 条”（n <= capacity）都是一段连续切片，读取无需拷贝或拼接
+    - 股票代码映射为整数编号（sym 列），按股票删除时整体压缩一次
+    """
+
+    def __init__(self,
+                 capacity: int,
+                 n_features: int,
+                 aux_columns: Sequence[str] = ()):
+        self.capacity = max(1, int(capacity))
+        self.n_features = int(n_features)
+        self.aux_columns = tuple(aux_columns)
+        size = 2 * self.capacity
+        self._x = np.zeros((size, self.n_features), dtype=np.float64)
+        self._y = np.zeros(size, dtype=np.float64)
+        self._aux = np.zeros((size, len(self.aux_columns)), dtype=np.float64)
+        self._sym = np.zeros(size, dtype=np.int32)
+        self._ts = np.zeros(size, dtype=np.float64)
+        self._symbols: List[str] = []
+        self._symbol_ids: Dict[str, int] = {}
+        self._count = 0  # 累计写入条数（决定下一个 slot）
+        self._size = 0
+        self._appended = 0  # 累计追加条数（删除股票不回退，用于判断新增样本量）
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def appended(self) -> int:
+        return self._appended
+
+    @property
+    def symbols(self) -> List[str]:
+        return self._symbols
+
+    def symbol_id(self, symbol: str) -> int:
+        sid = self._symbol_ids.get(symbol)
+        if sid is None:
+            sid = self._symbol_ids[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        return sid
+
+    def append(self,
+               symbol: str,
+               x: Sequence[float],
+               y: float,
+               aux: Sequence[float] = (),
+               ts: Optional[float] = None):
+        slot = self._count % self.capacity
+        mirror = slot + self.capacity
+        sid = self.symbol_id(symbol)
+        t = datetime.now().timestamp() if ts is None else float(ts)
+        for i in (slot, mirror):
+            self._x[i] = x
+            self._y[i] = y
+            if self.aux_columns:
+                self._aux[i] = aux
+            self._sym[i] = sid
+            self._ts[i] = t
+        self._count += 1
+        self._appended += 1
+        if self._size < self.capacity:
+            self._size += 1
+
+    def _window(self, n: Optional[int]) -> slice:
+        n = self._size if n is None else max(0, min(int(n), self._size))
+        if self._size < self.capacity:
+            # 尚未回绕：数据位于 [0, size)
+            return slice(self._size - n, self._size)
+        end = (self._count - 1) % self.capacity + self.capacity + 1
+        return slice(end - n, end)
+
+    def latest(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """最近 n 条（按时间升序）的 (X, y, aux, sym) 只读视图"""
+        w = self._window(n)
+        views = (self._x[w], self._y[w], self._aux[w], self._sym[w])
+        for v in views:
+            v.flags.writeable = False
+        return views
+
+    def timestamps(self, n: Optional[int] = None) -> np.ndarray:
+        return self._ts[self._window(n)]
+
+    def aux_column(self, name: str, n: Optional[int] = None) -> np.ndarray:
+        return self._aux[self._window(n), self.aux_columns.index(name)]
+
+    def clear(self):
+        self._count = 0
+        self._appended = 0
+        self._size = 0
+        self._symbols = []
+        self._symbol_ids = {}
+
+    def remove_symbol(self, symbol: str) -> int:
+        """删除某只股票的全部样本（代码不区分大小写），返回删除条数"""
+        key = str(symbol or "").upper()
+        ids = [sid for name, sid in self._symbol_ids.items() if name.upper() == key]
+        if not ids or self._size == 0:
+            return 0
+        X, y, aux, sym = self.latest()
+        keep = ~np.isin(sym, ids)
+        removed = int(self._size - keep.sum())
+        if removed == 0:
+            return 0
+        X, y, aux, sym, ts = X[keep].copy(), y[keep].copy(), aux[keep].copy(), sym[keep].copy(), self.timestamps()[keep].copy()
+        self._write_block(X, y, aux, sym, ts)
+        return removed
+
+    def _write_block(self, X, y, aux, sym, ts):
+        """以按时间升序的样本整体重写缓冲（从 slot 0 开始，同时写镜像区）"""
+        n = len(y)
+        for start in (0, self.capacity):
+            self._x[start:start + n] = X
+            self._y[start:start + n] = y
+            self._aux[start:start + n] = aux
+            self._sym[start:start + n] = sym
+            self._ts[start:start + n] = ts
+        self._count = n
+        self._size = n
+
+    def restore(self,
+                symbols: Sequence[str],
+                X: np.ndarray,
+                y: np.ndarray,
+                aux: np.ndarray,
+                sym: np.ndarray,
+                ts: np.ndarray):
+        """从导出的数组（latest() + timestamps() + symbols）恢复缓冲，超出容量时保留最近的样本"""
+        keep = slice(max(0, len(y) - self.capacity), len(y))
+        self._symbols = [str(s) for s in symbols]
+        self._symbol_ids = {s: i for i, s in enumerate(self._symbols)}
+        self._write_block(X[keep], y[keep], np.asarray(aux)[keep].reshape(-1, len(self.aux_columns)), sym[keep], ts[keep])
+        self._appended = self._size
+
+    def to_records(self, n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """最近 n 条转为字典列表（调试/导出用）"""
+        X, y, aux, sym = self.latest(n)
+        ts = self.timestamps(n)
+        out = []
+        for i in range(len(y)):
+            rec: Dict[str, Any] = {
+                "symbol": self._symbols[int(sym[i])],
+                "ts": datetime.fromtimestamp(float(ts[i])).isoformat(),
+                "x": X[i].tolist(),
+                "y": float(y[i]),
+            }
+            for j, name in enumerate(self.aux_columns):
+                rec[name] = float(aux[i, j])
+            out.append(rec)
+        return out
@@ -0,0 +1,216 @@
+"""
+跨资产风险模型 - 收益率协方差 EWMA 增量更新 + 向常相关目标收缩，按相关性一次求解风险预算仓位
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CovarianceRiskModel:
+    """
+    收益率协方差风险模型：
+    - 每个 D5 周期以截面收益率向量增量更新 EWMA 二阶矩（零均值假设），只更新当期同时有观测的股票对，
+      并记录每对的累计权重用于去偏；新股票加入时矩阵按需扩容
+    - 估计值向常相关目标收缩（对角为各自方差，非对角为平均相关 × 波动率乘积），
+      收缩强度取 max(shrinkage, N / (N + 有效样本数))，样本少时自动加大
+    - 观测不足 min_observations 的股票按不相关处理（退化为逐只独立仓位）
+    - refresh_every > 1 时求解仓位用的相关矩阵（含正定修正）及其逆矩阵每 refresh_every 次更新才重新估计，
+      期间沿用缓存，每期只做 O(N²) 的矩阵向量乘（回测逐 bar 求解时降低开销）；alpha 与波动率仍逐期使用最新值
+    """
+
+    def __init__(self,
+                 halflife: float = 60.0,
+                 shrinkage: float = 0.5,
+                 min_observations: int = 20,
+                 refresh_every: int = 1):
+        self.decay = 0.5 ** (1.0 / max(float(halflife), 1.0))
+        self.shrinkage = float(np.clip(shrinkage, 0.0, 1.0))
+        self.min_observations = max(1, int(min_observations))
+        self.refresh_every = max(1, int(refresh_every))
+        self._updates = 0
+        self._solver_cache: Optional[tuple] = None  # (股票元组, 估计时的更新次数, 正定相关矩阵, 其逆矩阵)
+        self._symbols: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._s = np.zeros((0, 0))  # EWMA 二阶矩（未去偏）
+        self._w = np.zeros((0, 0))  # 每对股票的累计 EWMA 权重
+        self._n = np.zeros(0, dtype=np.int64)  # 每只股票的观测次数
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+    def _indices(self, symbols: Sequence[str]) -> np.ndarray:
+        new = [s for s in dict.fromkeys(symbols) if s not in self._index]
+        if new:
+            for s in new:
+                self._index[s] = len(self._symbols)
+                self._symbols.append(s)
+            size = len(self._symbols)
+            grow = size - len(self._n)
+            self._s = np.pad(self._s, ((0, grow), (0, grow)))
+            self._w = np.pad(self._w, ((0, grow), (0, grow)))
+            self._n = np.pad(self._n, (0, grow))
+        return np.fromiter((self._index[s] for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def _block(self, idx: np.ndarray):
+        """子矩阵索引：恰为全部股票且顺序一致时用切片（视图），否则用 np.ix_"""
+        if len(idx) == len(self._symbols) and (len(idx) == 0 or (idx[0] == 0 and np.all(np.diff(idx) == 1))):
+            return slice(None), slice(None)
+        return np.ix_(idx, idx)
+
+    def update(self,
+               symbols: Sequence[str],
+               returns: np.ndarray,
+               observed: Optional[np.ndarray] = None):
+        """以一期截面收益率更新；observed 为布尔掩码（无上一价格的股票本期不参与）"""
+        idx = self._indices(symbols)
+        returns = np.asarray(returns, dtype=float)
+        mask = np.isfinite(returns) if observed is None else (np.asarray(observed, dtype=bool) & np.isfinite(returns))
+        idx, r = idx[mask], returns[mask]
+        if len(idx) == 0:
+            return
+        block = self._block(idx)
+        lam = self.decay
+        self._s[block] = lam * self._s[block] + (1.0 - lam) * np.outer(r, r)
+        self._w[block] = lam * self._w[block] + (1.0 - lam)
+        self._n[idx] += 1
+        self._updates += 1
+
+    def covariance(self, symbols: Sequence[str]) -> np.ndarray:
+        """指定股票的收缩协方差矩阵（N×N）"""
+        idx = self._indices(symbols)
+        n = len(idx)
+        if n == 0:
+            return np.zeros((0, 0))
+        block = self._block(idx)
+        w = self._w[block]
+        seen = w > 0
+        sample = np.zeros((n, n))
+        np.divide(self._s[block], w, out=sample, where=seen)
+
+        var = np.diag(sample).copy()
+        enough = (self._n[idx] >= self.min_observations) & (var > 0)
+        var = np.where(var > 0, var, np.nan)
+        sd = np.sqrt(var)
+        scale = np.outer(sd, sd)
+        corr = np.zeros((n, n))
+        valid = seen & np.outer(enough, enough) & np.isfinite(scale)
+        np.divide(sample, scale, out=corr, where=valid)
+        np.fill_diagonal(corr, 1.0)
+        off = valid & ~np.eye(n, dtype=bool)
+        mean_corr = float(corr[off].mean()) if off.any() else 0.0
+
+        # 常相关目标；观测不足的股票与其他股票的相关视为 0
+        target = np.where(np.outer(enough, enough), mean_corr, 0.0)
+        np.fill_diagonal(target, 1.0)
+        eff = float(w[valid].mean()) / (1.0 - self.decay) if valid.any() else 0.0
+        delta = max(self.shrinkage, n / (n + eff)) if eff > 0 else 1.0
+        shrunk = (1.0 - delta) * np.where(valid, corr, target) + delta * target
+        np.fill_diagonal(shrunk, 1.0)
+        return shrunk * np.where(np.isfinite(scale), scale, 0.0)
+
+    def correlation(self, symbols: Sequence[str]) -> np.ndarray:
+        """收缩后的相关系数矩阵；方差未知的股票与其他股票不相关"""
+        cov = self.covariance(symbols)
+        sd = np.sqrt(np.diag(cov))
+        corr = np.zeros_like(cov)
+        scale = np.outer(sd, sd)
+        np.divide(cov, scale, out=corr, where=scale > 0)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def risk_positions(self,
+                       symbols: Sequence[str],
+                       alpha: np.ndarray,
+                       volatility: np.ndarray,
+                       scale: float,
+                       cap: float) -> np.ndarray:
+        """
+        风险预算仓位：在 alpha 符号约束下求解 max aᵀx − ½xᵀCx（x ≥ 0，a = |α|，C 为按 alpha 符号翻转后的收缩相关矩阵），
+        w = scale · sign(α) · min(x, a) / vol。
+        - 每只股票的仓位方向与 alpha 一致，幅度不超过逐只独立的 scale · |α| / vol（相关性只做压缩，不反向对冲）
+        - C 为单位阵时即逐只独立仓位；组合风险不超过不相关情形的 scale · ‖α‖，单只限制在 ±cap
+        """
+        alpha = np.asarray(alpha, dtype=float)
+        n = len(alpha)
+        if n == 0:
+            return np.zeros(0)
+        sign = np.sign(alpha)
+        a = np.abs(alpha)
+        # 按符号翻转是合同变换（D·C·D，逆为 D·C⁻¹·D），a > 0 的子块保持正定
+        corr, inv = self._solver_correlation(symbols)
+        flip = np.outer(sign, sign)
+        corr = corr * flip
+        inv = inv * flip
+
+        # 有效集法：解出负值的股票仓位置 0 后在剩余股票上重解，直到全部非负。
+        # 子块的解由整体逆矩阵经 Schur 补得到：x_F = (P_FF − P_FR·P_RR⁻¹·P_RF)·a_F，只需解 |R| 阶方程
+        x = np.zeros(n)
+        free = a > 0
+        while free.any():
+            rest = ~free
+            sub = inv[np.ix_(free, free)] @ a[free]
+            if rest.any():
+                coupling = inv[np.ix_(rest, free)]
+                sub -= coupling.T @ np.linalg.solve(inv[np.ix_(rest, rest)], coupling @ a[free])
+            if np.all(sub >= 0):
+                x[free] = sub
+                break
+            free[np.flatnonzero(free)[sub < 0]] = False
+        x = np.minimum(x, a)
+
+        risk = float(x @ corr @ x)
+        budget = float(a @ a)
+        if risk > budget > 0:
+            x *= np.sqrt(budget / risk)
+        vol = np.where(np.asarray(volatility, dtype=float) <= 0, 0.01, volatility)
+        return np.clip(scale * sign * x / vol, -cap, cap)
+
+    def _solver_correlation(self, symbols: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """求解用的 (正定相关矩阵, 逆矩阵)；refresh_every > 1 时在股票列表不变且未到刷新间隔前复用缓存"""
+        key = tuple(symbols)
+        cached = self._solver_cache
+        if cached is not None and cached[0] == key and self._updates - cached[1] < self.refresh_every:
+            return cached[2], cached[3]
+        corr = self.correlation(symbols)
+        try:
+            np.linalg.cholesky(corr)
+        except np.linalg.LinAlgError:
+            # 逐对去偏后的估计不保证正定：特征值截断
+            vals, vecs = np.linalg.eigh(corr)
+            corr = (vecs * np.maximum(vals, 1e-6)) @ vecs.T
+        inv = np.linalg.inv(corr)
+        self._solver_cache = (key, self._updates, corr, inv) if self.refresh_every > 1 else None
+        return corr, inv
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "symbols": np.array(self._symbols, dtype=str),
+            "moments": self._s.copy(),
+            "weights": self._w.copy(),
+            "observations": self._n.copy(),
+        }
+
+    def restore(self, arrays: Dict[str, np.ndarray]):
+        """从 to_arrays() 的结果恢复（检查点加载）"""
+        self._symbols = [str(s) for s in arrays["symbols"]]
+        self._index = {s: i for i, s in enumerate(self._symbols)}
+        n = len(self._symbols)
+        self._s = np.array(arrays["moments"], dtype=np.float64).reshape(n, n)
+        self._w = np.array(arrays["weights"], dtype=np.float64).reshape(n, n)
+        self._n = np.array(arrays["observations"], dtype=np.int64).reshape(n)
+        self._solver_cache = None
+
+    def remove_symbol(self, symbol: str) -> bool:
+        """删除某只股票的协方差行列"""
+        i = self._index.get(symbol)
+        if i is None:
+            return False
+        keep = np.arange(len(self._symbols)) != i
+        self._s = self._s[np.ix_(keep, keep)]
+        self._w = self._w[np.ix_(keep, keep)]
+        self._n = self._n[keep]
+        self._symbols.pop(i)
+        self._index = {s: j for j, s in enumerate(self._symbols)}
+        self._solver_cache = None
+        return True
@@ -0,0 +1,116 @@
+"""
+流式收益率统计 - 多窗口滑动均值/方差（滑动 Welford，O(1) 更新）+ EWMA 波动率
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from collections import deque
+import math
+
+
+class _Window:
+    """单个窗口的滑动 Welford 状态"""
+    __slots__ = ("size", "n", "mean", "m2")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, x: float, leaving: Optional[float]):
+        if leaving is None:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x - self.mean)
+        else:
+            old_mean = self.mean
+            self.mean += (x - leaving) / self.n
+            self.m2 += (x - leaving) * (x - self.mean + leaving - old_mean)
+            if self.m2 < 0.0:
+                self.m2 = 0.0
+
+    def reset(self, values):
+        vals = list(values)[-self.size:]
+        self.n = len(vals)
+        self.mean = sum(vals) / self.n if self.n else 0.0
+        self.m2 = sum((v - self.mean) ** 2 for v in vals)
+
+
+class RollingStats:
+    """
+    单只股票的收益率流式统计：
+    - windows 中每个窗口长度维护滑动均值与二阶中心矩，每个新收益率 O(1) 更新；标准差为总体口径（同 np.std）
+    - EWMA 方差 var_t = λ·var_{t-1} + (1-λ)·r_t²（RiskMetrics，零均值假设）
+    - 每 resync_every 次更新按缓冲区重算一次，消除浮点累积误差
+    """
+
+    def __init__(self,
+                 windows: Iterable[int] = (20, 60, 120),
+                 ewma_lambda: float = 0.94,
+                 resync_every: int = 4096):
+        sizes = sorted({int(w) for w in windows if int(w) > 1})
+        if not sizes:
+            raise ValueError("windows must contain at least one length > 1")
+        self._windows: Dict[int, _Window] = {w: _Window(w) for w in sizes}
+        self._buffer: deque = deque(maxlen=sizes[-1])
+        self.ewma_lambda = float(ewma_lambda)
+        self._ewma_var: Optional[float] = None
+        self.resync_every = max(1, int(resync_every))
+        self._since_resync = 0
+        self.total = 0
+
+    @property
+    def windows(self) -> Tuple[int, ...]:
+        return tuple(self._windows)
+
+    @property
+    def max_window(self) -> int:
+        return self._buffer.maxlen
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def values(self) -> deque:
+        """最近 max_window 个收益率（只读使用）"""
+        return self._buffer
+
+    def push(self, x: float):
+        x = float(x)
+        buf = self._buffer
+        n = len(buf)
+        for size, win in self._windows.items():
+            win.push(x, buf[n - size] if n >= size else None)
+        buf.append(x)
+
+        lam = self.ewma_lambda
+        self._ewma_var = x * x if self._ewma_var is None else lam * self._ewma_var + (1.0 - lam) * x * x
+        self.total += 1
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every:
+            self._since_resync = 0
+            for win in self._windows.values():
+                win.reset(buf)
+
+    def count(self, window: Optional[int] = None) -> int:
+        return self._window(window).n
+
+    def mean(self, window: Optional[int] = None) -> float:
+        return self._window(window).mean
+
+    def variance(self, window: Optional[int] = None) -> float:
+        win = self._window(window)
+        return win.m2 / win.n if win.n else 0.0
+
+    def std(self, window: Optional[int] = None) -> float:
+        return math.sqrt(self.variance(window))
+
+    def ewma_volatility(self) -> Optional[float]:
+        return None if self._ewma_var is None else math.sqrt(self._ewma_var)
+
+    def _window(self, window: Optional[int]) -> _Window:
+        if window is None:
+            window = self.max_window
+        try:
+            return self._windows[window]
+        except KeyError:
+            raise KeyError(f"window {window} not tracked (available: {self.windows})") from None
@@ -0,0 +1,119 @@
+"""
+测试回测引擎：D6 规则向量化口径、模拟时钟下的交易限制、部门分数前向填充与决策回放、批量成交
+"""
+import asyncio
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from backtest import OHLCVPanel, BacktestEngine, RuleBasedD6Policy, CachedDecisionPolicy
+from backtest.engine import DIRECTIONS
+from departments.d6_ic import D6ICDepartment
+from models.base_models import TradingDecision
+from trading.paper_trading import PaperTradingEngine
+
+
+def _panel(T=60, N=4, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0.001, 0.02, (T, N)), axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.004, (T, N)))
+    high = np.maximum(open_, close) * 1.01
+    low = np.minimum(open_, close) * 0.99
+    ts = [datetime(2024, 1, 1) + timedelta(days=i) for i in range(T)]
+    return OHLCVPanel(ts, [f"S{i}" for i in range(N)], open_, high, low, close, np.full((T, N), 1e6))
+
+
+def test_rule_policy_matches_d6_risk_rules():
+    rng = random.Random(5)
+    policy = RuleBasedD6Policy()
+    n = 200
+    finals = [{d: SimpleNamespace(score=rng.uniform(-1, 1), confidence=rng.random())
+               for d in rng.sample(["D1", "D2", "D3", "D4"], rng.randint(1, 4))} for _ in range(n)]
+    confs = np.full((n, 4), np.nan)
+    for i, f in enumerate(finals):
+        for d, v in f.items():
+            confs[i, int(d[1]) - 1] = v.confidence
+    quant = {
+        "la_t": np.array([rng.uniform(-1, 1) for _ in range(n)]),
+        "position": np.array([rng.uniform(-0.8, 0.8) for _ in range(n)]),
+        "divergence": np.array([rng.uniform(0, 1) for _ in range(n)]),
+        "volatility": np.full(n, 0.02),
+        "final_alpha": np.zeros(n),
+    }
+    risk = np.array([rng.uniform(0, 1) for _ in range(n)])
+    direction, target = policy.decide(0, np.arange(n), quant, confs, risk)
+
+    for i in range(n):
+        qo = SimpleNamespace(divergence=quant["divergence"][i], event_risk=risk[i], position=quant["position"][i])
+        rc = D6ICDepartment._check_risk_controls(None, finals[i], qo, 0.0)
+        score = quant["la_t"][i]
+        expected_direction = D6ICDepartment._determine_direction(None, score, rc)
+        assert DIRECTIONS[direction[i]] == expected_direction
+        expected = D6ICDepartment._calculate_target_position(None, score, qo.position, rc, expected_direction)
+        assert abs(target[i] - expected) < 1e-12
+
+
+def test_backtest_is_deterministic_and_respects_simulated_limits():
+    panel = _panel()
+    results = [asyncio.run(BacktestEngine(panel, seed=7).run()) for _ in range(2)]
+    assert np.array_equal(results[0].equity, results[1].equity)
+    result = results[0]
+    assert result.metrics["trades"] > 0 and np.isfinite(result.equity).all()
+
+    days = defaultdict(set)
+    for trade in result.trades:
+        ts = datetime.fromisoformat(trade["timestamp"])
+        # 下一根 bar 开盘成交：首根 bar 不成交，时间戳来自面板而非系统时钟
+        assert panel.timestamps[1] <= ts <= panel.timestamps[-1]
+        days[(trade["symbol"], ts.isocalendar()[:2])].add(ts.date())
+    assert max(len(v) for v in days.values()) <= 3
+
+
+def test_department_scores_forward_fill_and_cached_decisions():
+    panel = _panel(T=10, N=2)
+    panel.attach_department_scores([
+        {"symbol": "S0", "timestamp": datetime(2024, 1, 3, 15), "department": "D1", "score": 0.6, "confidence": 0.9},
+        {"symbol": "S0", "timestamp": datetime(2024, 1, 6, 9), "department": "D1", "score": -0.4, "confidence": 0.8},
+    ])
+    s = panel.dept_scores[:, 0, 0]
+    # 1/3 盘中结论从 1/4 的 bar 起生效，之前为缺失
+    assert np.isnan(s[:3]).all() and (s[3:6] == 0.6).all() and (s[6:] == -0.4).all()
+    assert np.isnan(panel.dept_scores[:, 1]).all()
+
+    policy = CachedDecisionPolicy([
+        {"symbol": "S1", "timestamp": "2024-01-02T00:00:00", "direction": "LONG", "target_position": 0.5},
+        {"symbol": "S1", "timestamp": "2024-01-06T00:00:00", "direction": "FLAT", "target_position": 0.0},
+    ])
+    result = asyncio.run(BacktestEngine(panel, policy=policy, fill="close").run())
+    sides = [(t["symbol"], t["side"], t["timestamp"][:10]) for t in result.trades]
+    assert sides == [("S1", "BUY", "2024-01-02"), ("S1", "SELL", "2024-01-06")]
+
+
+def test_batch_execution_matches_per_order_execution():
+    now = datetime(2024, 3, 4, 10)
+
+    def decision(symbol, direction, target):
+        return TradingDecision(symbol=symbol, timestamp=now, direction=direction, target_position=target,
+                               execution_plan={}, risk_controls={}, rationale="test", evidence_ids=[],
+                               department_outputs={})
+
+    items = [(decision("A", "LONG", 0.3), 20.0), (decision("B", "LONG", 0.5), 40.0),
+             (decision("A", "FLAT", 0.0), 21.0), (decision("C", "LONG", 0.4), 10.0)]
+    engines = [PaperTradingEngine(clock=lambda: now, rng=random.Random(1), snapshot_on_trade=False) for _ in range(2)]
+    sequential = [asyncio.run(engines[0].execute_decision(d, px)) for d, px in items]
+
+    recalcs = []
+    original = engines[1]._recalculate_account_metrics
+    engines[1]._recalculate_account_metrics = lambda: recalcs.append(1) or original()
+    batched = asyncio.run(engines[1].execute_decisions_batch(items))
+
+    # 增量维护的账户总值与逐笔求和一致：成交数量、现金与持仓相同，账户指标只重算一次
+    assert [(o.side, o.filled_quantity) for o in batched] == [(o.side, o.filled_quantity) for o in sequential]
+    a, b = engines[0].account, engines[1].account
+    assert np.isclose(a.cash, b.cash) and np.isclose(a.total_value, b.total_value)
+    assert {k: v.quantity for k, v in a.positions.items()} == {k: v.quantity for k, v in b.positions.items()}
+    assert np.isclose(a.daily_pnl, b.daily_pnl)
+    assert len(recalcs) == 1 and engines[1]._batch_value is None
@@ -0,0 +1,85 @@
+"""
+测试 D5 模型检查点：状态导出/导入往返、版本保存/回滚/激活、重启加载生效版本与旧版本清理
+"""
+import numpy as np
+
+from core.scheduler import TradingPlatformScheduler
+from quantitative.checkpoints import D5CheckpointStore
+from quantitative.d5_quant import D5QuantDepartment
+
+
+def _feed(d5, n, seed=0, symbols=("AAPL", "MSFT")):
+    rng = np.random.default_rng(seed)
+    prices = {s: 100.0 for s in symbols}
+    for _ in range(n):
+        for s in symbols:
+            wf = rng.normal()
+            d5._record_training_sample(s, prices[s], rng.normal(scale=0.01), 0.0, 0.1, wf, 0.2, 0.1, 0.0)
+            prices[s] *= 1 + 0.004 * wf + rng.normal(scale=0.001)
+        d5.risk_model.update(list(symbols), rng.normal(0, 0.01, len(symbols)))
+
+
+def test_export_import_round_trip():
+    d5 = D5QuantDepartment(None)
+    _feed(d5, 60)
+    d5._last_price["AAPL"] = 123.0
+    restored = D5QuantDepartment(None)
+    restored.import_state(d5.export_state(), restore_data=True, restore_runtime=True)
+
+    assert restored.get_params() == d5.get_params()
+    for a, b in zip(restored.training_samples.latest(), d5.training_samples.latest()):
+        assert np.array_equal(a, b)
+    assert restored.training_samples.symbols == d5.training_samples.symbols
+    assert restored._pending_sample == d5._pending_sample and restored._last_price == d5._last_price
+    assert np.array_equal(restored.rls.P, d5.rls.P) and restored.rls.n_updates == d5.rls.n_updates
+    assert np.array_equal(restored.risk_model.covariance(["AAPL", "MSFT"]), d5.risk_model.covariance(["AAPL", "MSFT"]))
+    # 恢复后的缓冲可继续追加
+    _feed(restored, 5, seed=1)
+    assert len(restored.training_samples) == len(d5.training_samples) + 10
+
+
+def test_save_rollback_activate_and_reload_on_startup(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    scheduler = TradingPlatformScheduler(state_file=state_file)
+    _feed(scheduler.d5, 30)
+    v1 = scheduler.save_d5_checkpoint(note="baseline")
+    assert v1["version"] == 1 and v1["data_range"]["sample_count"] == 58
+    assert v1["data_range"]["symbols"] == ["AAPL", "MSFT"] and v1["data_range"]["start"] <= v1["data_range"]["end"]
+
+    scheduler.d5.update_params({"beta_4": 0.9})
+    _feed(scheduler.d5, 10, seed=2)
+    v2 = scheduler.save_d5_checkpoint()
+    assert v2["parent"] == 1 and scheduler.list_d5_checkpoints()["active"] == 2
+
+    # 激活旧版本只回退模型：训练样本、风险协方差、上一价格与待标注样本保持当前值
+    _feed(scheduler.d5, 5, seed=3)
+    scheduler.d5._last_price["AAPL"] = 150.0
+    pending = dict(scheduler.d5._pending_sample)
+    samples = [a.copy() for a in scheduler.d5.training_samples.latest()]
+    cov = scheduler.d5.risk_model.covariance(["AAPL", "MSFT"])
+    assert scheduler.rollback_d5_checkpoint()["version"] == 1
+    assert scheduler.d5._last_price["AAPL"] == 150.0 and scheduler.d5._pending_sample == pending
+    assert scheduler.d5.get_params() == v1["params"] and len(scheduler.d5.training_samples) == 88
+    assert all(np.array_equal(a, b) for a, b in zip(scheduler.d5.training_samples.latest(), samples))
+    assert np.array_equal(scheduler.d5.risk_model.covariance(["AAPL", "MSFT"]), cov)
+    scheduler.activate_d5_checkpoint(2)
+    assert scheduler.d5.params["beta_4"] == v2["params"]["beta_4"]
+
+    restarted = TradingPlatformScheduler(state_file=state_file)
+    assert restarted.list_d5_checkpoints()["active"] == 2
+    # 启动加载恢复生效版本保存时的样本
+    assert restarted.d5.get_params() == scheduler.d5.get_params()
+    assert len(restarted.d5.training_samples) == 78
+    assert restarted.d5._last_price == {} and restarted.d5._pending_sample == {}
+
+
+def test_store_prunes_oldest_versions(tmp_path):
+    store = D5CheckpointStore(str(tmp_path), keep=2)
+    state = D5QuantDepartment(None).export_state()
+    for _ in range(3):
+        store.save(state)
+    assert [m["version"] for m in store.list_versions()] == [2, 3] and store.active == 3
+    assert sorted(p.name for p in tmp_path.glob("*.npz")) == ["d5-000002.npz", "d5-000003.npz"]
+    assert store.previous() == 2 and store.previous(2) is None
+    # 索引随目录持久化
+    assert D5CheckpointStore(str(tmp_path)).list_versions() == store.list_versions()
@@ -0,0 +1,85 @@
+"""
+测试 D5 训练后台任务：任务去重、线程池训练完成并写入报告、新增样本达到阈值时自动重训、参数整体替换
+"""
+import asyncio
+
+import numpy as np
+
+from config.settings import config
+from core.scheduler import TradingPlatformScheduler
+
+
+def _feed_samples(d5, n, seed=0):
+    rng = np.random.default_rng(seed)
+    price = 100.0
+    for _ in range(n + 1):
+        wf = rng.normal()
+        d5._record_training_sample("AAPL", price, rng.normal(scale=0.01), 0.0, 0.0, wf, 0.1, 0.0, 0.0)
+        price *= 1 + 0.004 * wf + rng.normal(scale=0.001)
+
+
+async def _wait_job(scheduler, job_id):
+    while scheduler.state.jobs[job_id]["status"] == "running":
+        await asyncio.sleep(0.01)
+    return scheduler.state.jobs[job_id]
+
+
+def test_training_runs_as_deduplicated_background_job(tmp_path):
+    scheduler = TradingPlatformScheduler(state_file=str(tmp_path / "state.json"))
+    _feed_samples(scheduler.d5, 80)
+
+    async def scenario():
+        job_id = scheduler.run_d5_training_manual()
+        assert scheduler.run_d5_training_manual() == job_id
+        return await _wait_job(scheduler, job_id)
+
+    job = asyncio.run(scenario())
+    assert job["type"] == "train_d5" and job["status"] == "completed", job
+    report = scheduler.get_d5_training_report()
+    assert report["training"]["sample_count"] == 80
+    assert scheduler._d5_samples_at_train == 80
+
+
+def test_auto_retrain_after_enough_new_samples(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "d5_auto_train_min_samples", 50)
+    scheduler = TradingPlatformScheduler(state_file=str(tmp_path / "state.json"))
+
+    async def scenario():
+        _feed_samples(scheduler.d5, 30)
+        scheduler._maybe_retrain_d5()
+        assert scheduler._find_running_job("train_d5") is None
+
+        # 检查间隔内不重复检查；间隔过后样本达到阈值即启动任务
+        _feed_samples(scheduler.d5, 30, seed=1)
+        scheduler._maybe_retrain_d5()
+        assert scheduler._find_running_job("train_d5") is None
+        scheduler._last_d5_auto_train = None
+        scheduler._maybe_retrain_d5()
+        job_id = scheduler._find_running_job("train_d5")
+        assert job_id is not None
+        return await _wait_job(scheduler, job_id)
+
+    assert asyncio.run(scenario())["status"] == "completed"
+    # 第二批首个价格与上一批的待标注样本配对，多出 1 条
+    assert scheduler._d5_samples_at_train == scheduler.d5.training_samples.appended == 61
+
+
+def test_training_computes_off_instance_and_swaps_params(tmp_path):
+    """训练计算不修改实例；计算期间照常写入样本，生效时整体替换参数字典"""
+    scheduler = TradingPlatformScheduler(state_file=str(tmp_path / "state.json"))
+    d5 = scheduler.d5
+    _feed_samples(d5, 80)
+    snapshot = d5.snapshot_training_input()
+    params = d5.params
+    before = dict(params)
+
+    update = d5.compute_training_update(snapshot, [], [], {}, {"max_drawdown": 0.0, "total_pnl": 0.0})
+    assert d5.params is params and d5.params == before
+    _feed_samples(d5, 5, seed=2)
+    assert d5.training_samples.appended == 86
+
+    report = d5.apply_training_update(update)
+    assert d5.params is not params
+    assert report["training"]["sample_count"] == 80
+    assert {k: d5.params[k] for k in update["params"]} == update["params"]
+    assert d5.last_training_report is report
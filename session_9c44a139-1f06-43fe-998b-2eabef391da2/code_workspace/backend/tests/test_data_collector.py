@@ -0,0 +1,60 @@
+"""
+测试数据收集器的并发采集与 RSS 解析（不联网）
+"""
+import asyncio
+import pytest
+
+from data.data_collector import DataCollector
+
+
+RSS_SAMPLE = """<?xml version="1.0"?>
+<rss><channel>
+<item><title>Fed holds rates steady - Reuters</title><link>https://example.invalid/a</link>
+<pubDate>Mon, 05 Jan 2026 14:00:00 GMT</pubDate><source>Reuters</source></item>
+<item><title>Oil slips as dollar firms - CNBC</title><link>https://example.invalid/b</link>
+<pubDate>Mon, 05 Jan 2026 13:00:00 GMT</pubDate><source>CNBC</source></item>
+</channel></rss>"""
+
+
+@pytest.mark.asyncio
+async def test_gather_bounded_keeps_order_and_limits_fanout():
+    """结果保持输入顺序，同时在途数量不超过上限"""
+    collector = DataCollector()
+    state = {"running": 0, "peak": 0}
+
+    async def source(i: int):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        return i
+
+    out = await collector.gather_bounded([source(i) for i in range(10)], concurrency=3)
+    assert out == list(range(10))
+    assert state["peak"] <= 3
+
+
+@pytest.mark.asyncio
+async def test_gather_bounded_timeout_and_error_use_default():
+    """单源超时或异常返回 default，不影响其他源"""
+    collector = DataCollector()
+
+    async def slow():
+        await asyncio.sleep(1.0)
+        return "late"
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    async def fast():
+        return "ok"
+
+    out = await collector.gather_bounded([slow(), broken(), fast()], default=[], timeout=0.05)
+    assert out == [[], [], "ok"]
+
+
+def test_parse_google_news_rss():
+    """RSS 解析：清理标题尾缀并按时间倒序"""
+    items = DataCollector()._parse_google_news_rss(RSS_SAMPLE, limit=8)
+    assert [it["title"] for it in items] == ["Fed holds rates steady", "Oil slips as dollar firms"]
+    assert items[0]["reliability_score"] == 0.90
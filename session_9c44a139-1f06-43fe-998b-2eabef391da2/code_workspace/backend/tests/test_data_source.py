@@ -0,0 +1,129 @@
+"""
+测试录制/回放数据源（不联网）
+"""
+from datetime import datetime
+import asyncio
+import pytest
+
+from data.data_source import (
+    DataSource, RecordingDataSource, ReplayDataSource, ReplayFinished, ReplayedFetchError, set_data_source,
+)
+from data.http_cache import CachedResponse
+
+
+class _ScriptedSource(DataSource):
+    """按时间脚本返回固定正文的内层数据源"""
+
+    def __init__(self):
+        self.clock = datetime(2026, 1, 5, 14, 30)
+        self.bodies = {}
+
+    async def fetch(self, url, ttl_seconds=60, headers=None, timeout=12.0):
+        return CachedResponse(status=200, text=self.bodies[url])
+
+    def now(self):
+        return self.clock
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_by_simulated_clock(tmp_path):
+    """回放按模拟时钟返回该时刻及之前最近的录制"""
+    url = "https://stooq.invalid/q?s=aapl.us"
+    inner = _ScriptedSource()
+    recorder = RecordingDataSource(str(tmp_path), inner=inner)
+
+    inner.bodies[url] = "close=100"
+    await recorder.fetch(url)
+    await recorder.fetch(url)  # 正文不变不重复记录
+    inner.clock = datetime(2026, 1, 5, 14, 40)
+    inner.bodies[url] = "close=101"
+    await recorder.fetch(url)
+    assert recorder.recorded == 2
+
+    replay = ReplayDataSource(str(tmp_path), speed=0.0)
+    assert replay.now() == datetime(2026, 1, 5, 14, 30)
+    assert (await replay.fetch(url)).text == "close=100"
+
+    await replay.sleep(5 * 60)
+    assert (await replay.fetch(url)).text == "close=100"
+    await replay.sleep(5 * 60)
+    assert replay.now() == datetime(2026, 1, 5, 14, 40)
+    assert (await replay.fetch(url)).text == "close=101"
+
+    missing = await replay.fetch("https://unknown.invalid/")
+    assert not missing.ok and missing.status == 404
+
+
+@pytest.mark.asyncio
+async def test_replay_never_serves_future_recordings(tmp_path):
+    """模拟时钟早于某 URL 首条录制时按缺失处理，不返回未来的响应"""
+    early = "https://stooq.invalid/q?s=aapl.us"
+    late = "https://stooq.invalid/q?s=nvda.us"
+    inner = _ScriptedSource()
+    recorder = RecordingDataSource(str(tmp_path), inner=inner)
+    inner.bodies[early] = "close=100"
+    await recorder.fetch(early)
+    inner.clock = datetime(2026, 1, 5, 14, 45)
+    inner.bodies[late] = "close=900"
+    await recorder.fetch(late)
+
+    replay = ReplayDataSource(str(tmp_path))
+    assert (await replay.fetch(early)).text == "close=100"
+    before = await replay.fetch(late)
+    assert before.status == 404 and before.text is None
+    assert replay.get_stats()["missing"] == 1
+    await replay.sleep(15 * 60)
+    assert (await replay.fetch(late)).text == "close=900"
+
+
+class _FlakySource(_ScriptedSource):
+    async def fetch(self, url, ttl_seconds=60, headers=None, timeout=12.0):
+        if self.bodies.get(url) is None:
+            raise TimeoutError("upstream timed out")
+        return await super().fetch(url, ttl_seconds, headers, timeout)
+
+
+@pytest.mark.asyncio
+async def test_failed_fetches_are_recorded_and_replayed(tmp_path):
+    """录制期间的失败请求回放时同样失败"""
+    url = "https://stooq.invalid/q?s=msft.us"
+    inner = _FlakySource()
+    recorder = RecordingDataSource(str(tmp_path), inner=inner)
+    with pytest.raises(TimeoutError):
+        await recorder.fetch(url)
+    inner.clock = datetime(2026, 1, 5, 14, 40)
+    inner.bodies[url] = "close=50"
+    await recorder.fetch(url)
+    assert recorder.recorded == 2
+
+    replay = ReplayDataSource(str(tmp_path))
+    with pytest.raises(ReplayedFetchError, match="TimeoutError"):
+        await replay.fetch(url)
+    await replay.sleep(10 * 60)
+    assert (await replay.fetch(url)).text == "close=50"
+    assert replay.get_stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_replay_stops_scheduler_at_end_of_archive(tmp_path):
+    """模拟时钟越过最后一条录制后 sleep 抛出 ReplayFinished，调度循环随之停止"""
+    from core.scheduler import TradingPlatformScheduler
+
+    inner = _ScriptedSource()
+    url = "https://stooq.invalid/q?s=aapl.us"
+    inner.bodies[url] = "close=100"
+    await RecordingDataSource(str(tmp_path / "archive"), inner=inner).fetch(url)
+
+    replay = ReplayDataSource(str(tmp_path / "archive"))
+    await replay.sleep(0)
+    with pytest.raises(ReplayFinished):
+        await replay.sleep(1)
+    assert replay.finished
+
+    set_data_source(ReplayDataSource(str(tmp_path / "archive")))
+    try:
+        scheduler = TradingPlatformScheduler(state_file=str(tmp_path / "state.json"))
+        await asyncio.wait_for(scheduler.start(), timeout=5)
+        assert not scheduler.state.is_running
+    finally:
+        set_data_source(None)
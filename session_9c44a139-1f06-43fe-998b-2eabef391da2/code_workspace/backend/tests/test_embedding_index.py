@@ -0,0 +1,115 @@
+"""
+测试记忆语义向量索引（候选内相似度、删除后行号复用、检索排序、部门批量检索）
+"""
+import asyncio
+import random
+from datetime import datetime
+
+import numpy as np
+
+from memory.embedding_index import EmbeddingIndex, HashingEmbedder
+from memory.memory_store import InMemoryStore, MemoryManager, MemoryType, MemoryScope
+from departments.base_department import BaseDepartment
+from models.base_models import Evidence
+
+VOCAB = (
+    "fed rate cut inflation yields guidance earnings beat miss capex datacenter ai chip margin "
+    "risk drawdown stop-loss regime policy tariff oil dollar 回撤 止损 数据中心 利率"
+).split()
+
+
+def _texts(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCAB) for _ in range(rng.randint(5, 15))) for _ in range(n)]
+
+
+def test_embedder_is_deterministic_and_normalized():
+    a, b = HashingEmbedder(dim=64), HashingEmbedder(dim=64)
+    va, vb = a.embed("fed rate cut 利率下调"), b.embed("fed rate cut 利率下调")
+    assert va.dtype == np.float32 and np.allclose(va, vb)
+    assert abs(float(np.linalg.norm(va)) - 1.0) < 1e-5
+    assert float(va @ a.embed("rate cut by the fed")) > float(va @ a.embed("oil tariff dollar"))
+
+
+def test_similarities_follow_rows_after_removals():
+    texts = _texts(300)
+    index = EmbeddingIndex()
+    for i, t in enumerate(texts):
+        index.add(f"m{i}", t)
+    removed = {f"m{i}" for i in range(0, 300, 3)}
+    for eid in removed:
+        index.remove(eid)
+    assert len(index) == 200 and index.matrix.shape == (200, index.dim)
+
+    # 末行填补空位后，相似度仍按条目而非行号计算
+    q = "earnings beat guidance"
+    qv = index.embedder.embed(q)
+    candidates = [f"m{i}" for i in range(0, 300, 2)]
+    sims = index.similarities(q, candidates)
+    assert set(sims) == set(candidates) - removed
+    for eid, s in sims.items():
+        assert abs(s - float(index.embedder.embed(texts[int(eid[1:])]) @ qv)) < 1e-5
+
+    index.clear()
+    assert len(index) == 0 and index.similarities(q, candidates) == {}
+
+
+def test_retrieval_ranks_semantic_matches_first():
+    manager = MemoryManager(InMemoryStore(), embedding_index=EmbeddingIndex(), embedding_weight=1.0)
+    for t in _texts(60):
+        manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, t, "D3", "AAPL", importance=0.5)
+    target = manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC,
+                                "datacenter capex ai chip margin", "D3", "AAPL", importance=0.5)
+    top = manager.retrieve_relevant_memory("D3", "AAPL", query_text="datacenter capex ai chip margin", max_entries=3)
+    assert top[0].entry_id == target.entry_id
+
+
+def test_batch_retrieval_matches_single_queries():
+    manager = MemoryManager(InMemoryStore(), embedding_index=EmbeddingIndex(), embedding_weight=0.5)
+    rng = random.Random(4)
+    symbols = ["AAPL", "MSFT", "NVDA"]
+    for i, t in enumerate(_texts(240)):
+        manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, t, "D3", rng.choice(symbols),
+                           importance=rng.random())
+    queries = {"AAPL": "earnings beat guidance", "MSFT": "datacenter capex ai", "NVDA": "回撤 止损", "TSLA": "oil"}
+    batch = manager.retrieve_relevant_memory_batch("D3", queries, max_entries=5)
+    for sym, q in queries.items():
+        single = manager.retrieve_relevant_memory("D3", sym, query_text=q, max_entries=5)
+        assert [e.entry_id for e in batch[sym]] == [e.entry_id for e in single]
+    assert batch["TSLA"] == []
+
+
+class _StubDepartment(BaseDepartment):
+    def __init__(self, manager):
+        super().__init__("D3", manager)
+        self.gathered = []
+
+    async def gather_evidence(self, stock_symbol=None):
+        self.gathered.append(stock_symbol)
+        if stock_symbol == "FAIL":
+            raise RuntimeError("source down")
+        return [Evidence(content=f"{stock_symbol} datacenter capex", timestamp=datetime.now(),
+                         source_id=f"ev_{stock_symbol}", reliability_score=0.8, summary=f"{stock_symbol} capex")]
+
+    def get_department_name(self):
+        return "stub"
+
+
+def test_department_prepare_batch_uses_one_lookup(monkeypatch):
+    """部门批量准备：证据逐股收集，记忆摘要一次批量检索，结果与单股摘要一致"""
+    manager = MemoryManager(InMemoryStore(), embedding_index=EmbeddingIndex(), embedding_weight=0.5)
+    for i, t in enumerate(_texts(90)):
+        manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, t, "D3", ["AAPL", "MSFT"][i % 2])
+    dept = _StubDepartment(manager)
+    calls = []
+    original = manager.get_summary_batch
+    monkeypatch.setattr(manager, "get_summary_batch", lambda *a, **k: calls.append(a) or original(*a, **k))
+
+    assert asyncio.run(dept.prepare_batch(["AAPL", "MSFT", "FAIL", "AAPL"])) == 2
+    assert len(calls) == 1 and set(calls[0][1]) == {"AAPL", "MSFT"}
+    assert dept.gathered == ["AAPL", "MSFT", "FAIL"]
+    for sym in ("AAPL", "MSFT"):
+        evidence, summary = dept._prepared[sym]
+        query = dept._build_memory_query(sym, evidence, None)
+        single = manager.retrieve_relevant_memory("D3", sym, query_text=query)
+        assert summary == manager._format_summary(single)
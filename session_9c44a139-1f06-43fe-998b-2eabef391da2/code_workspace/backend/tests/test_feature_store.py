@@ -0,0 +1,49 @@
+"""
+测试 D5 特征存储：环形缓冲回绕、按 since 分页查询、磁盘追加与重启加载、早于内存窗口的查询
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from quantitative.feature_store import FeatureStore
+
+T0 = datetime(2024, 3, 1, 9, 30)
+
+
+def _fill(store, n, symbols=("AAPL", "MSFT")):
+    for i in range(n):
+        store.append_batch(list(symbols), T0 + timedelta(minutes=i),
+                           {"r_t": np.array([i, -i], dtype=float)[:len(symbols)], "gate": np.full(len(symbols), 0.5)})
+
+
+def test_ring_buffer_wraps_and_since_pages_forward():
+    store = FeatureStore(capacity=8)
+    _fill(store, 20)
+    latest = store.query("AAPL", limit=5)
+    assert latest["r_t"].tolist() == [15, 16, 17, 18, 19] and not latest["has_more"]
+    assert np.isnan(latest["z_vwap"]).all() and (latest["gate"] == 0.5).all()
+    assert store.query("MSFT")["r_t"].tolist() == [-i for i in range(12, 20)]
+
+    page = store.query("AAPL", since=T0 + timedelta(minutes=13), limit=3)
+    assert page["r_t"].tolist() == [14, 15, 16] and page["has_more"]
+    page = store.query("AAPL", since=datetime.fromtimestamp(page["ts"][-1]), limit=3)
+    assert page["r_t"].tolist() == [17, 18, 19] and not page["has_more"]
+    assert len(store.query("UNKNOWN")["ts"]) == 0 and "UNKNOWN" not in store.symbols
+
+
+def test_disk_history_survives_restart_and_serves_old_ranges(tmp_path):
+    store = FeatureStore(capacity=8, path=str(tmp_path))
+    _fill(store, 20)
+    # 模拟异常退出留下的不完整尾行
+    with open(tmp_path / "AAPL.f64", "ab") as f:
+        f.write(b"\x00" * 5)
+
+    reopened = FeatureStore(capacity=8, path=str(tmp_path))
+    assert reopened.query("AAPL")["r_t"].tolist() == list(range(12, 20))
+    reopened.append("AAPL", T0 + timedelta(minutes=20), {"r_t": 20.0})
+    old = reopened.query("AAPL", since=T0 - timedelta(minutes=1), limit=4)
+    assert old["r_t"].tolist() == [0, 1, 2, 3] and old["has_more"]
+    assert reopened.query("AAPL", since=T0 + timedelta(minutes=18))["r_t"].tolist() == [19, 20]
+
+    # 列定义不一致时不写磁盘
+    assert FeatureStore(path=str(tmp_path), columns=("r_t",)).path is None
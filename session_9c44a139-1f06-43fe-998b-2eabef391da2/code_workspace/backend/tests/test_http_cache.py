@@ -0,0 +1,120 @@
+"""
+测试 HTTP 持久化缓存（不联网）
+"""
+import time
+import pytest
+
+from data.http_cache import HttpCache
+
+
+def _seed(cache: HttpCache, url: str, body: str, age_seconds: float = 0.0):
+    cache._write(url, {
+        "url": url,
+        "body": body,
+        "etag": '"v1"',
+        "last_modified": None,
+        "fetched_at": time.time() - age_seconds,
+    })
+
+
+@pytest.mark.asyncio
+async def test_http_cache_hit_within_ttl(tmp_path):
+    """TTL 内直接命中，不发网络请求"""
+    cache = HttpCache(str(tmp_path))
+    _seed(cache, "https://example.invalid/feed", "<rss/>")
+    resp = await cache.fetch("https://example.invalid/feed", ttl_seconds=60)
+    assert resp.ok and resp.from_cache
+    assert resp.text == "<rss/>"
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_http_cache_persists_across_instances(tmp_path):
+    """落盘条目在新实例中可用"""
+    cache = HttpCache(str(tmp_path))
+    _seed(cache, "https://example.invalid/q", '{"a": 1}')
+    reopened = HttpCache(str(tmp_path), memory_entries=0)
+    entry = reopened._load("https://example.invalid/q")
+    assert entry is not None and entry["etag"] == '"v1"'
+    assert reopened.get_stats()["entries"] == 1
+
+
+def test_http_cache_size_limit_evicts_oldest(tmp_path):
+    """超过目录上限时淘汰最旧条目"""
+    cache = HttpCache(str(tmp_path), max_bytes=2000)
+    for i in range(10):
+        _seed(cache, f"https://example.invalid/{i}", "x" * 300)
+    stats = cache.get_stats()
+    assert stats["total_bytes"] <= 2000
+    assert stats["evictions"] > 0
+    assert cache._load("https://example.invalid/9") is not None
+
+
+class _FakeResponse:
+    def __init__(self, status, text="", headers=None):
+        self.status = status
+        self._text = text
+        self.headers = headers or {}
+
+    async def text(self):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeSession:
+    """替代 aiohttp.ClientSession：记录请求头，返回预置响应"""
+    requests = []
+    response = None
+
+    def __init__(self, timeout=None, headers=None):
+        self.headers = dict(headers or {})
+
+    def get(self, url):
+        _FakeSession.requests.append((url, self.headers))
+        return _FakeSession.response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.mark.asyncio
+async def test_http_cache_revalidates_with_conditional_request(tmp_path, monkeypatch):
+    """过期条目带 If-None-Match / If-Modified-Since 重新验证，304 沿用缓存正文并续期"""
+    import aiohttp
+    monkeypatch.setattr(aiohttp, "ClientSession", _FakeSession)
+    monkeypatch.setattr(_FakeSession, "requests", [])
+    monkeypatch.setattr(_FakeSession, "response", _FakeResponse(304))
+
+    url = "https://example.invalid/feed"
+    cache = HttpCache(str(tmp_path))
+    cache._write(url, {
+        "url": url,
+        "body": "<rss>v1</rss>",
+        "etag": '"v1"',
+        "last_modified": "Mon, 05 Jan 2026 14:30:00 GMT",
+        "fetched_at": time.time() - 120,
+    })
+
+    before = time.time()
+    resp = await cache.fetch(url, ttl_seconds=60, headers={"User-Agent": "test"})
+    assert resp.ok and resp.revalidated and resp.from_cache
+    assert resp.text == "<rss>v1</rss>"
+    (_, sent), = _FakeSession.requests
+    assert sent["If-None-Match"] == '"v1"'
+    assert sent["If-Modified-Since"] == "Mon, 05 Jan 2026 14:30:00 GMT"
+    assert sent["User-Agent"] == "test"
+
+    # 续期写回磁盘：新实例在 TTL 内直接命中，不再发请求
+    assert HttpCache(str(tmp_path), memory_entries=0)._load(url)["fetched_at"] >= before
+    again = await cache.fetch(url, ttl_seconds=60)
+    assert again.from_cache and not again.revalidated and again.text == "<rss>v1</rss>"
+    assert len(_FakeSession.requests) == 1
+    stats = cache.get_stats()
+    assert stats["revalidated"] == 1 and stats["hits"] == 1 and stats["misses"] == 0
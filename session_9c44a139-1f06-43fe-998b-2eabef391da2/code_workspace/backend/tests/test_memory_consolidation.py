@@ -0,0 +1,122 @@
+"""
+测试短期记忆合并为长期摘要（聚类、来源追溯、确定性、LLM 回退、聚类不阻塞事件循环）
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+from memory.consolidation import MemoryConsolidator, DIGEST_KIND
+from memory.memory_store import InMemoryStore, MemoryManager, MemoryType, MemoryScope
+from memory.sqlite_store import SQLiteMemoryStore
+
+NVDA_NOTES = [
+    "NVDA 数据中心需求强劲，资本开支上修。建议加仓，止损 5%。",
+    "数据中心订单继续增长，资本开支指引上调；维持加仓，止损位 5%。",
+    "NVDA 数据中心收入超预期，资本开支上修带动 GPU 需求。",
+    "数据中心资本开支上修，需求强劲，继续加仓。",
+]
+
+
+def _fill(manager: MemoryManager, hours_ago: float = 24):
+    created = datetime.now() - timedelta(hours=hours_ago)
+    ids = []
+    for i, text in enumerate(NVDA_NOTES + ["美联储利率维持不变，政策偏鹰，风险偏好下降。"]):
+        e = manager.add_memory(MemoryType.STM, MemoryScope.STOCK_SPECIFIC, text, "D3", "NVDA",
+                               importance=0.5 + 0.05 * i)
+        e.created_at = created + timedelta(minutes=i)
+        manager.store.store(e)
+        ids.append(e.entry_id)
+    return ids
+
+
+def test_similar_stm_collapse_into_ltm_digest(tmp_path):
+    for store in (InMemoryStore(), SQLiteMemoryStore(str(tmp_path / "c.db"))):
+        manager = MemoryManager(store)
+        ids = _fill(manager)
+        fresh = manager.add_memory(MemoryType.STM, MemoryScope.STOCK_SPECIFIC, NVDA_NOTES[0], "D3", "NVDA")
+
+        stats = asyncio.run(MemoryConsolidator(manager).consolidate())
+        assert stats["digests"] == 1 and stats["consolidated"] == 4
+
+        digests = [e for e in store.query(memory_type=MemoryType.LTM) if e.metadata.get("memory_kind") == DIGEST_KIND]
+        assert len(digests) == 1
+        digest = digests[0]
+        assert digest.metadata["source_entry_ids"] == ids[:4]
+        assert digest.metadata["summarizer"] == "extractive"
+        assert digest.importance == 0.65 and digest.expires_at is None
+        assert "数据中心" in digest.content and "美联储" not in digest.content
+        assert all(store.retrieve(eid) is None for eid in ids[:4])
+        # 不相似的条目、未到最小时长的新条目保留
+        assert store.retrieve(ids[4]) is not None and store.retrieve(fresh.entry_id) is not None
+
+
+def test_consolidation_is_deterministic_and_falls_back_from_llm():
+    contents = []
+    for _ in range(2):
+        manager = MemoryManager(InMemoryStore())
+        _fill(manager)
+        consolidator = MemoryConsolidator(manager)
+        entries = sorted(manager.store.query(memory_type=MemoryType.STM), key=lambda e: e.created_ts)
+        assert [len(g) for g in consolidator.cluster(entries)] == [4, 1]
+        contents.append(consolidator.extractive_summary(entries[:4]))
+    assert contents[0] == contents[1]
+
+    async def failing(entries):
+        raise RuntimeError("no api key")
+
+    manager = MemoryManager(InMemoryStore())
+    _fill(manager)
+    asyncio.run(MemoryConsolidator(manager, summarizer=failing).consolidate())
+    digest = manager.store.query(memory_type=MemoryType.LTM)[0]
+    assert digest.metadata["summarizer"] == "extractive"
+
+
+def test_cluster_changed_during_summary_is_skipped(tmp_path):
+    for store in (InMemoryStore(), SQLiteMemoryStore(str(tmp_path / "s.db"))):
+        manager = MemoryManager(store)
+        ids = _fill(manager)
+
+        async def evicting(entries):
+            # 摘要等待期间其中一条被删除（如容量淘汰）
+            store.delete(entries[0].entry_id)
+            return "summary"
+
+        stats = asyncio.run(MemoryConsolidator(manager, summarizer=evicting).consolidate())
+        assert stats["digests"] == 0 and stats["skipped"] == 1
+        assert not [e for e in store.query(memory_type=MemoryType.LTM)]
+        assert all(store.retrieve(eid) is not None for eid in ids[1:])
+
+
+def test_clustering_runs_off_the_event_loop(tmp_path):
+    manager = MemoryManager(SQLiteMemoryStore(str(tmp_path / "loop.db")))
+    ids = _fill(manager)
+    consolidator = MemoryConsolidator(manager)
+    threads = []
+    inner = consolidator.cluster
+
+    def slow_cluster(entries):
+        threads.append(threading.get_ident())
+        time.sleep(0.2)
+        return inner(entries)
+
+    consolidator.cluster = slow_cluster
+
+    async def run():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        stats = await consolidator.consolidate()
+        task.cancel()
+        return stats, threading.get_ident(), len(ticks)
+
+    stats, loop_thread, ticks = asyncio.run(run())
+    # 聚类在线程池中执行，期间事件循环继续调度其他协程；摘要写入与删除回到事件循环完成
+    assert threads and all(t != loop_thread for t in threads) and ticks >= 5
+    assert stats["digests"] == 1 and all(manager.store.retrieve(eid) is None for eid in ids[:4])
@@ -0,0 +1,225 @@
+"""
+测试 InMemoryStore 二级索引与过期堆
+"""
+import copy
+import random
+from datetime import datetime, timedelta
+
+from memory.memory_store import InMemoryStore, MemoryEntry, MemoryType, MemoryScope
+
+
+def _entry(i: int, rng: random.Random, expires_at=None) -> MemoryEntry:
+    scope = rng.choice([MemoryScope.GLOBAL, MemoryScope.STOCK_SPECIFIC])
+    return MemoryEntry(
+        entry_id=f"e{i}",
+        memory_type=rng.choice(list(MemoryType)),
+        scope=scope,
+        department=rng.choice(["D1", "D2", "D3", "D6"]),
+        stock_symbol=None if scope == MemoryScope.GLOBAL else rng.choice(["AAPL", "MSFT", "NVDA"]),
+        content=f"memory {i}",
+        metadata={},
+        created_at=datetime.now(),
+        expires_at=expires_at,
+        importance=rng.random(),
+        access_count=rng.randint(0, 5),
+    )
+
+
+def _scan(store: InMemoryStore, limit: int = 100, **filters):
+    """与索引无关的全表扫描参考实现"""
+    out = []
+    for e in store._entries.values():
+        if e.is_expired():
+            continue
+        if any(v and getattr(e, k) != v for k, v in filters.items()):
+            continue
+        out.append(e)
+    out.sort(key=lambda x: (x.importance, x.access_count), reverse=True)
+    return out[:limit]
+
+
+def test_indexed_query_matches_full_scan():
+    """各种过滤组合下，索引查询与全表扫描结果一致"""
+    rng = random.Random(3)
+    store = InMemoryStore()
+    for i in range(600):
+        store.store(_entry(i, rng))
+    for i in range(0, 600, 7):
+        store.delete(f"e{i}")
+    # 覆盖写入：桶发生变化
+    moved = _entry(1, rng)
+    moved.scope, moved.department, moved.stock_symbol = MemoryScope.STOCK_SPECIFIC, "D2", "AAPL"
+    store.store(moved)
+
+    cases = [
+        dict(scope=MemoryScope.STOCK_SPECIFIC, department="D2", stock_symbol="AAPL"),
+        dict(scope=MemoryScope.STOCK_SPECIFIC, department="D3"),
+        dict(scope=MemoryScope.GLOBAL, department="D1"),
+        dict(memory_type=MemoryType.LTM),
+        dict(memory_type=MemoryType.STM, scope=MemoryScope.GLOBAL, department="D6"),
+        dict(),
+    ]
+    for filters in cases:
+        got = store.query(limit=25, **filters)
+        want = _scan(store, limit=25, **filters)
+        assert [e.entry_id for e in got] == [e.entry_id for e in want], filters
+
+
+def test_cleanup_expired_uses_heap_and_skips_stale_items():
+    """过期清理只删除真正过期的条目；已删除/改期的堆项被跳过"""
+    rng = random.Random(5)
+    store = InMemoryStore()
+    past = datetime.now() - timedelta(minutes=1)
+    future = datetime.now() + timedelta(days=1)
+    for i in range(10):
+        store.store(_entry(i, rng, expires_at=past if i % 2 == 0 else future))
+    store.delete("e0")
+    renewed = store.retrieve("e2")
+    renewed.expires_at = future
+    store.store(renewed)
+
+    assert store.cleanup_expired() == 3  # e4, e6, e8
+    assert set(store._entries) == {"e1", "e2", "e3", "e5", "e7", "e9"}
+    assert all(e.entry_id in store._entries for e in store.query(limit=100))
+
+
+def test_text_index_scores_match_idf_weighted_formula():
+    """索引化的余弦/关键词重叠与按 IDF 加权查询的逐条计算一致，罕见词的权重高于常见词"""
+    import math
+    from collections import Counter
+    from memory.memory_store import MemoryManager
+    from memory.text_index import tokenize_text
+
+    rng = random.Random(9)
+    vocab = ["nvda", "guidance", "capex", "rate-cut", "fed", "margin", "ai", "datacenter", "risk", "q3", "2.5"]
+    store = InMemoryStore()
+    manager = MemoryManager(store)
+    for i in range(150):
+        words = [rng.choice(vocab) for _ in range(rng.randint(0, 12))]
+        store.store(MemoryEntry(
+            entry_id=f"t{i}", memory_type=MemoryType.LTM, scope=MemoryScope.STOCK_SPECIFIC,
+            department="D3", stock_symbol="NVDA", content=" ".join(words), metadata={},
+            created_at=datetime.now() - timedelta(hours=i), importance=rng.random(),
+        ))
+
+    query = "NVDA datacenter capex guidance risk risk"
+    sims = store.text_index.score(query)
+    docs = {eid: Counter(tokenize_text(e.content)) for eid, e in store._entries.items()}
+    q_tf = Counter(tokenize_text(query))
+    idf = {t: math.log((1 + len(docs)) / (1 + sum(t in d for d in docs.values()))) + 1 for t in q_tf}
+    q_norm = math.sqrt(sum((q_tf[t] * idf[t]) ** 2 for t in q_tf))
+    for eid, tf in docs.items():
+        cos, key = sims.get(eid, (0.0, 0.0))
+        e_norm = math.sqrt(sum(v * v for v in tf.values()))
+        dot = sum(q_tf[t] * idf[t] * tf[t] for t in q_tf)
+        assert abs(cos - (dot / (e_norm * q_norm) if e_norm else 0.0)) < 1e-9
+        assert abs(key - sum(idf[t] for t in q_tf if tf[t]) / sum(idf.values())) < 1e-9
+
+    # 只命中一个查询词时，命中罕见词的条目得分高于命中常见词的条目
+    store.store(MemoryEntry(
+        entry_id="rare", memory_type=MemoryType.LTM, scope=MemoryScope.STOCK_SPECIFIC, department="D3",
+        stock_symbol="NVDA", content="hbm", metadata={}, created_at=datetime.now(), importance=0.5))
+    store.store(MemoryEntry(
+        entry_id="common", memory_type=MemoryType.LTM, scope=MemoryScope.STOCK_SPECIFIC, department="D3",
+        stock_symbol="NVDA", content="risk", metadata={}, created_at=datetime.now(), importance=0.5))
+    sims = store.text_index.score("hbm risk")
+    assert sims["rare"][0] > sims["common"][0] and sims["rare"][1] > sims["common"][1]
+
+    store.delete("t0")
+    assert "t0" not in store.text_index
+    top = manager.retrieve_relevant_memory("D3", "NVDA", query_text=query, max_entries=10)
+    assert len(top) == 10 and all(e.entry_id != "t0" for e in top)
+
+
+def test_cjk_memories_are_retrievable_by_chinese_query():
+    """中文记忆按二元组参与语义评分，混合语言查询可命中"""
+    from memory.memory_store import MemoryManager
+    from memory.text_index import tokenize_text
+
+    assert tokenize_text("NVDA 风控回撤") == ["nvda", "风控", "控回", "回撤"]
+
+    store = InMemoryStore()
+    manager = MemoryManager(store)
+    texts = {
+        "a": "分析结论：数据中心资本开支上调，核心论点为 AI 需求强劲",
+        "b": "核心论点：利率维持高位，银行净息差承压",
+        "c": "风控提示：回撤超过止损线时减仓",
+    }
+    for eid, text in texts.items():
+        store.store(MemoryEntry(
+            entry_id=eid, memory_type=MemoryType.LTM, scope=MemoryScope.STOCK_SPECIFIC,
+            department="D3", stock_symbol="NVDA", content=text, metadata={},
+            created_at=datetime.now(), importance=0.5,
+        ))
+    top = manager.retrieve_relevant_memory("D3", "NVDA", query_text="数据中心资本开支 AI", max_entries=1)
+    assert top[0].entry_id == "a"
+    top = manager.retrieve_relevant_memory("D3", "NVDA", query_text="回撤止损", max_entries=1)
+    assert top[0].entry_id == "c"
+
+
+def test_incremental_eviction_matches_full_prune():
+    """插入时增量淘汰与全量 prune 的容量规则结果一致，且感知重要性变化"""
+    from memory.memory_store import MemoryManager
+
+    rng = random.Random(21)
+    incremental = MemoryManager(InMemoryStore())
+    full = MemoryManager(InMemoryStore())
+    for m in (incremental, full):
+        m.max_bucket_entries = 6
+        m.max_total_entries = 15
+
+    for i in range(80):
+        dept, sym = rng.choice([("D2", "AAPL"), ("D3", "AAPL"), ("D3", "MSFT"), ("D6", "MSFT")])
+        imp = round(rng.random(), 3)
+        e = incremental.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, f"m{i}", dept, sym, importance=imp)
+        e2 = copy.copy(e)
+        full.store.store(e2)
+        full.prune_memories()
+        if i == 40:
+            # 降低一条高优先级记忆的重要性，应尽快被淘汰
+            victim = max(incremental.store._entries.values(), key=lambda x: x.importance)
+            incremental.update_importance(victim.entry_id, -1.0)
+            full.update_importance(victim.entry_id, -1.0)
+
+    assert len(incremental.store) == 15
+    assert set(incremental.store._entries) == set(full.store._entries)
+
+
+def test_batch_trade_feedback_matches_sequential_scan():
+    """按索引批量反馈与逐只股票全表扫描的结果一致，且只触及相关条目"""
+    from memory.memory_store import MemoryManager
+
+    rng = random.Random(5)
+    now = datetime.now()
+    manager = MemoryManager(InMemoryStore())
+    for i in range(300):
+        e = _entry(i, rng)
+        e.created_at = now - timedelta(hours=rng.uniform(0, 24 * 60))
+        manager.store.store(e)
+    expected = {eid: e.importance for eid, e in manager.store._entries.items()}
+    feedback = [("AAPL", 0.12, "LONG"), ("msft", 0.2, "SHORT"), ("TSLA", 0.001, "LONG")]
+
+    # 参考实现：逐只股票遍历全部条目
+    for sym, pnl, direction in feedback:
+        signed = -pnl if direction == "SHORT" else pnl
+        delta_base = max(-0.10, min(0.10, signed * 0.25))
+        if abs(delta_base) < 0.002:
+            continue
+        for eid, e in manager.store._entries.items():
+            related = str(e.stock_symbol or "").upper() == sym.upper() or (
+                e.scope == MemoryScope.GLOBAL and e.department in ("D1", "D5", "D7")
+            )
+            age_h = max(0.0, (now - e.created_at).total_seconds() / 3600.0)
+            if not related or age_h > 24 * 45:
+                continue
+            expected[eid] = max(0.0, min(1.0, expected[eid] + delta_base / (1.0 + age_h / 48.0)))
+
+    touched = manager.apply_trade_feedback_batch(feedback, as_of=now)
+    assert touched > 0
+    for eid, e in manager.store._entries.items():
+        assert abs(e.importance - expected[eid]) < 1e-12
+        if e.feedback is not None:
+            assert e.feedback.last_symbol in ("AAPL", "MSFT")
+            assert e.stock_symbol in ("AAPL", "MSFT") or e.department == "D1"
+    nvda = manager.store.entries_for_symbol("nvda")
+    assert nvda and all(e.feedback is None for e in nvda)
@@ -0,0 +1,47 @@
+"""
+测试新闻近重复聚类
+"""
+from datetime import datetime
+
+from models.base_models import Evidence
+from data.news_dedup import NearDuplicateIndex, cluster_evidence, content_hash
+
+
+def _ev(title: str, source: str, minute: int, reliability: float = 0.78) -> Evidence:
+    return Evidence(
+        content=title,
+        timestamp=datetime(2026, 1, 5, 14, minute),
+        source_id=f"google_news_{content_hash(title, source)}",
+        reliability_score=reliability,
+        summary=title[:120],
+        metadata={"source": source, "link": f"https://{source.lower()}.invalid/x"},
+    )
+
+
+def test_content_hash_is_stable():
+    """内容哈希固定，不随进程变化"""
+    assert content_hash("Fed holds rates", "https://a") == "2281cb2556445595"
+    assert len(content_hash("x")) == 16
+    assert content_hash("a", "b") != content_hash("ab")
+
+
+def test_syndicated_copies_merge_into_one_evidence():
+    """转载标题合并为一条，保留多来源与最高可靠性"""
+    index = NearDuplicateIndex()
+    items = [
+        _ev("Fed holds interest rates steady, signals two cuts later this year", "Yahoo", 1),
+        _ev("Fed holds interest rates steady; signals two cuts later this year", "Reuters", 2, 0.90),
+        _ev("Fed holds interest rates steady, signals 2 cuts later this year", "MarketWatch", 3),
+        _ev("Oil prices slide as OPEC+ weighs output increase", "CNBC", 4),
+    ]
+    merged = cluster_evidence(items, index=index)
+    assert len(merged) == 2
+    fed = merged[0]
+    assert [s["source"] for s in fed.metadata["sources"]] == ["Yahoo", "Reuters", "MarketWatch"]
+    assert fed.reliability_score == 0.90
+    assert fed.metadata["duplicate_count"] == 3
+
+    # 同一新闻再次出现（其他部门/下一轮）得到相同 source_id
+    again = cluster_evidence([_ev("Fed holds interest rates steady, signals two cuts later this year", "WSJ", 9)], index=index)
+    assert again[0].source_id == fed.source_id
+    assert NearDuplicateIndex().assign(items[0].content) == fed.source_id.split("_", 1)[1]
@@ -0,0 +1,51 @@
+"""
+测试递推最小二乘（收敛到最小二乘解、遗忘因子跟踪漂移）及 D5 在线 beta 更新
+"""
+import numpy as np
+
+from quantitative.d5_quant import D5QuantDepartment
+from quantitative.online_rls import RecursiveLeastSquares
+
+
+def test_rls_matches_least_squares_without_forgetting():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([np.ones(400), rng.normal(size=(400, 3))])
+    y = X @ np.array([0.1, -0.5, 2.0, 0.3]) + rng.normal(scale=0.05, size=400)
+    rls = RecursiveLeastSquares(4, forgetting=1.0, delta=1e6)
+    for xi, yi in zip(X, y):
+        rls.update(xi, yi)
+    ols = np.linalg.lstsq(X, y, rcond=None)[0]
+    assert np.allclose(rls.theta, ols, atol=1e-4)
+
+
+def test_forgetting_tracks_coefficient_drift():
+    rng = np.random.default_rng(1)
+    rls = RecursiveLeastSquares(2, forgetting=0.97, delta=100.0)
+    for t in range(1200):
+        x = np.array([1.0, rng.normal()])
+        beta = np.array([0.0, 1.0 if t < 600 else -1.0])
+        rls.update(x, x @ beta + rng.normal(scale=0.01))
+    assert abs(rls.theta[1] + 1.0) < 0.05
+
+
+def test_d5_updates_betas_per_labelled_sample_and_checks_against_ridge():
+    rng = np.random.default_rng(2)
+    d5 = D5QuantDepartment(None)
+    d5.min_training_samples = 20
+    before = d5.get_params()["beta_4"]
+    price = 100.0
+    for _ in range(120):
+        wf = rng.normal()
+        d5._record_training_sample("AAPL", price, rng.normal(scale=0.01), 0.0, 0.0, wf, 0.1, 0.0, 0.0)
+        price *= 1 + 0.004 * wf + rng.normal(scale=0.001)
+    assert d5.rls.n_updates == len(d5.training_samples) == 119
+    assert d5.get_params()["beta_4"] != before
+    assert abs(d5.get_params()["beta_4"] - 0.004) < 0.002
+
+    report = d5.train_from_runtime([], [], {}, {"max_drawdown": 0.0, "total_pnl": 0.0})
+    check = report["training"]["rls_check"]
+    assert report["training"]["mode"] == "rls_online_ridge_check"
+    assert check["rls_updates"] == 119 and not check["reset_to_ridge"]
+
+    d5.update_params({"beta_4": 0.35})
+    assert d5.rls.theta[4] == 0.35 and d5.rls.n_updates == 0
@@ -0,0 +1,73 @@
+"""
+测试 D5 参数搜索：walk-forward 切分、按样本内选参、提前停止、进程池与单线程结果一致、风险模型选项显式传入
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backtest import BacktestEngine, OHLCVPanel, ParameterSearch, grid_candidates, walk_forward_splits
+
+
+def _panel(T=120, N=3, seed=9):
+    rng = np.random.default_rng(seed)
+    close = 40 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, (T, N)), axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.004, (T, N)))
+    ts = [datetime(2023, 1, 2) + timedelta(days=i) for i in range(T)]
+    return OHLCVPanel(ts, [f"S{i}" for i in range(N)], open_, np.maximum(open_, close) * 1.01,
+                      np.minimum(open_, close) * 0.99, close, np.full((T, N), 5e5))
+
+
+def test_walk_forward_splits():
+    assert walk_forward_splits(100, n_folds=4) == [(0, 20, 40), (20, 40, 60), (40, 60, 80), (60, 80, 100)]
+    assert walk_forward_splits(100, n_folds=2, train_bars=30, test_bars=10, anchored=True) == [(0, 80, 90), (0, 90, 100)]
+    with pytest.raises(ValueError):
+        walk_forward_splits(10, n_folds=5, train_bars=8)
+
+
+def test_search_selects_in_sample_and_stops_early():
+    panel = _panel()
+    candidates = grid_candidates({"K": [0.3, 0.9], "gamma_1": [0.5, 2.5]})
+    report = asyncio.run(ParameterSearch(panel, candidates, n_folds=3, max_workers=0).run())
+    assert report["evaluated"] == 4 and not report["stopped_early"]
+    assert report["searched_params"] == ["K", "gamma_1"]
+    tops = report["top"]
+    assert [t["is_mean"] for t in tops] == sorted((t["is_mean"] for t in tops), reverse=True)
+    # 每折选中的参数来自候选集，且是该折样本内得分最高者
+    for fold in report["walk_forward"]["folds"]:
+        assert fold["params"] in candidates
+        picked = [t for t in tops if t["params"] == fold["params"]]
+        assert picked and picked[0]["selected_in_folds"] >= 1
+    assert sum(t["selected_in_folds"] for t in tops) == 3
+    # 样本外得分只来自逐折选参：每折的样本外窗口都未参与该折的选参
+    assert all("oos_mean" not in t for t in tops)
+    wf = report["walk_forward"]
+    folds = wf["folds"]
+    assert all(f["train"][1] < f["test"][0] for f in folds)
+    assert abs(wf["oos_mean"] - np.mean([f["oos_score"] for f in folds])) < 1e-12
+    assert abs(wf["degradation"] - (wf["is_mean"] - wf["oos_mean"])) < 1e-12
+
+    # 完全相同的候选不会带来提升：patience=2 时第 3 个批次后停止
+    same = [{"K": 0.5}] * 6
+    report = asyncio.run(ParameterSearch(panel, same, n_folds=2, max_workers=0, batch_size=1, patience=2).run())
+    assert report["stopped_early"] and report["evaluated"] == 3
+
+
+def test_process_pool_matches_inline():
+    panel = _panel(T=80, N=2)
+    candidates = grid_candidates({"pos_max": [0.4, 0.8]})
+    inline = asyncio.run(ParameterSearch(panel, candidates, n_folds=2, max_workers=0).run())
+    pooled = asyncio.run(ParameterSearch(panel, candidates, n_folds=2, max_workers=2).run())
+    assert inline["top"] == pooled["top"]
+    assert inline["walk_forward"]["folds"] == pooled["walk_forward"]["folds"]
+
+
+def test_search_passes_risk_model_options_explicitly():
+    panel = _panel(T=60)
+    search = ParameterSearch(panel, grid_candidates({"pos_max": [0.4]}), n_folds=2, max_workers=0,
+                             risk_model=False, risk_refresh_bars=10,
+                             engine_options={"risk_model": True, "seed": 3})
+    assert search.engine_options == {"risk_model": False, "risk_refresh_bars": 10, "seed": 3}
+    engine = BacktestEngine(panel, **search.engine_options)
+    assert engine.d5.risk_model_enabled is False and engine.d5.risk_model.refresh_every == 10
@@ -0,0 +1,46 @@
+"""
+测试训练样本环形缓冲（回绕顺序、零拷贝视图、按股票删除）
+"""
+import numpy as np
+
+from quantitative.ring_buffer import SampleRingBuffer
+
+
+def _fill(buf: SampleRingBuffer, n: int):
+    ref = []
+    for i in range(n):
+        sym = ["AAPL", "MSFT", "NVDA"][i % 3]
+        x = [1.0, i * 0.1, -i * 0.01]
+        buf.append(sym, x, float(i), (i * 2.0,), ts=1_700_000_000 + i)
+        ref.append((sym, x, float(i), i * 2.0))
+    return ref
+
+
+def test_latest_is_ordered_zero_copy_view_across_wraparound():
+    buf = SampleRingBuffer(capacity=50, n_features=3, aux_columns=("la_adjusted",))
+    assert len(buf) == 0 and buf.latest()[1].shape == (0,)
+    for total in (10, 50, 51, 137, 200):
+        buf.clear()
+        ref = _fill(buf, total)[-50:]
+        assert len(buf) == len(ref)
+        for n in (1, 7, 50, None):
+            X, y, aux, sym = buf.latest(n)
+            tail = ref[-n:] if n else ref
+            assert y.tolist() == [r[2] for r in tail]
+            assert np.array_equal(X, np.array([r[1] for r in tail]))
+            assert aux[:, 0].tolist() == [r[3] for r in tail]
+            assert [buf.symbols[i] for i in sym] == [r[0] for r in tail]
+            assert np.shares_memory(X, buf._x) and not X.flags.writeable
+        assert buf.aux_column("la_adjusted", 3).tolist() == [r[3] for r in ref[-3:]]
+
+
+def test_remove_symbol_compacts_and_keeps_appending():
+    buf = SampleRingBuffer(capacity=40, n_features=3, aux_columns=("la_adjusted",))
+    ref = _fill(buf, 95)[-40:]
+    assert buf.remove_symbol("msft") == sum(1 for r in ref if r[0] == "MSFT")
+    kept = [r for r in ref if r[0] != "MSFT"]
+    assert buf.latest()[1].tolist() == [r[2] for r in kept]
+
+    buf.append("TSLA", [1.0, 0.0, 0.0], 999.0, (0.0,))
+    assert buf.latest(2)[1].tolist() == [kept[-1][2], 999.0]
+    assert buf.to_records(1)[0]["symbol"] == "TSLA"
@@ -0,0 +1,112 @@
+"""
+测试跨资产风险模型：无相关信息时退化为独立仓位、相关股票组的仓位被压缩、增删股票、相关矩阵按间隔刷新与 D5 截面输出
+"""
+import copy
+
+import numpy as np
+
+from quantitative.d5_quant import D5QuantDepartment
+from quantitative.risk_model import CovarianceRiskModel
+
+
+def _correlated_model(n_sector=10, steps=300, seed=0):
+    rng = np.random.default_rng(seed)
+    model = CovarianceRiskModel(halflife=60, min_observations=20)
+    symbols = [f"SEMI{i}" for i in range(n_sector)] + ["UTIL"]
+    for _ in range(steps):
+        factor = rng.normal(0, 0.02)
+        model.update(symbols, np.r_[factor + rng.normal(0, 0.008, n_sector), rng.normal(0, 0.02)])
+    return model, symbols
+
+
+def test_without_history_positions_match_independent_sizing():
+    model = CovarianceRiskModel()
+    alpha = np.array([0.02, -0.01, 0.005])
+    vol = np.array([0.02, 0.01, 0.0])
+    w = model.risk_positions(["A", "B", "C"], alpha, vol, scale=0.6, cap=0.8)
+    assert np.allclose(w, np.clip(0.6 * alpha / np.array([0.02, 0.01, 0.01]), -0.8, 0.8))
+
+
+def test_correlated_group_is_deconcentrated():
+    model, symbols = _correlated_model()
+    cov = model.covariance(symbols)
+    assert np.allclose(cov, cov.T) and np.linalg.eigvalsh(cov).min() > 0
+    corr = model.correlation(symbols)
+    assert corr[0, 1] > 0.6 and abs(corr[0, -1]) < corr[0, 1]
+
+    alpha = np.full(len(symbols), 0.01)
+    vol = np.full(len(symbols), 0.02)
+    independent = 0.6 * alpha / vol
+    w = model.risk_positions(symbols, alpha, vol, scale=0.6, cap=10.0)
+    # 同一行业 10 只股票合计敞口远低于独立仓位之和，不相关的股票基本保持独立仓位
+    assert w[:-1].sum() < 0.3 * independent[:-1].sum()
+    assert 0.5 * independent[-1] < w[-1] <= independent[-1] + 1e-12
+
+    assert model.remove_symbol("SEMI0") and not model.remove_symbol("SEMI0")
+    assert model.symbols == symbols[1:] and model.covariance(symbols[1:]).shape == (10, 10)
+
+
+def test_unequal_alphas_keep_their_sign():
+    # 4 只 ρ≈0.94 的股票、alpha 大小不一：仓位不能翻转成反向对冲，也不能超过独立仓位
+    rng = np.random.default_rng(3)
+    model = CovarianceRiskModel(halflife=60, min_observations=20)
+    symbols = ["A", "B", "C", "D"]
+    for _ in range(400):
+        model.update(symbols, rng.normal(0, 0.02) + rng.normal(0, 0.005, 4))
+    assert model.correlation(symbols)[0, 1] > 0.85
+
+    alpha = np.array([0.05, 0.03, 0.02, 0.025])
+    vol = np.full(4, 0.02)
+    independent = 0.6 * alpha / vol
+    w = model.risk_positions(symbols, alpha, vol, scale=0.6, cap=10.0)
+    assert np.all(w >= 0) and np.all(w <= independent + 1e-12)
+    assert w[0] > 0 and w.sum() < independent.sum()
+
+    mixed = np.array([0.05, -0.03, 0.02, -0.025])
+    w = model.risk_positions(symbols, mixed, vol, scale=0.6, cap=10.0)
+    assert np.all(w * mixed >= 0) and np.all(np.abs(w) <= 0.6 * np.abs(mixed) / vol + 1e-12)
+
+
+def test_refresh_every_reuses_correlation_between_refreshes():
+    model, symbols = _correlated_model()
+    model.refresh_every = 3
+    rng = np.random.default_rng(5)
+    alpha = rng.normal(0, 0.02, len(symbols))
+    vol = np.full(len(symbols), 0.02)
+    fresh = model.risk_positions(symbols, alpha, vol, scale=0.6, cap=10.0)
+    frozen = copy.deepcopy(model)
+
+    # 刷新间隔内：新收益率只进入二阶矩，求解沿用上次估计的相关矩阵（alpha 仍用最新值）
+    for _ in range(2):
+        model.update(symbols, rng.normal(0, 0.05, len(symbols)))
+    alpha = rng.normal(0, 0.02, len(symbols))
+    assert np.allclose(model.risk_positions(symbols, alpha, vol, 0.6, 10.0),
+                       frozen.risk_positions(symbols, alpha, vol, 0.6, 10.0))
+    assert not np.allclose(fresh, model.risk_positions(symbols, alpha, vol, 0.6, 10.0))
+
+    # 到达间隔后重新估计，结果与不缓存的模型一致
+    model.update(symbols, rng.normal(0, 0.05, len(symbols)))
+    uncached = copy.deepcopy(model)
+    uncached.refresh_every = 1
+    uncached._solver_cache = None
+    assert np.allclose(model.risk_positions(symbols, alpha, vol, 0.6, 10.0),
+                       uncached.risk_positions(symbols, alpha, vol, 0.6, 10.0))
+    assert not np.allclose(model.risk_positions(symbols, alpha, vol, 0.6, 10.0),
+                           frozen.risk_positions(symbols, alpha, vol, 0.6, 10.0))
+
+
+def test_d5_quant_arrays_emit_risk_positions():
+    d5 = D5QuantDepartment(None)
+    rng = np.random.default_rng(1)
+    symbols = ["A", "B"]
+    price = np.array([100.0, 50.0])
+    prev = np.full(2, np.nan)
+    for _ in range(40):
+        common = rng.normal(0, 0.01)
+        out = d5._quant_arrays(price, prev, price * 0.999, np.full(2, 10.0), np.full(2, 5.0),
+                               np.tile([1e5, 0.0, 0.0, 1e6], (2, 1)), np.full((2, 4), np.nan),
+                               np.full((2, 4), np.nan), np.zeros(2), symbols)
+        prev, price = price, price * (1 + common + rng.normal(0, 0.001, 2))
+    assert "risk_position" in out and np.all(np.abs(out["risk_position"]) <= d5.params["pos_max"])
+    # 两只高度相关、alpha 同向的股票：预算后仓位不超过独立仓位
+    assert np.all(np.abs(out["risk_position"]) <= np.abs(out["position"]) + 1e-12)
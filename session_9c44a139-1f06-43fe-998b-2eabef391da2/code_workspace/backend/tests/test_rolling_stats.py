@@ -0,0 +1,35 @@
+"""
+测试流式收益率统计（多窗口滑动方差、EWMA）与 D5 波动率
+"""
+import random
+
+import numpy as np
+
+from quantitative.rolling_stats import RollingStats
+
+
+def test_windowed_moments_match_numpy():
+    rng = random.Random(2)
+    stats = RollingStats(windows=(5, 20, 120), resync_every=1000)
+    values = []
+    for i in range(3000):
+        x = rng.gauss(0.0005, 0.02) * (5 if i % 500 == 0 else 1)
+        stats.push(x)
+        values.append(x)
+        if i % 37 == 0 or i < 130:
+            for w in (5, 20, 120):
+                tail = np.array(values[-w:])
+                assert stats.count(w) == len(tail)
+                assert abs(stats.mean(w) - tail.mean()) < 1e-12
+                assert abs(stats.std(w) - tail.std()) < 1e-10
+    assert stats.std() == stats.std(120) and len(stats) == 120
+
+
+def test_ewma_volatility_recursion():
+    stats = RollingStats(windows=(10,), ewma_lambda=0.9)
+    assert stats.ewma_volatility() is None
+    var = None
+    for x in (0.01, -0.02, 0.03, 0.0, -0.01):
+        stats.push(x)
+        var = x * x if var is None else 0.9 * var + 0.1 * x * x
+    assert abs(stats.ewma_volatility() - var ** 0.5) < 1e-15
@@ -0,0 +1,97 @@
+"""
+测试行情数据源健康度跟踪
+"""
+from data.source_health import SourceHealthTracker
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_failing_source_cools_down_and_recovers():
+    """连续失败进入冷却被跳过，冷却结束后重新参与排序"""
+    clock = _Clock()
+    tracker = SourceHealthTracker(["stooq", "yahoo_chart"], failure_threshold=3, cooldown_seconds=60, clock=clock)
+    assert tracker.ordered() == ["stooq", "yahoo_chart"]
+
+    for _ in range(3):
+        tracker.record_failure("stooq", "TimeoutError")
+    assert tracker.ordered() == ["yahoo_chart"]
+    assert tracker.get_stats()["sources"]["stooq"]["skipped"] == 1
+
+    clock.t += 61
+    assert "stooq" in tracker.ordered()
+
+
+def test_order_prefers_faster_reliable_source_and_adapts_timeout():
+    """慢源排后，超时随 P95 延迟收敛"""
+    tracker = SourceHealthTracker(["stooq", "yahoo_chart"], min_timeout=2.0, max_timeout=10.0, clock=_Clock())
+    for _ in range(10):
+        tracker.record_success("stooq", 3.0)
+        tracker.record_success("yahoo_chart", 0.2)
+    assert tracker.ordered() == ["yahoo_chart", "stooq"]
+    assert tracker.timeout_for("yahoo_chart") == 2.0
+    assert tracker.timeout_for("stooq") == 6.0
+
+
+def test_all_sources_cooling_down_keeps_one_probe():
+    """全部冷却时保留最早解冻的源做探测"""
+    clock = _Clock()
+    tracker = SourceHealthTracker(["a", "b"], failure_threshold=1, cooldown_seconds=60, clock=clock)
+    tracker.record_failure("a")
+    clock.t += 10
+    tracker.record_failure("b")
+    assert tracker.ordered() == ["a"]
+
+
+def test_cache_hits_and_empty_results_do_not_move_health():
+    """缓存命中不压低延迟分位数；无数据股票不让源进入冷却"""
+    tracker = SourceHealthTracker(["stooq"], failure_threshold=2, min_timeout=2.0, max_timeout=10.0, clock=_Clock())
+    for _ in range(5):
+        tracker.record_success("stooq", 3.0)
+    for _ in range(50):
+        tracker.record_cache_hit("stooq")
+        tracker.record_empty("stooq")
+    assert tracker.timeout_for("stooq") == 6.0 and tracker.ordered() == ["stooq"]
+    stats = tracker.get_stats()["sources"]["stooq"]
+    assert stats["cache_hits"] == 50 and stats["empty"] == 50 and stats["failures"] == 0
+
+
+def test_market_data_falls_back_on_empty_and_build_errors(tmp_path):
+    import asyncio
+    from core.scheduler import TradingPlatformScheduler
+
+    scheduler = TradingPlatformScheduler(state_file=str(tmp_path / "state.json"))
+    calls = []
+
+    async def empty(symbol, timeout):
+        return None, False
+
+    async def chart(symbol, timeout):
+        return [(10.0, 100.0)], False
+
+    async def broken_build(symbol, payload):
+        raise ValueError("bad payload")
+
+    async def quote(symbol, timeout):
+        return {"regularMarketPrice": 10.0}, True
+
+    async def build_quote(symbol, payload):
+        calls.append(symbol)
+        return "market", "whale"
+
+    scheduler._fetch_stooq_quote_row = empty
+    scheduler._fetch_yahoo_chart_series = chart
+    scheduler._build_from_yahoo_chart = broken_build
+    scheduler._fetch_yahoo_quote_row = quote
+    scheduler._build_from_yahoo_quote = build_quote
+
+    assert asyncio.run(scheduler._get_market_data("ZZZZ")) == ("market", "whale") and calls == ["ZZZZ"]
+    stats = scheduler.get_source_health()["sources"]
+    assert stats["stooq"]["empty"] == 1 and stats["stooq"]["failures"] == 0
+    assert stats["yahoo_chart"]["failures"] == 1 and "bad payload" in stats["yahoo_chart"]["last_error"]
+    assert stats["yahoo_quote"]["cache_hits"] == 1 and stats["yahoo_quote"]["latency_p50_ms"] is None
@@ -0,0 +1,115 @@
+"""
+测试 SQLiteMemoryStore 与 InMemoryStore 行为一致、重启后保留
+"""
+import random
+from datetime import datetime, timedelta
+
+from memory.memory_store import InMemoryStore, MemoryManager, MemoryType, MemoryScope
+from memory.sqlite_store import SQLiteMemoryStore
+
+
+def _fill(managers, n: int = 120, seed: int = 9):
+    rng = random.Random(seed)
+    words = ["earnings", "guidance", "回撤", "止损", "数据中心", "利率", "policy", "AI"]
+    for i in range(n):
+        dept, sym = rng.choice([("D2", "AAPL"), ("D3", "AAPL"), ("D3", "NVDA"), ("D1", None)])
+        scope = MemoryScope.GLOBAL if sym is None else MemoryScope.STOCK_SPECIFIC
+        content = f"note {i} " + " ".join(rng.sample(words, 3))
+        imp = round(rng.random(), 4)
+        first = managers[0].add_memory(MemoryType.LTM, scope, content, dept, sym, importance=imp)
+        for m in managers[1:]:
+            m.store.store(first)
+            m._enforce_capacity(first)
+
+
+def test_sqlite_store_matches_in_memory(tmp_path):
+    mem = MemoryManager(InMemoryStore())
+    sql = MemoryManager(SQLiteMemoryStore(str(tmp_path / "mem.db")))
+    for m in (mem, sql):
+        m.max_bucket_entries = 20
+        m.max_total_entries = 60
+    _fill([mem, sql])
+
+    assert len(sql.store) == len(mem.store) == 60
+    assert {e.entry_id for e in sql.store.entries_for_symbol("aapl")} == \
+        {e.entry_id for e in mem.store.entries_for_symbol("aapl")}
+    for dept, sym in (("D3", "NVDA"), ("D1", None)):
+        for q in ("回撤止损", "earnings guidance", None):
+            a = [e.entry_id for e in mem.retrieve_relevant_memory(dept, sym, query_text=q, max_entries=5)]
+            b = [e.entry_id for e in sql.retrieve_relevant_memory(dept, sym, query_text=q, max_entries=5)]
+            assert a == b
+
+    now = datetime.now()
+    feedback = [("AAPL", 0.2, "LONG"), ("NVDA", -0.1, "LONG")]
+    mem.apply_trade_feedback_batch(feedback, as_of=now)
+    sql.apply_trade_feedback_batch(feedback, as_of=now)
+    for e in mem.store._entries.values():
+        other = sql.store.query(scope=e.scope, department=e.department, stock_symbol=e.stock_symbol, limit=1000)
+        match = next(x for x in other if x.entry_id == e.entry_id)
+        assert abs(match.importance - e.importance) < 1e-9
+        assert (match.feedback is None) == (e.feedback is None)
+
+
+def test_sqlite_store_persists_and_expires(tmp_path):
+    path = str(tmp_path / "mem.db")
+    manager = MemoryManager(SQLiteMemoryStore(path))
+    kept = manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, "数据中心资本开支上修", "D3", "NVDA")
+    gone = manager.add_memory(MemoryType.EPHEMERAL, MemoryScope.STOCK_SPECIFIC, "盘中噪声", "D3", "NVDA")
+    gone.expires_at = datetime.now() - timedelta(minutes=1)
+    manager.store.store(gone)
+    manager.store.close()
+
+    reopened = SQLiteMemoryStore(path)
+    assert len(reopened) == 2
+    assert reopened.cleanup_expired() == 1
+    # FTS5 表随删除同步
+    assert reopened.fts_enabled
+    assert reopened._conn.execute("SELECT COUNT(*) FROM memories_fts WHERE memories_fts MATCH '资本'").fetchone()[0] == 1
+    hits = reopened.score("资本开支")
+    assert set(hits) == {kept.entry_id}
+    assert set(reopened.score("资本开支", candidates=[kept.entry_id, gone.entry_id])) == {kept.entry_id}
+    assert reopened.retrieve(kept.entry_id).access_count == 1
+
+
+def test_fts_prefilter_matches_text_index(tmp_path):
+    """FTS5 预筛与无 FTS5 逐条计算、InMemoryStore 倒排索引的得分一致"""
+    mem = MemoryManager(InMemoryStore())
+    fts = MemoryManager(SQLiteMemoryStore(str(tmp_path / "fts.db")))
+    plain = MemoryManager(SQLiteMemoryStore(str(tmp_path / "plain.db"), enable_fts=False))
+    assert fts.store.fts_enabled and not plain.store.fts_enabled
+    _fill([mem, fts, plain], n=80)
+
+    ids = [e.entry_id for e in mem.store._entries.values()]
+    for q in ("回撤止损", "earnings guidance policy", "ai 数据中心", "unmatched"):
+        expected = mem.store.text_index.score(q)
+        for store in (fts.store, plain.store):
+            assert store.score(q) == expected
+            assert store.score(q, candidates=ids[:25]) == {k: v for k, v in expected.items() if k in ids[:25]}
+    assert fts.store.score("earnings", candidates=[]) == {}
+
+
+def test_summary_cache_follows_bucket_generation(tmp_path):
+    for store in (InMemoryStore(), SQLiteMemoryStore(str(tmp_path / "gen.db"))):
+        manager = MemoryManager(store)
+        calls = []
+        inner = manager.retrieve_relevant_memory
+        manager.retrieve_relevant_memory = lambda *a, **k: calls.append(1) or inner(*a, **k)
+
+        nvda = manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, "数据中心需求强劲", "D3", "NVDA")
+        first = manager.get_summary("D3", "NVDA", query_text="数据中心")
+        assert manager.get_summary("D3", "NVDA", query_text="数据中心") == first and len(calls) == 1
+        manager.get_summary("D3", None)
+        assert len(calls) == 2
+
+        # 其他股票的桶写入不影响 NVDA，但会让部门级（不限股票）摘要失效
+        manager.add_memory(MemoryType.LTM, MemoryScope.STOCK_SPECIFIC, "iPhone 出货", "D3", "AAPL")
+        manager.get_summary("D3", "NVDA", query_text="数据中心")
+        assert len(calls) == 2
+        manager.get_summary("D3", None)
+        assert len(calls) == 3
+
+        manager.update_importance(nvda.entry_id, 0.2)
+        manager.get_summary("D3", "NVDA", query_text="数据中心")
+        assert len(calls) == 4
+        manager.get_summary("D3", "NVDA", query_text="供应链")
+        assert len(calls) == 5
@@ -1,15 +1,23 @@
 """
 测试用户账户管理功能
 """
+import os
+import tempfile
+
 import pytest
 from datetime import datetime
 from core.scheduler import TradingPlatformScheduler
 from models.base_models import UserAccount
 
 
+def _scheduler() -> TradingPlatformScheduler:
+    """临时目录中的调度器：运行状态与记忆库不写入正式文件"""
+    return TradingPlatformScheduler(state_file=os.path.join(tempfile.mkdtemp(), "state.json"))
+
+
 def test_create_paper_account():
     """测试创建模拟账户"""
-    scheduler = TradingPlatformScheduler()
+    scheduler = _scheduler()
     
     # 创建模拟账户
     user_account = scheduler.create_user_account(
@@ -34,7 +42,7 @@ def test_create_paper_account():
 
 def test_create_real_account():
     """测试创建真实账户"""
-    scheduler = TradingPlatformScheduler()
+    scheduler = _scheduler()
     
     # 创建真实账户
     user_account = scheduler.create_user_account(
@@ -66,7 +74,7 @@ def test_create_real_account():
 
 def test_real_account_validation():
     """测试真实账户创建时的验证"""
-    scheduler = TradingPlatformScheduler()
+    scheduler = _scheduler()
     
     # 缺少必要信息应该抛出异常
     with pytest.raises(ValueError, match="Real account requires brokerage, api_key, and api_secret"):
@@ -82,7 +90,7 @@ def test_real_account_validation():
 
 def test_get_user_account():
     """测试获取用户账户"""
-    scheduler = TradingPlatformScheduler()
+    scheduler = _scheduler()
     
     # 创建账户
     scheduler.create_user_account(
@@ -104,7 +112,7 @@ def test_get_user_account():
 
 def test_get_user_account_status():
     """测试获取用户账户状态"""
-    scheduler = TradingPlatformScheduler()
+    scheduler = _scheduler()
     
     # 创建账户
     scheduler.create_user_account(
@@ -129,7 +137,7 @@ def test_get_user_account_status():
 
 def test_multiple_users():
     """测试多用户场景"""
-    scheduler = TradingPlatformScheduler()
+    scheduler = _scheduler()
     
     # 创建多个用户
     user_ids = ["user_001", "user_002", "user_003"]
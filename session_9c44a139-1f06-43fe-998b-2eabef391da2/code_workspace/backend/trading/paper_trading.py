@@ -1,14 +1,18 @@
 ﻿"""
 Paper Trading - 模拟交易执行
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Sequence, Tuple
 from datetime import datetime, date, timedelta
 from dataclasses import dataclass, field
 from models.base_models import TradingDecision
+from operator import attrgetter
 import uuid
 import asyncio
 import random
 
+_MARKET_VALUE = attrgetter("market_value")
+_POSITION_PNL = attrgetter("unrealized_pnl", "realized_pnl")
+
 
 @dataclass
 class Order:
@@ -60,6 +64,8 @@ class Position:
         self.market_value = self.quantity * price
         if self.avg_cost > 0:
             self.unrealized_pnl = (price - self.avg_cost) * self.quantity
+        else:
+            self.unrealized_pnl = 0.0
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -89,7 +95,7 @@ class TradingAccount:
     @property
     def total_value(self) -> float:
         """总资产"""
-        positions_value = sum(p.market_value for p in self.positions.values())
+        positions_value = sum(map(_MARKET_VALUE, self.positions.values()))
         return self.cash + positions_value
     
     def to_dict(self) -> Dict[str, Any]:
@@ -105,7 +111,17 @@ class TradingAccount:
         }
 
 class PaperTradingEngine:
-    def __init__(self, account_id: str = "paper_account_001", initial_capital: float = 100000.0):
+    def __init__(self,
+                 account_id: str = "paper_account_001",
+                 initial_capital: float = 100000.0,
+                 clock: Optional[Callable[[], datetime]] = None,
+                 rng: Optional[random.Random] = None,
+                 snapshot_on_trade: bool = True):
+        # 时钟与随机源可注入：回放/回测时使用模拟时间，交易日/周限制按模拟日期计算
+        self.clock: Callable[[], datetime] = clock or datetime.now
+        self._rng = rng or random
+        # 回测按 bar 统一记录快照时可关闭逐笔快照（逐笔快照需遍历全部持仓）
+        self.snapshot_on_trade = snapshot_on_trade
         self.account = TradingAccount(
             account_id=account_id,
             initial_capital=initial_capital,
@@ -120,6 +136,9 @@ class PaperTradingEngine:
         # 统计
         self.daily_trade_counts: Dict[str, int] = {}  # 每只股票每日交易次数
         self.weekly_trade_days: Dict[str, Dict[str, set]] = {}  # 每只股票每周交易天数 {symbol: {week_key: set(dates)}}
+        self._last_count_purge: Optional[date] = None
+        # 批量成交期间暂缓逐笔的回撤/账户指标重算，账户总值增量维护（见 execute_decisions_batch）
+        self._batch_value: Optional[float] = None
         
         # 交易规则限制（从配置导入）
         from config.settings import config
@@ -152,9 +171,27 @@ class PaperTradingEngine:
         self._record_trade(filled_order, decision)
         
         return filled_order
+
+    async def execute_decisions_batch(self, items: Sequence[Tuple[TradingDecision, float]]) -> List[Order]:
+        """
+        按顺序执行同一时刻的一批决策：现金与持仓逐笔更新，下单用的账户总值按成交增量维护，
+        回撤与账户指标（O(持仓数)）在批末只重算一次
+        """
+        self._batch_value = self.account.total_value
+        try:
+            orders = [await self.execute_decision(decision, price) for decision, price in items]
+        finally:
+            self._batch_value = None
+        if any(o.status == "FILLED" and o.filled_quantity > 0 for o in orders):
+            self._refresh_after_fills()
+        return orders
+
+    def _today(self) -> date:
+        return self.clock().date()
+
     def _check_trading_rules(self, symbol: str) -> bool:
         """检查交易规则"""
-        today = date.today()
+        today = self._today()
         
         # 检查每日交易次数
         daily_key = f"{symbol}_{today}"
@@ -196,7 +233,7 @@ class PaperTradingEngine:
         position = self.account.positions.get(symbol)
         current_qty = float(position.quantity if position else 0.0)
         current_value = current_qty * current_price
-        total_value = max(float(self.account.total_value), 1.0)
+        total_value = max(float(self._account_value()), 1.0)
 
         # target_position 是账户资金占比（[-1,1]）；纸面账户当前仅支持 long-only 执行。
         target_ratio = abs(float(decision.target_position or 0.0))
@@ -238,7 +275,7 @@ class PaperTradingEngine:
             decision_id=decision_id
         )
         # 模拟滑点
-        slippage = random.uniform(-0.001, 0.001)  # ±0.1%滑点
+        slippage = self._rng.uniform(-0.001, 0.001)  # ±0.1%滑点
         execution_price = current_price * (1 + slippage)
         
         # 模拟手续费
@@ -248,7 +285,7 @@ class PaperTradingEngine:
         order.status = "FILLED"
         order.filled_quantity = order.quantity
         order.filled_price = execution_price
-        order.updated_at = datetime.now()
+        order.created_at = order.updated_at = self.clock()
         
         return order
     async def _simulate_execution(self, order: Order, current_price: float) -> Order:
@@ -257,12 +294,17 @@ class PaperTradingEngine:
         # 此方法返回订单即可
         return order
     
+    def _account_value(self) -> float:
+        """账户总值；批量成交期间返回增量维护的值，避免每笔遍历全部持仓"""
+        return self.account.total_value if self._batch_value is None else self._batch_value
+
     def _update_account(self, order: Order):
         """更新账户"""
         symbol = order.symbol
         trade_value = order.filled_quantity * order.filled_price
         
         # 更新现金
+        cash_before = self.account.cash
         if order.side == "BUY":
             self.account.cash -= trade_value
         else:
@@ -273,6 +315,7 @@ class PaperTradingEngine:
             self.account.positions[symbol] = Position(symbol=symbol)
         
         position = self.account.positions[symbol]
+        value_before = cash_before + position.market_value
         
         if order.side == "BUY":
             # 买入，更新平均成本
@@ -289,9 +332,13 @@ class PaperTradingEngine:
             if position.quantity <= 0:
                 position.quantity = 0
                 position.avg_cost = 0
+        # 以成交价重估该持仓市值，避免下单后到下次行情刷新前账户总值失真
+        position.update_price(order.filled_price)
+        if self._batch_value is not None:
+            self._batch_value += self.account.cash + position.market_value - value_before
         
         # 更新交易计数
-        today = date.today()
+        today = self._today()
         daily_key = f"{symbol}_{today}"
         self.daily_trade_counts[daily_key] = self.daily_trade_counts.get(daily_key, 0) + 1
         
@@ -307,29 +354,37 @@ class PaperTradingEngine:
         
         self.weekly_trade_days[symbol][week_key].add(today)
         
-        # 清理过期的每日交易计数（保留最近7天）
-        week_ago = today - timedelta(days=7)
-        keys_to_remove = [k for k in self.daily_trade_counts.keys() 
-                          if datetime.strptime(k.split('_')[-1], '%Y-%m-%d').date() < week_ago]
-        for k in keys_to_remove:
-            del self.daily_trade_counts[k]
-        
-        
-        # 计算回撤
+        # 清理过期的每日交易计数（保留最近7天；每个交易日只清理一次）
+        if self._last_count_purge != today:
+            self._last_count_purge = today
+            week_ago = today - timedelta(days=7)
+            keys_to_remove = [k for k in self.daily_trade_counts.keys()
+                              if date.fromisoformat(k.rsplit('_', 1)[-1]) < week_ago]
+            for k in keys_to_remove:
+                del self.daily_trade_counts[k]
+
+        if self._batch_value is None:
+            self._refresh_after_fills()
+
+    def _refresh_after_fills(self):
+        """成交后更新峰值/回撤并重算账户指标（或记录快照）"""
         current_value = self.account.total_value
         if current_value > self.account.peak_value:
             self.account.peak_value = current_value
         drawdown = (self.account.peak_value - current_value) / self.account.peak_value
         if drawdown > self.account.max_drawdown:
             self.account.max_drawdown = drawdown
-        self._recalculate_account_metrics()
-        self.record_equity_snapshot("trade")
+        if self.snapshot_on_trade:
+            # 快照内会重算账户指标
+            self.record_equity_snapshot("trade")
+        else:
+            self._recalculate_account_metrics()
     
     
     def _record_trade(self, order: Order, decision: TradingDecision):
         """记录交易"""
         trade_record = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.clock().isoformat(),
             "order": order.to_dict(),
             "decision_id": decision.decision_id if hasattr(decision, 'decision_id') else None,
             "symbol": order.symbol,
@@ -366,7 +421,7 @@ class PaperTradingEngine:
     
     def get_daily_stats(self) -> Dict[str, Any]:
         """获取每日统计"""
-        today = date.today()
+        today = self._today()
         today_trades = [t for t in self.trade_history 
                         if datetime.fromisoformat(t['timestamp']).date() == today]
         
@@ -385,6 +440,14 @@ class PaperTradingEngine:
         pos.update_price(price)
         self._recalculate_account_metrics()
 
+    def mark_to_market_batch(self, prices: Dict[str, float]):
+        """批量按行情更新持仓市值，账户指标只重算一次。"""
+        for symbol, price in prices.items():
+            pos = self.account.positions.get(symbol)
+            if pos:
+                pos.update_price(price)
+        self._recalculate_account_metrics()
+
     def _symbol_pnl_map(self) -> Dict[str, float]:
         out: Dict[str, float] = {}
         for sym, pos in self.account.positions.items():
@@ -392,21 +455,28 @@ class PaperTradingEngine:
         return out
 
     def _recalculate_account_metrics(self):
-        total_unrealized = sum(float(p.unrealized_pnl or 0.0) for p in self.account.positions.values())
-        total_realized = sum(float(p.realized_pnl or 0.0) for p in self.account.positions.values())
-        self.account.total_pnl = total_unrealized + total_realized
-        today = date.today().isoformat()
-        today_snaps = [x for x in self.equity_history if str(x.get("timestamp", "")).startswith(today)]
-        if today_snaps:
-            day_open = float(today_snaps[0].get("total_value", self.account.initial_capital) or self.account.initial_capital)
-            self.account.daily_pnl = self.account.total_value - day_open
+        total_pnl = 0.0
+        for unrealized, realized in map(_POSITION_PNL, self.account.positions.values()):
+            total_pnl += (unrealized or 0.0) + (realized or 0.0)
+        self.account.total_pnl = total_pnl
+        total_value = self.account.total_value
+        today = self._today().isoformat()
+        # 快照按时间追加：从尾部回溯到当日第一条即可，不扫描全部历史
+        day_open_snap = None
+        for x in reversed(self.equity_history):
+            if not str(x.get("timestamp", "")).startswith(today):
+                break
+            day_open_snap = x
+        if day_open_snap is not None:
+            day_open = float(day_open_snap.get("total_value", self.account.initial_capital) or self.account.initial_capital)
+            self.account.daily_pnl = total_value - day_open
         else:
-            self.account.daily_pnl = self.account.total_value - self.account.initial_capital
+            self.account.daily_pnl = total_value - self.account.initial_capital
 
     def record_equity_snapshot(self, reason: str = ""):
         """记录净值快照（含每股PnL），供周/月/半年/年收益查询。"""
         self._recalculate_account_metrics()
-        now = datetime.now()
+        now = self.clock()
         snap = {
             "timestamp": now.isoformat(),
             "reason": reason,
@@ -422,7 +492,7 @@ class PaperTradingEngine:
                 return
         self.equity_history.append(snap)
         if len(self.equity_history) > 12000:
-            self.equity_history = self.equity_history[-12000:]
+            del self.equity_history[:-12000]
 
     def _find_snapshot_before(self, cutoff: datetime) -> Optional[Dict[str, Any]]:
         for row in reversed(self.equity_history):
@@ -436,7 +506,7 @@ class PaperTradingEngine:
 
     def get_portfolio_performance(self) -> Dict[str, Any]:
         self._recalculate_account_metrics()
-        now = datetime.now()
+        now = self.clock()
         periods = {
             "week": 7,
             "month": 30,
@@ -458,7 +528,7 @@ class PaperTradingEngine:
         }
 
     def get_stock_performance(self, symbols: Optional[List[str]] = None) -> Dict[str, Any]:
-        now = datetime.now()
+        now = self.clock()
         periods = {
             "week": 7,
             "month": 30,